@@ -11,9 +11,11 @@ import hashlib
 import logging
 import os
 import pathlib
+import sqlite3
 import time
 
 import tornado.gen
+import tornado.ioloop
 
 import salt.cache
 import salt.crypt
@@ -24,6 +26,7 @@ import salt.utils.channel
 import salt.utils.event
 import salt.utils.minions
 import salt.utils.platform
+import salt.utils.presence
 import salt.utils.stringutils
 from salt.exceptions import SaltDeserializationError, UnsupportedAlgorithm
 from salt.utils.cache import CacheCli
@@ -882,6 +885,10 @@ class PubServerChannel:
         self.aes_funcs = salt.master.AESFuncs(self.opts)
         self.present = {}
         self.presence_events = presence_events
+        self.presence_table = salt.utils.presence.enabled(self.opts)
+        self._presence_changes = {}
+        self._presence_flush = None
+        self._presence_heartbeat = 0
         self.event = salt.utils.event.get_event("master", opts=self.opts, listen=False)
 
     @property
@@ -904,6 +911,10 @@ class PubServerChannel:
         self.event = salt.utils.event.get_event("master", opts=self.opts, listen=False)
         self.ckminions = salt.utils.minions.CkMinions(self.opts)
         self.present = {}
+        self.presence_table = salt.utils.presence.enabled(self.opts)
+        self._presence_changes = {}
+        self._presence_flush = None
+        self._presence_heartbeat = 0
         self.master_key = salt.crypt.MasterKeys(self.opts)
 
     def close(self):
@@ -937,10 +948,86 @@ class PubServerChannel:
         if secrets is not None:
             salt.master.SMaster.secrets = secrets
         self.master_key = salt.crypt.MasterKeys(self.opts)
+        if self.presence_table:
+            try:
+                with salt.utils.presence.PresenceTable(self.opts) as table:
+                    table.reset(self.presence_publisher)
+            except sqlite3.Error as exc:
+                log.error("Failed to reset the presence table: %s", exc)
         self.transport.publish_daemon(
             self.publish_payload, self.presence_callback, self.remove_presence_callback
         )
 
+    @property
+    def presence_publisher(self):
+        """
+        The name the connections of this publisher are recorded under in the
+        presence table
+        """
+        return "{}:{}".format(self.opts.get("transport"), self.opts.get("publish_port"))
+
+    def _record_presence(self, client, change):
+        """
+        Queue a change to the connection of a minion, to be written to the
+        presence table
+        """
+        if not self.presence_table:
+            return
+        id_ = client.id_
+        if change == "seen" and id_ in self._presence_changes:
+            # A pending connection is recorded as seen when it is written
+            return
+        addr = getattr(client, "address", None)
+        if isinstance(addr, (tuple, list)):
+            addr = addr[0]
+        self._presence_changes[id_] = (change, addr)
+        if self._presence_flush is None:
+            self._presence_flush = tornado.ioloop.PeriodicCallback(
+                self._flush_presence,
+                salt.utils.presence.FLUSH_INTERVAL * 1000,
+            )
+            self._presence_flush.start()
+
+    def _flush_presence(self):
+        """
+        Write the queued changes to the connections of the minions to the
+        presence table, in one transaction, and update the heartbeat of this
+        publisher
+        """
+        now = time.time()
+        if (
+            not self._presence_changes
+            and now - self._presence_heartbeat < salt.utils.presence.HEARTBEAT_INTERVAL
+        ):
+            return
+        changes, self._presence_changes = self._presence_changes, {}
+        connected = []
+        seen = []
+        disconnected = []
+        for id_, (change, addr) in changes.items():
+            if change == "connected":
+                connected.append((id_, addr))
+            elif change == "seen":
+                seen.append(id_)
+            else:
+                disconnected.append(id_)
+        try:
+            with salt.utils.presence.PresenceTable(self.opts) as table:
+                table.update(
+                    self.presence_publisher,
+                    connected=connected,
+                    seen=seen,
+                    disconnected=disconnected,
+                    now=now,
+                )
+        except sqlite3.Error as exc:
+            log.error("Failed to update the presence table: %s", exc)
+            # Retry the changes with the next flush
+            changes.update(self._presence_changes)
+            self._presence_changes = changes
+            return
+        self._presence_heartbeat = now
+
     def presence_callback(self, subscriber, msg):
         if msg["enc"] != "aes":
             # We only accept 'aes' encoded messages for 'id'
@@ -961,8 +1048,10 @@ class PubServerChannel:
         if id_ in self.present:
             clients = self.present[id_]
             clients.add(client)
+            self._record_presence(client, "seen")
         else:
             self.present[id_] = {client}
+            self._record_presence(client, "connected")
             if self.presence_events:
                 data = {"new": [id_], "lost": []}
                 self.event.fire_event(
@@ -991,6 +1080,7 @@ class PubServerChannel:
         clients.remove(client)
         if len(clients) == 0:
             del self.present[id_]
+            self._record_presence(client, "disconnected")
             if self.presence_events:
                 data = {"new": [], "lost": [id_]}
                 self.event.fire_event(
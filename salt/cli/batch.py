@@ -11,11 +11,145 @@ from datetime import datetime, timedelta
 import salt.client
 import salt.exceptions
 import salt.output
+import salt.utils.minions
+import salt.utils.presence
 import salt.utils.stringutils
 
 log = logging.getLogger(__name__)
 
 
+def batch_size(batch, count):
+    """
+    Return the number of minions to run on at once, for a batch of a number
+    of minions, or a percentage of the ``count`` minions
+
+    :raises ValueError: When the batch is invalid
+    """
+
+    def partition(x):
+        return float(x) / 100.0 * count
+
+    if isinstance(batch, str) and "%" in batch:
+        res = partition(float(batch.strip("%")))
+        if res < 1:
+            return int(math.ceil(res))
+        else:
+            return int(res)
+    else:
+        return int(batch)
+
+
+class JobTracker:
+    """
+    Track the minions which have not returned from the jobs published for a
+    batch run, checking whether the minions of the jobs which timed out are
+    still running them, as ``LocalClient.get_iter_returns`` does
+    """
+
+    def __init__(self, timeout, gather_job_timeout):
+        self.timeout = timeout
+        self.gather_job_timeout = gather_job_timeout
+        # jid -> the minions which have not returned, and the state of the
+        # saltutil.find_job check of the job
+        self.jobs = {}
+        # The jid of each saltutil.find_job job -> the jid of the job it checks
+        self.find_jobs = {}
+
+    def __len__(self):
+        return len(self.jobs)
+
+    @staticmethod
+    def parse_tag(tag):
+        """
+        Return the jid and minion of a job return event tag, or None
+        """
+        parts = tag.split("/")
+        if len(parts) != 5 or parts[:2] != ["salt", "job"] or parts[3] != "ret":
+            return None
+        return parts[2], parts[4]
+
+    def add(self, jid, minions, now):
+        self.jobs[jid] = {
+            "pending": set(minions),
+            "timeout_at": now + self.timeout,
+            "find_jid": None,
+            "find_at": None,
+            "running": set(),
+        }
+
+    def _finish(self, jid):
+        job = self.jobs.pop(jid)
+        self.find_jobs.pop(job["find_jid"], None)
+
+    def discard(self, jid):
+        """
+        Stop tracking a job, returning the minions which had not returned
+        """
+        if jid not in self.jobs:
+            return []
+        pending = sorted(self.jobs[jid]["pending"])
+        self._finish(jid)
+        return pending
+
+    def returned(self, jid, minion, data):
+        """
+        Record a job return event, and return whether it is the return of a
+        minion which is being waited for
+        """
+        if jid in self.find_jobs:
+            job = self.jobs.get(self.find_jobs[jid])
+            ret = data.get("return")
+            if job is not None and isinstance(ret, dict):
+                if ret and ret.get("return") != {}:
+                    job["running"].add(minion)
+            return False
+        job = self.jobs.get(jid)
+        if job is None or minion not in job["pending"] or "return" not in data:
+            return False
+        job["pending"].discard(minion)
+        if not job["pending"]:
+            self._finish(jid)
+        return True
+
+    def expired(self, now):
+        """
+        Return a list of ``(jid, minions)`` tuples for the jobs which timed out,
+        whose minions have to be checked for still running them
+        """
+        ret = []
+        for jid, job in self.jobs.items():
+            if job["find_at"] is None and now >= job["timeout_at"]:
+                job["find_at"] = now + self.gather_job_timeout
+                job["running"] = set()
+                ret.append((jid, sorted(job["pending"])))
+        return ret
+
+    def checking(self, jid, find_jid):
+        """
+        Record the jid of the saltutil.find_job job checking a job
+        """
+        if find_jid and jid in self.jobs:
+            self.jobs[jid]["find_jid"] = find_jid
+            self.find_jobs[find_jid] = jid
+
+    def lost(self, now):
+        """
+        Return the minions which did not return, and which were not found to
+        still be running their job
+        """
+        lost = []
+        for jid, job in list(self.jobs.items()):
+            if job["find_at"] is None or now < job["find_at"]:
+                continue
+            self.find_jobs.pop(job["find_jid"], None)
+            lost.extend(sorted(job["pending"] - job["running"]))
+            job["pending"] &= job["running"]
+            job.update(find_jid=None, find_at=None, timeout_at=now + self.timeout)
+            if not job["pending"]:
+                self._finish(jid)
+        return lost
+
+
 class Batch:
     """
     Manage the execution of batch runs
@@ -98,18 +232,10 @@ class Batch:
         Return the active number of minions to maintain
         """
 
-        def partition(x):
-            return float(x) / 100.0 * len(self.minions)
-
         try:
             if isinstance(self.opts["batch"], str) and "%" in self.opts["batch"]:
-                res = partition(float(self.opts["batch"].strip("%")))
-                if res < 1:
-                    return int(math.ceil(res))
-                else:
-                    return int(res)
-            else:
-                return int(self.opts["batch"])
+                return batch_size(self.opts["batch"], len(self.minions))
+            return int(self.opts["batch"])
         except ValueError:
             if not self.quiet:
                 salt.utils.stringutils.print_cli(
@@ -125,6 +251,65 @@ class Batch:
         if i:
             del wait[:i]
 
+    def _process_return(self, minion, data, ret):
+        """
+        Process the return of a minion, recording it in ``ret``
+
+        :return: A tuple of the ``(data, retcode)`` tuple to yield for the
+                 return, or None, and whether the batch run has to be stopped
+                 due to failhard
+        """
+        failhard = False
+        result = None
+
+        # need to check if Minion failed to respond to job sent
+        failed_check = data.get("failed", False)
+        if failed_check:
+            log.debug(
+                "Minion '%s' failed to respond to job sent, data '%s'",
+                minion,
+                data,
+            )
+            if not self.quiet:
+                # We already know some minions didn't respond to the ping, so inform
+                # inform user attempt to run a job failed
+                salt.utils.stringutils.print_cli(
+                    f"Minion '{minion}' failed to respond to job sent"
+                )
+
+            if self.opts.get("failhard"):
+                failhard = True
+            ret[minion] = data
+        else:
+            # If we are executing multiple modules with the same cmd,
+            # We use the highest retcode.
+            retcode = 0
+            if "retcode" in data:
+                if isinstance(data["retcode"], dict):
+                    try:
+                        data["retcode"] = max(data["retcode"].values())
+                    except ValueError:
+                        data["retcode"] = 0
+                if self.opts.get("failhard") and data["retcode"] > 0:
+                    failhard = True
+                retcode = data["retcode"]
+
+            if self.opts.get("raw"):
+                ret[minion] = data
+                result = (data, retcode)
+            else:
+                ret[minion] = data["ret"]
+                result = ({minion: data["ret"]}, retcode)
+            if not self.quiet:
+                ret[minion] = data["ret"]
+                data[minion] = data.pop("ret")
+                if "out" in data:
+                    out = data.pop("out")
+                else:
+                    out = None
+                salt.output.display_output(data, out, self.opts)
+        return result, failhard
+
     def run(self):
         """
         Execute the batch run
@@ -285,55 +470,9 @@ class Batch:
                     active.remove(minion)
                     if bwait:
                         wait.append(datetime.now() + timedelta(seconds=bwait))
-                failhard = False
-
-                # need to check if Minion failed to respond to job sent
-                failed_check = data.get("failed", False)
-                if failed_check:
-                    log.debug(
-                        "Minion '%s' failed to respond to job sent, data '%s'",
-                        minion,
-                        data,
-                    )
-                    if not self.quiet:
-                        # We already know some minions didn't respond to the ping, so inform
-                        # inform user attempt to run a job failed
-                        salt.utils.stringutils.print_cli(
-                            f"Minion '{minion}' failed to respond to job sent"
-                        )
-
-                    if self.opts.get("failhard"):
-                        failhard = True
-                    ret[minion] = data
-                else:
-                    # If we are executing multiple modules with the same cmd,
-                    # We use the highest retcode.
-                    retcode = 0
-                    if "retcode" in data:
-                        if isinstance(data["retcode"], dict):
-                            try:
-                                data["retcode"] = max(data["retcode"].values())
-                            except ValueError:
-                                data["retcode"] = 0
-                        if self.opts.get("failhard") and data["retcode"] > 0:
-                            failhard = True
-                        retcode = data["retcode"]
-
-                    if self.opts.get("raw"):
-                        ret[minion] = data
-                        yield data, retcode
-                    else:
-                        ret[minion] = data["ret"]
-                        yield {minion: data["ret"]}, retcode
-                    if not self.quiet:
-                        ret[minion] = data["ret"]
-                        data[minion] = data.pop("ret")
-                        if "out" in data:
-                            out = data.pop("out")
-                        else:
-                            out = None
-                        salt.output.display_output(data, out, self.opts)
-
+                result, failhard = self._process_return(minion, data, ret)
+                if result is not None:
+                    yield result
                 if failhard:
                     log.error(
                         "Minion %s returned with non-zero exit code. "
@@ -354,3 +493,208 @@ class Batch:
                             if bwait:
                                 wait.append(datetime.now() + timedelta(seconds=bwait))
         self.local.destroy()
+
+
+class EventBatch(Batch):
+    """
+    Manage the execution of batch runs, driven by the job return events on
+    the master event bus
+
+    Rather than pinging the targeted minions first, the run uses the targeted
+    minions which are connected to the master. Whenever minions return, a
+    single job is published to a list of minions which fills the free slots of
+    the batch, and the returns of all of the jobs are read from a single event
+    subscription.
+    """
+
+    def __init__(self, opts, eauth=None, quiet=False, _parser=None):
+        super().__init__(opts, eauth=eauth, quiet=quiet, _parser=_parser)
+        self.metrics = {}
+
+    def gather_minions(self):
+        """
+        Return a list of the targeted minions which are connected to the
+        master, falling back to pinging the targeted minions when neither the
+        minion data cache nor the presence table, which are needed to find the
+        connected minions, is enabled
+        """
+        if not self.opts.get(
+            "minion_data_cache", False
+        ) and not salt.utils.presence.enabled(self.opts):
+            return super().gather_minions()
+        tgt_type = self.opts.get("selected_target_option") or self.opts.get(
+            "tgt_type", "glob"
+        )
+        ckminions = salt.utils.minions.CkMinions(self.opts)
+        targeted = ckminions.check_minions(self.opts["tgt"], tgt_type)["minions"]
+        if not targeted:
+            if not self.quiet:
+                salt.utils.stringutils.print_cli("No minions matched the target.")
+            return ([], None, set())
+        connected = ckminions.connected_ids(subset=targeted)
+        minions = [minion for minion in targeted if minion in connected]
+        return (minions, None, set(targeted).difference(connected))
+
+    def _publish(self, minions, fun, arg, timeout):
+        """
+        Publish a job to a list of minions, and return its jid, or None if it
+        could not be published
+        """
+        # Listen, so that the event subscription is connected before the job
+        # is published, and returns from fast minions are not missed
+        pub_data = self.local.run_job(
+            minions,
+            fun,
+            arg,
+            tgt_type="list",
+            ret=self.opts.get("return", self.opts.get("ret", "")),
+            timeout=timeout,
+            listen=True,
+            **self.eauth,
+        )
+        self.metrics["publishes"] += 1
+        return pub_data.get("jid")
+
+    def run(self):
+        """
+        Execute the batch run
+        """
+        self.minions, _, self.down_minions = self.gather_minions()
+        bnum = self.get_bnum()
+        if not self.minions:
+            return
+        if not self.quiet:
+            for down_minion in self.down_minions:
+                salt.utils.stringutils.print_cli(
+                    "Minion {} is not connected. No job will be sent.".format(
+                        down_minion
+                    )
+                )
+
+        verbose = self.options.verbose if self.options else False
+        timeout = self.opts["timeout"]
+        bwait = self.opts.get("batch_wait", 0)
+        to_run = list(self.minions)
+        to_run.reverse()
+        tracker = JobTracker(timeout, self.opts["gather_job_timeout"])
+        active = set()
+        wait = []
+        ret = {}
+        self.metrics = {"publishes": 0, "returns": 0, "lost": 0}
+        start = time.time()
+
+        while len(ret) < len(self.minions):
+            if bwait and wait:
+                now = datetime.now()
+                wait = [when for when in wait if when > now]
+            next_ = []
+            while to_run and len(active) + len(next_) + len(wait) < bnum:
+                next_.append(to_run.pop())
+            if not to_run and not active and not next_ and not tracker:
+                # Nothing left which could return
+                break
+            if next_:
+                if not self.quiet:
+                    salt.utils.stringutils.print_cli(
+                        f"\nExecuting run on {sorted(next_)}\n"
+                    )
+                jid = self._publish(next_, self.opts["fun"], self.opts["arg"], timeout)
+                if jid is None:
+                    # The master did not accept the job, so these minions will
+                    # not return
+                    parts = [(minion, {"ret": {}}) for minion in next_]
+                else:
+                    tracker.add(jid, next_, time.time())
+                    active.update(next_)
+                    parts = []
+            else:
+                parts = []
+
+            # Read all of the returns which are available, waiting briefly for
+            # the first one
+            raw = self.local.event.get_event(
+                wait=0.05, tag="salt/job/", match_type="startswith", full=True
+            )
+            while raw is not None:
+                parts.extend(self._parse_event(raw, tracker))
+                raw = self.local.event.get_event(
+                    tag="salt/job/", match_type="startswith", full=True, no_block=True
+                )
+
+            now = time.time()
+            for jid, minions in tracker.expired(now):
+                tracker.checking(
+                    jid,
+                    self._publish(
+                        minions,
+                        "saltutil.find_job",
+                        [jid],
+                        self.opts["gather_job_timeout"],
+                    ),
+                )
+            for minion in tracker.lost(now):
+                self.metrics["lost"] += 1
+                parts.append((minion, {"failed": True} if verbose else {"ret": {}}))
+
+            for minion, data in parts:
+                if minion in active:
+                    active.discard(minion)
+                    if bwait:
+                        wait.append(datetime.now() + timedelta(seconds=bwait))
+                result, failhard = self._process_return(minion, data, ret)
+                if result is not None:
+                    yield result
+                if failhard:
+                    log.error(
+                        "Minion %s returned with non-zero exit code. "
+                        "Batch run stopped due to failhard",
+                        minion,
+                    )
+                    self._log_metrics(start)
+                    return
+        self._log_metrics(start)
+        self.local.destroy()
+
+    def _parse_event(self, raw, tracker):
+        """
+        Return a list of the ``(minion, data)`` returns in a job event
+        """
+        parsed = tracker.parse_tag(raw["tag"])
+        if parsed is None or not tracker.returned(*parsed, raw["data"]):
+            return []
+        minion = parsed[1]
+        data = raw["data"]
+        self.metrics["returns"] += 1
+        if self.opts.get("raw"):
+            return [(minion, raw)]
+        ret = {"ret": data["return"]}
+        for key in ("out", "retcode", "jid"):
+            if key in data:
+                ret[key] = data[key]
+        return [(minion, ret)]
+
+    def _log_metrics(self, start):
+        elapsed = time.time() - start
+        self.metrics["elapsed"] = elapsed
+        self.metrics["returns_per_second"] = (
+            self.metrics["returns"] / elapsed if elapsed else 0.0
+        )
+        log.info(
+            "Batch run on %d minions finished in %.2fs: %d returns (%.1f/s), "
+            "%d publishes, %d minions did not return",
+            len(self.minions),
+            elapsed,
+            self.metrics["returns"],
+            self.metrics["returns_per_second"],
+            self.metrics["publishes"],
+            self.metrics["lost"],
+        )
+
+
+def get_batch(opts, eauth=None, quiet=False, _parser=None):
+    """
+    Return the batch runner configured by the ``batch_event_driven`` option
+    """
+    if opts.get("batch_event_driven", False) and not opts.get("order_masters"):
+        return EventBatch(opts, eauth=eauth, quiet=quiet, _parser=_parser)
+    return Batch(opts, eauth=eauth, quiet=quiet, _parser=_parser)
@@ -0,0 +1,455 @@
+"""
+Execute batch runs on the master
+
+When the :conf_master:`batch_async` master option is set, the master runs a
+batch scheduler process. Batches are submitted with
+:py:meth:`LocalClient.run_batch_async <salt.client.LocalClient.run_batch_async>`,
+which returns the jid of the batch as soon as the master has accepted it, so
+that the client does not have to stay connected while the batch runs.
+
+The windows of all of the batches are driven from the event loop of the
+scheduler, by the job return events on the master event bus. The returns of
+the minions are stored in the master job cache under the jid of the batch,
+and the progress of the batch in its load, so that both can be looked up with
+the :mod:`jobs runner <salt.runners.jobs>`. When the scheduler starts, it
+resumes the batches of the job cache which have not finished, including those
+which were submitted while it was not running.
+
+.. versionadded:: 3008.0
+"""
+
+import asyncio
+import logging
+import time
+
+import salt.client
+import salt.exceptions
+import salt.minion
+import salt.utils.event
+import salt.utils.jid
+import salt.utils.minions
+import salt.utils.presence
+from salt.cli.batch import JobTracker, batch_size
+from salt.utils.event import tagify
+
+log = logging.getLogger(__name__)
+
+# The interval, in seconds, at which the timeouts of the batches are checked
+TICK_INTERVAL = 1
+
+# The minimum interval, in seconds, between two saves of the progress of a
+# batch to the job cache
+PROGRESS_INTERVAL = 5
+
+
+class AsyncBatch:
+    """
+    The state of a batch run by the scheduler
+    """
+
+    def __init__(self, jid, load, minions, down, now):
+        spec = load["batch"]
+        self.jid = jid
+        self.load = load
+        self.minions = minions
+        self.down = down
+        self.size = batch_size(spec["batch"], len(minions))
+        self.wait = spec.get("batch_wait", 0)
+        self.failhard = spec.get("failhard", False)
+        self.timeout = spec["timeout"]
+        self.gather_job_timeout = spec["gather_job_timeout"]
+        self.tracker = JobTracker(self.timeout, self.gather_job_timeout)
+        # The jids of the jobs published for the batch
+        self.jids = set()
+        self.to_run = list(reversed(minions))
+        self.active = set()
+        self.waiting = []
+        self.done = []
+        self.lost = []
+        self.failed = False
+        self.start = now
+        self.saved = 0
+        self.dirty = True
+
+    def restore(self, progress, now):
+        """
+        Restore the progress saved by an earlier run of the scheduler, for a
+        batch created with the minions which have not run yet. The minions
+        which were running then are counted as not having returned, as their
+        returns may have been missed.
+        """
+        running = list(progress.get("running") or [])
+        down = list(progress.get("down") or [])
+        self.done = list(progress.get("done") or [])
+        self.lost = list(progress.get("lost") or []) + running
+        self.down = down + [minion for minion in self.down if minion not in down]
+        self.failed = bool(progress.get("failhard")) or bool(
+            self.failhard and running
+        )
+        self.start = now - progress.get("elapsed", 0)
+        # The size of the windows depends on the number of minions of the
+        # whole batch
+        self.size = batch_size(
+            self.load["batch"]["batch"],
+            len(self.to_run) + len(self.done) + len(self.lost),
+        )
+
+    @property
+    def finished(self):
+        return not self.active and (self.failed or not self.to_run)
+
+    def next_window(self, now):
+        """
+        Return the minions to publish the next job to, which fill the free
+        slots of the batch, and mark them as running
+        """
+        if self.failed:
+            return []
+        if self.waiting:
+            self.waiting = [when for when in self.waiting if when > now]
+        ret = []
+        while self.to_run and len(self.active) + len(ret) + len(self.waiting) < (
+            self.size
+        ):
+            ret.append(self.to_run.pop())
+        self.active.update(ret)
+        return ret
+
+    def finish_minion(self, minion, now, lost=False):
+        """
+        Record that a minion returned, or that it was lost
+        """
+        if minion not in self.active:
+            return
+        self.active.discard(minion)
+        if lost:
+            self.lost.append(minion)
+            if self.failhard:
+                self.failed = True
+        else:
+            self.done.append(minion)
+        if self.wait:
+            self.waiting.append(now + self.wait)
+        self.dirty = True
+
+    def progress(self, now):
+        return {
+            "pending": len(self.to_run),
+            "running": sorted(self.active),
+            "done": list(self.done),
+            "lost": list(self.lost),
+            "down": list(self.down),
+            "failhard": self.failed,
+            "finished": self.finished,
+            "elapsed": now - self.start,
+        }
+
+
+class BatchScheduler:
+    """
+    Run the batches submitted to the master, from the events on the master
+    event bus
+    """
+
+    def __init__(self, opts, io_loop=None):
+        self.opts = opts
+        self.io_loop = io_loop
+        self.local = salt.client.get_local_client(mopts=opts, io_loop=io_loop)
+        self.mminion = salt.minion.MasterMinion(
+            opts, states=False, rend=False, ignore_config_errors=True
+        )
+        self.ckminions = salt.utils.minions.CkMinions(opts)
+        self.event = salt.utils.event.get_master_event(
+            opts, opts["sock_dir"], listen=False
+        )
+        # The jid of each running batch -> its AsyncBatch
+        self.batches = {}
+        # The jid of each job published for a running batch -> its AsyncBatch
+        self.jobs = {}
+        self._last_jid = None
+
+    def _returner(self, name):
+        return self.mminion.returners[
+            "{}.{}".format(self.opts["master_job_cache"], name)
+        ]
+
+    def _gen_jid(self):
+        jid = salt.utils.jid.gen_jid(self.opts)
+        while jid == self._last_jid or jid in self.jobs:
+            jid = salt.utils.jid.gen_jid(self.opts)
+        self._last_jid = jid
+        return jid
+
+    def _register(self, batch, jid):
+        batch.jids.add(jid)
+        self.jobs[jid] = batch
+
+    def _prune(self, batch):
+        """
+        Forget the jobs of a batch which are no longer being tracked
+        """
+        tracked = set(batch.tracker.jobs).union(batch.tracker.find_jobs)
+        for jid in batch.jids - tracked:
+            self.jobs.pop(jid, None)
+        batch.jids &= tracked
+
+    async def handle_event(self, package):
+        """
+        Handle an event of the master event bus
+        """
+        tag, data = salt.utils.event.SaltEvent.unpack(package)
+        if tag.startswith("salt/job/"):
+            parsed = JobTracker.parse_tag(tag)
+            if parsed is not None and parsed[0] in self.jobs:
+                await self.job_returned(*parsed, data)
+        elif tag.startswith("salt/batch/") and tag.endswith("/new"):
+            await self.start_batch(tag.split("/")[2])
+
+    async def resume_batches(self):
+        """
+        Start the batches of the job cache which have not finished, because
+        the scheduler stopped while they ran, or because they were submitted
+        while it was not running
+        """
+        try:
+            jobs = self._returner("get_jids")()
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error("Failed to list the jobs of the job cache: %s", exc)
+            return
+        for jid, job in sorted(jobs.items()):
+            if not isinstance(job, dict):
+                continue
+            if job.get("Function") == "saltutil.find_job" or "batch_jid" in (
+                job.get("Metadata") or {}
+            ):
+                # The jobs published for a batch
+                continue
+            await self.start_batch(jid, resume=True)
+
+    async def start_batch(self, jid, resume=False):
+        """
+        Start a batch which was accepted by the master. With ``resume``, a
+        batch which did not finish is resumed from its saved progress.
+
+        The batch is read from the job cache, where the master saved it, since
+        any minion can fire an event with the tag of a new batch.
+        """
+        if jid in self.batches:
+            return
+        try:
+            load = self._returner("get_load")(jid)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error("Failed to read the load of batch %s: %s", jid, exc)
+            return
+        if not isinstance(load, dict) or not isinstance(load.get("batch"), dict):
+            if not resume:
+                log.debug("Ignoring the start of %s, which is not a batch", jid)
+            return
+        progress = load.get("progress")
+        if progress is not None and (
+            not resume or not isinstance(progress, dict) or progress.get("finished")
+        ):
+            log.debug("Ignoring the start of batch %s, which already ran", jid)
+            return
+        minions = list(load.get("minions") or [])
+        if progress is not None:
+            ran = set(progress.get("done") or []).union(
+                progress.get("lost") or [],
+                progress.get("running") or [],
+                progress.get("down") or [],
+            )
+            minions = [minion for minion in minions if minion not in ran]
+        down = []
+        if self.opts.get("minion_data_cache", False) or salt.utils.presence.enabled(
+            self.opts
+        ):
+            connected = self.ckminions.connected_ids(subset=minions)
+            down = [minion for minion in minions if minion not in connected]
+            minions = [minion for minion in minions if minion in connected]
+        try:
+            batch = AsyncBatch(jid, load, minions, down, time.time())
+        except (KeyError, TypeError, ValueError) as exc:
+            log.error("Invalid batch %s: %s", jid, exc)
+            return
+        if progress is not None:
+            batch.restore(progress, time.time())
+        self.batches[jid] = batch
+        log.info(
+            "%s batch %s of %s on %d minions, %d at a time",
+            "Resuming" if progress is not None else "Starting",
+            jid,
+            load.get("fun"),
+            len(minions),
+            batch.size,
+        )
+        await self.step(batch, time.time())
+
+    async def step(self, batch, now):
+        """
+        Publish a job to the minions which fill the free slots of a batch, or
+        finish it
+        """
+        if batch.finished:
+            self.finish_batch(batch, now)
+            return
+        minions = batch.next_window(now)
+        if not minions:
+            return
+        jid = self._gen_jid()
+        # Track the job before publishing it, so that no return is missed
+        batch.tracker.add(jid, minions, now)
+        self._register(batch, jid)
+        published = await self._publish(
+            batch,
+            minions,
+            batch.load["fun"],
+            batch.load["arg"],
+            jid,
+            batch.timeout,
+            ret=batch.load.get("ret", ""),
+        )
+        if not published:
+            # The minions will not return
+            for minion in batch.tracker.discard(jid):
+                batch.finish_minion(minion, time.time(), lost=True)
+            self._prune(batch)
+            await self.step(batch, time.time())
+
+    async def _publish(self, batch, minions, fun, arg, jid, timeout, ret=""):
+        """
+        Publish a job of a batch, and return whether it was published
+        """
+        try:
+            pub_data = await self.local.run_job_async(
+                minions,
+                fun,
+                arg,
+                tgt_type="list",
+                ret=ret,
+                timeout=timeout,
+                jid=jid,
+                listen=False,
+                io_loop=self.io_loop,
+                metadata={"batch_jid": batch.jid},
+            )
+        except salt.exceptions.SaltException as exc:
+            log.error("Failed to publish %s for batch %s: %s", fun, batch.jid, exc)
+            return False
+        return bool(pub_data.get("jid"))
+
+    async def job_returned(self, jid, minion, data):
+        """
+        Handle the return of a minion from a job of a batch
+        """
+        batch = self.jobs[jid]
+        if not batch.tracker.returned(jid, minion, data):
+            return
+        if jid not in batch.tracker.jobs:
+            self._prune(batch)
+        self.save_return(batch, minion, data)
+        batch.finish_minion(minion, time.time())
+        retcode = data.get("retcode", 0)
+        if isinstance(retcode, dict):
+            retcode = max(retcode.values(), default=0)
+        if batch.failhard and retcode:
+            log.error(
+                "Minion %s returned with non-zero exit code. "
+                "Batch %s stopped due to failhard",
+                minion,
+                batch.jid,
+            )
+            batch.failed = True
+        await self.step(batch, time.time())
+
+    def save_return(self, batch, minion, data):
+        """
+        Store the return of a minion in the job cache, under the jid of the
+        batch
+        """
+        load = {
+            "jid": batch.jid,
+            "id": minion,
+            "fun": batch.load["fun"],
+            "fun_args": batch.load["arg"],
+            "return": data.get("return"),
+            "retcode": data.get("retcode", 0),
+            "success": data.get("success", True),
+        }
+        try:
+            self._returner("returner")(load)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error(
+                "Failed to store the return of %s for batch %s: %s",
+                minion,
+                batch.jid,
+                exc,
+            )
+
+    def save_progress(self, batch, now):
+        """
+        Store the progress of a batch in its load in the job cache
+        """
+        batch.load["progress"] = batch.progress(now)
+        try:
+            self._returner("save_load")(
+                batch.jid, batch.load, minions=batch.load.get("minions")
+            )
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error("Failed to save the progress of batch %s: %s", batch.jid, exc)
+        batch.saved = now
+        batch.dirty = False
+
+    def finish_batch(self, batch, now):
+        self.batches.pop(batch.jid, None)
+        for jid in batch.jids:
+            self.jobs.pop(jid, None)
+        batch.jids.clear()
+        self.save_progress(batch, now)
+        progress = batch.load["progress"]
+        log.info(
+            "Batch %s finished in %.2fs: %d minions returned, %d did not return",
+            batch.jid,
+            progress["elapsed"],
+            len(progress["done"]),
+            len(progress["lost"]),
+        )
+        self.event.fire_event(
+            {"jid": batch.jid, **progress}, tagify([batch.jid, "done"], "batch")
+        )
+
+    async def check_batches(self, now):
+        """
+        Check the jobs of the batches which timed out, and fill the slots which
+        were freed when minions did not return or ``batch_wait`` passed
+        """
+        for batch in list(self.batches.values()):
+            for jid, minions in batch.tracker.expired(now):
+                find_jid = self._gen_jid()
+                batch.tracker.checking(jid, find_jid)
+                self._register(batch, find_jid)
+                await self._publish(
+                    batch,
+                    minions,
+                    "saltutil.find_job",
+                    [jid],
+                    find_jid,
+                    batch.gather_job_timeout,
+                )
+            for minion in batch.tracker.lost(now):
+                batch.finish_minion(minion, now, lost=True)
+            self._prune(batch)
+            await self.step(batch, now)
+            if (
+                batch.jid in self.batches
+                and batch.dirty
+                and now - batch.saved >= PROGRESS_INTERVAL
+            ):
+                self.save_progress(batch, now)
+
+    async def tick(self):
+        while True:
+            await asyncio.sleep(TICK_INTERVAL)
+            try:
+                await self.check_batches(time.time())
+            except Exception:  # pylint: disable=broad-except
+                log.exception("Failed to check the running batches")
@@ -265,7 +265,7 @@ class SaltCMD(salt.utils.parsers.SaltCMDOptionParser):
                 self.config["batch"] = "100%"
 
             try:
-                batch = salt.cli.batch.Batch(self.config, eauth=eauth, quiet=True)
+                batch = salt.cli.batch.get_batch(self.config, eauth=eauth, quiet=True)
             except SaltClientError:
                 sys.exit(2)
 
@@ -279,7 +279,7 @@ class SaltCMD(salt.utils.parsers.SaltCMDOptionParser):
         else:
             try:
                 self.config["batch"] = self.options.batch
-                batch = salt.cli.batch.Batch(
+                batch = salt.cli.batch.get_batch(
                     self.config, eauth=eauth, _parser=self.options
                 )
             except SaltClientError:
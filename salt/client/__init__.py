@@ -626,10 +626,62 @@ class LocalClient:
         for key, val in self.opts.items():
             if key not in opts:
                 opts[key] = val
-        batch = salt.cli.batch.Batch(opts, eauth=eauth, quiet=True)
+        batch = salt.cli.batch.get_batch(opts, eauth=eauth, quiet=True)
         for ret, _ in batch.run():
             yield ret
 
+    def run_batch_async(
+        self,
+        tgt,
+        fun,
+        arg=(),
+        tgt_type="glob",
+        ret="",
+        kwarg=None,
+        batch="10%",
+        timeout=None,
+        **kwargs,
+    ):
+        """
+        Run a command on subsets of minions at a time, from the master
+
+        The batch is run by the master, which has to have
+        :conf_master:`batch_async` enabled, so this returns as soon as the
+        master accepted the batch. The returns of the minions are stored in
+        the job cache under the jid of the batch, and the progress of the
+        batch is stored in its load, as ``progress``.
+
+        The function signature is the same as :py:meth:`cmd_batch`, with the
+        ``batch_wait``, ``gather_job_timeout`` and ``failhard`` options passed
+        as keyword arguments.
+
+        .. versionadded:: 3008.0
+
+        :returns: A dictionary with the jid of the batch and the targeted
+                  minions, or an empty dictionary on failure
+
+        .. code-block:: python
+
+            >>> local.run_batch_async('*', 'state.highstate', batch='10%')
+            {'jid': '20131219215650131543', 'minions': ['jerry', 'dave']}
+        """
+        arg = salt.utils.args.condition_input(arg, kwarg)
+        payload_kwargs = self._prep_pub(
+            tgt,
+            fun,
+            arg,
+            tgt_type,
+            ret,
+            "",
+            self.opts["timeout"],
+            batch=batch,
+            **kwargs,
+        )
+        payload_kwargs["cmd"] = "publish_batch"
+        payload_kwargs["kwargs"]["timeout"] = self._get_timeout(timeout)
+        pub_data = self._send_pub_load(payload_kwargs, timeout=self.opts["timeout"])
+        return self._check_pub_data(pub_data, listen=False)
+
     def cmd(
         self,
         tgt,
@@ -1889,7 +1941,13 @@ class LocalClient:
         payload_kwargs = self._prep_pub(
             tgt, fun, arg, tgt_type, ret, jid, timeout, **kwargs
         )
+        return self._send_pub_load(payload_kwargs, timeout=timeout, listen=listen)
 
+    def _send_pub_load(self, payload_kwargs, timeout=5, listen=False):
+        """
+        Send a load prepared by ``_prep_pub`` to the master, and return the
+        jid and minions of the job
+        """
         master_uri = "tcp://{}:{}".format(
             salt.utils.network.ip_bracket(self.opts["interface"]),
             str(self.opts["ret_port"]),
@@ -243,6 +243,9 @@ VALID_OPTS = immutabletypes.freeze(
         "pillarenv": (type(None), str),
         # Make the pillarenv always match the effective saltenv
         "pillarenv_from_saltenv": bool,
+        # Send the hash of the current pillar when requesting the pillar, so the
+        # master can reply with only the changes to it
+        "pillar_delta": bool,
         # Allows a user to provide an alternate name for top.sls
         "state_top": str,
         "state_top_saltenv": (type(None), str),
@@ -279,6 +282,14 @@ VALID_OPTS = immutabletypes.freeze(
         "gpg_decrypt_must_succeed": bool,
         # The type of hashing algorithm to use when doing file comparisons
         "hash_type": str,
+        # Remember the hashes of local files, keyed by their stat, so that
+        # unchanged files are not read again to hash them
+        "file_hash_cache": bool,
+        # The maximum number of lines of the diffs returned by file.line,
+        # file.replace and file.blockreplace
+        "file_diff_max_lines": int,
+        # How long to cache the login environment of the users which commands are run as
+        "cmd_runas_env_cache_ttl": int,
         # Order of preference for optimized .pyc files (PY3 only)
         "optimization_order": list,
         # Refuse to load these modules
@@ -388,6 +399,16 @@ VALID_OPTS = immutabletypes.freeze(
         "unique_jid": bool,
         # Governs whether state runs will queue or fail to run when a state is already running
         "state_queue": (bool, int),
+        # Skip the states of a highstate which are unchanged since their last successful run
+        "state_incremental": bool,
+        # The number of seconds between highstates which run every state when state_incremental is set
+        "state_incremental_full_run_interval": int,
+        # Reuse the compiled highstate of the previous run when none of its inputs have changed
+        "state_compile_cache": bool,
+        # The number of state chunks which may run at the same time
+        "state_concurrency": int,
+        # The number of onlyif, unless and check_cmd commands of a state which may run at the same time
+        "state_check_concurrency": int,
         # Tells the highstate outputter to show successful states. False will omit successes.
         "state_verbose": bool,
         # Specify the format for state outputs. See highstate outputter for additional details.
@@ -575,7 +596,10 @@ VALID_OPTS = immutabletypes.freeze(
         "git_pillar_passphrase": str,
         "git_pillar_refspecs": list,
         "git_pillar_includes": bool,
+        "git_pillar_checkout": bool,
         "git_pillar_verify_config": bool,
+        "git_pillar_fetch_workers": int,
+        "git_pillar_fetch_timeout": int,
         # NOTE: gitfs_base, gitfs_fallback, gitfs_mountpoint, and gitfs_root omitted
         # here because their values could conceivably be loaded as non-string types,
         # which is OK because gitfs will normalize them to strings. But rather than
@@ -593,6 +617,9 @@ VALID_OPTS = immutabletypes.freeze(
         "gitfs_ref_types": list,
         "gitfs_refspecs": list,
         "gitfs_disable_saltenv_mapping": bool,
+        "gitfs_tree_index": bool,
+        "gitfs_fetch_workers": int,
+        "gitfs_fetch_timeout": int,
         "hgfs_remotes": list,
         "hgfs_mountpoint": str,
         "hgfs_root": str,
@@ -614,6 +641,12 @@ VALID_OPTS = immutabletypes.freeze(
         "minionfs_blacklist": list,
         # Specify a list of external pillar systems to use
         "ext_pillar": list,
+        # The number of threads used to run the ext_pillars listed in
+        # ext_pillar_independent concurrently
+        "ext_pillar_workers": int,
+        # A list of ext_pillars which do not use the data of the ext_pillars
+        # that come before them, and so can be run concurrently
+        "ext_pillar_independent": list,
         # Reserved for future use to version the pillar structure
         "pillar_version": int,
         # Whether or not a copy of the master opts dict should be rendered into minion pillars
@@ -624,6 +657,14 @@ VALID_OPTS = immutabletypes.freeze(
         "pillar_cache_ttl": int,
         # Pillar cache backend. Defaults to `disk` which stores caches in the master cache
         "pillar_cache_backend": str,
+        # Reuse rendered pillar SLS files between minions which read the same
+        # grains, pillar and opts values
+        "pillar_render_cache": bool,
+        # The number of rendered pillar SLS files to keep in memory
+        "pillar_render_cache_size": int,
+        # Push pillar changes to the minions whose pillar was compiled from files
+        # or git_pillar remotes which have changed
+        "pillar_push": bool,
         # Cache the GPG data to avoid having to pass through the gpg renderer
         "gpg_cache": bool,
         # GPG data cache TTL, in seconds. Has no effect unless `gpg_cache` is True
@@ -641,6 +682,10 @@ VALID_OPTS = immutabletypes.freeze(
         # How to merge multiple top files from multiple salt environments
         # (saltenvs); can be 'merge' or 'same'
         "top_file_merging_strategy": str,
+        # Cache the results of matching top file targets against minions
+        "top_match_cache": bool,
+        # The number of top file target match results to keep in memory
+        "top_match_cache_size": int,
         # The ordering for salt environment merging, when top_file_merging_strategy
         # is set to 'same'
         "env_order": list,
@@ -713,6 +758,9 @@ VALID_OPTS = immutabletypes.freeze(
         # cachedir under the name of the minion and used to predetermine what minions are expected to
         # reply from executions.
         "minion_data_cache": bool,
+        # The grain paths to keep in the master's columnar grains store, for the
+        # cache.query runner
+        "grains_store_paths": list,
         # The number of seconds between AES key rotations on the master
         "publish_session": int,
         # Defines a salt reactor. See https://docs.saltproject.io/en/latest/topics/reactor/
@@ -791,6 +839,13 @@ VALID_OPTS = immutabletypes.freeze(
         "jinja_lstrip_blocks": bool,
         # If this is set to True the first newline after a Jinja block is removed
         "jinja_trim_blocks": bool,
+        # Cache compiled Jinja templates in memory and on disk
+        "jinja_bytecode_cache": bool,
+        # The number of compiled Jinja templates to keep in memory
+        "jinja_bytecode_cache_size": int,
+        # The number of seconds a compiled Jinja template is kept on disk after
+        # it was last used
+        "jinja_bytecode_cache_max_age": int,
         # Cache minion ID to file
         "minion_id_caching": bool,
         # Always generate minion id in lowercase.
@@ -805,6 +860,12 @@ VALID_OPTS = immutabletypes.freeze(
         "transport": str,
         # The number of seconds to wait when the client is requesting information about running jobs
         "gather_job_timeout": int,
+        # Whether batch runs are driven by the job return events, publishing to the
+        # connected minions, rather than by pinging the minions and polling each job
+        "batch_event_driven": bool,
+        # Whether the master runs the batches submitted with
+        # LocalClient.run_batch_async
+        "batch_async": bool,
         # The number of seconds to wait before timing out an authentication request
         "auth_timeout": int,
         # The number of attempts to authenticate to a master before giving up
@@ -997,6 +1058,10 @@ VALID_OPTS = immutabletypes.freeze(
         # The port to be used when checking if a master is connected to a
         # minion
         "remote_minions_port": int,
+        # Whether the publishers of the master record the connected minions in
+        # a table which the master's processes read to check which minions are
+        # connected
+        "presence_table": bool,
         # pass renderer: Fetch secrets only for the template variables matching the prefix
         "pass_variable_prefix": str,
         # pass renderer: Whether to error out when unable to fetch a secret
@@ -1073,6 +1138,7 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze(
         "lock_saltenv": False,
         "pillarenv": None,
         "pillarenv_from_saltenv": False,
+        "pillar_delta": False,
         "pillar_opts": False,
         "pillar_source_merging_strategy": "smart",
         "pillar_merge_lists": False,
@@ -1083,6 +1149,8 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze(
         "pillar_cache": False,
         "pillar_cache_ttl": 3600,
         "pillar_cache_backend": "disk",
+        "pillar_render_cache": False,
+        "pillar_render_cache_size": 1000,
         "request_channel_timeout": 60,
         "request_channel_tries": 3,
         "gpg_cache": False,
@@ -1106,6 +1174,8 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze(
             "base": [salt.syspaths.BASE_FILE_ROOTS_DIR, salt.syspaths.SPM_FORMULA_PATH]
         },
         "top_file_merging_strategy": "merge",
+        "top_match_cache": False,
+        "top_match_cache_size": 10000,
         "env_order": [],
         "default_top": "base",
         "file_recv": False,
@@ -1147,6 +1217,9 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze(
         "git_pillar_passphrase": "",
         "git_pillar_refspecs": _DFLT_REFSPECS,
         "git_pillar_includes": True,
+        "git_pillar_checkout": True,
+        "git_pillar_fetch_workers": 1,
+        "git_pillar_fetch_timeout": 0,
         "gitfs_remotes": [],
         "gitfs_mountpoint": "",
         "gitfs_root": "",
@@ -1166,8 +1239,14 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze(
         "gitfs_ref_types": ["branch", "tag", "sha"],
         "gitfs_refspecs": _DFLT_REFSPECS,
         "gitfs_disable_saltenv_mapping": False,
+        "gitfs_tree_index": False,
+        "gitfs_fetch_workers": 1,
+        "gitfs_fetch_timeout": 0,
         "unique_jid": False,
         "hash_type": DEFAULT_HASH_TYPE,
+        "file_hash_cache": False,
+        "file_diff_max_lines": 10000,
+        "cmd_runas_env_cache_ttl": 0,
         "optimization_order": [0, 1, 2],
         "disable_modules": [],
         "disable_returners": [],
@@ -1226,6 +1305,11 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze(
         "state_events": False,
         "state_aggregate": False,
         "state_queue": False,
+        "state_incremental": False,
+        "state_incremental_full_run_interval": 86400,
+        "state_compile_cache": False,
+        "state_concurrency": 1,
+        "state_check_concurrency": 1,
         "snapper_states": False,
         "snapper_states_config": "root",
         "acceptance_wait_time": 10,
@@ -1373,6 +1457,8 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze(
         "thorium_interval": 0.5,
         "thorium_roots": {"base": [salt.syspaths.BASE_THORIUM_ROOTS_DIR]},
         "top_file_merging_strategy": "merge",
+        "top_match_cache": False,
+        "top_match_cache_size": 10000,
         "env_order": [],
         "saltenv": None,
         "lock_saltenv": False,
@@ -1403,6 +1489,9 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze(
         "git_pillar_passphrase": "",
         "git_pillar_refspecs": _DFLT_REFSPECS,
         "git_pillar_includes": True,
+        "git_pillar_checkout": True,
+        "git_pillar_fetch_workers": 1,
+        "git_pillar_fetch_timeout": 0,
         "git_pillar_verify_config": True,
         "gitfs_remotes": [],
         "gitfs_mountpoint": "",
@@ -1423,6 +1512,9 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze(
         "gitfs_ref_types": ["branch", "tag", "sha"],
         "gitfs_refspecs": _DFLT_REFSPECS,
         "gitfs_disable_saltenv_mapping": False,
+        "gitfs_tree_index": False,
+        "gitfs_fetch_workers": 1,
+        "gitfs_fetch_timeout": 0,
         "hgfs_remotes": [],
         "hgfs_mountpoint": "",
         "hgfs_root": "",
@@ -1449,6 +1541,8 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze(
         "minionfs_whitelist": [],
         "minionfs_blacklist": [],
         "ext_pillar": [],
+        "ext_pillar_workers": 1,
+        "ext_pillar_independent": [],
         "pillar_version": 2,
         "pillar_opts": False,
         "pillar_safe_render_error": True,
@@ -1458,6 +1552,9 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze(
         "pillar_cache": False,
         "pillar_cache_ttl": 3600,
         "pillar_cache_backend": "disk",
+        "pillar_render_cache": False,
+        "pillar_render_cache_size": 1000,
+        "pillar_push": False,
         "gpg_cache": False,
         "gpg_cache_ttl": 86400,
         "gpg_cache_backend": "disk",
@@ -1514,6 +1611,7 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze(
         "master_job_cache": "local_cache",
         "job_cache_store_endtime": False,
         "minion_data_cache": True,
+        "grains_store_paths": [],
         "enforce_mine_cache": False,
         "ipc_mode": _DFLT_IPC_MODE,
         "ipc_write_buffer": _DFLT_IPC_WBUFFER,
@@ -1603,6 +1701,9 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze(
         "jinja_sls_env": {},
         "jinja_lstrip_blocks": False,
         "jinja_trim_blocks": False,
+        "jinja_bytecode_cache": False,
+        "jinja_bytecode_cache_size": 1000,
+        "jinja_bytecode_cache_max_age": 604800,
         "tcp_keepalive": True,
         "tcp_keepalive_idle": 300,
         "tcp_keepalive_cnt": -1,
@@ -1611,6 +1712,8 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze(
         "keysize": 2048,
         "transport": "zeromq",
         "gather_job_timeout": 10,
+        "batch_event_driven": False,
+        "batch_async": False,
         "syndic_event_forward_timeout": 0.5,
         "syndic_jid_forward_cache_hwm": 100,
         "regen_thin": False,
@@ -1673,6 +1776,7 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze(
         "fips_mode": False,
         "detect_remote_minions": False,
         "remote_minions_port": 22,
+        "presence_table": False,
         "pass_variable_prefix": "",
         "pass_strict_fetch": False,
         "pass_gnupghome": "",
@@ -29,6 +29,7 @@ import salt.utils.dictupdate
 import salt.utils.event
 import salt.utils.files
 import salt.utils.gitfs
+import salt.utils.grainstore
 import salt.utils.gzip_util
 import salt.utils.jid
 import salt.utils.job
@@ -458,6 +459,7 @@ class RemoteFuncs:
         self._serve_file = fs_.serve_file
         self._file_find = fs_._find_file
         self._file_hash = fs_.file_hash
+        self._file_hash_list = fs_.file_hash_list
         self._file_list = fs_.file_list
         self._file_list_emptydirs = fs_.file_list_emptydirs
         self._dir_list = fs_.dir_list
@@ -794,6 +796,7 @@ class RemoteFuncs:
                 "data",
                 {"grains": load["grains"], "pillar": data},
             )
+            salt.utils.grainstore.update(self.opts, load["id"], load["grains"])
             if self.opts.get("minion_data_cache_events") is True:
                 self.event.fire_event(
                     {"comment": "Minion data cache refresh"},
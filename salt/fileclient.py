@@ -82,6 +82,9 @@ class Client:
     Base class for Salt file interactions
     """
 
+    # The set get_file records fetched files in, see record_fetches
+    _fetched = None
+
     def __init__(self, opts):
         self.opts = opts
         self.utils = salt.loader.utils(self.opts)
@@ -149,6 +152,24 @@ class Client:
 
             yield dest
 
+    @contextlib.contextmanager
+    def record_fetches(self):
+        """
+        Record the files fetched from the file server with ``get_file`` while
+        the context is active, as a set of ``(path, saltenv)`` tuples
+        """
+        fetched = set()
+        previous = self._fetched
+        self._fetched = fetched
+        try:
+            yield fetched
+        finally:
+            self._fetched = previous
+
+    def _record_fetch(self, path, saltenv):
+        if self._fetched is not None:
+            self._fetched.add((path, saltenv))
+
     def get_cachedir(self, cachedir=None):
         if cachedir is None:
             cachedir = self.opts["cachedir"]
@@ -318,6 +339,13 @@ class Client:
         """
         return {}  # pragma: no cover
 
+    def hash_list(self, saltenv="base", prefix=""):
+        """
+        Return the hash and mode of every file below the prefix, or None if
+        they cannot be retrieved at once
+        """
+        return None
+
     def is_cached(self, path, saltenv="base", cachedir=None):
         """
         Returns the full path to a file if it is cached locally on the minion
@@ -949,6 +977,7 @@ class PillarClient(Client):
         Copies a file from the local files directory into :param:`dest`
         gzip compression settings are ignored for local files
         """
+        self._record_fetch(path, saltenv)
         path = self._check_proto(path)
         fnd = self._find_file(path, saltenv)
         fnd_path = fnd.get("path")
@@ -1093,6 +1122,36 @@ class PillarClient(Client):
         """
         return self.opts
 
+    def _stat_root(self, root):
+        """
+        Return the relative path, size and modification time of each file in
+        a pillar root
+        """
+        ret = []
+        for dirpath, dirs, files in salt.utils.path.os_walk(root, followlinks=True):
+            dirs.sort()
+            for fname in sorted(files):
+                path = os.path.join(dirpath, fname)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                ret.append(
+                    (os.path.relpath(path, root), stat.st_size, stat.st_mtime_ns)
+                )
+        return ret
+
+    def get_roots_fingerprint(self, saltenv="base"):
+        """
+        Return a hash which changes when any file in the pillar_roots of the
+        environment is added, removed or modified
+        """
+        fingerprint = [
+            (root, self._stat_root(root))
+            for root in self.opts["pillar_roots"].get(saltenv, [])
+        ]
+        return salt.utils.hashutils.sha256_digest(repr(fingerprint))
+
     def envs(self):
         """
         Return the available environments
@@ -1118,6 +1177,150 @@ class PillarClient(Client):
         return {}
 
 
+class GitPillarClient(PillarClient):
+    """
+    Used by git_pillar to render pillar SLS files straight from git tree
+    objects, instead of from a checked out working copy.
+
+    ``pillar_trees`` maps pillar roots to ``(repo, tree, mountpoint, env)``
+    tuples, as set up by :py:meth:`salt.utils.gitfs.GitPillar.load_trees`.
+    Files are listed from the tree objects, and a file is only written to its
+    pillar root the first time it is requested. Pillar roots which are not in
+    ``pillar_trees`` are handled as regular directories.
+    """
+
+    def __init__(self, opts, pillar_trees=None):
+        super().__init__(opts)
+        self.pillar_trees = pillar_trees or {}
+        self._tree_files = {}
+
+    def _list_tree_files(self, root):
+        """
+        Return the list of files in the tree served from the specified pillar
+        root, including the mountpoint
+        """
+        if root not in self._tree_files:
+            repo, tree, mountpoint, _ = self.pillar_trees[root]
+            self._tree_files[root] = [
+                salt.utils.path.join(mountpoint, path, use_posixpath=True)
+                for path in repo.get_tree_files(tree)
+            ]
+        return self._tree_files[root]
+
+    def _write_tree_file(self, root, path, dest):
+        """
+        Write the specified file from the tree served from the specified
+        pillar root to dest. Returns False if the file is not in the tree.
+        """
+        repo, tree, mountpoint, _ = self.pillar_trees[root]
+        if ".." in path.split("/"):
+            return False
+        if mountpoint:
+            if not path.startswith(mountpoint + "/"):
+                return False
+            path = path[len(mountpoint) + 1 :]
+        blob, _, _ = repo.find_file_in_tree(path, tree)
+        if blob is None:
+            return False
+        destdir = os.path.dirname(dest)
+        os.makedirs(destdir, exist_ok=True)
+        # The tree is immutable, so if another process writes the same file
+        # concurrently, it writes the same contents. Write to a temp file and
+        # rename it so that a partially-written file is never read.
+        tmp = salt.utils.files.mkstemp(dir=destdir)
+        try:
+            repo.write_file(blob, tmp)
+            os.replace(tmp, dest)
+        except OSError:
+            salt.utils.files.safe_rm(tmp)
+            raise
+        return True
+
+    def _find_file(self, path, saltenv="base"):
+        """
+        Locate the file path, writing it from the git tree if necessary
+        """
+        fnd = {"path": "", "rel": ""}
+
+        if salt.utils.url.is_escaped(path):
+            # The path arguments are escaped
+            path = salt.utils.url.unescape(path)
+        for root in self.opts["pillar_roots"].get(saltenv, []):
+            full = os.path.join(root, path)
+            if not os.path.isfile(full):
+                if root not in self.pillar_trees:
+                    continue
+                if not self._write_tree_file(root, path, full):
+                    continue
+            fnd["path"] = full
+            fnd["rel"] = path
+            return fnd
+        return fnd
+
+    def file_list(self, saltenv="base", prefix=""):
+        """
+        Return a list of files in the given environment
+        with optional relative prefix path to limit directory traversal
+        """
+        ret = []
+        prefix = prefix.strip("/")
+        for root in self.opts["pillar_roots"].get(saltenv, []):
+            if root not in self.pillar_trees:
+                for dirpath, dirs, files in salt.utils.path.os_walk(
+                    os.path.join(root, prefix), followlinks=True
+                ):
+                    dirs[:] = [
+                        d
+                        for d in dirs
+                        if not salt.fileserver.is_file_ignored(self.opts, d)
+                    ]
+                    for fname in files:
+                        relpath = os.path.relpath(os.path.join(dirpath, fname), root)
+                        ret.append(salt.utils.data.decode(relpath))
+                continue
+            for path in self._list_tree_files(root):
+                if prefix and not path.startswith(prefix + "/"):
+                    continue
+                # Don't list files in directories that match
+                # file_ignore_regex or glob
+                if any(
+                    salt.fileserver.is_file_ignored(self.opts, dirname)
+                    for dirname in path.split("/")[:-1]
+                ):
+                    continue
+                ret.append(path)
+        return ret
+
+    def file_list_emptydirs(self, saltenv="base", prefix=""):
+        """
+        List the empty dirs, git trees cannot contain empty dirs
+        """
+        return []
+
+    def _stat_root(self, root):
+        """
+        The pillar roots for git trees are named after the tree, so their names
+        identify their contents
+        """
+        if root in self.pillar_trees:
+            return []
+        return super()._stat_root(root)
+
+    def dir_list(self, saltenv="base", prefix=""):
+        """
+        List the dirs in the given environment
+        with optional relative prefix path to limit directory traversal
+        """
+        ret = set()
+        for path in self.file_list(saltenv, prefix=prefix):
+            dirname = os.path.dirname(path)
+            while dirname:
+                ret.add(dirname)
+                dirname = os.path.dirname(dirname)
+        ret.add(prefix.strip("/") or ".")
+        return sorted(ret)
+
+
 class RemoteClient(Client):
     """
     Interact with the salt master file server.
@@ -1179,6 +1382,7 @@ class RemoteClient(Client):
         path, senv = salt.utils.url.split_env(path)
         if senv:
             saltenv = senv
+        self._record_fetch(path, saltenv)
 
         hash_server = self.hash_file(path, saltenv)
 
@@ -1389,6 +1593,19 @@ class RemoteClient(Client):
             load,
         )
 
+    def hash_list(self, saltenv="base", prefix=""):
+        """
+        Return the hash and mode of every file below the prefix on the master,
+        or None if the master does not support listing them
+        """
+        load = {"saltenv": saltenv, "prefix": prefix, "cmd": "_file_hash_list"}
+        ret = self._channel_send(
+            load,
+        )
+        if not isinstance(ret, dict):
+            return None
+        return ret
+
     def __hash_and_stat_file(self, path, saltenv="base"):
         """
         Common code for hashing and stating files
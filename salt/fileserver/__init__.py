@@ -660,6 +660,40 @@ class Fileserver:
         except (IndexError, TypeError):
             return "", None
 
+    def file_hash_list(self, load):
+        """
+        Return the hash and mode of every file in the dominant environment
+        below the given prefix, so that a whole directory tree can be compared
+        with a single request
+        """
+        if "env" in load:
+            # "env" is not supported; Use "saltenv".
+            load.pop("env")
+
+        ret = {}
+        if "saltenv" not in load:
+            return ret
+        if not isinstance(load["saltenv"], str):
+            load["saltenv"] = str(load["saltenv"])
+
+        for path in self.file_list(
+            {"saltenv": load["saltenv"], "prefix": load.get("prefix", "")}
+        ):
+            hash_load = {"path": path, "saltenv": load["saltenv"]}
+            hsum, stat_result = self.file_hash_and_stat(hash_load)
+            if not hsum:
+                continue
+            try:
+                mode = stat_result[0]
+            except (IndexError, TypeError):
+                mode = None
+            ret[path] = {
+                "hsum": hsum["hsum"],
+                "hash_type": hsum["hash_type"],
+                "mode": mode,
+            }
+        return ret
+
     def clear_file_list_cache(self, load):
         """
         Deletes the file_lists cache files
@@ -133,9 +133,10 @@ def lock(remote=None):
 
 def update(remotes=None):
     """
-    Execute a git fetch on all of the repos
+    Execute a git fetch on all of the repos. Returns True if any changes
+    were fetched.
     """
-    _gitfs().update(remotes)
+    return _gitfs().update(remotes)
 
 
 def update_intervals():
@@ -20,6 +20,7 @@ import salt.utils.crypt
 import salt.utils.data
 import salt.utils.event
 import salt.utils.files
+import salt.utils.grainstore
 import salt.utils.json
 import salt.utils.kinds
 import salt.utils.minions
@@ -485,9 +486,12 @@ class Key:
             cache = salt.cache.factory(self.opts)
             clist = cache.list(self.ACC)
             if clist:
+                removed = []
                 for minion in clist:
                     if minion not in minions and minion not in preserve_minions:
                         cache.flush(f"{self.ACC}/{minion}")
+                        removed.append(minion)
+                salt.utils.grainstore.remove(self.opts, *removed)
 
     def check_master(self):
         """
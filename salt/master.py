@@ -22,6 +22,8 @@ import tornado.gen
 import salt.acl
 import salt.auth
 import salt.channel.server
+import salt.cli.batch
+import salt.cli.batch_async
 import salt.client
 import salt.client.ssh.client
 import salt.crypt
@@ -42,6 +44,7 @@ import salt.utils.ctx
 import salt.utils.event
 import salt.utils.files
 import salt.utils.gitfs
+import salt.utils.grainstore
 import salt.utils.gzip_util
 import salt.utils.jid
 import salt.utils.job
@@ -256,6 +259,10 @@ class Maintenance(salt.utils.process.SignalHandlingProcess):
             self.pki_dir = self.opts["cluster_pki_dir"]
         else:
             self.pki_dir = self.opts.get("pki_dir", "")
+        # Pillar changes are pushed from a thread, so that recompiling the
+        # pillars does not hold up the maintenance loop
+        self.pillar_push_thread = None
+        self.pillar_push_git_changed = False
 
     def _post_fork_init(self):
         """
@@ -335,9 +342,12 @@ class Maintenance(salt.utils.process.SignalHandlingProcess):
                 salt.daemons.masterapi.clean_expired_tokens(self.opts)
                 salt.daemons.masterapi.clean_pub_auth(self.opts)
                 salt.utils.master.clean_proc_dir(self.opts)
+            git_pillar_changed = False
             if not last or (now - last_git_pillar_update) >= git_pillar_update_interval:
                 last_git_pillar_update = now
-                self.handle_git_pillar()
+                git_pillar_changed = self.handle_git_pillar()
+            if not last or (now - last) >= self.loop_interval:
+                self.handle_pillar_push(git_pillar_changed)
             self.handle_schedule()
             self.handle_key_cache()
             self.handle_presence(old_present)
@@ -430,13 +440,52 @@ class Maintenance(salt.utils.process.SignalHandlingProcess):
 
     def handle_git_pillar(self):
         """
-        Update git pillar
+        Update git pillar. Returns True if any of the remotes changed.
         """
+        changed = False
         try:
             for pillar in self.git_pillar:
-                pillar.fetch_remotes()
+                if pillar.fetch_remotes():
+                    changed = True
         except Exception as exc:  # pylint: disable=broad-except
             log.error("Exception caught while updating git_pillar", exc_info=True)
+        if changed:
+            salt.pillar.flush_pillar_cache(self.opts)
+        return changed
+
+    def handle_pillar_push(self, git_pillar_changed=False):
+        """
+        Push pillar changes to the minions whose pillar was compiled from
+        files or git_pillar remotes which have changed. The changes are pushed
+        from a thread. If the previous push is still running, a new one is
+        started on a later loop, and includes the git_pillar changes seen in
+        the meantime.
+        """
+        if not self.opts.get("pillar_push", False):
+            return
+        self.pillar_push_git_changed = self.pillar_push_git_changed or bool(
+            git_pillar_changed
+        )
+        if self.pillar_push_thread is not None and self.pillar_push_thread.is_alive():
+            log.debug("The previous pillar push is still running")
+            return
+        changed_ext_pillars = ["git"] if self.pillar_push_git_changed else []
+        self.pillar_push_git_changed = False
+        self.pillar_push_thread = threading.Thread(
+            target=self._push_pillar_changes,
+            args=(changed_ext_pillars,),
+            name="PillarPush",
+            daemon=True,
+        )
+        self.pillar_push_thread.start()
+
+    def _push_pillar_changes(self, changed_ext_pillars):
+        try:
+            salt.pillar.push_pillar_changes(
+                self.opts, changed_ext_pillars=changed_ext_pillars
+            )
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error("Exception caught while pushing pillar changes", exc_info=True)
 
     def handle_schedule(self):
         """
@@ -543,8 +592,10 @@ class FileserverUpdate(salt.utils.process.SignalHandlingProcess):
     @staticmethod
     def _do_update(backends):
         """
-        Perform fileserver updates
+        Perform fileserver updates. Returns True if any of the backends
+        reported changes.
         """
+        changed = False
         for backend, update_args in backends.items():
             backend_name, update_func = backend
             try:
@@ -559,15 +610,21 @@ class FileserverUpdate(salt.utils.process.SignalHandlingProcess):
                     log.debug("Updating %s fileserver cache", backend_name)
                     args = ()
 
-                update_func(*args)
+                result = update_func(*args)
+                # Some backends return the data for the update event
+                if isinstance(result, dict):
+                    result = result.get("changed")
+                if result is True:
+                    changed = True
             except Exception as exc:  # pylint: disable=broad-except
                 log.exception(
                     "Uncaught exception while updating %s fileserver cache",
                     backend_name,
                 )
+        return changed
 
     @classmethod
-    def update(cls, interval, backends, timeout):
+    def update(cls, interval, backends, timeout, opts=None):
         """
         Threading target which handles all updates for a given wait interval
         """
@@ -578,7 +635,10 @@ class FileserverUpdate(salt.utils.process.SignalHandlingProcess):
                 "Performing fileserver updates for items with an update interval of %d",
                 interval,
             )
-            cls._do_update(backends)
+            if cls._do_update(backends) is True and opts is not None:
+                # Cached pillars may have been rendered from files which
+                # have now changed
+                salt.pillar.flush_pillar_cache(opts)
             log.debug(
                 "Completed fileserver updates for items with an update "
                 "interval of %d, waiting %d seconds",
@@ -612,6 +672,7 @@ class FileserverUpdate(salt.utils.process.SignalHandlingProcess):
                     interval,
                     self.buckets[interval],
                     self.opts["fileserver_interval"],
+                    self.opts,
                 ),
             )
             self.update_threads[interval].start()
@@ -869,6 +930,12 @@ class Master(SMaster):
                 name="Maintenance",
             )
 
+            if self.opts.get("batch_async"):
+                log.info("Creating master batch manager process")
+                self.process_manager.add_process(
+                    BatchManager, args=(self.opts,), name="BatchManager"
+                )
+
             if self.opts.get("event_return"):
                 log.info("Creating master event return process")
                 self.process_manager.add_process(
@@ -1017,6 +1084,30 @@ class EventMonitor(salt.utils.process.SignalHandlingProcess):
             io_loop.start()
 
 
+class BatchManager(salt.utils.process.SignalHandlingProcess):
+    """
+    Run the batches submitted with ``LocalClient.run_batch_async``, from the
+    job return events on the master event bus
+    """
+
+    def __init__(self, opts, **kwargs):
+        super().__init__(**kwargs)
+        self.opts = opts
+
+    def run(self):
+        io_loop = tornado.ioloop.IOLoop()
+        scheduler = salt.cli.batch_async.BatchScheduler(self.opts, io_loop=io_loop)
+        with salt.utils.event.get_master_event(
+            self.opts, self.opts["sock_dir"], io_loop=io_loop, listen=True
+        ) as event_bus:
+            event_bus.subscribe("")
+            event_bus.set_event_handler(scheduler.handle_event)
+            # Once subscribed, so that no batch submitted meanwhile is missed
+            io_loop.spawn_callback(scheduler.resume_batches)
+            io_loop.spawn_callback(scheduler.tick)
+            io_loop.start()
+
+
 class ReqServer(salt.utils.process.SignalHandlingProcess):
     """
     Starts up the master request server, minions send results to this
@@ -1377,6 +1468,7 @@ class AESFuncs(TransportMethods):
         "_file_find",
         "_file_hash",
         "_file_hash_and_stat",
+        "_file_hash_list",
         "_file_list",
         "_file_list_emptydirs",
         "_dir_list",
@@ -1426,6 +1518,7 @@ class AESFuncs(TransportMethods):
         self._file_find = self.fs_._find_file
         self._file_hash = self.fs_.file_hash
         self._file_hash_and_stat = self.fs_.file_hash_and_stat
+        self._file_hash_list = self.fs_.file_hash_list
         self._file_list = self.fs_.file_list
         self._file_list_emptydirs = self.fs_.file_list_emptydirs
         self._dir_list = self.fs_.dir_list
@@ -1764,13 +1857,72 @@ class AESFuncs(TransportMethods):
                 "data",
                 {"grains": load["grains"], "pillar": data},
             )
+            salt.utils.grainstore.update(self.opts, load["id"], load["grains"])
+            if (
+                self.opts.get("pillar_push", False)
+                and pillar.dependencies is not None
+                and not load.get("pillar_override")
+                and not load.get("ext")
+            ):
+                # Record what the pillar was compiled from, so that the
+                # minion can be sent the changes when any of it changes
+                self.masterapi.cache.store(
+                    "minions/{}".format(load["id"]),
+                    "pillar_deps",
+                    dict(
+                        pillar.dependencies,
+                        saltenv=load.get("saltenv", load.get("env")),
+                        pillarenv=load.get("pillarenv"),
+                        extra_minion_data=load.get("extra_minion_data"),
+                    ),
+                )
             if self.opts.get("minion_data_cache_events") is True:
                 self.event.fire_event(
                     {"Minion data cache refresh": load["id"]},
                     tagify(load["id"], "refresh", "minion"),
                 )
+        if load.get("pillar_hash") and self.opts.get("minion_data_cache", False):
+            # The pillar last sent to the minion is kept in the minion data
+            # cache, so without it the minion is sent the full pillar
+            return self._pillar_delta(load, data)
         return data
 
+    def _pillar_delta(self, load, data):
+        """
+        Reply to a pillar request from a minion which sent the hash of its
+        current pillar, with only the changes to it when possible
+
+        :param dict load: Minion payload
+        :param dict data: The compiled pillar data
+
+        :rtype: dict
+        :return: The reply from :py:func:`salt.pillar.pillar_delta_reply`
+        """
+        bank = "minions/{}".format(load["id"])
+        try:
+            stored = self.masterapi.cache.fetch(bank, "pillar_base") or {}
+        except salt.exceptions.SaltCacheError as exc:
+            log.error("Failed to fetch the pillar base for %s: %s", load["id"], exc)
+            stored = {}
+        base = None
+        if stored.get("hash") == load["pillar_hash"]:
+            base = stored.get("pillar")
+        reply = salt.pillar.pillar_delta_reply(data, load["pillar_hash"], base)
+        if not load.get("pillar_override") and not load.get("ext"):
+            # This is the pillar the minion will keep in memory, so it is what
+            # the next request is diffed against
+            digest = salt.pillar.pillar_hash(data)
+            if digest is not None and digest != stored.get("hash"):
+                try:
+                    self.masterapi.cache.store(
+                        bank, "pillar_base", {"hash": digest, "pillar": data}
+                    )
+                except salt.exceptions.SaltCacheError as exc:
+                    log.error(
+                        "Failed to store the pillar base for %s: %s", load["id"], exc
+                    )
+        return reply
+
     def _minion_event(self, load):
         """
         Receive an event from the minion and fire it on the master event
@@ -2111,12 +2263,16 @@ class ClearFuncs(TransportMethods):
     expose_methods = (
         "ping",
         "publish",
+        "publish_batch",
         "get_token",
         "mk_token",
         "wheel",
         "runner",
     )
-    async_methods = ("publish",)
+    async_methods = (
+        "publish",
+        "publish_batch",
+    )
 
     # The ClearFuncs object encapsulates the functions that can be executed in
     # the clear:
@@ -2313,6 +2469,145 @@ class ClearFuncs(TransportMethods):
         """
         extra = clear_load.get("kwargs", {})
 
+        _res, auth_list, err = self._check_publish_auth(clear_load, extra)
+        if err is not None:
+            return err
+        minions = _res.get("minions", list())
+        missing = _res.get("missing", list())
+        ssh_minions = _res.get("ssh_minions", False)
+
+        # If we order masters (via a syndic), don't short circuit if no minions
+        # are found
+        if not self.opts.get("order_masters"):
+            # Check for no minions
+            if not minions:
+                return {
+                    "enc": "clear",
+                    "load": {
+                        "jid": None,
+                        "minions": minions,
+                        "error": (
+                            "Master could not resolve minions for target {}".format(
+                                clear_load["tgt"]
+                            )
+                        ),
+                    },
+                }
+        jid = self._prep_jid(clear_load, extra)
+        if jid is None or isinstance(jid, dict):
+            if jid and "error" in jid:
+                load = jid
+            else:
+                load = {"error": "Master failed to assign jid"}
+            return load
+        payload = self._prep_pub(minions, jid, clear_load, extra, missing)
+
+        if self.opts.get("order_masters"):
+            payload["auth_list"] = auth_list
+
+        # Send it!
+        # Copy the payload when firing event for now since it's adding a
+        # __pub_stamp field.
+        self.event.fire_event(payload.copy(), tagify([jid, "publish"], "job"))
+        # An alternative to copy may be to pop it
+        # payload.pop("_stamp")
+        self._send_ssh_pub(payload, ssh_minions=ssh_minions)
+
+        await self._send_pub(payload)
+        return {
+            "enc": "clear",
+            "load": {"jid": clear_load["jid"], "minions": minions, "missing": missing},
+        }
+
+    async def publish_batch(self, clear_load):
+        """
+        Accept a batch run from the LocalClient, which is then run by the
+        batch manager of the master, and return its jid
+        """
+        if not self.opts.get("batch_async"):
+            return {
+                "error": "Batches cannot be run on the master, as batch_async is"
+                " not enabled"
+            }
+        extra = clear_load.get("kwargs", {})
+
+        _res, _, err = self._check_publish_auth(clear_load, extra)
+        if err is not None:
+            return err
+        minions = _res.get("minions", list())
+        missing = _res.get("missing", list())
+
+        if not minions:
+            return {
+                "enc": "clear",
+                "load": {
+                    "jid": None,
+                    "minions": minions,
+                    "error": "Master could not resolve minions for target {}".format(
+                        clear_load["tgt"]
+                    ),
+                },
+            }
+        batch = extra.get("batch", "10%")
+        try:
+            if salt.cli.batch.batch_size(batch, len(minions)) < 1:
+                raise ValueError(batch)
+            batch_wait = int(extra.get("batch_wait", 0))
+        except (TypeError, ValueError):
+            return {"error": f"Invalid batch: {batch}"}
+
+        jid = self._prep_jid(clear_load, extra)
+        if jid is None or isinstance(jid, dict):
+            if jid and "error" in jid:
+                load = jid
+            else:
+                load = {"error": "Master failed to assign jid"}
+            return load
+
+        # The batch manager only trusts the batch saved in the job cache, the
+        # event only announces its jid
+        load = {
+            "jid": jid,
+            "tgt_type": clear_load.get("tgt_type", "glob"),
+            "tgt": clear_load["tgt"],
+            "user": clear_load["user"],
+            "fun": clear_load["fun"],
+            "arg": clear_load["arg"],
+            "ret": clear_load.get("ret", ""),
+            "minions": minions,
+            "missing": missing,
+            "batch": {
+                "batch": batch,
+                "batch_wait": batch_wait,
+                "timeout": extra.get("timeout") or self.opts["timeout"],
+                "gather_job_timeout": extra.get("gather_job_timeout")
+                or self.opts["gather_job_timeout"],
+                "failhard": bool(extra.get("failhard", self.opts["failhard"])),
+            },
+        }
+        if "metadata" in extra:
+            load["metadata"] = extra["metadata"]
+        fstr = "{}.save_load".format(self.opts["master_job_cache"])
+        try:
+            self.mminion.returners[fstr](jid, load, minions=minions)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error("Failed to save the load of batch %s: %s", jid, exc)
+            return {"error": "Master failed to save the batch"}
+        self.event.fire_event({"jid": jid}, tagify([jid, "new"], "batch"))
+        return {
+            "enc": "clear",
+            "load": {"jid": jid, "minions": minions, "missing": missing},
+        }
+
+    def _check_publish_auth(self, clear_load, extra):
+        """
+        Authenticate and authorize a publication to the minions
+
+        :return: A tuple of the targeted minions, as returned by
+                 ``CkMinions.check_minions``, the auth_list of the user, and the
+                 error load to return, which is None when the publication is
+                 authorized
+        """
         publisher_acl = salt.acl.PublisherACL(self.opts["publisher_acl_blacklist"])
 
         if publisher_acl.user_is_blacklisted(
@@ -2325,12 +2620,16 @@ class ClearFuncs(TransportMethods):
                 clear_load["user"],
                 clear_load["fun"],
             )
-            return {
-                "error": {
-                    "name": "AuthorizationError",
-                    "message": "Authorization error occurred.",
-                }
-            }
+            return (
+                None,
+                None,
+                {
+                    "error": {
+                        "name": "AuthorizationError",
+                        "message": "Authorization error occurred.",
+                    }
+                },
+            )
 
         # Retrieve the minions list
         delimiter = extra.get("delimiter", DEFAULT_TARGET_DELIM)
@@ -2339,8 +2638,6 @@ class ClearFuncs(TransportMethods):
             clear_load["tgt"], clear_load.get("tgt_type", "glob"), delimiter
         )
         minions = _res.get("minions", list())
-        missing = _res.get("missing", list())
-        ssh_minions = _res.get("ssh_minions", False)
 
         auth_key = clear_load.get("key", None)
 
@@ -2382,7 +2679,7 @@ class ClearFuncs(TransportMethods):
                 self.event.fire_event(
                     {**clear_load, **err}, tagify([clear_load["jid"], "error"], "job")
                 )
-            return err
+            return None, None, err
         # All Token, Eauth, and non-root users must pass the authorization check
         if auth_type != "user" or (auth_type == "user" and auth_list):
             # Authorize the request
@@ -2422,7 +2719,7 @@ class ClearFuncs(TransportMethods):
                         {**clear_load, **err},
                         tagify([clear_load["jid"], "error"], "job"),
                     )
-                return err
+                return None, None, err
 
             # Perform some specific auth_type tasks after the authorization check
             if auth_type == "token":
@@ -2432,49 +2729,7 @@ class ClearFuncs(TransportMethods):
             elif auth_type == "eauth":
                 # The username we are attempting to auth with
                 clear_load["user"] = self.loadauth.load_name(extra)
-
-        # If we order masters (via a syndic), don't short circuit if no minions
-        # are found
-        if not self.opts.get("order_masters"):
-            # Check for no minions
-            if not minions:
-                return {
-                    "enc": "clear",
-                    "load": {
-                        "jid": None,
-                        "minions": minions,
-                        "error": (
-                            "Master could not resolve minions for target {}".format(
-                                clear_load["tgt"]
-                            )
-                        ),
-                    },
-                }
-        jid = self._prep_jid(clear_load, extra)
-        if jid is None or isinstance(jid, dict):
-            if jid and "error" in jid:
-                load = jid
-            else:
-                load = {"error": "Master failed to assign jid"}
-            return load
-        payload = self._prep_pub(minions, jid, clear_load, extra, missing)
-
-        if self.opts.get("order_masters"):
-            payload["auth_list"] = auth_list
-
-        # Send it!
-        # Copy the payload when firing event for now since it's adding a
-        # __pub_stamp field.
-        self.event.fire_event(payload.copy(), tagify([jid, "publish"], "job"))
-        # An alternative to copy may be to pop it
-        # payload.pop("_stamp")
-        self._send_ssh_pub(payload, ssh_minions=ssh_minions)
-
-        await self._send_pub(payload)
-        return {
-            "enc": "clear",
-            "load": {"jid": clear_load["jid"], "minions": minions, "missing": missing},
-        }
+        return _res, auth_list, None
 
     def _prep_auth_info(self, clear_load):
         sensitive_load_keys = []
@@ -22,4 +22,6 @@ def match(tgt, delimiter=DEFAULT_TARGET_DELIM, opts=None, minion_id=None):
         log.error("Got insufficient arguments for grains match statement from master")
         return False
 
-    return salt.utils.data.subdict_match(opts["grains"], tgt, delimiter=delimiter)
+    return salt.utils.data.compile_subdict_match(tgt, delimiter=delimiter).match(
+        opts["grains"]
+    )
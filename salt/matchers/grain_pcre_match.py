@@ -23,6 +23,6 @@ def match(tgt, delimiter=DEFAULT_TARGET_DELIM, opts=None, minion_id=None):
         )
         return False
 
-    return salt.utils.data.subdict_match(
-        opts["grains"], tgt, delimiter=delimiter, regex_match=True
-    )
+    return salt.utils.data.compile_subdict_match(
+        tgt, delimiter=delimiter, regex_match=True
+    ).match(opts["grains"])
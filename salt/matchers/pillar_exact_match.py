@@ -26,6 +26,6 @@ def match(tgt, delimiter=":", opts=None, minion_id=None):
         log.info("No pillar found, fallback to ext_pillar")
         pillar = opts["ext_pillar"]
 
-    return salt.utils.data.subdict_match(
-        pillar, tgt, delimiter=delimiter, exact_match=True
-    )
+    return salt.utils.data.compile_subdict_match(
+        tgt, delimiter=delimiter, exact_match=True
+    ).match(pillar)
@@ -27,4 +27,4 @@ def match(tgt, delimiter=DEFAULT_TARGET_DELIM, opts=None, minion_id=None):
         log.info("No pillar found, fallback to ext_pillar")
         pillar = opts["ext_pillar"]
 
-    return salt.utils.data.subdict_match(pillar, tgt, delimiter=delimiter)
+    return salt.utils.data.compile_subdict_match(tgt, delimiter=delimiter).match(pillar)
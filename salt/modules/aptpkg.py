@@ -113,9 +113,13 @@ def _get_ppa_info_from_launchpad(owner_name, ppa_name):
     return salt.utils.json.load(lp_page)
 
 
-def _call_apt(args, scope=True, **kwargs):
+def _call_apt(args, scope=True, cache=False, **kwargs):
     """
     Call apt* utilities.
+
+    If ``cache`` is True, the result is shared with later identical calls in
+    the same run, until the package database or repository metadata changes.
+    Only use it for commands which query the package database.
     """
     cmd = []
     if (
@@ -133,6 +137,15 @@ def _call_apt(args, scope=True, **kwargs):
     }
     params.update(kwargs)
 
+    if cache:
+        return salt.utils.pkg.cached_query(__context__, "apt", _run_apt, cmd, **params)
+    return _run_apt(cmd, **params)
+
+
+def _run_apt(cmd, **params):
+    """
+    Run an apt* command, retrying while the dpkg lock is held
+    """
     cmd_ret = __salt__["cmd.run_all"](cmd, **params)
     count = 0
     while "Could not get lock" in cmd_ret.get("stderr", "") and count < 10:
@@ -233,7 +246,7 @@ def latest_version(*names, **kwargs):
     cmd.extend(names)
     if repo is not None:
         cmd.extend(repo)
-    out = _call_apt(cmd, scope=False)
+    out = _call_apt(cmd, scope=False, cache=True)
 
     short_names = [nom.split(":", maxsplit=1)[0] for nom in names]
 
@@ -355,6 +368,7 @@ def refresh_db(cache_valid_time=0, failhard=False, **kwargs):
         except OSError as exp:
             log.warning("could not stat cache directory due to: %s", exp)
 
+    salt.utils.pkg.clear_query_cache(__context__)
     call = _call_apt(["apt-get", "-q", "update"], scope=False)
     if call["retcode"] != 0:
         comment = ""
@@ -784,6 +798,8 @@ def install(
                 errors.append(out["stderr"])
 
         __context__.pop("pkg.list_pkgs", None)
+        salt.utils.pkg.clear_query_cache(__context__)
+
         new = list_pkgs()
         ret = salt.utils.data.compare_dicts(old, new)
 
@@ -846,6 +862,8 @@ def _uninstall(action="remove", name=None, pkgs=None, **kwargs):
         errors = []
 
     __context__.pop("pkg.list_pkgs", None)
+    salt.utils.pkg.clear_query_cache(__context__)
+
     new = list_pkgs()
     new_removed = list_pkgs(removed=True)
 
@@ -918,6 +936,7 @@ def autoremove(list_only=False, purge=False):
         cmd.append("autoremove")
         _call_apt(cmd, ignore_retcode=True)
         __context__.pop("pkg.list_pkgs", None)
+        salt.utils.pkg.clear_query_cache(__context__)
         new = list_pkgs()
         return salt.utils.data.compare_dicts(old, new)
 
@@ -1105,6 +1124,7 @@ def upgrade(refresh=True, dist_upgrade=False, **kwargs):
     cmd.append("dist-upgrade" if dist_upgrade else "upgrade")
     result = _call_apt(cmd, env=DPKG_ENV_VARS.copy())
     __context__.pop("pkg.list_pkgs", None)
+    salt.utils.pkg.clear_query_cache(__context__)
     new = list_pkgs()
     ret = salt.utils.data.compare_dicts(old, new)
 
@@ -1362,7 +1382,7 @@ def _get_upgradable(dist_upgrade=True, **kwargs):
     except KeyError:
         pass
 
-    call = _call_apt(cmd)
+    call = _call_apt(cmd, cache=True)
     if call["retcode"] != 0:
         msg = "Failed to get upgrades"
         for key in ("stderr", "stdout"):
@@ -1575,7 +1595,7 @@ def list_repo_pkgs(*args, **kwargs):  # pylint: disable=unused-import
         # Get information about all available packages
         cmd = ["apt-cache", "dump"]
 
-    out = _call_apt(cmd, scope=False, ignore_retcode=True)
+    out = _call_apt(cmd, scope=False, cache=True, ignore_retcode=True)
 
     ret = {}
     pkg_name = None
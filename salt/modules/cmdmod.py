@@ -6,9 +6,12 @@ access to the master root execution access to all salt minions.
 """
 
 import base64
+import concurrent.futures
+import contextvars
 import fnmatch
 import functools
 import glob
+import hashlib
 import logging
 import os
 import re
@@ -73,6 +76,40 @@ log = logging.getLogger(__name__)
 
 DEFAULT_SHELL = salt.grains.extra.shell()["shell"]
 
+# The files read by login shells, whose changes invalidate the cached login
+# environment of the runas users
+RUNAS_ENV_FILES = (
+    "/etc/environment",
+    "/etc/default/locale",
+    "/etc/login.defs",
+    "/etc/security/pam_env.conf",
+    "/etc/profile",
+    "/etc/profile.d",
+    "/etc/bashrc",
+    "/etc/bash.bashrc",
+    "/etc/zshenv",
+    "/etc/zprofile",
+    "/etc/zshrc",
+    "/etc/zsh/zshenv",
+    "/etc/zsh/zprofile",
+    "/etc/zsh/zshrc",
+    "/etc/csh.cshrc",
+    "/etc/csh.login",
+)
+RUNAS_ENV_HOME_FILES = (
+    ".pam_environment",
+    ".profile",
+    ".bash_profile",
+    ".bash_login",
+    ".bashrc",
+    ".zshenv",
+    ".zprofile",
+    ".zshrc",
+    ".cshrc",
+    ".tcshrc",
+    ".login",
+)
+
 
 # Overwriting the cmd python module makes debugging modules with pdb a bit
 # harder so lets do it this way instead.
@@ -332,6 +369,200 @@ def _prep_powershell_cmd(win_shell, cmd, encoded_cmd):
     return new_cmd
 
 
+def _discover_runas_env(runas, group, shell, use_sudo, log_callback):
+    """
+    Return the login environment of the ``runas`` user, and ``group``, by
+    running a login shell which prints it
+    """
+    # Use markers to thwart any stdout noise
+    # There must be a better way to do this.
+    import uuid
+
+    marker = "<<<" + str(uuid.uuid4()) + ">>>"
+    marker_b = marker.encode(__salt_system_encoding__)
+    py_code = (
+        "import sys, os, itertools; sys.stdout.write('{0}'); "
+        "sys.stdout.write('\\0'.join(itertools.chain(*os.environ.items()))); "
+        "sys.stdout.write('{0}');".format(marker)
+    )
+
+    if use_sudo:
+        env_cmd = ["sudo"]
+        # runas is optional if use_sudo is set.
+        if runas:
+            env_cmd.extend(["-u", runas])
+        if group:
+            env_cmd.extend(["-g", group])
+        if shell != DEFAULT_SHELL:
+            env_cmd.extend(["-s", "--", shell, "-c"])
+        else:
+            env_cmd.extend(["-i", "--"])
+    elif __grains__["os"] in ["FreeBSD"]:
+        env_cmd = [
+            "su",
+            "-",
+            runas,
+            "-c",
+        ]
+    elif __grains__["os_family"] in ["Solaris"]:
+        env_cmd = ["su", "-", runas, "-c"]
+    elif __grains__["os_family"] in ["AIX"]:
+        env_cmd = ["su", "-", runas, "-c"]
+    else:
+        env_cmd = ["su", "-s", shell, "-", runas, "-c"]
+
+    if not salt.utils.pkg.check_bundled():
+        if __grains__["os"] in ["FreeBSD"]:
+            env_cmd.extend([f"{shell} -c {sys.executable}"])
+        else:
+            env_cmd.extend([sys.executable])
+    else:
+        with tempfile.NamedTemporaryFile("w", delete=False) as fp:
+            if __grains__["os"] in ["FreeBSD"]:
+                env_cmd.extend(
+                    ["{} -c {} python {}".format(shell, sys.executable, fp.name)]
+                )
+            else:
+                env_cmd.extend([f"{sys.executable} python {fp.name}"])
+            fp.write(py_code)
+            shutil.chown(fp.name, runas)
+
+    msg = f"env command: {env_cmd}"
+    log.debug(log_callback(msg))
+    env_bytes, env_encoded_err = subprocess.Popen(
+        env_cmd,
+        stderr=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stdin=subprocess.PIPE,
+    ).communicate(salt.utils.stringutils.to_bytes(py_code))
+    if salt.utils.pkg.check_bundled():
+        os.remove(fp.name)
+    marker_count = env_bytes.count(marker_b)
+    if marker_count == 0:
+        # Possibly PAM prevented the login
+        log.error(
+            "Environment could not be retrieved for user '%s': " "stderr=%r stdout=%r",
+            runas,
+            env_encoded_err,
+            env_bytes,
+        )
+        # Ensure that we get an empty env_runas dict below since we
+        # were not able to get the environment.
+        env_bytes = b""
+    elif marker_count != 2:
+        raise CommandExecutionError(
+            "Environment could not be retrieved for user '{}'",
+            info={"stderr": repr(env_encoded_err), "stdout": repr(env_bytes)},
+        )
+    else:
+        # Strip the marker
+        env_bytes = env_bytes.split(marker_b)[1]
+
+    env_runas = dict(list(zip(*[iter(env_bytes.split(b"\0"))] * 2)))
+
+    return {
+        salt.utils.stringutils.to_str(k): salt.utils.stringutils.to_str(v)
+        for k, v in env_runas.items()
+    }
+
+
+def _runas_env_fingerprint(runas):
+    """
+    Return the details of the user and the stat of the files read by login
+    shells, which the login environment of ``runas`` depends on
+    """
+    if runas:
+        try:
+            pw_entry = pwd.getpwnam(runas)
+        except KeyError:
+            return None
+        home = pw_entry.pw_dir
+        ret = [[pw_entry.pw_uid, pw_entry.pw_gid, home, pw_entry.pw_shell]]
+    else:
+        home = os.path.expanduser("~")
+        ret = [[os.geteuid(), os.getegid(), home, None]]
+    paths = list(RUNAS_ENV_FILES)
+    paths.extend(sorted(glob.glob("/etc/profile.d/*")))
+    paths.extend(os.path.join(home, name) for name in RUNAS_ENV_HOME_FILES)
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            ret.append([path, None])
+        else:
+            ret.append([path, stat.st_ino, stat.st_size, stat.st_mtime_ns])
+    return ret
+
+
+def _get_runas_env(runas, group, shell, use_sudo, log_callback):
+    """
+    Return the login environment of the ``runas`` user, and ``group``.
+
+    When ``cmd_runas_env_cache_ttl`` is set, the environment is cached in
+    ``__context__`` and in the minion's cachedir for that many seconds, as
+    long as the user's details and the files read by login shells do not
+    change.
+    """
+    ttl = __opts__.get("cmd_runas_env_cache_ttl", 0)
+    if not ttl or "__context__" not in globals():
+        return _discover_runas_env(runas, group, shell, use_sudo, log_callback)
+
+    fingerprint = _runas_env_fingerprint(runas)
+    if fingerprint is None:
+        return _discover_runas_env(runas, group, shell, use_sudo, log_callback)
+
+    key = salt.utils.json.dumps([runas, group, shell, bool(use_sudo)])
+    cache = __context__.setdefault("cmd.runas_env", {})
+    cache_dir = os.path.join(__opts__["cachedir"], "runas_env")
+    cache_file = os.path.join(
+        cache_dir, hashlib.sha256(key.encode()).hexdigest() + ".json"
+    )
+
+    def _valid(entry):
+        return (
+            isinstance(entry, dict)
+            and entry.get("key") == key
+            and entry.get("fingerprint") == fingerprint
+            and 0 <= time.time() - entry.get("time", 0) < ttl
+        )
+
+    entry = cache.get(key)
+    if not _valid(entry):
+        try:
+            with salt.utils.files.fopen(cache_file, "r") as fp_:
+                entry = salt.utils.json.load(fp_)
+        except (OSError, ValueError):
+            entry = None
+        if _valid(entry):
+            cache[key] = entry
+    if _valid(entry):
+        log.debug("Using the cached environment for user %s", runas)
+        return dict(entry["env"])
+
+    env_runas = _discover_runas_env(runas, group, shell, use_sudo, log_callback)
+    if not env_runas:
+        # The environment could not be retrieved, try again next time
+        return env_runas
+    entry = cache[key] = {
+        "key": key,
+        "fingerprint": fingerprint,
+        "time": time.time(),
+        "env": env_runas,
+    }
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        # The environment may contain secrets, the temp file is only readable
+        # by its owner
+        with tempfile.NamedTemporaryFile(
+            "w", dir=cache_dir, suffix=".tmp", delete=False
+        ) as fp_:
+            salt.utils.json.dump(entry, fp_)
+        os.replace(fp_.name, cache_file)
+    except OSError as exc:
+        log.debug("Unable to cache the environment for user %s: %s", runas, exc)
+    return dict(env_runas)
+
+
 def _run(
     cmd,
     cwd=None,
@@ -366,10 +597,15 @@ def _run(
     success_stdout=None,
     success_stderr=None,
     windows_codepage=65001,
+    runas_env=None,
     **kwargs,
 ):
     """
     Do the DRY thing and only call subprocess.Popen() once
+
+    runas_env
+        The login environment of ``runas``, as returned by
+        :py:func:`_get_runas_env`, to use instead of discovering it again
     """
     if "pillar" in kwargs and not pillar_override:
         pillar_override = kwargs["pillar"]
@@ -536,101 +772,9 @@ def _run(
     if (runas or group) and not salt.utils.platform.is_windows():
         try:
             # Getting the environment for the runas user
-            # Use markers to thwart any stdout noise
-            # There must be a better way to do this.
-            import uuid
-
-            marker = "<<<" + str(uuid.uuid4()) + ">>>"
-            marker_b = marker.encode(__salt_system_encoding__)
-            py_code = (
-                "import sys, os, itertools; sys.stdout.write('{0}'); "
-                "sys.stdout.write('\\0'.join(itertools.chain(*os.environ.items()))); "
-                "sys.stdout.write('{0}');".format(marker)
-            )
-
-            if use_sudo:
-                env_cmd = ["sudo"]
-                # runas is optional if use_sudo is set.
-                if runas:
-                    env_cmd.extend(["-u", runas])
-                if group:
-                    env_cmd.extend(["-g", group])
-                if shell != DEFAULT_SHELL:
-                    env_cmd.extend(["-s", "--", shell, "-c"])
-                else:
-                    env_cmd.extend(["-i", "--"])
-            elif __grains__["os"] in ["FreeBSD"]:
-                env_cmd = [
-                    "su",
-                    "-",
-                    runas,
-                    "-c",
-                ]
-            elif __grains__["os_family"] in ["Solaris"]:
-                env_cmd = ["su", "-", runas, "-c"]
-            elif __grains__["os_family"] in ["AIX"]:
-                env_cmd = ["su", "-", runas, "-c"]
-            else:
-                env_cmd = ["su", "-s", shell, "-", runas, "-c"]
-
-            if not salt.utils.pkg.check_bundled():
-                if __grains__["os"] in ["FreeBSD"]:
-                    env_cmd.extend([f"{shell} -c {sys.executable}"])
-                else:
-                    env_cmd.extend([sys.executable])
-            else:
-                with tempfile.NamedTemporaryFile("w", delete=False) as fp:
-                    if __grains__["os"] in ["FreeBSD"]:
-                        env_cmd.extend(
-                            [
-                                "{} -c {} python {}".format(
-                                    shell, sys.executable, fp.name
-                                )
-                            ]
-                        )
-                    else:
-                        env_cmd.extend([f"{sys.executable} python {fp.name}"])
-                    fp.write(py_code)
-                    shutil.chown(fp.name, runas)
-
-            msg = f"env command: {env_cmd}"
-            log.debug(log_callback(msg))
-            env_bytes, env_encoded_err = subprocess.Popen(
-                env_cmd,
-                stderr=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stdin=subprocess.PIPE,
-            ).communicate(salt.utils.stringutils.to_bytes(py_code))
-            if salt.utils.pkg.check_bundled():
-                os.remove(fp.name)
-            marker_count = env_bytes.count(marker_b)
-            if marker_count == 0:
-                # Possibly PAM prevented the login
-                log.error(
-                    "Environment could not be retrieved for user '%s': "
-                    "stderr=%r stdout=%r",
-                    runas,
-                    env_encoded_err,
-                    env_bytes,
-                )
-                # Ensure that we get an empty env_runas dict below since we
-                # were not able to get the environment.
-                env_bytes = b""
-            elif marker_count != 2:
-                raise CommandExecutionError(
-                    "Environment could not be retrieved for user '{}'",
-                    info={"stderr": repr(env_encoded_err), "stdout": repr(env_bytes)},
-                )
-            else:
-                # Strip the marker
-                env_bytes = env_bytes.split(marker_b)[1]
-
-            env_runas = dict(list(zip(*[iter(env_bytes.split(b"\0"))] * 2)))
-
-            env_runas = {
-                salt.utils.stringutils.to_str(k): salt.utils.stringutils.to_str(v)
-                for k, v in env_runas.items()
-            }
+            if runas_env is None:
+                runas_env = _get_runas_env(runas, group, shell, use_sudo, log_callback)
+            env_runas = dict(runas_env)
             env_runas.update(env)
 
             # Fix platforms like Solaris that don't set a USER env var in the
@@ -2695,6 +2839,132 @@ def _retcode_quiet(
     )
 
 
+def retcode_many(
+    cmds,
+    concurrency=None,
+    runas=None,
+    group=None,
+    shell=DEFAULT_SHELL,
+    python_shell=None,
+    log_callback=None,
+    **kwargs,
+):
+    """
+    .. versionadded:: 3008.0
+
+    Run several independent commands at the same time, and return the return
+    code of each of them along with how long it took to run. This is used to
+    run the ``onlyif``, ``unless`` and ``check_cmd`` commands of a state
+    together, see :conf_minion:`state_check_concurrency`.
+
+    The commands are run from a pool of threads. When ``runas``, ``group`` or
+    ``umask`` is used, the commands are run one at a time, as switching the
+    user, group and umask of the new process is not safe from several threads.
+    The login environment of the user is then only retrieved once, and shared
+    by all of the commands.
+
+    :param list cmds: The commands to run
+
+    :param int concurrency: The maximum number of commands to run at the same
+        time. Defaults to the number of CPUs plus four, up to 32. Commands are
+        always run one at a time on Windows, or when ``runas``, ``group`` or
+        ``umask`` is used.
+
+    :param str runas: Specify an alternate user to run the commands
+
+    :param str group: Group to run the commands as
+
+    :param str shell: Specify an alternate shell. Defaults to the system's
+        default shell.
+
+    :param bool python_shell: If False, let python handle the positional
+        arguments. Set to True to use shell features, such as pipes or
+        redirection.
+
+    Any other arguments are passed to each command, as for
+    :py:func:`cmd.retcode <salt.modules.cmdmod.retcode>`.
+
+    :return: A list with a dictionary for each command, in the same order as
+        ``cmds``, containing the command (``cmd``), its return code
+        (``retcode``) and how long it ran for in milliseconds (``duration``).
+        When a command could not be run, the return code is ``None`` and the
+        reason is given in ``error``.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' cmd.retcode_many '["test -f /etc/motd", "which nginx"]' python_shell=True
+    """
+    python_shell = _python_shell_default(python_shell, kwargs.get("__pub_jid", ""))
+    log_callback = _check_cb(log_callback)
+    if salt.utils.platform.is_windows():
+        # The code page is changed for the whole process while a command runs
+        concurrency = 1
+    elif concurrency is not None:
+        concurrency = max(int(concurrency), 1)
+
+    if runas is None and "__context__" in globals():
+        runas = __context__.get("runas")
+    if runas or group or kwargs.get("umask") is not None:
+        # _run switches the user, group and umask in a preexec_fn, which does
+        # user and group lookups between the fork and the exec, and is not
+        # safe to run with several threads
+        concurrency = 1
+
+    runas_env = None
+    if (
+        (runas or group)
+        and not salt.utils.platform.is_windows()
+        and not salt.utils.platform.is_darwin()
+    ):
+        # Take one snapshot of the login environment for all of the commands.
+        # If the user or group is not valid, each command reports the error.
+        try:
+            if runas:
+                pwd.getpwnam(runas)
+            if group:
+                grp.getgrnam(group)
+            if not group or which_bin(["sudo"]):
+                runas_env = _get_runas_env(
+                    runas, group, shell, bool(group), log_callback
+                )
+        except (KeyError, ValueError, CommandExecutionError) as exc:
+            log.debug("Unable to retrieve the environment for user %s: %s", runas, exc)
+
+    def _retcode(cmd):
+        ret = {"cmd": cmd}
+        start = time.time()
+        try:
+            ret["retcode"] = _run(
+                cmd,
+                runas=runas,
+                group=group,
+                shell=shell,
+                python_shell=python_shell,
+                stderr=subprocess.STDOUT,
+                log_callback=log_callback,
+                runas_env=runas_env,
+                **kwargs,
+            )["retcode"]
+        except CommandExecutionError as exc:
+            ret["retcode"] = None
+            ret["error"] = str(exc)
+        ret["duration"] = (time.time() - start) * 1000
+        return ret
+
+    if concurrency == 1:
+        return [_retcode(cmd) for cmd in cmds]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Each command runs in a copy of the current context, for the loader's
+        # dunders to be available in the threads of the pool
+        futures = [
+            executor.submit(contextvars.copy_context().run, _retcode, cmd)
+            for cmd in cmds
+        ]
+        return [future.result() for future in futures]
+
+
 def script(
     source,
     args=None,
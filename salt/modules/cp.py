@@ -815,6 +815,25 @@ def list_master_symlinks(saltenv=None, prefix=""):
         return client.symlink_list(saltenv, prefix)
 
 
+def list_master_hashes(saltenv=None, prefix=""):
+    """
+    .. versionadded:: 3008.0
+
+    List the hash and mode of all of the files stored on the master below the
+    prefix. Returns ``None`` if the master does not support listing them.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' cp.list_master_hashes prefix=path/to/dir
+    """
+    if not saltenv:
+        saltenv = __opts__["saltenv"] or "base"
+    with _client() as client:
+        return client.hash_list(saltenv, prefix)
+
+
 def list_minion(saltenv=None):
     """
     .. versionchanged:: 3005
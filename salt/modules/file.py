@@ -9,10 +9,12 @@ group, mode, and data
 
 
 import datetime
+import difflib
 import errno
 import fnmatch
 import glob
 import hashlib
+import io
 import itertools
 import logging
 import mmap
@@ -25,7 +27,7 @@ import sys
 import tempfile
 import time
 import urllib.parse
-from collections import namedtuple
+from collections import deque, namedtuple
 from collections.abc import Iterable, Mapping
 
 import salt.utils.args
@@ -728,7 +730,7 @@ def get_sum(path, form="sha256"):
 
     if not os.path.isfile(path):
         return "File not found"
-    return salt.utils.hashutils.get_hash(path, form, 4096)
+    return get_hash(path, form, 4096)
 
 
 def get_hash(path, form="sha256", chunk_size=65536):
@@ -756,7 +758,12 @@ def get_hash(path, form="sha256", chunk_size=65536):
 
         salt '*' file.get_hash /etc/shadow
     """
-    return salt.utils.hashutils.get_hash(os.path.expanduser(path), form, chunk_size)
+    path = os.path.expanduser(path)
+    if __opts__.get("file_hash_cache"):
+        return salt.utils.hashutils.get_hash_cached(
+            path, os.path.join(__opts__["cachedir"], "file_hashes"), form, chunk_size
+        )
+    return salt.utils.hashutils.get_hash(path, form, chunk_size)
 
 
 def get_source_sum(
@@ -1838,6 +1845,322 @@ def _mkstemp_copy(path, preserve_inode=True):
     return temp_file
 
 
+def _format_range_unified(start, stop):
+    """
+    Format a range of lines for a unified diff hunk header, the same way as
+    ``difflib.unified_diff``
+    """
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+class _StreamingDiff:
+    """
+    Build a unified diff, in the same format as ``difflib.unified_diff``, from
+    the lines of a file as they are streamed through an edit, keeping only
+    the context lines and the first ``max_lines`` lines of the diff in memory
+    """
+
+    def __init__(self, max_lines=None, context=3):
+        self.max_lines = max_lines
+        self.context = context
+        self.truncated = False
+        self._lines = []
+        self._old = 0
+        self._new = 0
+        self._before = deque(maxlen=context)
+        self._hunk = None
+        self._pending = ([], [])
+
+    @staticmethod
+    def _decode(line):
+        return salt.utils.stringutils.to_unicode(
+            line, encoding=("utf-8", "latin-1", __salt_system_encoding__)
+        )
+
+    def _add(self, body, prefix, lines):
+        # The header of the hunk, and of the diff before the first hunk, are
+        # added when the hunk is closed
+        headers = 1 if self._lines else 3
+        for line in lines:
+            if (
+                self.max_lines
+                and len(self._lines) + headers + len(body) >= self.max_lines
+            ):
+                self.truncated = True
+                return
+            body.append(prefix + self._decode(line))
+
+    def equal(self, line):
+        """
+        Add a line which is the same in both files
+        """
+        self._old += 1
+        self._new += 1
+        self._flush()
+        if self._hunk is None:
+            self._before.append(line)
+            return
+        tail = self._hunk["tail"]
+        tail.append(line)
+        if len(tail) > 2 * self.context:
+            self._close_hunk()
+
+    def change(self, old_lines, new_lines):
+        """
+        Add lines which were replaced, removed or inserted
+        """
+        if not old_lines and not new_lines:
+            return
+        if self._hunk is None:
+            self._hunk = {
+                "old_start": self._old - len(self._before),
+                "new_start": self._new - len(self._before),
+                "old_len": len(self._before),
+                "new_len": len(self._before),
+                "body": [],
+                "tail": [],
+            }
+            self._add(self._hunk["body"], " ", self._before)
+            self._before.clear()
+        else:
+            tail = self._hunk["tail"]
+            self._add(self._hunk["body"], " ", tail)
+            self._hunk["old_len"] += len(tail)
+            self._hunk["new_len"] += len(tail)
+            tail.clear()
+        # Consecutive changes are shown with all of the removed lines before
+        # the added ones, as difflib does
+        for pending, lines in zip(self._pending, (old_lines, new_lines)):
+            pending.extend(lines)
+            if self.max_lines:
+                del pending[self.max_lines :]
+        self._hunk["old_len"] += len(old_lines)
+        self._hunk["new_len"] += len(new_lines)
+        self._old += len(old_lines)
+        self._new += len(new_lines)
+
+    def compare(self, old_lines, new_lines):
+        """
+        Add the differences between two lists of lines
+        """
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                for line in old_lines[i1:i2]:
+                    self.equal(line)
+            else:
+                self.change(old_lines[i1:i2], new_lines[j1:j2])
+
+    def _flush(self):
+        removed, added = self._pending
+        if self._hunk is not None and (removed or added):
+            self._add(self._hunk["body"], "-", removed)
+            self._add(self._hunk["body"], "+", added)
+            removed.clear()
+            added.clear()
+
+    def _close_hunk(self):
+        self._flush()
+        hunk = self._hunk
+        self._hunk = None
+        trailing = hunk["tail"][: self.context]
+        self._add(hunk["body"], " ", trailing)
+        self._before.extend(hunk["tail"])
+        if self.truncated and not hunk["body"]:
+            return
+        if not self._lines:
+            self._lines.extend(["--- \n", "+++ \n"])
+        self._lines.append(
+            "@@ -{} +{} @@\n".format(
+                _format_range_unified(
+                    hunk["old_start"],
+                    hunk["old_start"] + hunk["old_len"] + len(trailing),
+                ),
+                _format_range_unified(
+                    hunk["new_start"],
+                    hunk["new_start"] + hunk["new_len"] + len(trailing),
+                ),
+            )
+        )
+        self._lines.extend(hunk["body"])
+
+    def result(self):
+        """
+        Return the diff
+        """
+        if self._hunk is not None:
+            self._close_hunk()
+        ret = "".join(self._lines)
+        if self.truncated:
+            ret += f"[Diff truncated after {self.max_lines} lines]\n"
+        return ret
+
+
+def _diff_max_lines():
+    return __opts__.get("file_diff_max_lines", 10000)
+
+
+def _stream_edit(lines, edits, write=None, diff=None):
+    """
+    Apply ``edits`` to the ``lines`` of a file in a single pass, passing the
+    resulting lines to ``write`` and the changes to the
+    :py:class:`_StreamingDiff` instance ``diff``. Only the lines of the edit
+    being applied are held in memory. Returns ``True`` if the edits changed
+    anything.
+
+    lines
+        An iterable of the lines of the file
+
+    edits
+        An iterable of ``(start, stop, new_lines)`` tuples sorted by line
+        number, each replacing the lines ``start`` up to ``stop`` (counting
+        from zero) with ``new_lines``. When ``start`` equals ``stop``,
+        ``new_lines`` are inserted before line ``start``, or at the end of the
+        file if ``start`` is the number of lines in the file.
+    """
+    changed = False
+    edits = iter(edits)
+    edit = next(edits, None)
+    old = []
+
+    def _apply(old, new):
+        if write is not None:
+            for line in new:
+                write(line)
+        if old == new:
+            if diff is not None:
+                for line in old:
+                    diff.equal(line)
+            return False
+        if diff is not None:
+            diff.compare(old, new)
+        return True
+
+    idx = 0
+    for line in lines:
+        while edit is not None and edit[0] == edit[1] == idx:
+            changed |= _apply([], list(edit[2]))
+            edit = next(edits, None)
+        if edit is not None and edit[0] <= idx < edit[1]:
+            old.append(line)
+            if idx + 1 == edit[1]:
+                changed |= _apply(old, list(edit[2]))
+                old = []
+                edit = next(edits, None)
+        else:
+            if write is not None:
+                write(line)
+            if diff is not None:
+                diff.equal(line)
+        idx += 1
+    while edit is not None:
+        changed |= _apply(old, list(edit[2]))
+        old = []
+        edit = next(edits, None)
+    return changed
+
+
+def _iter_lines(data):
+    """
+    Iterate over the lines of ``data``, an mmap or bytes object, splitting on
+    ``\\n`` only
+    """
+    if isinstance(data, mmap.mmap):
+        data.seek(0)
+        return iter(data.readline, b"")
+    return io.BytesIO(data)
+
+
+def _count_newlines(data, start=0, end=None, chunk_size=1048576):
+    """
+    Count the newlines in ``data[start:end]`` for an mmap or bytes object,
+    without copying more than ``chunk_size`` bytes at a time
+    """
+    if end is None:
+        end = len(data)
+    ret = 0
+    for pos in range(start, end, chunk_size):
+        ret += data[pos : min(pos + chunk_size, end)].count(b"\n")
+    return ret
+
+
+def _regex_edits(data, cpattern, repl, count=0, stats=None):
+    """
+    Generate the edits for :py:func:`_stream_edit` which replace the matches
+    of ``cpattern`` in ``data`` (an mmap or bytes object) with ``repl``, like
+    ``re.subn``. Each edit covers the whole lines containing one or more
+    matches. The number of matches is counted in ``stats["count"]``.
+    """
+    if stats is None:
+        stats = {}
+    stats["count"] = 0
+    size = len(data)
+    line_idx = 0
+    pos = 0
+    region = None
+
+    def _finish(region):
+        new = b"".join(region["pieces"]) + data[region["copied"] : region["end"]]
+        old_count = _count_newlines(data, region["start"], region["end"])
+        if region["end"] == size and region["end"] > region["start"]:
+            if data[size - 1 : size] != b"\n":
+                old_count += 1
+        return old_count, io.BytesIO(new).readlines()
+
+    def _extend(region):
+        # Keep the line boundaries of the new content aligned with the original
+        # lines, by merging the next line when the replacement removed the end
+        # of the last line
+        if region["end"] >= size:
+            return
+        if region["copied"] < region["end"]:
+            last = data[region["end"] - 1 : region["end"]]
+        else:
+            last = next((x[-1:] for x in reversed(region["pieces"]) if x), b"")
+        if last != b"\n":
+            nl = data.find(b"\n", region["end"])
+            region["end"] = size if nl == -1 else nl + 1
+
+    for match in cpattern.finditer(data):
+        if count and stats["count"] >= count:
+            break
+        stats["count"] += 1
+        start, end = match.span()
+        line_start = data.rfind(b"\n", 0, start) + 1
+        nl = data.find(b"\n", end - 1 if end > start else start)
+        line_end = size if nl == -1 else nl + 1
+        if region is not None:
+            _extend(region)
+            if line_start >= region["end"]:
+                old_count, new_lines = _finish(region)
+                line_idx += _count_newlines(data, pos, region["start"])
+                pos = region["start"]
+                yield line_idx, line_idx + old_count, new_lines
+                region = None
+        if region is None:
+            region = {
+                "start": line_start,
+                "end": line_end,
+                "copied": line_start,
+                "pieces": [],
+            }
+        region["end"] = max(region["end"], line_end)
+        region["pieces"].append(data[region["copied"] : start])
+        region["pieces"].append(match.expand(repl))
+        region["copied"] = end
+    if region is not None:
+        _extend(region)
+        old_count, new_lines = _finish(region)
+        line_idx += _count_newlines(data, pos, region["start"])
+        yield line_idx, line_idx + old_count, new_lines
+
+
 def _regex_to_static(src, regex):
     """
     Expand regular expression to static match.
@@ -2206,6 +2529,8 @@ def line(
         .. note::
             Using this option will store two copies of the file in-memory
             (the original version and the edited version) in order to generate the diff.
+            The diff is truncated after the number of lines set by the
+            ``file_diff_max_lines`` minion config option (10000 by default).
 
     backup
         Create a backup of the original file with the extension:
@@ -2387,6 +2712,7 @@ def line(
 
     with salt.utils.files.fopen(path, mode="r") as fp_:
         body = salt.utils.data.decode_list(fp_.readlines())
+    orig_body = list(body)
     body_before = hashlib.sha256(
         salt.utils.stringutils.to_bytes("".join(body))
     ).hexdigest()
@@ -2444,9 +2770,9 @@ def line(
 
     if changed:
         if show_changes:
-            with salt.utils.files.fopen(path, "r") as fp_:
-                path_content = salt.utils.data.decode_list(fp_.read().splitlines(True))
-            changes_diff = __utils__["stringutils.get_diff"](path_content, body)
+            diff = _StreamingDiff(_diff_max_lines())
+            diff.compare(orig_body, body)
+            changes_diff = diff.result()
         if __opts__["test"] is False:
             fh_ = None
             try:
@@ -2557,10 +2883,9 @@ def replace(
         if changes were made, and ``False`` if not.
 
         .. note::
-            Using this option will store two copies of the file in memory (the
-            original version and the edited version) in order to generate the
-            diff. This may not normally be a concern, but could impact
-            performance if used with large files.
+            The diff is built while the file is streamed, and is truncated
+            after the number of lines set by the ``file_diff_max_lines``
+            minion config option (10000 by default).
 
     ignore_if_missing: False
         .. versionadded:: 2015.8.0
@@ -2641,8 +2966,6 @@ def replace(
 
     # Search the file; track if any changes have been made for the return val
     has_changes = False
-    orig_file = []  # used for show_changes and change detection
-    new_file = []  # used for show_changes and change detection
     if not salt.utils.platform.is_windows():
         pre_user = get_user(path)
         pre_group = get_group(path)
@@ -2653,14 +2976,48 @@ def replace(
     repl = salt.utils.stringutils.to_bytes(str(repl))
     if not_found_content:
         not_found_content = salt.utils.stringutils.to_bytes(not_found_content)
+    sub_repl = repl.replace(b"\\", b"\\\\") if backslash_literal else repl
 
     found = False
+    not_found = False
     temp_file = None
     content = (
         salt.utils.stringutils.to_unicode(not_found_content)
         if not_found_content and (prepend_if_not_found or append_if_not_found)
         else salt.utils.stringutils.to_unicode(repl)
     )
+    linesep = salt.utils.stringutils.to_bytes(os.linesep)
+    # Only keep the lines around the changes in memory, to build the diff
+    diff = _StreamingDiff(_diff_max_lines()) if show_changes else None
+
+    def _not_found_edits(data):
+        # The edit which prepends or appends the content to the file
+        new_content = (not_found_content or repl) + linesep
+        if prepend_if_not_found:
+            return [(0, 0, io.BytesIO(new_content).readlines())]
+        size = len(data)
+        line_count = _count_newlines(data)
+        if size and data[size - len(linesep) :] != linesep:
+            # Make sure we have a newline at the end of the file
+            last_start = data.rfind(b"\n", 0, size - 1) + 1
+            if data[size - 1 :] == b"\n":
+                line_count -= 1
+            new_content = data[last_start:] + linesep + new_content
+            return [(line_count, line_count + 1, io.BytesIO(new_content).readlines())]
+        return [(line_count, line_count, io.BytesIO(new_content).readlines())]
+
+    def _edits(data):
+        if not_found:
+            return _not_found_edits(data)
+        return _regex_edits(data, cpattern, sub_repl, count)
+
+    def _open_data(r_file):
+        try:
+            # mmap throws a ValueError if the file is empty.
+            return mmap.mmap(r_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # size of file in /proc is 0, but contains data
+            return b"".join(r_file)
 
     try:
         # First check the whole file, determine whether to make the replacement
@@ -2668,53 +3025,35 @@ def replace(
         r_data = None
         # Use a read-only handle to open the file
         with salt.utils.files.fopen(path, mode="rb", buffering=bufsize) as r_file:
-            try:
-                # mmap throws a ValueError if the file is empty.
-                r_data = mmap.mmap(r_file.fileno(), 0, access=mmap.ACCESS_READ)
-            except (ValueError, OSError):
-                # size of file in /proc is 0, but contains data
-                r_data = b"".join(r_file)
+            r_data = _open_data(r_file)
             if search_only:
                 # Just search; bail as early as a match is found
                 if re.search(cpattern, r_data):
                     return True  # `with` block handles file closure
                 else:
                     return False
-            else:
-                result, nrepl = re.subn(
-                    cpattern,
-                    repl.replace(b"\\", b"\\\\") if backslash_literal else repl,
-                    r_data,
-                    count,
-                )
 
-                # found anything? (even if no change)
-                if nrepl > 0:
+            # found anything? (even if no change)
+            found = re.search(cpattern, r_data) is not None
+            if not found and (prepend_if_not_found or append_if_not_found):
+                # Search for content, to avoid pre/appending the
+                # content if it was pre/appended in a previous run.
+                if re.search(
+                    salt.utils.stringutils.to_bytes(
+                        f"^{re.escape(content)}($|(?=\r\n))"
+                    ),
+                    r_data,
+                    flags=re_flags,
+                ):
+                    # Content was found, so set found.
                     found = True
-                    # Identity check the potential change
-                    has_changes = True if pattern != repl else has_changes
-
-                if prepend_if_not_found or append_if_not_found:
-                    # Search for content, to avoid pre/appending the
-                    # content if it was pre/appended in a previous run.
-                    if re.search(
-                        salt.utils.stringutils.to_bytes(
-                            f"^{re.escape(content)}($|(?=\r\n))"
-                        ),
-                        r_data,
-                        flags=re_flags,
-                    ):
-                        # Content was found, so set found.
-                        found = True
+                else:
+                    not_found = True
 
-                orig_file = (
-                    r_data.read(filesize).splitlines(True)
-                    if isinstance(r_data, mmap.mmap)
-                    else r_data.splitlines(True)
+            if found or not_found:
+                has_changes = _stream_edit(
+                    _iter_lines(r_data), _edits(r_data), diff=diff
                 )
-                new_file = result.splitlines(True)
-                if orig_file == new_file:
-                    has_changes = False
 
     except OSError as exc:
         raise CommandExecutionError(f"Unable to open file '{path}'. Exception: {exc}")
@@ -2733,21 +3072,17 @@ def replace(
         r_data = None
         try:
             # Open the file in write mode
-            with salt.utils.files.fopen(path, mode="w", buffering=bufsize) as w_file:
+            with salt.utils.files.fopen(path, mode="wb", buffering=bufsize) as w_file:
                 try:
                     # Open the temp file in read mode
                     with salt.utils.files.fopen(
-                        temp_file, mode="r", buffering=bufsize
+                        temp_file, mode="rb", buffering=bufsize
                     ) as r_file:
-                        r_data = mmap.mmap(r_file.fileno(), 0, access=mmap.ACCESS_READ)
-                        result, nrepl = re.subn(
-                            cpattern,
-                            repl.replace(b"\\", b"\\\\") if backslash_literal else repl,
-                            r_data,
-                            count,
-                        )
+                        r_data = _open_data(r_file)
                         try:
-                            w_file.write(salt.utils.stringutils.to_str(result))
+                            _stream_edit(
+                                _iter_lines(r_data), _edits(r_data), write=w_file.write
+                            )
                         except OSError as exc:
                             raise CommandExecutionError(
                                 "Unable to write file '{}'. Contents may "
@@ -2763,39 +3098,6 @@ def replace(
         except OSError as exc:
             raise CommandExecutionError(f"Exception: {exc}")
 
-    if not found and (append_if_not_found or prepend_if_not_found):
-        if not_found_content is None:
-            not_found_content = repl
-        if prepend_if_not_found:
-            new_file.insert(
-                0, not_found_content + salt.utils.stringutils.to_bytes(os.linesep)
-            )
-        else:
-            # append_if_not_found
-            # Make sure we have a newline at the end of the file
-            if 0 != len(new_file):
-                if not new_file[-1].endswith(
-                    salt.utils.stringutils.to_bytes(os.linesep)
-                ):
-                    new_file[-1] += salt.utils.stringutils.to_bytes(os.linesep)
-            new_file.append(
-                not_found_content + salt.utils.stringutils.to_bytes(os.linesep)
-            )
-        has_changes = True
-        if not dry_run:
-            try:
-                # Create a copy to read from and for later use as a backup
-                temp_file = _mkstemp_copy(path=path, preserve_inode=preserve_inode)
-            except OSError as exc:
-                raise CommandExecutionError(f"Exception: {exc}")
-            # write new content in the file while avoiding partial reads
-            try:
-                fh_ = salt.utils.atomicfile.atomic_open(path, "wb")
-                for line in new_file:
-                    fh_.write(salt.utils.stringutils.to_bytes(line))
-            finally:
-                fh_.close()
-
     if backup and has_changes and not dry_run:
         # keep the backup only if it was requested
         # and only if there were any changes
@@ -2835,16 +3137,8 @@ def replace(
     if not dry_run and not salt.utils.platform.is_windows():
         check_perms(path, None, pre_user, pre_group, pre_mode)
 
-    differences = __utils__["stringutils.get_diff"](orig_file, new_file)
-
     if show_changes:
-        return differences
-
-    # We may have found a regex line match but don't need to change the line
-    # (for situations where the pattern also matches the repl). Revert the
-    # has_changes flag to False if the final result is unchanged.
-    if not differences:
-        has_changes = False
+        return diff.result()
 
     return has_changes
 
@@ -2928,7 +3222,8 @@ def blockreplace(
         Controls how changes are presented. If ``True``, this function will
         return a unified diff of the changes made. If False, then it will
         return a boolean (``True`` if any changes were made, otherwise
-        ``False``).
+        ``False``). The diff is truncated after the number of lines set by the
+        ``file_diff_max_lines`` minion config option (10000 by default).
 
     append_newline: False
         Controls whether or not a newline is appended to the content block. If
@@ -3006,11 +3301,16 @@ def blockreplace(
 
     line_count = len(split_content)
 
-    has_changes = False
-    orig_file = []
-    new_file = []
+    # The edits to make to the lines of the file, as (start, stop, new_lines)
+    # tuples for _stream_edit
+    edits = []
     in_block = False
     block_found = False
+    block_start = None
+    match_regex = insert_before_match or insert_after_match
+    match_idx = None
+    file_line_count = 0
+    last_line = None
     linesep = None
 
     def _add_content(linesep, lines=None, include_marker_start=True, end_line=None):
@@ -3041,16 +3341,20 @@ def blockreplace(
 
         return lines
 
-    # We do not use in-place editing to avoid file attrs modifications when
-    # no changes are required and to avoid any file access on a partially
-    # written file.
+    def _file_id(fi_file):
+        stats = os.fstat(fi_file.fileno())
+        return stats.st_ino, stats.st_size, stats.st_mtime_ns
+
+    # The file is streamed rather than read into memory, first to find the
+    # block and then to compare and write the edited lines. We do not use
+    # in-place editing to avoid file attrs modifications when no changes are
+    # required and to avoid any file access on a partially written file.
     try:
         with salt.utils.files.fopen(
             path, "r", encoding=file_encoding, newline=""
         ) as fi_file:
-            for line in fi_file:
-                write_line_to_new_file = True
-
+            file_id = _file_id(fi_file)
+            for idx, line in enumerate(fi_file):
                 if linesep is None:
                     # Auto-detect line separator
                     if line.endswith("\r\n"):
@@ -3062,45 +3366,45 @@ def blockreplace(
                         linesep = os.linesep
 
                 if marker_start in line:
-                    # We've entered the content block
+                    # We've entered the content block. The lines since an
+                    # earlier start marker are removed.
+                    if in_block and block_start < idx:
+                        edits.append((block_start, idx, []))
                     in_block = True
-                else:
-                    if in_block:
-                        # We're not going to write the lines from the old file to
-                        # the new file until we have exited the block.
-                        write_line_to_new_file = False
-
-                        marker_end_pos = line.find(marker_end)
-                        if marker_end_pos != -1:
-                            # End of block detected
-                            in_block = False
-                            # We've found and exited the block
-                            block_found = True
-
-                            _add_content(
-                                linesep,
-                                lines=new_file,
-                                include_marker_start=False,
-                                end_line=line[marker_end_pos:],
+                    block_start = idx + 1
+                elif in_block:
+                    marker_end_pos = line.find(marker_end)
+                    if marker_end_pos != -1:
+                        # End of block detected
+                        in_block = False
+                        # We've found and exited the block
+                        block_found = True
+                        edits.append(
+                            (
+                                block_start,
+                                idx + 1,
+                                _add_content(
+                                    linesep,
+                                    lines=[],
+                                    include_marker_start=False,
+                                    end_line=line[marker_end_pos:],
+                                ),
                             )
+                        )
 
-                # Save the line from the original file
-                orig_file.append(line)
-                if write_line_to_new_file:
-                    new_file.append(line)
+                if match_regex and match_idx is None and re.search(match_regex, line):
+                    match_idx = idx
+                file_line_count = idx + 1
+                last_line = line
 
     except OSError as exc:
         raise CommandExecutionError(f"Failed to read from {path}: {exc}")
-    finally:
-        if linesep is None:
-            # If the file was empty, we will not have set linesep yet. Assume
-            # the system's line separator. This is needed for when we
-            # prepend/append later on.
-            linesep = os.linesep
-        try:
-            fi_file.close()
-        except Exception:  # pylint: disable=broad-except
-            pass
+
+    if linesep is None:
+        # If the file was empty, we will not have set linesep yet. Assume
+        # the system's line separator. This is needed for when we
+        # prepend/append later on.
+        linesep = os.linesep
 
     if in_block:
         # unterminated block => bad, always fail
@@ -3111,119 +3415,103 @@ def blockreplace(
     if not block_found:
         if prepend_if_not_found:
             # add the markers and content at the beginning of file
-            prepended_content = _add_content(linesep)
-            prepended_content.extend(new_file)
-            new_file = prepended_content
+            edits.append((0, 0, _add_content(linesep)))
             block_found = True
         elif append_if_not_found:
-            # Make sure we have a newline at the end of the file
-            if new_file:
-                if not new_file[-1].endswith(linesep):
-                    new_file[-1] += linesep
-            # add the markers and content at the end of file
-            _add_content(linesep, lines=new_file)
+            if last_line is not None and not last_line.endswith(linesep):
+                # Make sure we have a newline at the end of the file
+                edits.append(
+                    (
+                        file_line_count - 1,
+                        file_line_count,
+                        [last_line + linesep] + _add_content(linesep),
+                    )
+                )
+            else:
+                # add the markers and content at the end of file
+                edits.append((file_line_count, file_line_count, _add_content(linesep)))
             block_found = True
-        elif insert_before_match or insert_after_match:
-            match_regex = insert_before_match or insert_after_match
-            match_idx = [
-                i for i, item in enumerate(orig_file) if re.search(match_regex, item)
-            ]
-            if match_idx:
-                match_idx = match_idx[0]
-                for line in _add_content(linesep):
-                    if insert_after_match:
-                        match_idx += 1
-                    new_file.insert(match_idx, line)
-                    if insert_before_match:
-                        match_idx += 1
+        elif match_regex:
+            if match_idx is not None:
+                if not insert_before_match:
+                    match_idx += 1
+                edits.append((match_idx, match_idx, _add_content(linesep)))
                 block_found = True
-        else:
-            raise CommandExecutionError(
-                "Cannot edit marked block. Markers were not found in file."
-            )
-
-    if block_found:
-        diff = __utils__["stringutils.get_diff"](orig_file, new_file)
-        has_changes = diff != ""
-        if has_changes and not dry_run:
-            # changes detected
-            # backup file attrs
-            perms = {}
-            perms["user"] = get_user(path)
-            perms["group"] = get_group(path)
-            perms["mode"] = salt.utils.files.normalize_mode(get_mode(path))
-
-            # backup old content
-            if backup is not False:
-                backup_path = f"{path}{backup}"
-                shutil.copy2(path, backup_path)
-                # copy2 does not preserve ownership
-                if salt.utils.platform.is_windows():
-                    # This function resides in win_file.py and will be available
-                    # on Windows. The local function will be overridden
-                    # pylint: disable=E1120,E1123
-                    check_perms(path=backup_path, ret=None, owner=perms["user"])
-                    # pylint: enable=E1120,E1123
-                else:
-                    check_perms(
-                        name=backup_path,
-                        ret=None,
-                        user=perms["user"],
-                        group=perms["group"],
-                        mode=perms["mode"],
-                    )
 
     if not block_found:
         raise CommandExecutionError(
             "Cannot edit marked block. Markers were not found in file."
         )
 
-    diff = __utils__["stringutils.get_diff"](orig_file, new_file)
-    has_changes = diff != ""
-    if has_changes and not dry_run:
-        # changes detected
-        # backup file attrs
-        perms = {}
-        perms["user"] = get_user(path)
-        perms["group"] = get_group(path)
-        perms["mode"] = salt.utils.files.normalize_mode(get_mode(path))
-
-        # backup old content
-        if backup is not False:
-            backup_path = f"{path}{backup}"
-            shutil.copy2(path, backup_path)
-            # copy2 does not preserve ownership
+    diff = _StreamingDiff(_diff_max_lines()) if show_changes else None
+
+    def _edit(write=None):
+        try:
+            with salt.utils.files.fopen(
+                path, "r", encoding=file_encoding, newline=""
+            ) as fi_file:
+                # The edits were found from the file as it was then
+                if _file_id(fi_file) != file_id:
+                    raise CommandExecutionError(
+                        f"File {path} was changed while it was being edited"
+                    )
+                return _stream_edit(fi_file, edits, write=write, diff=diff)
+        except OSError as exc:
+            raise CommandExecutionError(f"Failed to read from {path}: {exc}")
+
+    if dry_run:
+        has_changes = _edit()
+    else:
+        # The edited lines are written to a temporary file while they are
+        # compared, which replaces the file only if anything changed
+        with salt.utils.atomicfile.atomic_open(path, "wb") as fh_:
+            has_changes = _edit(
+                write=lambda line: fh_.write(
+                    salt.utils.stringutils.to_bytes(line, encoding=file_encoding)
+                )
+            )
+            if not has_changes:
+                fh_.discard()
+            else:
+                # backup file attrs
+                perms = {}
+                perms["user"] = get_user(path)
+                perms["group"] = get_group(path)
+                perms["mode"] = salt.utils.files.normalize_mode(get_mode(path))
+
+                # backup old content
+                if backup is not False:
+                    backup_path = f"{path}{backup}"
+                    shutil.copy2(path, backup_path)
+                    # copy2 does not preserve ownership
+                    if salt.utils.platform.is_windows():
+                        # This function resides in win_file.py and will be available
+                        # on Windows. The local function will be overridden
+                        # pylint: disable=E1120,E1123
+                        check_perms(path=backup_path, ret=None, owner=perms["user"])
+                        # pylint: enable=E1120,E1123
+                    else:
+                        check_perms(
+                            backup_path,
+                            None,
+                            perms["user"],
+                            perms["group"],
+                            perms["mode"],
+                        )
+
+        if has_changes:
+            # this may have overwritten file attrs
             if salt.utils.platform.is_windows():
                 # This function resides in win_file.py and will be available
                 # on Windows. The local function will be overridden
                 # pylint: disable=E1120,E1123
-                check_perms(path=backup_path, ret=None, owner=perms["user"])
+                check_perms(path=path, ret=None, owner=perms["user"])
                 # pylint: enable=E1120,E1123
             else:
-                check_perms(
-                    backup_path, None, perms["user"], perms["group"], perms["mode"]
-                )
-
-        # write new content in the file while avoiding partial reads
-        try:
-            fh_ = salt.utils.atomicfile.atomic_open(path, "wb")
-            for line in new_file:
-                fh_.write(salt.utils.stringutils.to_bytes(line, encoding=file_encoding))
-        finally:
-            fh_.close()
-
-        # this may have overwritten file attrs
-        if salt.utils.platform.is_windows():
-            # This function resides in win_file.py and will be available
-            # on Windows. The local function will be overridden
-            # pylint: disable=E1120,E1123
-            check_perms(path=path, ret=None, owner=perms["user"])
-            # pylint: enable=E1120,E1123
-        else:
-            check_perms(path, None, perms["user"], perms["group"], perms["mode"])
+                check_perms(path, None, perms["user"], perms["group"], perms["mode"])
 
     if show_changes:
-        return diff
+        return diff.result()
 
     return has_changes
 
@@ -6553,6 +6841,8 @@ def manage_file(
         .. note::
             Using this option will store two copies of the file in-memory
             (the original version and the edited version) in order to generate the diff.
+            The diff is truncated after the number of lines set by the
+            ``file_diff_max_lines`` minion config option (10000 by default).
 
     contents:
         Specify the contents of the file. Cannot be used in combination with
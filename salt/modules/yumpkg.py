@@ -180,9 +180,13 @@ def _yum():
     return context.get(contextkey)
 
 
-def _call_yum(args, **kwargs):
+def _call_yum(args, cache=False, **kwargs):
     """
     Call yum/dnf.
+
+    If ``cache`` is True, the result is shared with later identical calls in
+    the same run, until the package database or repository metadata changes.
+    Only use it for commands which query the package database.
     """
     params = {
         "output_loglevel": "trace",
@@ -198,6 +202,10 @@ def _call_yum(args, **kwargs):
     cmd.append(_yum())
     cmd.extend(args)
 
+    if cache:
+        return salt.utils.pkg.cached_query(
+            __context__, "yum", __salt__["cmd.run_all"], cmd, **params
+        )
     return __salt__["cmd.run_all"](cmd, **params)
 
 
@@ -518,7 +526,7 @@ def latest_version(*names, **kwargs):
     cmd.extend(options)
     cmd.extend(["list", "available"])
     cmd.extend(names)
-    out = _call_yum(cmd, ignore_retcode=True)
+    out = _call_yum(cmd, cache=True, ignore_retcode=True)
     if out["retcode"] != 0:
         if out["stderr"]:
             # Check first if this is just a matter of the packages being
@@ -955,7 +963,7 @@ def list_repo_pkgs(*args, **kwargs):
         cmd_prefix.append("list")
         for pkg_src in ("installed", "available"):
             # Check installed packages first
-            out = _call_yum(cmd_prefix + [pkg_src], ignore_retcode=True)
+            out = _call_yum(cmd_prefix + [pkg_src], cache=True, ignore_retcode=True)
             if out["retcode"] == 0:
                 _parse_output(out["stdout"], strict=True)
     # The --showduplicates option is added in 3.2.13, but the
@@ -967,7 +975,7 @@ def list_repo_pkgs(*args, **kwargs):
         cmd_prefix.append("list")
         for pkg_src in ("installed", "available"):
             # Check installed packages first
-            out = _call_yum(cmd_prefix + [pkg_src], ignore_retcode=True)
+            out = _call_yum(cmd_prefix + [pkg_src], cache=True, ignore_retcode=True)
             if out["retcode"] == 0:
                 _parse_output(out["stdout"], strict=True)
     else:
@@ -986,7 +994,7 @@ def list_repo_pkgs(*args, **kwargs):
                 cmd.append("-C")
             # Can't concatenate because args is a tuple, using list.extend()
             cmd.extend(args)
-            out = _call_yum(cmd, ignore_retcode=True)
+            out = _call_yum(cmd, cache=True, ignore_retcode=True)
             if out["retcode"] != 0 and "Error:" in out["stdout"]:
                 continue
             _parse_output(out["stdout"])
@@ -1038,7 +1046,7 @@ def list_upgrades(refresh=True, **kwargs):
     cmd = ["--quiet"]
     cmd.extend(options)
     cmd.extend(["list", "--upgrades" if _yum() in ("dnf", "dnf5") else "updates"])
-    out = _call_yum(cmd, ignore_retcode=True)
+    out = _call_yum(cmd, cache=True, ignore_retcode=True)
     if out["retcode"] != 0 and "Error:" in out:
         return {}
 
@@ -1160,6 +1168,7 @@ def refresh_db(**kwargs):
     """
     # Remove rtag file to keep multiple refreshes from happening in pkg states
     salt.utils.pkg.clear_rtag(__opts__)
+    salt.utils.pkg.clear_query_cache(__context__)
     retcodes = {
         100: True,
         0: None,
@@ -1790,6 +1799,8 @@ def install(
                 errors.append(out["stdout"])
 
     __context__.pop("pkg.list_pkgs", None)
+    salt.utils.pkg.clear_query_cache(__context__)
+
     new = (
         list_pkgs(versions_as_list=False, attr=diff_attr)
         if not downloadonly
@@ -2041,6 +2052,7 @@ def upgrade(
     cmd.extend(targets)
     result = _call_yum(cmd)
     __context__.pop("pkg.list_pkgs", None)
+    salt.utils.pkg.clear_query_cache(__context__)
     new = list_pkgs(attr=diff_attr)
     ret = salt.utils.data.compare_dicts(old, new)
 
@@ -2174,6 +2186,8 @@ def remove(name=None, pkgs=None, **kwargs):  # pylint: disable=W0613
         errors = []
 
     __context__.pop("pkg.list_pkgs", None)
+    salt.utils.pkg.clear_query_cache(__context__)
+
     new = list_pkgs()
     ret = salt.utils.data.compare_dicts(old, new)
 
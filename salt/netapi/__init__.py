@@ -233,6 +233,20 @@ class NetapiClient:
         with salt.client.get_local_client(mopts=self.opts) as client:
             return client.cmd_batch(*args, **kwargs)
 
+    def local_batch_async(self, *args, **kwargs):
+        """
+        Run :ref:`execution modules <all-salt.modules>` against batches of
+        minions, from the master
+
+        .. versionadded:: 3008.0
+
+        Wraps :py:meth:`salt.client.LocalClient.run_batch_async`
+
+        :return: The jid of the batch and the targeted minions
+        """
+        with salt.client.get_local_client(mopts=self.opts) as client:
+            return client.run_batch_async(*args, **kwargs)
+
     def ssh(self, *args, **kwargs):
         """
         Run salt-ssh commands synchronously
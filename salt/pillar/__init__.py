@@ -3,8 +3,11 @@ Render the pillar data
 """
 
 import collections
+import concurrent.futures
+import contextlib
 import copy
 import fnmatch
+import hashlib
 import logging
 import os
 import sys
@@ -13,17 +16,24 @@ import traceback
 
 import tornado.gen
 
+import salt.cache
 import salt.channel.client
+import salt.client
 import salt.fileclient
 import salt.loader
 import salt.minion
+import salt.template
 import salt.utils.args
 import salt.utils.cache
 import salt.utils.crypt
 import salt.utils.data
 import salt.utils.dictupdate
+import salt.utils.hashutils
+import salt.utils.json
+import salt.utils.rendercache
+import salt.utils.topmatch
 import salt.utils.url
-from salt.exceptions import SaltClientError
+from salt.exceptions import SaltCacheError, SaltClientError
 from salt.template import compile_template
 
 # Even though dictupdate is imported, invoking salt.utils.dictupdate.merge here
@@ -35,6 +45,10 @@ from salt.version import __version__
 
 log = logging.getLogger(__name__)
 
+# The only key of the master's reply to a pillar request which carried the
+# hash of the minion's current pillar
+PILLAR_DELTA_KEY = "__pillar_delta__"
+
 
 def get_pillar(
     opts,
@@ -197,6 +211,42 @@ class RemotePillarMixin:
         log.trace("ext_pillar_extra_data = %s", extra_data)
         return extra_data
 
+    def add_pillar_hash(self, load):
+        """
+        Send the hash of the minion's current pillar with the request, so that
+        the master can reply with only the changes to it
+        """
+        if not self.opts.get("pillar_delta", False):
+            return
+        current = self.opts.get("pillar")
+        if isinstance(current, dict) and current:
+            digest = pillar_hash(current)
+            if digest is not None:
+                load["pillar_hash"] = digest
+
+    def pillar_from_reply(self, ret):
+        """
+        Return the pillar from the master's reply. Returns None if the master
+        replied with changes which do not apply to the current pillar.
+        """
+        if not isinstance(ret, dict) or list(ret) != [PILLAR_DELTA_KEY]:
+            # A master which does not know about pillar deltas
+            return ret
+        reply = ret[PILLAR_DELTA_KEY]
+        current = self.opts.get("pillar") or {}
+        if reply.get("type") == "unchanged":
+            if pillar_hash(current) != reply.get("hash"):
+                return None
+            log.debug("Pillar is unchanged on the master")
+            return copy.deepcopy(current)
+        if reply.get("type") == "delta":
+            new_pillar = apply_pillar_diff(current, reply.get("diff", {}))
+            if new_pillar is None:
+                return None
+            log.debug("Applied pillar changes from the master")
+            return copy.deepcopy(new_pillar)
+        return reply.get("pillar")
+
     def validate_return(self, data):
         if not isinstance(data, dict):
             msg = "Got a bad pillar from master, type {}, expecting dict: {}".format(
@@ -269,9 +319,25 @@ class AsyncRemotePillar(RemotePillarMixin):
             load["clean_cache"] = self.clean_cache
         if self.ext:
             load["ext"] = self.ext
+        self.add_pillar_hash(load)
+        ret = yield self._request_pillar(load)
+        ret_pillar = self.pillar_from_reply(ret)
+        if ret_pillar is None and "pillar_hash" in load:
+            log.debug("Pillar changes do not apply, requesting the full pillar")
+            load.pop("pillar_hash", None)
+            ret = yield self._request_pillar(load)
+            ret_pillar = self.pillar_from_reply(ret)
+        self.validate_return(ret_pillar)
+        raise tornado.gen.Return(ret_pillar)
+
+    @tornado.gen.coroutine
+    def _request_pillar(self, load):
+        """
+        Send the pillar request to the master and return its reply
+        """
         start = time.monotonic()
         try:
-            ret_pillar = yield self.channel.crypted_transfer_decode_dictentry(
+            ret = yield self.channel.crypted_transfer_decode_dictentry(
                 load,
                 dictkey="pillar",
             )
@@ -285,8 +351,7 @@ class AsyncRemotePillar(RemotePillarMixin):
         except Exception:  # pylint: disable=broad-except
             log.exception("Exception getting pillar:")
             raise SaltClientError("Exception getting pillar.")
-        self.validate_return(ret_pillar)
-        raise tornado.gen.Return(ret_pillar)
+        raise tornado.gen.Return(ret)
 
     def destroy(self):
         if self._closing:
@@ -359,10 +424,22 @@ class RemotePillar(RemotePillarMixin):
         }
         if self.ext:
             load["ext"] = self.ext
+        self.add_pillar_hash(load)
+        ret_pillar = self.pillar_from_reply(self._request_pillar(load))
+        if ret_pillar is None and "pillar_hash" in load:
+            log.debug("Pillar changes do not apply, requesting the full pillar")
+            load.pop("pillar_hash", None)
+            ret_pillar = self.pillar_from_reply(self._request_pillar(load))
+        self.validate_return(ret_pillar)
+        return ret_pillar
 
+    def _request_pillar(self, load):
+        """
+        Send the pillar request to the master and return its reply
+        """
         start = time.monotonic()
         try:
-            ret_pillar = self.channel.crypted_transfer_decode_dictentry(
+            return self.channel.crypted_transfer_decode_dictentry(
                 load,
                 dictkey="pillar",
             )
@@ -376,8 +453,6 @@ class RemotePillar(RemotePillarMixin):
         except Exception:  # pylint: disable=broad-except
             log.exception("Exception getting pillar:")
             raise SaltClientError("Exception getting pillar.")
-        self.validate_return(ret_pillar)
-        return ret_pillar
 
     def destroy(self):
         if hasattr(self, "_closing") and self._closing:
@@ -393,6 +468,241 @@ class RemotePillar(RemotePillarMixin):
     # pylint: enable=W1701
 
 
+def _pillar_cache_bank(minion_id=None):
+    """
+    Return the salt.cache bank holding the cached pillars of a minion, or of
+    all minions
+    """
+    if minion_id is None:
+        return "compiled_pillar"
+    return f"compiled_pillar/{minion_id}"
+
+
+def flush_pillar_cache(opts, minion_id=None):
+    """
+    Remove the pillars cached by the ``salt_cache`` pillar cache backend for
+    the specified minion, or for all minions. Returns False if the
+    ``salt_cache`` backend is not in use.
+    """
+    if not opts.get("pillar_cache") or opts.get("pillar_cache_backend") != "salt_cache":
+        return False
+    log.debug(
+        "Flushing cached pillar for %s",
+        "all minions" if minion_id is None else f"minion {minion_id}",
+    )
+    salt.cache.factory(opts).flush(_pillar_cache_bank(minion_id))
+    return True
+
+
+def _hashable_pillar(pillar):
+    """
+    Return the pillar without the internal keys the minion's scheduler adds to
+    the pillar schedule items
+    """
+    schedule = pillar.get("schedule")
+    if not isinstance(schedule, dict):
+        return pillar
+    return dict(
+        pillar,
+        schedule={
+            name: (
+                {key: val for key, val in item.items() if not str(key).startswith("_")}
+                if isinstance(item, dict)
+                else item
+            )
+            for name, item in schedule.items()
+        },
+    )
+
+
+def pillar_hash(pillar):
+    """
+    Return a hash of the compiled pillar data, used to check that a pillar diff
+    from the master applies to the pillar the minion has. Returns None if the
+    pillar cannot be hashed.
+    """
+    try:
+        serialized = salt.utils.json.dumps(
+            _hashable_pillar(pillar or {}), sort_keys=True, default=repr
+        )
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def _dict_diff(old, new):
+    """
+    Return the changes between two dicts. Values which are dicts on both sides
+    are diffed recursively, other changed values are replaced whole.
+    """
+    diff = {"set": {}, "unset": [key for key in old if key not in new], "update": {}}
+    for key, val in new.items():
+        if key in old and old[key] == val:
+            continue
+        if key in old and isinstance(old[key], dict) and isinstance(val, dict):
+            diff["update"][key] = _dict_diff(old[key], val)
+        else:
+            diff["set"][key] = val
+    return diff
+
+
+def _apply_dict_diff(data, diff):
+    """
+    Return a copy of ``data`` with the changes from :py:func:`_dict_diff`
+    applied
+    """
+    data = dict(data)
+    for key in diff.get("unset", []):
+        data.pop(key, None)
+    for key, subdiff in diff.get("update", {}).items():
+        current = data.get(key)
+        data[key] = _apply_dict_diff(
+            current if isinstance(current, dict) else {}, subdiff
+        )
+    data.update(diff.get("set", {}))
+    return data
+
+
+def pillar_diff(old, new):
+    """
+    Return the changes between two compiled pillars, along with the hashes of
+    both pillars
+    """
+    diff = _dict_diff(old, new)
+    diff["base"] = pillar_hash(old)
+    diff["hash"] = pillar_hash(new)
+    return diff
+
+
+def pillar_delta_reply(pillar, minion_hash, base=None):
+    """
+    Return the master's reply to a pillar request from a minion whose current
+    pillar has the hash ``minion_hash``. ``base`` is the pillar the minion has,
+    if the master still has it. The reply says that the pillar is unchanged, or
+    holds the changes to the minion's pillar, or the full pillar.
+    """
+    digest = pillar_hash(pillar)
+    if digest is not None and digest == minion_hash:
+        reply = {"type": "unchanged", "hash": digest}
+    elif base is not None:
+        reply = {"type": "delta", "diff": pillar_diff(base, pillar)}
+    else:
+        reply = {"type": "full", "pillar": pillar}
+    reply["version"] = 1
+    return {PILLAR_DELTA_KEY: reply}
+
+
+def apply_pillar_diff(pillar, diff):
+    """
+    Return a copy of the pillar with the changes from :py:func:`pillar_diff`
+    applied, or None if the diff was not made against this pillar
+    """
+    base = pillar_hash(pillar)
+    if base is None or base != diff.get("base"):
+        return None
+    new_pillar = _apply_dict_diff(pillar, diff)
+    if pillar_hash(new_pillar) != diff.get("hash"):
+        return None
+    return new_pillar
+
+
+def _file_hash(path):
+    """
+    Return the sha256 of a file the pillar was rendered from, or None if it can
+    no longer be read
+    """
+    try:
+        return salt.utils.hashutils.get_hash(path, "sha256")
+    except OSError:
+        return None
+
+
+def find_changed_pillars(opts, changed_ext_pillars=(), cache=None):
+    """
+    Return the IDs of the minions whose pillar was compiled from a file which
+    has since changed, or used one of the ext_pillars in
+    ``changed_ext_pillars``. Only minions whose dependencies were recorded,
+    when ``pillar_push`` is enabled, are considered.
+    """
+    if cache is None:
+        cache = salt.cache.factory(opts)
+    changed_ext_pillars = set(changed_ext_pillars)
+    hashes = {}
+
+    def _changed(path, digest):
+        if path not in hashes:
+            hashes[path] = _file_hash(path)
+        return hashes[path] != digest
+
+    changed = []
+    for minion_id in cache.list("minions"):
+        deps = cache.fetch(f"minions/{minion_id}", "pillar_deps")
+        if not deps:
+            continue
+        if changed_ext_pillars.intersection(deps.get("ext_pillar", [])) or any(
+            _changed(path, digest) for path, digest in deps.get("files", {}).items()
+        ):
+            changed.append(minion_id)
+    return changed
+
+
+def push_pillar_changes(opts, changed_ext_pillars=(), local=None):
+    """
+    Recompile the pillar of the minions whose pillar dependencies have changed,
+    and tell the minions whose pillar did change to refresh it. Minions whose
+    pillar did not actually change are not contacted.
+
+    Only a :py:func:`saltutil.refresh_pillar
+    <salt.modules.saltutil.refresh_pillar>` job is published, so no pillar data
+    goes out on the publish channel. The minions then fetch their pillar, or the
+    changes to it when ``pillar_delta`` is enabled, through the usual encrypted
+    pillar request.
+
+    Returns a list of the IDs of the notified minions.
+    """
+    if not opts.get("pillar_push", False) or not opts.get("minion_data_cache"):
+        return []
+    cache = salt.cache.factory(opts)
+    ret = []
+    for minion_id in find_changed_pillars(opts, changed_ext_pillars, cache=cache):
+        bank = f"minions/{minion_id}"
+        data = cache.fetch(bank, "data") or {}
+        deps = cache.fetch(bank, "pillar_deps") or {}
+        if not data.get("grains"):
+            continue
+        pillar = get_pillar(
+            opts,
+            data["grains"],
+            minion_id,
+            deps.get("saltenv"),
+            pillarenv=deps.get("pillarenv"),
+            extra_minion_data=deps.get("extra_minion_data"),
+            clean_cache=True,
+        )
+        try:
+            new_pillar = pillar.compile_pillar()
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Failed to recompile pillar for minion %s", minion_id)
+            continue
+        cache.store(bank, "data", {"grains": data["grains"], "pillar": new_pillar})
+        if pillar.dependencies is not None:
+            deps.update(pillar.dependencies)
+            cache.store(bank, "pillar_deps", deps)
+        if (data.get("pillar") or {}) == new_pillar:
+            log.debug("Pillar for minion %s is unchanged", minion_id)
+            continue
+        log.debug("Notifying minion %s of pillar changes", minion_id)
+        if local is None:
+            local = salt.client.get_local_client(mopts=opts)
+        # The pillar cache was refreshed above, so the minion's request does
+        # not need to compile the pillar again
+        local.cmd_async(
+            minion_id, "saltutil.refresh_pillar", kwarg={"clean_cache": False}
+        )
+        ret.append(minion_id)
+    return ret
+
+
 class PillarCache:
     """
     Return a cached pillar if it exists, otherwise cache it.
@@ -435,6 +745,8 @@ class PillarCache:
         self.pillarenv = pillarenv
         self.clean_cache = clean_cache
         self.extra_minion_data = extra_minion_data
+        # The dependencies of the last pillar compiled, None on a cache hit
+        self.dependencies = None
 
         if saltenv is None:
             self.saltenv = "base"
@@ -442,11 +754,16 @@ class PillarCache:
             self.saltenv = saltenv
 
         # Determine caching backend
-        self.cache = salt.utils.cache.CacheFactory.factory(
-            self.opts["pillar_cache_backend"],
-            self.opts["pillar_cache_ttl"],
-            minion_cache_path=self._minion_cache_path(minion_id),
-        )
+        if self.opts["pillar_cache_backend"] == "salt_cache":
+            # Each pillarenv is stored separately, in the configured salt.cache
+            # driver, so that it can be shared between processes and masters
+            self.cache = salt.cache.factory(self.opts)
+        else:
+            self.cache = salt.utils.cache.CacheFactory.factory(
+                self.opts["pillar_cache_backend"],
+                self.opts["pillar_cache_ttl"],
+                minion_cache_path=self._minion_cache_path(minion_id),
+            )
 
     def _minion_cache_path(self, minion_id):
         """
@@ -473,19 +790,92 @@ class PillarCache:
             pillarenv=self.pillarenv,
             extra_minion_data=self.extra_minion_data,
         )
-        return fresh_pillar.compile_pillar()
+        ret = fresh_pillar.compile_pillar()
+        self.dependencies = fresh_pillar.dependencies
+        return ret
 
     def clear_pillar(self):
         """
         Clear the cache
         """
-        self.cache.clear()
+        if self.opts["pillar_cache_backend"] == "salt_cache":
+            self.cache.flush(_pillar_cache_bank(self.minion_id))
+        else:
+            self.cache.clear()
 
         return True
 
+    def _salt_cache_key(self):
+        """
+        Return the key of the cached pillar for the pillarenv in the minion's
+        bank, when using the salt_cache backend
+        """
+        return "__none__" if self.pillarenv is None else str(self.pillarenv)
+
+    def get_cached_pillar(self):
+        """
+        Return the cached pillar for the minion and pillarenv when using the
+        salt_cache backend, or None if it is missing or has expired
+        """
+        bank = _pillar_cache_bank(self.minion_id)
+        key = self._salt_cache_key()
+        try:
+            updated = self.cache.updated(bank, key)
+            if updated is None:
+                return None
+            if time.time() - updated > self.opts["pillar_cache_ttl"]:
+                log.debug(
+                    "Cached pillar for minion %s and pillarenv %s has expired",
+                    self.minion_id,
+                    self.pillarenv,
+                )
+                return None
+            cached = self.cache.fetch(bank, key)
+        except SaltCacheError as exc:
+            log.error(
+                "Failed to fetch cached pillar for minion %s: %s", self.minion_id, exc
+            )
+            return None
+        if not isinstance(cached, dict) or "pillar" not in cached:
+            return None
+        return cached["pillar"]
+
+    def _compile_pillar_salt_cache(self):
+        """
+        Return the pillar from the salt_cache backend, compiling and storing it
+        on a cache miss
+        """
+        cached = self.get_cached_pillar()
+        if cached is not None:
+            log.debug(
+                "Pillar cache hit for minion %s and pillarenv %s",
+                self.minion_id,
+                self.pillarenv,
+            )
+            return cached
+        log.debug(
+            "Pillar cache miss for minion %s and pillarenv %s",
+            self.minion_id,
+            self.pillarenv,
+        )
+        fresh_pillar = self.fetch_pillar()
+        try:
+            self.cache.store(
+                _pillar_cache_bank(self.minion_id),
+                self._salt_cache_key(),
+                {"pillar": fresh_pillar},
+            )
+        except SaltCacheError as exc:
+            log.error(
+                "Failed to store cached pillar for minion %s: %s", self.minion_id, exc
+            )
+        return fresh_pillar
+
     def compile_pillar(self, *args, **kwargs):  # Will likely just be pillar_dirs
         if self.clean_cache:
             self.clear_pillar()
+        if self.opts["pillar_cache_backend"] == "salt_cache":
+            return self._compile_pillar_salt_cache()
         log.debug(
             "Scanning pillar cache for information about minion %s and pillarenv %s",
             self.minion_id,
@@ -547,6 +937,7 @@ class Pillar:
         pillar_override=None,
         pillarenv=None,
         extra_minion_data=None,
+        client=None,
     ):
         self.minion_id = minion_id
         self.ext = ext
@@ -556,7 +947,9 @@ class Pillar:
         # use the local file client
         self.opts = self.__gen_opts(opts, grains, saltenv=saltenv, pillarenv=pillarenv)
         self.saltenv = saltenv
-        self.client = salt.fileclient.get_file_client(self.opts, True)
+        if client is None:
+            client = salt.fileclient.get_file_client(self.opts, True)
+        self.client = client
         self.fileclient = salt.fileclient.get_file_client(self.opts, False)
         self.avail = self.__gather_avail()
 
@@ -606,6 +999,24 @@ class Pillar:
         if not isinstance(self.extra_minion_data, dict):
             self.extra_minion_data = {}
             log.error("Extra minion data must be a dictionary")
+        self.render_cache = None
+        if self.opts.get("pillar_render_cache", False) and isinstance(
+            self.client, salt.fileclient.PillarClient
+        ):
+            self.render_cache = salt.utils.rendercache.get_render_cache(
+                "pillar", self.opts.get("pillar_render_cache_size", 1000)
+            )
+        self._roots_fingerprints = {}
+        # The files and ext_pillars the last compiled pillar was built from.
+        # They are only needed to push pillar changes, so they are not
+        # recorded otherwise.
+        self._track_dependencies = bool(
+            self.opts.get("pillar_push", False)
+            and self.opts.get("minion_data_cache", False)
+        )
+        self.dependencies = None
+        if self._track_dependencies:
+            self.dependencies = {"files": {}, "ext_pillar": []}
         self._closing = False
 
     def __valid_on_demand_ext_pillar(self, opts):
@@ -742,17 +1153,8 @@ class Pillar:
             for saltenv in saltenvs:
                 top = self.client.cache_file(self.opts["state_top"], saltenv)
                 if top:
-                    tops[saltenv].append(
-                        compile_template(
-                            top,
-                            self.rend,
-                            self.opts["renderer"],
-                            self.opts["renderer_blacklist"],
-                            self.opts["renderer_whitelist"],
-                            saltenv=saltenv,
-                            _pillar_rend=True,
-                        )
-                    )
+                    self._add_dependency(top)
+                    tops[saltenv].append(self._render_top(top, saltenv))
         except Exception as exc:  # pylint: disable=broad-except
             errors.append(f"Rendering Primary Top file failed, render error:\n{exc}")
             log.exception("Pillar rendering failed for minion %s", self.minion_id)
@@ -776,17 +1178,9 @@ class Pillar:
                     if sls in done[saltenv]:
                         continue
                     try:
-                        tops[saltenv].append(
-                            compile_template(
-                                self.client.get_state(sls, saltenv).get("dest", False),
-                                self.rend,
-                                self.opts["renderer"],
-                                self.opts["renderer_blacklist"],
-                                self.opts["renderer_whitelist"],
-                                saltenv=saltenv,
-                                _pillar_rend=True,
-                            )
-                        )
+                        fn_ = self.client.get_state(sls, saltenv).get("dest", False)
+                        self._add_dependency(fn_)
+                        tops[saltenv].append(self._render_top(fn_, saltenv))
                     except Exception as exc:  # pylint: disable=broad-except
                         errors.append(
                             "Rendering Top file {} failed, render error:\n{}".format(
@@ -800,6 +1194,26 @@ class Pillar:
 
         return tops, errors
 
+    def _render_top(self, fn_, saltenv):
+        """
+        Render a top file, reusing a previous render from the render cache
+        when possible
+        """
+        if fn_ and self.render_cache is not None:
+            top, rendered = self._render_cached(fn_, saltenv, "", {})
+            if rendered:
+                return top
+        with self._record_templates():
+            return compile_template(
+                fn_,
+                self.rend,
+                self.opts["renderer"],
+                self.opts["renderer_blacklist"],
+                self.opts["renderer_whitelist"],
+                saltenv=saltenv,
+                _pillar_rend=True,
+            )
+
     def merge_tops(self, tops):
         """
         Cleanly merge the top files
@@ -879,12 +1293,17 @@ class Pillar:
         matches = {}
         if reload:
             self.matchers = salt.loader.matchers(self.opts)
+        confirm_top = self.matchers["confirm_top.confirm_top"]
+        if self.opts.get("top_match_cache", False):
+            confirm_top = salt.utils.topmatch.TopMatcher(
+                self.opts, confirm_top, self.opts.get("top_match_cache_size", 10000)
+            )
         for saltenv, body in top.items():
             if self.opts["pillarenv"]:
                 if saltenv != self.opts["pillarenv"]:
                     continue
             for match, data in body.items():
-                if self.matchers["confirm_top.confirm_top"](
+                if confirm_top(
                     match,
                     data,
                     self.opts.get("nodegroups", {}),
@@ -898,6 +1317,131 @@ class Pillar:
                             env_matches.append(item)
         return matches
 
+    def _get_render_cache_key(self, fn_, saltenv, sls, defaults):
+        """
+        Return the key under which the rendered SLS file is cached, or None if
+        it is rendered with a renderer whose output cannot be cached
+        """
+        render_pipe = salt.template.template_shebang(
+            fn_,
+            self.rend,
+            self.opts["renderer"],
+            self.opts["renderer_blacklist"],
+            self.opts["renderer_whitelist"],
+            "",
+        )
+        if not render_pipe:
+            return None
+        for render, _ in render_pipe:
+            name = render.__module__.split(".")[-1]
+            if name not in salt.utils.rendercache.CACHEABLE_RENDERERS:
+                log.trace(
+                    "Not caching SLS '%s', the '%s' renderer is not cacheable",
+                    sls or fn_,
+                    name,
+                )
+                return None
+        if saltenv not in self._roots_fingerprints:
+            self._roots_fingerprints[saltenv] = self.client.get_roots_fingerprint(
+                saltenv
+            )
+        return (
+            saltenv,
+            sls,
+            fn_,
+            salt.utils.hashutils.get_hash(fn_, form="sha256"),
+            self._roots_fingerprints[saltenv],
+            repr([(argline, render.__module__) for render, argline in render_pipe]),
+            repr(sorted(defaults.items())),
+        )
+
+    def _render_cached(self, fn_, saltenv, sls, defaults):
+        """
+        Render the SLS file, reusing the result of a previous render which
+        read the same grains, pillar and opts values, if there is one
+        """
+        cache_key = self._get_render_cache_key(fn_, saltenv, sls, defaults)
+        if cache_key is None:
+            return None, False
+        grains = self.opts.get("grains", {})
+        pillar = self.opts.get("pillar", {})
+        cached = self.render_cache.get(
+            cache_key, {"grains": grains, "pillar": pillar, "opts": self.opts}
+        )
+        if cached is not None:
+            log.debug(
+                "Using cached render of SLS '%s' in env '%s'", sls or fn_, saltenv
+            )
+            state, templates = cached
+            if templates is not None or self.dependencies is None:
+                for path in templates or ():
+                    self._add_dependency(path)
+                return state, True
+            # The templates were not recorded when this render was cached,
+            # so render again to record them
+        inputs = salt.utils.rendercache.RenderInputs()
+        context = {
+            "grains": inputs.track("grains", grains),
+            "pillar": inputs.track("pillar", pillar),
+            "opts": inputs.track("opts", self.opts),
+            "salt": inputs.untracked("salt", self.functions),
+        }
+        with self._record_templates() as templates:
+            state = compile_template(
+                fn_,
+                self.rend,
+                self.opts["renderer"],
+                self.opts["renderer_blacklist"],
+                self.opts["renderer_whitelist"],
+                saltenv,
+                sls,
+                context=context,
+                _pillar_rend=True,
+                **defaults,
+            )
+        # The templates the render loaded are kept with it, so that they are
+        # still recorded as dependencies when the render is reused
+        if self.dependencies is not None:
+            templates = sorted(templates)
+        else:
+            templates = None
+        self.render_cache.set(cache_key, inputs, (state, templates))
+        return state, True
+
+    def _add_dependency(self, path):
+        """
+        Record a file the pillar is compiled from, along with the hash of its
+        contents, so that changes to it can be detected
+        """
+        if self.dependencies is None:
+            return
+        if path and path not in self.dependencies["files"]:
+            self.dependencies["files"][path] = _file_hash(path)
+
+    @contextlib.contextmanager
+    def _record_templates(self):
+        """
+        Record the templates loaded from the file client while rendering, such
+        as the files imported or included by a Jinja template, as dependencies.
+        Yields a set which holds their paths once the context exits.
+        """
+        templates = set()
+        if self.dependencies is None or not isinstance(
+            self.client, salt.fileclient.Client
+        ):
+            yield templates
+            return
+        with self.client.record_fetches() as fetched:
+            try:
+                yield templates
+            finally:
+                for path, saltenv in sorted(fetched):
+                    # Returns the path of the file on the master
+                    dest = self.client.get_file(path, saltenv=saltenv)
+                    if dest:
+                        templates.add(dest)
+                        self._add_dependency(dest)
+
     def render_pstate(self, sls, saltenv, mods, defaults=None):
         """
         Collect a single pillar sls file and render it
@@ -945,19 +1489,25 @@ class Pillar:
                 log.debug(msg)
                 # return state, mods, errors
                 return None, mods, errors
+        self._add_dependency(fn_)
         state = None
         try:
-            state = compile_template(
-                fn_,
-                self.rend,
-                self.opts["renderer"],
-                self.opts["renderer_blacklist"],
-                self.opts["renderer_whitelist"],
-                saltenv,
-                sls,
-                _pillar_rend=True,
-                **defaults,
-            )
+            rendered = False
+            if self.render_cache is not None:
+                state, rendered = self._render_cached(fn_, saltenv, sls, defaults)
+            if not rendered:
+                with self._record_templates():
+                    state = compile_template(
+                        fn_,
+                        self.rend,
+                        self.opts["renderer"],
+                        self.opts["renderer_blacklist"],
+                        self.opts["renderer_whitelist"],
+                        saltenv,
+                        sls,
+                        _pillar_rend=True,
+                        **defaults,
+                    )
         except Exception as exc:  # pylint: disable=broad-except
             msg = f"Rendering SLS '{sls}' failed, render error:\n{exc}"
             log.critical(msg, exc_info=True)
@@ -1161,6 +1711,46 @@ class Pillar:
                 ext = self.ext_pillars[key](self.minion_id, pillar, val)
         return ext
 
+    def _timed_external_pillar_data(self, pillar, val, key):
+        """
+        Call _external_pillar_data and log how long the ext_pillar took
+        """
+        start = time.time()
+        try:
+            return self._external_pillar_data(pillar, val, key)
+        finally:
+            log.debug(
+                "ext_pillar '%s' for minion '%s' took %.3f seconds",
+                key,
+                self.minion_id,
+                time.time() - start,
+            )
+
+    def _submit_independent_ext_pillars(self, executor, pillar):
+        """
+        Start the ext_pillars declared in ext_pillar_independent. They do not
+        use the data from the ext_pillars which come before them, so they are
+        all passed the pillar data from before any ext_pillar was run.
+
+        Returns a dict mapping the position of each started ext_pillar in the
+        ext_pillar config, and its name, to its future.
+        """
+        independent = self.opts.get("ext_pillar_independent") or []
+        futures = {}
+        for idx, run in enumerate(self.opts["ext_pillar"]):
+            if not isinstance(run, dict):
+                # Reported when the ext_pillar is reached
+                break
+            if next(iter(run.keys())) in self.opts.get("exclude_ext_pillar", []):
+                continue
+            for key, val in run.items():
+                if key not in independent or key not in self.ext_pillars:
+                    continue
+                futures[(idx, key)] = executor.submit(
+                    self._timed_external_pillar_data, copy.deepcopy(pillar), val, key
+                )
+        return futures
+
     def ext_pillar(self, pillar, errors=None):
         """
         Render the external pillar data
@@ -1193,7 +1783,6 @@ class Pillar:
             errors.append('The "ext_pillar" option is malformed')
             log.critical(errors[-1])
             return pillar, errors
-        ext = None
         # Bring in CLI pillar data
         if self.pillar_override:
             pillar = merge(
@@ -1204,7 +1793,23 @@ class Pillar:
                 self.opts.get("pillar_merge_lists", False),
             )
 
-        for run in self.opts["ext_pillar"]:
+        workers = self.opts.get("ext_pillar_workers", 1)
+        if workers > 1 and self.opts.get("ext_pillar_independent"):
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="ext_pillar"
+            ) as executor:
+                futures = self._submit_independent_ext_pillars(executor, pillar)
+                return self._merge_ext_pillars(pillar, errors, futures)
+        return self._merge_ext_pillars(pillar, errors, {})
+
+    def _merge_ext_pillars(self, pillar, errors, futures):
+        """
+        Run the ext_pillars in order, merging their data into the pillar. The
+        ext_pillars which were already started in ``futures`` are waited for
+        instead of being run.
+        """
+        ext = None
+        for idx, run in enumerate(self.opts["ext_pillar"]):
             if not isinstance(run, dict):
                 errors.append('The "ext_pillar" option is malformed')
                 log.critical(errors[-1])
@@ -1219,8 +1824,16 @@ class Pillar:
                         key,
                     )
                     continue
+                if (
+                    self.dependencies is not None
+                    and key not in self.dependencies["ext_pillar"]
+                ):
+                    self.dependencies["ext_pillar"].append(key)
                 try:
-                    ext = self._external_pillar_data(pillar, val, key)
+                    if (idx, key) in futures:
+                        ext = futures[(idx, key)].result()
+                    else:
+                        ext = self._timed_external_pillar_data(pillar, val, key)
                 except Exception as exc:  # pylint: disable=broad-except
                     errors.append(
                         "Failed to load ext_pillar {}: {}".format(
@@ -1248,11 +1861,15 @@ class Pillar:
         """
         Render the pillar data and return
         """
+        if self._track_dependencies:
+            self.dependencies = {"files": {}, "ext_pillar": []}
         top, top_errors = self.get_top()
         if ext:
             if self.opts.get("ext_pillar_first", False):
                 self.opts["pillar"], errors = self.ext_pillar(self.pillar_override)
-                self.rend = salt.loader.render(self.opts, self.functions)
+                self.rend = salt.loader.render(
+                    self.opts, self.functions, self.client, file_client=self.client
+                )
                 matches = self.top_matches(top, reload=True)
                 pillar, errors = self.render_pillar(matches, errors=errors)
                 pillar = merge(
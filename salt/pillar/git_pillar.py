@@ -390,7 +390,9 @@ Setting ``fallback`` per-remote or global configuration parameter will map non-e
 
 import copy
 import logging
+from collections import OrderedDict
 
+import salt.fileclient
 import salt.utils.dictupdate
 import salt.utils.gitfs
 import salt.utils.stringutils
@@ -446,11 +448,28 @@ def ext_pillar(minion_id, pillar, *repos):  # pylint: disable=unused-argument
         # If masterless, fetch the remotes. We'll need to remove this once
         # we make the minion daemon able to run standalone.
         git_pillar.fetch_remotes()
-    git_pillar.checkout()
+    if __opts__.get("git_pillar_checkout", True):
+        git_pillar.checkout()
+        pillar_dirs = git_pillar.pillar_dirs
+        mounted_dirs = git_pillar.pillar_linked_dirs
+        client = None
+    else:
+        # Render straight from the git tree objects, no checkout is done
+        git_pillar.load_trees()
+        pillar_dirs = OrderedDict(
+            (pillar_root, env)
+            for pillar_root, (_, _, _, env) in git_pillar.pillar_trees.items()
+        )
+        mounted_dirs = [
+            pillar_root
+            for pillar_root, (_, _, mountpoint, _) in git_pillar.pillar_trees.items()
+            if mountpoint
+        ]
+        client = salt.fileclient.GitPillarClient(opts, git_pillar.pillar_trees)
     ret = {}
     merge_strategy = __opts__.get("pillar_source_merging_strategy", "smart")
     merge_lists = __opts__.get("pillar_merge_lists", False)
-    for pillar_dir, env in git_pillar.pillar_dirs.items():
+    for pillar_dir, env in pillar_dirs.items():
         # Map env if env == '__env__' before checking the env value
         if env == "__env__":
             env = (
@@ -469,7 +488,7 @@ def ext_pillar(minion_id, pillar, *repos):  # pylint: disable=unused-argument
                 opts["pillarenv"],
             )
             continue
-        if pillar_dir in git_pillar.pillar_linked_dirs:
+        if pillar_dir in mounted_dirs:
             log.debug(
                 "git_pillar is skipping processing on %s as it is a mounted repo",
                 pillar_dir,
@@ -491,16 +510,12 @@ def ext_pillar(minion_id, pillar, *repos):  # pylint: disable=unused-argument
             # list, so that its top file is sourced from the correct
             # location and not from another git_pillar remote.
             pillar_roots.extend(
-                [
-                    d
-                    for (d, e) in git_pillar.pillar_dirs.items()
-                    if env == e and d != pillar_dir
-                ]
+                [d for (d, e) in pillar_dirs.items() if env == e and d != pillar_dir]
             )
 
         opts["pillar_roots"] = {env: pillar_roots}
 
-        local_pillar = Pillar(opts, __grains__, minion_id, env)
+        local_pillar = Pillar(opts, __grains__, minion_id, env, client=client)
         ret = salt.utils.dictupdate.merge(
             ret,
             local_pillar.compile_pillar(ext=False),
@@ -14,6 +14,7 @@ import salt.pillar.git_pillar
 import salt.runners.winrepo
 import salt.utils.args
 import salt.utils.gitfs
+import salt.utils.grainstore
 import salt.utils.master
 from salt.exceptions import SaltInvocationError
 from salt.fileserver import clear_lock as _clear_lock
@@ -113,6 +114,80 @@ def mine(tgt=None, tgt_type="glob", **kwargs):
     return cached_mine
 
 
+def query(group_by=None, where=None, count=False):
+    """
+    .. versionadded:: 3008.0
+
+    Query the grains store of the master, which keeps the grains listed in the
+    :conf_master:`grains_store_paths` master option for all minions. This does
+    not need to load the cached grains of each minion, so it is much faster
+    than :py:func:`cache.grains <salt.runners.cache.grains>` for fleet-wide
+    questions.
+
+    group_by
+        A grain, or a comma-separated list of grains, to count the minions by.
+        The counts are nested for each additional grain. Minions which do not
+        have all of the grains are not counted.
+
+    where
+        Filters which the minions must match, as ``grain:pattern``, in a list
+        or comma-separated. The patterns are globs, which are matched
+        case-insensitively, and match a list grain if any of its items match.
+
+    count : False
+        When not grouping, return the number of matching minions instead of
+        their IDs.
+
+    CLI Examples:
+
+    .. code-block:: bash
+
+        salt-run cache.query group_by=osfinalname
+        salt-run cache.query group_by=os,osrelease where=kernel:Linux
+        salt-run cache.query where=kernelrelease:5.15*
+        salt-run cache.query where=os:Ubuntu,osrelease:22.* count=True
+    """
+    if not salt.utils.grainstore.enabled(__opts__):
+        raise SaltInvocationError(
+            "The grains store is not enabled, it requires minion_data_cache and"
+            " grains_store_paths to be set"
+        )
+    with salt.utils.grainstore.GrainStore(__opts__) as store:
+        return store.query(group_by=group_by, where=where, count=count)
+
+
+def rebuild_grains_store():
+    """
+    .. versionadded:: 3008.0
+
+    Rebuild the grains store of the master from the minion data cache. This
+    fills the store after :conf_master:`grains_store_paths` is changed, rather
+    than waiting for the minions to refresh their grains.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt-run cache.rebuild_grains_store
+    """
+    if not salt.utils.grainstore.enabled(__opts__):
+        raise SaltInvocationError(
+            "The grains store is not enabled, it requires minion_data_cache and"
+            " grains_store_paths to be set"
+        )
+    cache = salt.cache.factory(__opts__)
+
+    def _minion_grains():
+        for minion_id in cache.list("minions"):
+            mdata = cache.fetch(f"minions/{minion_id}", "data")
+            if isinstance(mdata, dict) and "grains" in mdata:
+                yield minion_id, mdata["grains"]
+
+    with salt.utils.grainstore.GrainStore(__opts__) as store:
+        store.rebuild(_minion_grains())
+        return len(store.minions())
+
+
 def _clear_cache(
     tgt=None,
     tgt_type="glob",
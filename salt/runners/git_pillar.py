@@ -96,6 +96,9 @@ def update(branch=None, repo=None):
                 remote.clear_lock()
             ret[remote.id] = result
 
+    if any(ret.values()):
+        salt.pillar.flush_pillar_cache(__opts__)
+        salt.pillar.push_pillar_changes(__opts__, changed_ext_pillars=["git"])
     if not ret:
         if branch is not None or repo is not None:
             raise SaltRunnerError(
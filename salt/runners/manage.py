@@ -20,6 +20,7 @@ import salt.utils.compat
 import salt.utils.files
 import salt.utils.minions
 import salt.utils.path
+import salt.utils.presence
 import salt.utils.versions
 import salt.version
 import salt.wheel
@@ -65,6 +66,20 @@ def _ping(tgt, tgt_type, timeout, gather_job_timeout):
         return returned, not_returned
 
 
+def _presence(tgt, tgt_type):
+    """
+    Return the targeted minions which are connected and the ones which are
+    not, from the presence table
+    """
+    ckminions = salt.utils.minions.CkMinions(__opts__)
+    minions = ckminions.check_minions(tgt, tgt_type)["minions"]
+    connected = ckminions.connected_ids(subset=minions)
+    return (
+        sorted(minion for minion in minions if minion in connected),
+        sorted(minion for minion in minions if minion not in connected),
+    )
+
+
 def status(
     output=True, tgt="*", tgt_type="glob", timeout=None, gather_job_timeout=None
 ):
@@ -74,6 +89,11 @@ def status(
         The ``expr_form`` argument has been renamed to ``tgt_type``, earlier
         releases must use ``expr_form``.
 
+    .. versionchanged:: 3008.0
+
+        When the :conf_master:`presence_table` is enabled, the minions which
+        are connected to the master are up, and no ``test.ping`` is sent.
+
     Print the status of all known salt minions
 
     CLI Example:
@@ -86,6 +106,10 @@ def status(
     """
     ret = {}
 
+    if salt.utils.presence.enabled(__opts__):
+        ret["up"], ret["down"] = _presence(tgt, tgt_type)
+        return ret
+
     if not timeout:
         timeout = __opts__["timeout"]
     if not gather_job_timeout:
@@ -141,6 +141,9 @@ def clear_pillar_cache(minion="*", **kwargs):
         )
         pillar.clear_pillar()
 
+        if __opts__.get("pillar_cache_backend") == "salt_cache":
+            # The minion's bank was flushed, so nothing is left in the cache
+            continue
         if __opts__.get("pillar_cache_backend") == "memory":
             _pillar_cache = pillar.cache
         else:
@@ -192,6 +195,11 @@ def show_pillar_cache(minion="*", **kwargs):
             __opts__, grains, id_, saltenv, pillarenv=pillarenv
         )
 
+        if __opts__.get("pillar_cache_backend") == "salt_cache":
+            cached = pillar.get_cached_pillar()
+            if cached:
+                pillar_cache[tgt] = cached
+            continue
         if __opts__.get("pillar_cache_backend") == "memory":
             _pillar_cache = pillar.cache
         else:
@@ -19,6 +19,8 @@ import fnmatch
 import importlib
 import inspect
 import logging
+import multiprocessing
+import multiprocessing.connection
 import os
 import pickle
 import random
@@ -35,6 +37,7 @@ import salt.channel.client
 import salt.fileclient
 import salt.loader
 import salt.minion
+import salt.payload
 import salt.pillar
 import salt.syspaths as syspaths
 import salt.utils.args
@@ -47,18 +50,21 @@ import salt.utils.files
 import salt.utils.hashutils
 import salt.utils.immutabletypes as immutabletypes
 import salt.utils.jid
+import salt.utils.json
 import salt.utils.msgpack
 import salt.utils.platform
 import salt.utils.process
+import salt.utils.rendercache
+import salt.utils.topmatch
 import salt.utils.url
 import salt.utils.verify
+import salt.version
 
 # Explicit late import to avoid circular import. DO NOT MOVE THIS.
 import salt.utils.yamlloader as yamlloader
 from salt.exceptions import CommandExecutionError, SaltRenderError, SaltReqTimeoutError
 from salt.serializers.msgpack import deserialize as msgpack_deserialize
-from salt.serializers.msgpack import serialize as msgpack_serialize
-from salt.template import compile_template, compile_template_str
+from salt.template import compile_template, compile_template_str, template_shebang
 from salt.utils.odict import DefaultOrderedDict, HashableOrderedDict
 from salt.utils.requisite import DependencyGraph, RequisiteType
 
@@ -132,6 +138,30 @@ STATE_INTERNAL_KEYWORDS = STATE_REQUISITE_KEYWORDS.union(
     STATE_REQUISITE_IN_KEYWORDS
 ).union(STATE_RUNTIME_KEYWORDS)
 
+# The state modules whose states are never run concurrently with each other
+# when state_concurrency is set, as their functions take a system wide lock
+STATE_CONCURRENCY_EXCLUSIVE = frozenset(
+    ("pkg", "pkgrepo", "pip", "gem", "npm", "ports", "chocolatey", "winrepo")
+)
+
+# The options which are part of the key of a compiled highstate through other
+# means, all of the others are part of it as they are
+_COMPILED_CACHE_SKIP_OPTS = frozenset(("grains", "pillar"))
+
+
+def _compiled_key_default(obj):
+    """
+    Serialize the values in the key of a compiled highstate which JSON does
+    not support
+    """
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=repr)
+    if isinstance(obj, bytes):
+        return repr(obj)
+    # Objects such as loaders have no representation which is the same on
+    # every run, so only their type is part of the key
+    return f"<{type(obj).__name__}>"
+
 
 def split_low_tag(tag: str) -> dict[str, Any]:
     """
@@ -801,6 +831,11 @@ class State:
         self.dependency_dag = DependencyGraph()
         # a mapping of state tag (unique id) to the return result dict
         self.disabled_states: dict[str, dict[str, Any]] | None = None
+        # the fingerprints of the chunks of an incremental highstate
+        self.fingerprints = None
+        # the pipes the processes of parallel states return their results on,
+        # by state tag
+        self.parallel_conns = {}
 
     def _match_global_state_conditions(self, full, state, name):
         """
@@ -992,6 +1027,48 @@ class State:
         self.format_slots(cdata)
         return self.functions[fun](*cdata["args"], **cdata["kwargs"])
 
+    def _check_cmd_retcodes(self, entries, cmd_opts):
+        """
+        Return a function which returns the return code of the command at an
+        index of a list of onlyif, unless or check_cmd entries. When
+        ``state_check_concurrency`` is above 1, all of the commands in the list
+        are run together first.
+        """
+        results = {}
+        concurrency = self.opts.get("state_check_concurrency", 1)
+        indexes = [idx for idx, entry in enumerate(entries) if isinstance(entry, str)]
+        if (
+            concurrency > 1
+            and len(indexes) > 1
+            and "cmd.retcode_many" in self.functions
+        ):
+            ret = self.functions["cmd.retcode_many"](
+                [entries[idx] for idx in indexes],
+                concurrency=concurrency,
+                ignore_retcode=True,
+                python_shell=True,
+                **cmd_opts,
+            )
+            for result in ret:
+                log.debug(
+                    "Check command %r returned %s in %.2f ms",
+                    result["cmd"],
+                    result["retcode"],
+                    result["duration"],
+                )
+            results = dict(zip(indexes, ret))
+
+        def _retcode(idx):
+            if idx not in results:
+                return self.functions["cmd.retcode"](
+                    entries[idx], ignore_retcode=True, python_shell=True, **cmd_opts
+                )
+            if "error" in results[idx]:
+                raise CommandExecutionError(results[idx]["error"])
+            return results[idx]["retcode"]
+
+        return _retcode
+
     def _run_check_onlyif(self, low: LowChunk, cmd_opts) -> dict[str, Any]:
         """
         Make sure that all commands return True for the state to run. If any
@@ -1022,12 +1099,11 @@ class State:
                 ret.update({"comment": "onlyif condition is true", "result": False})
             return True
 
-        for entry in low_onlyif:
+        retcode = self._check_cmd_retcodes(low_onlyif, cmd_opts)
+        for idx, entry in enumerate(low_onlyif):
             if isinstance(entry, str):
                 try:
-                    cmd = self.functions["cmd.retcode"](
-                        entry, ignore_retcode=True, python_shell=True, **cmd_opts
-                    )
+                    cmd = retcode(idx)
                 except CommandExecutionError:
                     # Command failed, notify onlyif to skip running the item
                     cmd = 100
@@ -1100,12 +1176,11 @@ class State:
                 ret.update({"comment": "unless condition is false", "result": False})
                 return True
 
-        for entry in low_unless:
+        retcode = self._check_cmd_retcodes(low_unless, cmd_opts)
+        for idx, entry in enumerate(low_unless):
             if isinstance(entry, str):
                 try:
-                    cmd = self.functions["cmd.retcode"](
-                        entry, ignore_retcode=True, python_shell=True, **cmd_opts
-                    )
+                    cmd = retcode(idx)
                     log.debug("Last command return code: %s", cmd)
                 except CommandExecutionError:
                     # Command failed, so notify unless to skip the item
@@ -1159,10 +1234,9 @@ class State:
         cmd_opts = {}
         if "shell" in self.opts["grains"]:
             cmd_opts["shell"] = self.opts["grains"].get("shell")
-        for entry in low["check_cmd"]:
-            cmd = self.functions["cmd.retcode"](
-                entry, ignore_retcode=True, python_shell=True, **cmd_opts
-            )
+        retcode = self._check_cmd_retcodes(low["check_cmd"], cmd_opts)
+        for idx in range(len(low["check_cmd"])):
+            cmd = retcode(idx)
             log.debug("Last command return code: %s", cmd)
             if cmd == 0 and ret["result"] is False:
                 ret.update(
@@ -1906,7 +1980,7 @@ class State:
 
     @classmethod
     def _call_parallel_target(
-        cls, instance, init_kwargs, name, cdata, low, inject_globals
+        cls, instance, init_kwargs, name, cdata, low, inject_globals, conn
     ):
         """
         The target function to call that will create the parallel thread/process
@@ -2006,17 +2080,12 @@ class State:
                     ]
                 )
 
-        troot = os.path.join(instance.opts["cachedir"], instance.invocation_id)
-        tfile = os.path.join(troot, salt.utils.hashutils.sha1_digest(tag))
-        if not os.path.isdir(troot):
-            try:
-                os.makedirs(troot)
-            except OSError:
-                # Looks like the directory was created between the check
-                # and the attempt, we are safe to pass
-                pass
-        with salt.utils.files.fopen(tfile, "wb+") as fp_:
-            fp_.write(msgpack_serialize(ret))
+        try:
+            conn.send(ret)
+        except (pickle.PicklingError, TypeError, AttributeError) as exc:
+            log.error("Unable to return the result of parallel state %s: %s", tag, exc)
+        finally:
+            conn.close()
 
     def call_parallel(
         self,
@@ -2042,9 +2111,18 @@ class State:
             instance = self
             inject_globals = None
 
+        recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
         proc = salt.utils.process.Process(
             target=self._call_parallel_target,
-            args=(instance, self._init_kwargs, name, cdata, low, inject_globals),
+            args=(
+                instance,
+                self._init_kwargs,
+                name,
+                cdata,
+                low,
+                inject_globals,
+                send_conn,
+            ),
             name=f"ParallelState({name})",
         )
         try:
@@ -2067,10 +2145,22 @@ class State:
             init_kwargs["context"] = clean_context
             proc = salt.utils.process.Process(
                 target=self._call_parallel_target,
-                args=(instance, init_kwargs, name, cdata, low, inject_globals),
+                args=(
+                    instance,
+                    init_kwargs,
+                    name,
+                    cdata,
+                    low,
+                    inject_globals,
+                    send_conn,
+                ),
                 name=f"ParallelState({name})",
             )
             proc.start()
+        # Only the child writes to the pipe, closing our end of it lets us see
+        # the child exit without returning
+        send_conn.close()
+        self.parallel_conns[_gen_tag(low)] = recv_conn
         ret = {
             "name": name,
             "result": None,
@@ -2080,6 +2170,166 @@ class State:
         }
         return ret
 
+    def _fingerprints_path(self):
+        return os.path.join(self.opts["cachedir"], "state_fingerprints.p")
+
+    def _fingerprint_env(self):
+        """
+        Return a digest of the grains and pillar, a change in which forces a
+        full run of an incremental highstate
+        """
+        data = {"grains": self.opts.get("grains"), "pillar": self.opts.get("pillar")}
+        try:
+            serialized = salt.utils.json.dumps(data, sort_keys=True, default=repr)
+        except (TypeError, ValueError):
+            return None
+        return salt.utils.hashutils.sha256_digest(serialized)
+
+    def load_fingerprints(self):
+        """
+        Load the fingerprints recorded by the last incremental highstate, so
+        that the chunks which have not changed since can be skipped
+        """
+        stored = {}
+        path = self._fingerprints_path()
+        if os.path.isfile(path):
+            try:
+                with salt.utils.files.fopen(path, "rb") as fp_:
+                    stored = salt.payload.load(fp_)
+            except Exception as exc:  # pylint: disable=broad-except
+                log.warning("Unable to read state fingerprints from %s: %s", path, exc)
+            if not isinstance(stored, dict):
+                stored = {}
+        env = self._fingerprint_env()
+        interval = self.opts.get("state_incremental_full_run_interval", 86400)
+        full_run = stored.get("full_run") or 0
+        full = (
+            env is None
+            or env != stored.get("env")
+            or time.time() - full_run >= interval
+        )
+        if full:
+            log.debug("Running all states, not skipping unchanged states")
+        self.fingerprints = {
+            "full_run": full_run,
+            "full": full,
+            "env": env,
+            "chunks": stored.get("chunks") or {},
+            "seen": set(),
+        }
+
+    def save_fingerprints(self):
+        """
+        Store the fingerprints of the chunks which succeeded in this run
+        """
+        if self.fingerprints is None:
+            return
+        data = {
+            "full_run": (
+                time.time()
+                if self.fingerprints["full"]
+                else self.fingerprints["full_run"]
+            ),
+            "env": self.fingerprints["env"],
+            "chunks": {
+                tag: entry
+                for tag, entry in self.fingerprints["chunks"].items()
+                if tag in self.fingerprints["seen"]
+            },
+        }
+        self.fingerprints = None
+        path = self._fingerprints_path()
+        with salt.utils.files.set_umask(0o077):
+            try:
+                with salt.utils.files.fopen(path, "w+b") as fp_:
+                    salt.payload.dump(data, fp_)
+            except OSError:
+                log.error("Unable to write state fingerprints to %s", path)
+
+    def _fingerprint_applies(self, low):
+        """
+        Return whether the chunk may be skipped when it is unchanged
+        """
+        if self.fingerprints is None or self.opts.get("test"):
+            return False
+        if low.get("__prereq__") or low["fun"] == "mod_watch":
+            return False
+        # the results of these depend on more than the resource itself
+        if any(
+            key in low
+            for key in ("unless", "onlyif", "creates", "check_cmd", "retry", "parallel")
+        ):
+            return False
+        return "{0[state]}.mod_fingerprint".format(low) in self.states
+
+    def _low_hash(self, low):
+        data = {
+            key: val
+            for key, val in low.items()
+            if key not in ("order", "__prereq__", "__prerequired__")
+        }
+        try:
+            serialized = salt.utils.json.dumps(data, sort_keys=True, default=repr)
+        except (TypeError, ValueError):
+            return None
+        return salt.utils.hashutils.sha256_digest(serialized)
+
+    def _fingerprint(self, low):
+        """
+        Return the fingerprint of the resource managed by the chunk, as
+        returned by the ``mod_fingerprint`` function of its state module, or
+        None if it cannot be fingerprinted
+        """
+        fp_low = dict(low)
+        fp_low["sfun"] = low["fun"]
+        fp_low["fun"] = "mod_fingerprint"
+        full = "{0[state]}.mod_fingerprint".format(low)
+        try:
+            cdata = salt.utils.args.format_call(
+                self.states[full],
+                fp_low,
+                expected_extra_kws=STATE_INTERNAL_KEYWORDS,
+            )
+            fingerprint = self.states[full](*cdata["args"], **cdata["kwargs"])
+        except Exception as exc:  # pylint: disable=broad-except
+            log.debug("Unable to fingerprint %s: %s", _gen_tag(low), exc)
+            return None
+        return fingerprint if isinstance(fingerprint, str) else None
+
+    def _call_state_function(self, low, cdata):
+        """
+        Run the state function of the chunk. In an incremental highstate, a
+        chunk whose low data and fingerprint are the same as after its last
+        successful run is not run again.
+        """
+        if not self._fingerprint_applies(low):
+            return self.states[cdata["full"]](*cdata["args"], **cdata["kwargs"])
+        tag = _gen_tag(low)
+        chunks = self.fingerprints["chunks"]
+        self.fingerprints["seen"].add(tag)
+        low_hash = self._low_hash(low)
+        fingerprint = self._fingerprint(low) if low_hash else None
+        if (
+            fingerprint is not None
+            and not self.fingerprints["full"]
+            and chunks.get(tag) == {"low": low_hash, "fingerprint": fingerprint}
+        ):
+            log.debug("Skipping state %s, it is unchanged since it last ran", tag)
+            return {
+                "name": low["name"],
+                "result": True,
+                "changes": {},
+                "comment": "State was not run, it is unchanged since the last successful run",
+            }
+        chunks.pop(tag, None)
+        ret = self.states[cdata["full"]](*cdata["args"], **cdata["kwargs"])
+        if fingerprint is not None and isinstance(ret, dict) and ret.get("result"):
+            if ret.get("changes"):
+                fingerprint = self._fingerprint(low)
+            if fingerprint is not None:
+                chunks[tag] = {"low": low_hash, "fingerprint": fingerprint}
+        return ret
+
     @salt.utils.decorators.state.OutputUnifier("content_check", "unify")
     def call(
         self,
@@ -2226,9 +2476,7 @@ class State:
                     else:
                         self.format_slots(cdata)
                         with salt.utils.files.set_umask(low.get("__umask__")):
-                            ret = self.states[cdata["full"]](
-                                *cdata["args"], **cdata["kwargs"]
-                            )
+                            ret = self._call_state_function(low, cdata)
                 self.states.inject_globals = {}
             if "check_cmd" in low:
                 state_check_cmd = "{0[state]}.mod_run_check_cmd".format(low)
@@ -2548,6 +2796,13 @@ class State:
                 self._check_disabled(chunk, disabled)
         else:
             disabled = disabled_states
+        concurrency = self.opts.get("state_concurrency", 1)
+        if (
+            concurrency > 1
+            and not salt.utils.platform.spawning_platform()
+            and all(_gen_tag(chunk) in self.dependency_dag.dag for chunk in chunks)
+        ):
+            return self._call_chunks_concurrent(chunks, disabled, concurrency)
         running = {}
         pending_chunks = {}
         for low in chunks:
@@ -2572,14 +2827,274 @@ class State:
             pending_chunks, running, failhard = _call_pending(pending_chunks, running)
             if failhard:
                 return running
-            time.sleep(0.01)
-        while True:
-            if self.reconcile_procs(running):
-                break
-            time.sleep(0.01)
+            if pending_chunks:
+                # wait for one of the processes they are waiting on to return
+                self.reconcile_procs(running, block=True)
+        while not self.reconcile_procs(running, block=True):
+            pass
         ret = {**disabled, **running}
         return ret
 
+    def _chunk_ready(self, low: LowChunk, running: dict[str, dict]) -> bool:
+        """
+        Return whether all of the chunks the chunk depends on have completed
+        """
+        for _, chunk in self.dependency_dag.get_dependencies(low):
+            ret = running.get(_gen_tag(chunk))
+            if ret is None or "proc" in ret:
+                return False
+        return True
+
+    def _chunk_is_barrier(self, low: LowChunk) -> bool:
+        """
+        Return whether the chunk has to be run on its own, after all of the
+        chunks before it have completed, as it relies on the state of the run
+        in the main process, or may stop the run
+        """
+        return bool(
+            low.get("__prereq__")
+            or low.get("__prerequiring__")
+            or low.get("failhard", self.opts["failhard"])
+            or self.dependency_dag.get_aggregate_chunks(low)
+        )
+
+    def _call_chunk_target(
+        self,
+        low: LowChunk,
+        running: dict[str, dict],
+        chunks: Sequence[LowChunk],
+        conn: multiprocessing.connection.Connection,
+    ) -> None:
+        """
+        The target of the processes started by ``_call_chunks_concurrent``,
+        which calls the chunk and sends the new entries of the running dict
+        back to the main process, along with the changes the chunk made to
+        the state of the run
+        """
+        done = set(running)
+        snapshot = self._chunk_state_snapshot()
+        updates = {}
+        try:
+            running, _ = self.call_chunk(low, running, chunks)
+            ret = {tag: val for tag, val in running.items() if tag not in done}
+            updates = self._chunk_state_updates(snapshot)
+        except Exception:  # pylint: disable=broad-except
+            trb = traceback.format_exc()
+            ret = {
+                _gen_tag(low): {
+                    "result": False,
+                    "name": low.get("name"),
+                    "changes": {},
+                    "comment": f"An exception occurred in this state: {trb}",
+                }
+            }
+        try:
+            conn.send((ret, updates))
+        except (pickle.PicklingError, TypeError, AttributeError) as exc:
+            conn.send(
+                (
+                    {
+                        _gen_tag(low): {
+                            "result": False,
+                            "name": low.get("name"),
+                            "changes": {},
+                            "comment": f"Unable to return the state result: {exc}",
+                        }
+                    },
+                    {},
+                )
+            )
+        finally:
+            conn.close()
+
+    def _chunk_state_snapshot(self) -> tuple[dict[str, Any], set[str]]:
+        """
+        Return what is needed to find the changes a chunk run in another
+        process makes to ``__context__`` and to the incremental fingerprints
+        """
+        seen = set()
+        if self.fingerprints is not None:
+            seen = set(self.fingerprints["seen"])
+        return dict(self.state_con), seen
+
+    def _chunk_state_updates(
+        self, snapshot: tuple[dict[str, Any], set[str]]
+    ) -> dict[str, Any]:
+        """
+        Return the changes made to ``__context__`` and to the incremental
+        fingerprints since the snapshot was taken. Context values which cannot
+        be sent back to the main process are left out.
+        """
+        context, seen = snapshot
+        updates = {
+            "context": {},
+            "context_removed": [key for key in context if key not in self.state_con],
+        }
+        for key, val in self.state_con.items():
+            if key == "fileclient" or (key in context and context[key] is val):
+                continue
+            try:
+                pickle.dumps(val)
+            except Exception:  # pylint: disable=broad-except
+                log.trace("Not returning __context__ key %s to the main process", key)
+                continue
+            updates["context"][key] = val
+        if self.fingerprints is not None:
+            chunks = self.fingerprints["chunks"]
+            updates["fingerprints"] = {
+                tag: chunks.get(tag) for tag in self.fingerprints["seen"] - seen
+            }
+        return updates
+
+    def _merge_chunk_state_updates(self, updates: dict[str, Any]) -> None:
+        """
+        Apply the changes returned by ``_chunk_state_updates`` in another
+        process
+        """
+        for key in updates.get("context_removed", ()):
+            self.state_con.pop(key, None)
+        self.state_con.update(updates.get("context", {}))
+        if self.fingerprints is not None:
+            chunks = self.fingerprints["chunks"]
+            for tag, entry in updates.get("fingerprints", {}).items():
+                self.fingerprints["seen"].add(tag)
+                if entry is None:
+                    chunks.pop(tag, None)
+                else:
+                    chunks[tag] = entry
+
+    def _call_chunks_concurrent(
+        self,
+        chunks: Sequence[LowChunk],
+        disabled: dict[str, dict[str, Any]],
+        concurrency: int,
+    ) -> dict[str, Any]:
+        """
+        Call the chunks, running up to ``concurrency`` of them at a time in
+        separate processes. A chunk is started once all of the chunks it
+        depends on have completed, and the results are numbered in the order
+        of the chunks, as if they had been run one after the other.
+        """
+        running = {}
+        # the tags each chunk added to the running dict, by chunk index
+        produced = {}
+        pending = dict(enumerate(chunks))
+        inflight = {}
+        stop = False
+        run_num = self.__run_num
+
+        def _completed(idx, low, new):
+            nonlocal stop
+            failhard = new.pop("__FAILHARD__", False)
+            running.update(new)
+            produced[idx] = sorted(new, key=lambda tag: new[tag].get("__run_num__", 0))
+            if self.check_failhard(low, running) or failhard:
+                stop = True
+
+        def _call(idx, low):
+            nonlocal running
+            done = set(running)
+            running, is_pending = self.call_chunk(low, running, chunks)
+            if not is_pending:
+                new = {tag: val for tag, val in running.items() if tag not in done}
+                _completed(idx, low, new)
+            return is_pending
+
+        while pending or inflight:
+            started = False
+            busy = {low["state"] for _, low, _ in inflight.values()}
+            for idx, low in list(pending.items()) if not stop else ():
+                if self._chunk_is_barrier(low):
+                    if idx != next(iter(pending)) or inflight:
+                        break
+                elif len(inflight) >= concurrency:
+                    break
+                elif not self._chunk_ready(low, running) or (
+                    low["state"] in STATE_CONCURRENCY_EXCLUSIVE and low["state"] in busy
+                ):
+                    continue
+                if self.check_pause(low) == "kill":
+                    stop = True
+                    break
+                del pending[idx]
+                started = True
+                tag = _gen_tag(low)
+                if tag in running:
+                    # already run as the requisite of another chunk
+                    produced[idx] = []
+                elif self._chunk_is_barrier(low) or low.get("parallel"):
+                    if _call(idx, low):
+                        pending = {idx: low, **pending}
+                        started = False
+                    # the chunks which depend on it may be ready now
+                    break
+                else:
+                    recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+                    proc = salt.utils.process.Process(
+                        target=self._call_chunk_target,
+                        args=(low, running, chunks, send_conn),
+                        name=f"StateChunk({low['name']})",
+                    )
+                    proc.start()
+                    send_conn.close()
+                    inflight[recv_conn] = (idx, low, proc)
+                    busy.add(low["state"])
+            if stop and not inflight:
+                break
+            if started:
+                continue
+            procs = [
+                self.parallel_conns[tag]
+                for tag, ret in running.items()
+                if ret.get("proc") and tag in self.parallel_conns
+            ]
+            if not inflight and not procs:
+                if not pending:
+                    break
+                # None of the chunks are ready, one of them depends on a chunk
+                # which is not in this run, fall back to calling the next one
+                idx = next(iter(pending))
+                _call(idx, pending.pop(idx))
+                continue
+            for ready in multiprocessing.connection.wait(list(inflight) + procs):
+                if ready in inflight:
+                    idx, low, proc = inflight.pop(ready)
+                    try:
+                        new, updates = ready.recv()
+                        self._merge_chunk_state_updates(updates)
+                    except EOFError:
+                        new = {
+                            _gen_tag(low): {
+                                "result": False,
+                                "name": low.get("name"),
+                                "changes": {},
+                                "comment": "State process failed to return",
+                            }
+                        }
+                    ready.close()
+                    proc.join()
+                    for tag, ret in new.items():
+                        ret.setdefault("__sls__", low.get("__sls__"))
+                        ret.setdefault("__id__", low.get("__id__"))
+                        if tag == _gen_tag(low):
+                            self.check_refresh(low, ret)
+                    _completed(idx, low, new)
+            if procs:
+                self.reconcile_procs(running)
+        while not self.reconcile_procs(running, block=True):
+            pass
+
+        ret = {}
+        for idx in sorted(produced):
+            for tag in produced[idx]:
+                running[tag]["__run_num__"] = run_num
+                run_num += 1
+                ret[tag] = running[tag]
+        self.__run_num = run_num
+        if stop:
+            return ret
+        return {**disabled, **ret}
+
     def check_failhard(self, low: LowChunk, running: dict[str, dict]):
         """
         Check if the low data chunk should send a failhard signal
@@ -2640,42 +3155,48 @@ class State:
                 return "run"
         return "run"
 
-    def reconcile_procs(self, running: dict) -> bool:
+    def reconcile_procs(self, running: dict, block: bool = False) -> bool:
         """
-        Check the running dict for processes and resolve them
+        Check the running dict for processes and resolve the ones which have
+        returned. When ``block`` is True, wait until at least one of them has
+        returned. Returns whether all of the processes have been resolved.
         """
-        retset = set()
+        conns = {}
         for tag in running:
-            proc = running[tag].get("proc")
-            if proc:
-                if not proc.is_alive():
-                    ret_cache = os.path.join(
-                        self.opts["cachedir"],
-                        self.invocation_id,
-                        salt.utils.hashutils.sha1_digest(tag),
-                    )
-                    if not os.path.isfile(ret_cache):
-                        ret = {
+            if running[tag].get("proc"):
+                conn = self.parallel_conns.get(tag)
+                if conn is None:
+                    running[tag].update(
+                        {
                             "result": False,
                             "comment": "Parallel process failed to return",
-                            "name": running[tag]["name"],
-                            "changes": {},
-                        }
-                    try:
-                        with salt.utils.files.fopen(ret_cache, "rb") as fp_:
-                            ret = msgpack_deserialize(fp_.read())
-                    except OSError:
-                        ret = {
-                            "result": False,
-                            "comment": "Parallel cache failure",
-                            "name": running[tag]["name"],
                             "changes": {},
                         }
-                    running[tag].update(ret)
+                    )
                     running[tag].pop("proc")
                 else:
-                    retset.add(False)
-        return False not in retset
+                    conns[conn] = tag
+        if not conns:
+            return True
+        ready = multiprocessing.connection.wait(
+            list(conns), timeout=None if block else 0
+        )
+        for conn in ready:
+            tag = conns.pop(conn)
+            try:
+                ret = conn.recv()
+            except (EOFError, OSError):
+                ret = {
+                    "result": False,
+                    "comment": "Parallel process failed to return",
+                    "name": running[tag]["name"],
+                    "changes": {},
+                }
+            conn.close()
+            self.parallel_conns.pop(tag, None)
+            running[tag].pop("proc").join()
+            running[tag].update(ret)
+        return not conns
 
     def _check_requisites(self, low: LowChunk, running: dict[str, dict[str, Any]]):
         """
@@ -2706,10 +3227,8 @@ class State:
             if low.get("parallel"):
                 pending = not self.reconcile_procs(run_dict)
             else:
-                while True:
-                    if self.reconcile_procs(run_dict):
-                        break
-                    time.sleep(0.01)
+                while not self.reconcile_procs(run_dict, block=True):
+                    pass
 
             for chunk in chunks:
                 tag = _gen_tag(chunk)
@@ -3210,26 +3729,40 @@ class State:
         """
         Process a high data call and ensure the defined states.
         """
+        chunks, errors = self.compile_high(high, orchestration_jid)
+        if errors:
+            return errors
+        return self.call_compiled(chunks)
+
+    def compile_high(
+        self, high: HighData, orchestration_jid: str | int | None = None
+    ) -> tuple[list[LowChunk], list[str]]:
+        """
+        Reconcile, verify and compile high data into the ordered low chunks
+        and the dependency graph run by ``call_compiled``.
+
+        :return: a tuple of a list of the ordered chunks and a list of errors
+        """
         errors = []
         # If there is extension data reconcile it
         high, ext_errors = self.reconcile_extend(high)
         errors.extend(ext_errors)
         errors.extend(self.verify_high(high))
         if errors:
-            return errors
+            return [], errors
         high, req_in_errors = self.requisite_in(high)
         errors.extend(req_in_errors)
         high = self.apply_exclude(high)
         # Verify that the high data is structurally sound
         if errors:
-            return errors
+            return [], errors
         # Compile and verify the raw chunks
-        chunks, errors = self.compile_high_data(high, orchestration_jid)
-        if errors:
-            return errors
-        # If there are extensions in the highstate, process them and update
-        # the low data chunks
+        return self.compile_high_data(high, orchestration_jid)
 
+    def call_compiled(self, chunks: Sequence[LowChunk]) -> dict | list:
+        """
+        Run the low chunks compiled by ``compile_high``
+        """
         ret = self.call_chunks(chunks, disabled_states=self.disabled_states)
         ret = self.call_listen(chunks, ret)
         ret = self.call_beacons(chunks, ret)
@@ -3439,6 +3972,9 @@ class BaseHighState:
         self.iorder = 10000
         self.avail = self.__gather_avail()
         self.building_highstate = HashableOrderedDict()
+        # Records the use of execution modules by the renders of a highstate
+        # which is compiled to be cached
+        self._render_inputs = None
 
     def __gather_avail(self):
         """
@@ -3521,6 +4057,37 @@ class BaseHighState:
             envs.extend([env for env in client_envs if env not in envs])
             return envs
 
+    def _render_context(self, context, template):
+        """
+        Return the context to render a template with. While a highstate is
+        compiled to be cached, the execution modules are passed to the
+        renderers through a proxy which makes the compiled highstate
+        uncacheable once they are used, as their results are not part of the
+        cache key. So do renderers which do not get them through the context.
+        """
+        inputs = self._render_inputs
+        if inputs is None or not inputs.cacheable:
+            return context
+        if not template or not os.path.isfile(template):
+            # Nothing will be rendered
+            return context
+        render_pipe = template_shebang(
+            template,
+            self.state.rend,
+            self.state.opts["renderer"],
+            self.state.opts["renderer_blacklist"],
+            self.state.opts["renderer_whitelist"],
+            "",
+        )
+        for render, _ in render_pipe or []:
+            name = render.__module__.split(".")[-1]
+            if name not in salt.utils.rendercache.CACHEABLE_RENDERERS:
+                inputs.invalidate(f"{template} is rendered with {name}")
+                return context
+        context = dict(context or {})
+        context["salt"] = inputs.untracked("salt", self.state.functions)
+        return context
+
     def get_tops(self, context=None):
         """
         Gather the top files
@@ -3552,7 +4119,7 @@ class BaseHighState:
                         self.state.opts["renderer_blacklist"],
                         self.state.opts["renderer_whitelist"],
                         saltenv=self.opts["saltenv"],
-                        context=context,
+                        context=self._render_context(context, contents),
                     )
                 ]
             else:
@@ -3578,7 +4145,7 @@ class BaseHighState:
                             self.state.opts["renderer_blacklist"],
                             self.state.opts["renderer_whitelist"],
                             saltenv=saltenv,
-                            context=context,
+                            context=self._render_context(context, contents),
                         )
                     )
                 else:
@@ -3627,15 +4194,16 @@ class BaseHighState:
                     for sls in fnmatch.filter(self.avail[saltenv], sls_match):
                         if sls in done[saltenv]:
                             continue
+                        top_fn = self.client.get_state(sls, saltenv).get("dest", False)
                         tops[saltenv].append(
                             compile_template(
-                                self.client.get_state(sls, saltenv).get("dest", False),
+                                top_fn,
                                 self.state.rend,
                                 self.state.opts["renderer"],
                                 self.state.opts["renderer_blacklist"],
                                 self.state.opts["renderer_whitelist"],
                                 saltenv,
-                                context=context,
+                                context=self._render_context(context, top_fn),
                             )
                         )
                         done[saltenv].append(sls)
@@ -3906,6 +4474,11 @@ class BaseHighState:
         {'saltenv': ['state1', 'state2', ...]}
         """
         matches = DefaultOrderedDict(HashableOrderedDict)
+        confirm_top = self.matchers["confirm_top.confirm_top"]
+        if self.opts.get("top_match_cache", False):
+            confirm_top = salt.utils.topmatch.TopMatcher(
+                self.opts, confirm_top, self.opts.get("top_match_cache_size", 10000)
+            )
         # pylint: disable=cell-var-from-loop
         for saltenv, body in top.items():
             if self.opts["saltenv"]:
@@ -3916,7 +4489,7 @@ class BaseHighState:
                 def _filter_matches(_match, _data, _opts):
                     if isinstance(_data, str):
                         _data = [_data]
-                    if self.matchers["confirm_top.confirm_top"](_match, _data, _opts):
+                    if confirm_top(_match, _data, _opts):
                         if saltenv not in matches:
                             matches[saltenv] = []
                         for item in _data:
@@ -4036,7 +4609,7 @@ class BaseHighState:
                     saltenv,
                     sls,
                     rendered_sls=mods,
-                    context=context,
+                    context=self._render_context(context, fn_),
                 )
             except SaltRenderError as exc:
                 msg = f"Rendering SLS '{saltenv}:{sls}' failed: {exc}"
@@ -4497,7 +5070,70 @@ class BaseHighState:
                 with salt.utils.files.fopen(cfn, "rb") as fp_:
                     high = salt.payload.load(fp_)
                     return self.state.call_high(high, orchestration_jid)
-        # File exists so continue
+        incremental = (
+            self.opts.get("state_incremental") and not whitelist and not exclude
+        )
+        compile_cache = (
+            self.opts.get("state_compile_cache")
+            and not whitelist
+            and not exclude
+            and orchestration_jid is None
+        )
+        fetched = None
+        if compile_cache:
+            compiled = self._load_compiled()
+            if compiled is not None and self._check_pillar(force):
+                log.debug("Using the compiled highstate from the previous run")
+                self.load_dynamic(compiled["matches"])
+                chunks = self._restore_compiled(compiled["chunks"])
+                if chunks is not None:
+                    return self._call_compiled(chunks, incremental)
+            self._render_inputs = salt.utils.rendercache.RenderInputs()
+            try:
+                with self.client.record_fetches() as fetched:
+                    ret = self._gather_highstate(
+                        ret, tag_name, force, whitelist, exclude
+                    )
+            finally:
+                inputs, self._render_inputs = self._render_inputs, None
+            if not inputs.cacheable:
+                compile_cache = False
+        else:
+            ret = self._gather_highstate(ret, tag_name, force, whitelist, exclude)
+        if not isinstance(ret, tuple):
+            return ret
+        high, matches = ret
+        with salt.utils.files.set_umask(0o077):
+            try:
+                if salt.utils.platform.is_windows():
+                    # Make sure cache file isn't read-only
+                    self.state.functions["cmd.run"](
+                        ["attrib", "-R", cfn],
+                        python_shell=False,
+                        output_loglevel="quiet",
+                    )
+                with salt.utils.files.fopen(cfn, "w+b") as fp_:
+                    try:
+                        salt.payload.dump(high, fp_)
+                    except TypeError:
+                        # Can't serialize pydsl
+                        pass
+            except OSError:
+                log.error('Unable to write to "state.highstate" cache file %s', cfn)
+
+        chunks, errors = self.state.compile_high(high, orchestration_jid)
+        if errors:
+            return errors
+        if compile_cache:
+            self._store_compiled(fetched, matches, chunks)
+        return self._call_compiled(chunks, incremental)
+
+    def _gather_highstate(self, ret, tag_name, force, whitelist, exclude):
+        """
+        Render the highstate for ``call_highstate``. Returns a tuple of the
+        high data and the top file matches, or the return of the highstate
+        when it cannot be run.
+        """
         err = []
         try:
             top = self.get_top()
@@ -4537,25 +5173,121 @@ class BaseHighState:
             return err
         if not high:
             return ret
+        return high, matches
+
+    def _call_compiled(self, chunks, incremental=False):
+        if incremental:
+            self.state.load_fingerprints()
+        try:
+            return self.state.call_compiled(chunks)
+        finally:
+            self.state.save_fingerprints()
+
+    def _compiled_cache_path(self):
+        return os.path.join(self.opts["cachedir"], "highstate.compiled.p")
+
+    def _restore_compiled(self, chunks):
+        """
+        Rebuild the dependency graph of the cached low chunks, and return them
+        in the order to run them, or None if they cannot be ordered
+        """
+        for chunk in chunks:
+            # These are set while the requisites are added to the graph
+            chunk.pop("__prereq__", None)
+            chunk.pop("__prerequiring__", None)
+        self.state.dependency_dag = DependencyGraph()
+        chunks, errors = self.state.order_chunks(chunks)
+        if errors:
+            log.debug("Unable to order the compiled highstate: %s", errors)
+            return None
+        return chunks
+
+    def _compiled_key(self, sources):
+        """
+        Return the key a compiled highstate is cached under, a digest of the
+        hashes of the files it was rendered from, the states available in
+        their environments, the grains and pillar, and the options
+        """
+        saltenvs = sorted({saltenv for _, saltenv in sources})
+        hashes = []
+        for path, saltenv in sorted(sources):
+            hash_ret = self.client.hash_file(path, saltenv) or {}
+            hashes.append((path, saltenv, hash_ret.get("hsum")))
+        data = {
+            "version": salt.version.__version__,
+            "envs": self._get_envs(),
+            "avail": {saltenv: sorted(self.avail[saltenv]) for saltenv in saltenvs},
+            "sources": hashes,
+            "grains": self.state.opts.get("grains"),
+            "pillar": self.state.opts.get("pillar"),
+            "opts": {
+                key: value
+                for key, value in self.opts.items()
+                if key not in _COMPILED_CACHE_SKIP_OPTS
+            },
+        }
+        try:
+            serialized = salt.utils.json.dumps(
+                data, sort_keys=True, default=_compiled_key_default
+            )
+        except (TypeError, ValueError):
+            return None
+        return salt.utils.hashutils.sha256_digest(serialized)
+
+    def _load_compiled(self):
+        """
+        Return the highstate compiled by a previous run, if none of its inputs
+        have changed since
+        """
+        path = self._compiled_cache_path()
+        if not os.path.isfile(path):
+            return None
+        try:
+            with salt.utils.files.fopen(path, "rb") as fp_:
+                cached = salt.payload.load(fp_)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.warning("Unable to read the compiled highstate %s: %s", path, exc)
+            return None
+        try:
+            key = self._compiled_key(cached["sources"])
+        except Exception as exc:  # pylint: disable=broad-except
+            log.debug("Unable to check the compiled highstate: %s", exc)
+            return None
+        if key is None or key != cached["key"]:
+            log.debug("The compiled highstate is out of date")
+            return None
+        return cached
+
+    def _store_compiled(self, sources, matches, chunks):
+        """
+        Store the compiled highstate for the next run. This has to happen
+        before the chunks are run, as running them modifies them.
+        """
+        key = self._compiled_key(sources)
+        if key is None:
+            return
+        path = self._compiled_cache_path()
         with salt.utils.files.set_umask(0o077):
             try:
-                if salt.utils.platform.is_windows():
-                    # Make sure cache file isn't read-only
-                    self.state.functions["cmd.run"](
-                        ["attrib", "-R", cfn],
-                        python_shell=False,
-                        output_loglevel="quiet",
-                    )
-                with salt.utils.files.fopen(cfn, "w+b") as fp_:
-                    try:
-                        salt.payload.dump(high, fp_)
-                    except TypeError:
-                        # Can't serialize pydsl
-                        pass
+                data = salt.payload.dumps(
+                    {
+                        "key": key,
+                        "sources": sorted(sources),
+                        "matches": {
+                            saltenv: list(mods) for saltenv, mods in matches.items()
+                        },
+                        "chunks": chunks,
+                    }
+                )
+            except TypeError as exc:
+                # Can't serialize pydsl
+                log.debug("Unable to serialize the compiled highstate: %s", exc)
+                return
+            try:
+                with salt.utils.files.fopen(path, "w+b") as fp_:
+                    fp_.write(data)
             except OSError:
-                log.error('Unable to write to "state.highstate" cache file %s', cfn)
-
-        return self.state.call_high(high, orchestration_jid)
+                log.error("Unable to write the compiled highstate to %s", path)
 
     def compile_highstate(self, context=None):
         """
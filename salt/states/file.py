@@ -783,6 +783,105 @@ def _gen_recurse_managed_files(
     )
 
 
+def _gen_recurse_unchanged(
+    name,
+    sources,
+    managed_files,
+    managed_directories,
+    user=None,
+    group=None,
+    file_mode=None,
+    dir_mode=None,
+    keep_mode=False,
+):
+    """
+    Find the files and directories managed by a recurse state which are
+    already in the correct state. The hashes and modes of the source files are
+    fetched from the fileserver in one request per source, and the target
+    directory is walked once, instead of checking each file separately.
+    """
+    manifest = {}
+    for source in sources:
+        recurse_root, senv = salt.utils.url.parse(source)
+        if senv is None:
+            senv = __env__
+        if not recurse_root.endswith(posixpath.sep):
+            recurse_root += posixpath.sep
+        if "cp.list_master_hashes" in __salt__:
+            hashes = __salt__["cp.list_master_hashes"](senv, recurse_root)
+        else:
+            hashes = None
+        if hashes is None:
+            # The fileserver cannot list the hashes, check each file instead
+            return set(), set()
+        for path, info in hashes.items():
+            manifest[salt.utils.url.create(path, saltenv=senv)] = info
+
+    local = {}
+
+    def _walk(path):
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        local[entry.path] = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if stat.S_ISDIR(local[entry.path].st_mode):
+                        _walk(entry.path)
+        except OSError:
+            pass
+
+    try:
+        local[name] = os.lstat(name)
+    except OSError:
+        return set(), set()
+    _walk(name)
+
+    uid = gid = None
+    if user is not None:
+        uid = __salt__["file.user_to_uid"](user)
+    if group is not None:
+        gid = __salt__["file.group_to_gid"](group)
+    if uid == "" or gid == "":
+        return set(), set()
+
+    def _perms_match(lstat, mode):
+        if uid is not None and lstat.st_uid != uid:
+            return False
+        if gid is not None and lstat.st_gid != gid:
+            return False
+        return mode is None or stat.S_IMODE(lstat.st_mode) == stat.S_IMODE(mode)
+
+    unchanged_files = set()
+    for dest, src in managed_files:
+        lstat = local.get(dest)
+        info = manifest.get(src)
+        if lstat is None or info is None or not stat.S_ISREG(lstat.st_mode):
+            continue
+        if keep_mode:
+            if info.get("mode") is None:
+                continue
+            mode = info["mode"]
+        else:
+            mode = int(file_mode, 8) if file_mode is not None else None
+        if not _perms_match(lstat, mode):
+            continue
+        if __salt__["file.get_hash"](dest, info["hash_type"]) != info["hsum"]:
+            continue
+        unchanged_files.add(dest)
+
+    unchanged_dirs = set()
+    mode = int(dir_mode, 8) if dir_mode is not None else None
+    for dirname in managed_directories:
+        lstat = local.get(dirname)
+        if lstat is not None and stat.S_ISDIR(lstat.st_mode):
+            if _perms_match(lstat, mode):
+                unchanged_dirs.add(dirname)
+
+    return unchanged_files, unchanged_dirs
+
+
 def _gen_keep_files(name, require, walk_d=None):
     """
     Generate the list of files that need to be kept when a dir based function
@@ -4753,6 +4852,7 @@ def recurse(
     win_deny_perms=None,
     win_inheritance=True,
     merge=False,
+    bulk=False,
     **kwargs,
 ):
     """
@@ -4984,6 +5084,16 @@ def recurse(
             because of the override (file -> dir/dir -> file), where the
             (lower priority) symlink is dropped, even if it is not overridden
             by a higher priority source.
+
+    bulk
+        Fetch the hashes and modes of all of the source files in a single
+        request, and compare them with the target directory in one pass,
+        instead of checking each file and directory on its own. Only the
+        files and directories which differ are then managed, as usual. This
+        is much faster for large trees. It has no effect when ``template`` or
+        SELinux context arguments are used, or on Windows. Defaults to false.
+
+        .. versionadded:: 3008.0
     """
     if "env" in kwargs:
         # "env" is not supported; Use "saltenv".
@@ -5165,10 +5275,31 @@ def recurse(
         merge=merge,
     )
 
+    unchanged_files = unchanged_dirs = set()
+    if (
+        bulk
+        and not template
+        and not salt.utils.platform.is_windows()
+        and not any(kwargs.get(x) for x in ("seuser", "serole", "setype", "serange"))
+    ):
+        unchanged_files, unchanged_dirs = _gen_recurse_unchanged(
+            name,
+            sources,
+            mng_files,
+            mng_dirs,
+            user=user,
+            group=group,
+            file_mode=file_mode,
+            dir_mode=dir_mode,
+            keep_mode=keep_mode,
+        )
+
     for dirname in mng_dirs:
-        manage_directory(dirname)
+        if dirname not in unchanged_dirs:
+            manage_directory(dirname)
     for dest, src in mng_files:
-        manage_file(dest, src, replace)
+        if dest not in unchanged_files:
+            manage_file(dest, src, replace)
     # On Windows, we need symlink targets to exist, hence
     # symlinks should be managed last.
     # In case there are n-level symlinks, we need to order them
@@ -9879,6 +10010,53 @@ def not_cached(name, saltenv="base"):
     return ret
 
 
+def mod_fingerprint(
+    name, sfun=None, source=None, source_hash="", template=None, **kwargs
+):
+    """
+    Return a fingerprint of a managed file, used to skip its state in an
+    incremental highstate when neither the file nor its source have changed.
+    Returns ``None`` when the file cannot be fingerprinted, such as when it is
+    rendered from a template, which may depend on anything.
+
+    .. versionadded:: 3008.0
+
+    .. note::
+        This state exists to support the ``state_incremental`` option. It
+        should not be called directly.
+    """
+    if sfun != "managed" or template:
+        return None
+    name = os.path.expanduser(name)
+    try:
+        fstat = os.stat(name)
+    except OSError:
+        return None
+    if not stat.S_ISREG(fstat.st_mode):
+        return None
+    data = [
+        name,
+        fstat.st_mtime_ns,
+        fstat.st_size,
+        fstat.st_mode,
+        fstat.st_uid,
+        fstat.st_gid,
+        salt.utils.hashutils.get_hash(name, "sha256"),
+    ]
+    if source:
+        if not isinstance(source, str):
+            return None
+        if source.startswith("salt://"):
+            source_sum = __salt__["cp.hash_file"](source, __env__)
+            if not source_sum:
+                return None
+            data.append(source_sum["hsum"])
+        elif not source_hash or "://" in source_hash:
+            # The source cannot be checked without fetching it
+            return None
+    return salt.utils.hashutils.sha256_digest(repr(data))
+
+
 def mod_beacon(name, **kwargs):
     """
     Create a beacon to monitor a file based on a beacon state argument.
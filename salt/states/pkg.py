@@ -3695,6 +3695,24 @@ def mod_watch(name, **kwargs):
     }
 
 
+def mod_fingerprint(name, sfun=None, version=None, **kwargs):
+    """
+    Return a fingerprint of the package database, used to skip the state in
+    an incremental highstate when no packages have been installed or removed
+    since it last ran. Returns ``None`` when the package database cannot be
+    fingerprinted, or for states which depend on the package repositories.
+
+    .. versionadded:: 3008.0
+
+    .. note::
+        This state exists to support the ``state_incremental`` option. It
+        should not be called directly.
+    """
+    if sfun not in ("installed", "removed", "purged") or version == "latest":
+        return None
+    return salt.utils.pkg.db_fingerprint()
+
+
 def mod_beacon(name, **kwargs):
     """
     Create a beacon to monitor a package or packages
@@ -65,9 +65,11 @@ set the reload value to True:
 """
 
 import logging
+import os
 import time
 
 import salt.utils.data
+import salt.utils.hashutils
 import salt.utils.platform
 from salt.exceptions import CommandExecutionError
 from salt.utils.args import get_function_argspec as _argspec
@@ -75,6 +77,12 @@ from salt.utils.systemd import booted
 
 SYSTEMD_ONLY = ("no_block", "unmask", "unmask_runtime")
 
+_SYSTEMD_UNIT_DIRS = (
+    "/etc/systemd/system",
+    "/usr/lib/systemd/system",
+    "/lib/systemd/system",
+)
+
 log = logging.getLogger(__name__)
 
 __virtualname__ = "service"
@@ -1086,6 +1094,32 @@ def mod_watch(
     return ret
 
 
+def mod_fingerprint(name, sfun=None, **kwargs):
+    """
+    Return a fingerprint of the status of a service and of its unit files,
+    used to skip the state in an incremental highstate when neither have
+    changed since it last ran.
+
+    .. versionadded:: 3008.0
+
+    .. note::
+        This state exists to support the ``state_incremental`` option. It
+        should not be called directly.
+    """
+    if sfun not in ("running", "dead", "enabled", "disabled"):
+        return None
+    data = [name, __salt__["service.status"](name)]
+    if "service.enabled" in __salt__:
+        data.append(__salt__["service.enabled"](name))
+    for unit_dir in _SYSTEMD_UNIT_DIRS:
+        for unit in (name, f"{name}.service"):
+            try:
+                data.append(os.stat(os.path.join(unit_dir, unit)).st_mtime_ns)
+            except OSError:
+                data.append(None)
+    return salt.utils.hashutils.sha256_digest(repr(data))
+
+
 def mod_beacon(name, **kwargs):
     """
     Create a beacon to monitor a service based on a beacon state argument.
@@ -13,6 +13,7 @@ import tornado.ioloop
 import salt.payload
 import salt.transport.base
 import salt.transport.frame
+import salt.utils.msgpack
 from salt.transport.tcp import (
     USE_LOAD_BALANCER,
     LoadBalancerServer,
@@ -168,13 +169,15 @@ class PublishClient(salt.transport.base.PublishClient):
         if port is not None:
             self.port = port
         if connect_callback:
-            self.connect_callback = None
+            self.connect_callback = connect_callback
         if disconnect_callback:
-            self.disconnect_callback = None
+            self.disconnect_callback = disconnect_callback
         await self._connect(timeout=timeout)
 
     async def send(self, msg):
-        await self.message_client.send(msg, reply=False)
+        while self._ws is None:
+            await self.connect()
+        await self._ws.send_bytes(msg)
 
     async def recv(self, timeout=None):
         while self._ws is None:
@@ -276,6 +279,8 @@ class PublishServer(salt.transport.base.DaemonizedPublishServer):
         self.pub_path_perms = pub_path_perms
         self.ssl = ssl
         self.clients = set()
+        self.presence_callback = None
+        self.remove_presence_callback = None
         self._run = None
         self.pub_writer = None
         self.pub_reader = None
@@ -349,6 +354,8 @@ class PublishServer(salt.transport.base.DaemonizedPublishServer):
         if self._run is None:
             self._run = asyncio.Event()
         self._run.set()
+        self.presence_callback = presence_callback
+        self.remove_presence_callback = remove_presence_callback
 
         ctx = None
         if self.ssl is not None:
@@ -424,9 +431,25 @@ class PublishServer(salt.transport.base.DaemonizedPublishServer):
                 log.debug("Request client cert %r", name)
         ws = aiohttp.web.WebSocketResponse()
         await ws.prepare(request)
+        ws.id_ = None
+        ws.address = request.remote
         self.clients.add(ws)
-        while True:
-            await asyncio.sleep(1)
+        # Minions send their ID over the connection, to track their presence
+        unpacker = salt.utils.msgpack.Unpacker()
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.BINARY:
+                    continue
+                unpacker.feed(msg.data)
+                for framed_msg in unpacker:
+                    framed_msg = salt.transport.frame.decode_embedded_strs(framed_msg)
+                    if self.presence_callback:
+                        self.presence_callback(ws, framed_msg["body"])
+        finally:
+            self.clients.discard(ws)
+            if self.remove_presence_callback:
+                self.remove_presence_callback(ws)
+        return ws
 
     async def _connect(self):
         if self.pull_path:
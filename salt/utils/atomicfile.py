@@ -149,15 +149,21 @@ class _AtomicWFile:
                 os.chmod(self._tmp_filename, 0o666 & ~salt.utils.files.get_umask())
         atomic_rename(self._tmp_filename, self._filename)
 
+    def discard(self):
+        """
+        Close and remove the temporary file, leaving the file untouched
+        """
+        self._fh.close()
+        try:
+            os.remove(self._tmp_filename)
+        except OSError:
+            pass
+
     def __exit__(self, exc_type, exc_value, traceback):
         if exc_type is None:
             self.close()
         else:
-            self._fh.close()
-            try:
-                os.remove(self._tmp_filename)
-            except OSError:
-                pass
+            self.discard()
 
     def __repr__(self):
         return "<{} {}{}, mode {}>".format(
@@ -9,6 +9,7 @@ import fnmatch
 import functools
 import hashlib
 import logging
+import os
 import random
 import re
 from collections.abc import Mapping, MutableMapping, Sequence
@@ -878,136 +879,176 @@ def traverse_dict_and_list(data, key, default=None, delimiter=DEFAULT_TARGET_DEL
     return ptr
 
 
-def subdict_match(
-    data, expr, delimiter=DEFAULT_TARGET_DELIM, regex_match=False, exact_match=False
-):
+class SubdictMatcher:
     """
-    Check for a match in a dictionary using a delimiter character to denote
-    levels of subdicts, and also allowing the delimiter character to be
-    matched. Thus, 'foo:bar:baz' will match data['foo'] == 'bar:baz' and
-    data['foo']['bar'] == 'baz'. The latter would take priority over the
-    former, as more deeply-nested matches are tried first.
+    A compiled :py:func:`subdict_match` expression. The expression is split
+    and its patterns are compiled once, so that it can be matched against the
+    data of many minions.
     """
 
-    def _match(target, pattern, regex_match=False, exact_match=False):
-        # XXX: A lot of this logic is here because of supporting PY2 and PY3,
-        # now that we only support PY3 we should probably re-visit what's going
-        # on here.
-        try:
-            target = str(target).lower()
-        except UnicodeDecodeError:
-            target = salt.utils.stringutils.to_unicode(target).lower()
-        try:
-            pattern = str(pattern).lower()
-        except UnicodeDecodeError:
-            pattern = salt.utils.stringutils.to_unicode(pattern).lower()
+    def __init__(
+        self,
+        expr,
+        delimiter=DEFAULT_TARGET_DELIM,
+        regex_match=False,
+        exact_match=False,
+    ):
+        self.expr = expr
+        self.delimiter = delimiter
+        self.regex_match = regex_match
+        self.exact_match = exact_match
+        # The (key, matchstr) pairs to try, with the most deeply-nested key
+        # first. A key of None matches on the entire data.
+        self._lookups = []
+        splits = expr.split(delimiter)
+        # If we have 4 splits, then we have three delimiters. Thus, the indexes
+        # we want to use are 3, 2, and 1, in that order. With only one split
+        # the delimiter is not present, so this can't possibly be a match.
+        for idx in range(len(splits) - 1, 0, -1):
+            if delimiter.join(splits[:idx]) == "*":
+                # We are matching on everything under the top level, so we
+                # need to treat the match as the entire data being passed in
+                self._lookups.append((None, expr))
+            else:
+                self._lookups.append((splits[:idx], delimiter.join(splits[idx:])))
+        self._patterns = {}
+        self._submatchers = {}
 
-        if regex_match:
+    def _pattern(self, pattern):
+        """
+        Return the compiled match function for a pattern
+        """
+        try:
+            return self._patterns[pattern]
+        except KeyError:
+            pass
+        lowered = str(pattern).lower()
+        if self.regex_match:
             try:
-                return re.match(pattern, target)
+                func = re.compile(lowered).match
             except Exception:  # pylint: disable=broad-except
-                log.error("Invalid regex '%s' in match", pattern)
-                return False
+                log.error("Invalid regex '%s' in match", lowered)
+                func = None
+        elif self.exact_match:
+            func = lowered.__eq__
         else:
-            return (
-                target == pattern if exact_match else fnmatch.fnmatch(target, pattern)
+            regex = re.compile(fnmatch.translate(os.path.normcase(lowered)))
+            func = lambda target: regex.match(os.path.normcase(target))
+        self._patterns[pattern] = func
+        return func
+
+    def _match(self, target, pattern):
+        func = self._pattern(pattern)
+        if func is None:
+            return False
+        return bool(func(str(target).lower()))
+
+    def _submatcher(self, pattern):
+        try:
+            return self._submatchers[pattern]
+        except KeyError:
+            ret = self._submatchers[pattern] = compile_subdict_match(
+                pattern, regex_match=self.regex_match, exact_match=self.exact_match
             )
+            return ret
 
-    def _dict_match(target, pattern, regex_match=False, exact_match=False):
-        ret = False
+    def _dict_match(self, target, pattern):
         wildcard = pattern.startswith("*:")
         if wildcard:
             pattern = pattern[2:]
 
         if pattern == "*":
             # We are just checking that the key exists
-            ret = True
-        if not ret and pattern in target:
+            return True
+        if pattern in target:
             # We might want to search for a key
-            ret = True
-        if not ret and subdict_match(
-            target, pattern, regex_match=regex_match, exact_match=exact_match
-        ):
-            ret = True
-        if not ret and wildcard:
+            return True
+        if self._submatcher(pattern).match(target):
+            return True
+        if wildcard:
             for key in target:
                 if isinstance(target[key], dict):
-                    if _dict_match(
-                        target[key],
-                        pattern,
-                        regex_match=regex_match,
-                        exact_match=exact_match,
-                    ):
+                    if self._dict_match(target[key], pattern):
                         return True
                 elif isinstance(target[key], list):
                     for item in target[key]:
-                        if _match(
-                            item,
-                            pattern,
-                            regex_match=regex_match,
-                            exact_match=exact_match,
-                        ):
+                        if self._match(item, pattern):
                             return True
-                elif _match(
-                    target[key],
-                    pattern,
-                    regex_match=regex_match,
-                    exact_match=exact_match,
-                ):
+                elif self._match(target[key], pattern):
                     return True
-        return ret
-
-    splits = expr.split(delimiter)
-    num_splits = len(splits)
-    if num_splits == 1:
-        # Delimiter not present, this can't possibly be a match
         return False
 
-    # If we have 4 splits, then we have three delimiters. Thus, the indexes we
-    # want to use are 3, 2, and 1, in that order.
-    for idx in range(num_splits - 1, 0, -1):
-        key = delimiter.join(splits[:idx])
-        if key == "*":
-            # We are matching on everything under the top level, so we need to
-            # treat the match as the entire data being passed in
-            matchstr = expr
-            match = data
-        else:
-            matchstr = delimiter.join(splits[idx:])
-            match = traverse_dict_and_list(data, key, {}, delimiter=delimiter)
-        log.debug(
-            "Attempting to match '%s' in '%s' using delimiter '%s'",
-            matchstr,
-            key,
-            delimiter,
-        )
-        if match == {}:
-            continue
-        if isinstance(match, dict):
-            if _dict_match(
-                match, matchstr, regex_match=regex_match, exact_match=exact_match
-            ):
-                return True
-            continue
-        if isinstance(match, (list, tuple)):
-            # We are matching a single component to a single list member
-            for member in match:
-                if isinstance(member, dict):
-                    if _dict_match(
-                        member,
-                        matchstr,
-                        regex_match=regex_match,
-                        exact_match=exact_match,
-                    ):
-                        return True
-                if _match(
-                    member, matchstr, regex_match=regex_match, exact_match=exact_match
-                ):
+    def match(self, data):
+        """
+        Return whether the expression matches ``data``
+        """
+        for key, matchstr in self._lookups:
+            if key is None:
+                match = data
+            else:
+                match = traverse_dict_and_list(data, key, {}, delimiter=self.delimiter)
+            if match == {}:
+                continue
+            if isinstance(match, dict):
+                if self._dict_match(match, matchstr):
                     return True
-            continue
-        if _match(match, matchstr, regex_match=regex_match, exact_match=exact_match):
-            return True
-    return False
+                continue
+            if isinstance(match, (list, tuple)):
+                # We are matching a single component to a single list member
+                for member in match:
+                    if isinstance(member, dict):
+                        if self._dict_match(member, matchstr):
+                            return True
+                    if self._match(member, matchstr):
+                        return True
+                continue
+            if self._match(match, matchstr):
+                return True
+        return False
+
+    def match_many(self, data_list):
+        """
+        Return whether the expression matches each of the items of
+        ``data_list``, such as the grains of many minions, as a list of
+        booleans
+        """
+        return [self.match(data) for data in data_list]
+
+
+@functools.lru_cache(maxsize=256)
+def compile_subdict_match(
+    expr, delimiter=DEFAULT_TARGET_DELIM, regex_match=False, exact_match=False
+):
+    """
+    Return a :py:class:`SubdictMatcher` for the expression. The matchers for
+    recently used expressions are reused.
+    """
+    log.debug(
+        "Compiling match of '%s' using delimiter '%s'",
+        expr,
+        delimiter,
+    )
+    return SubdictMatcher(
+        expr, delimiter=delimiter, regex_match=regex_match, exact_match=exact_match
+    )
+
+
+def subdict_match(
+    data, expr, delimiter=DEFAULT_TARGET_DELIM, regex_match=False, exact_match=False
+):
+    """
+    Check for a match in a dictionary using a delimiter character to denote
+    levels of subdicts, and also allowing the delimiter character to be
+    matched. Thus, 'foo:bar:baz' will match data['foo'] == 'bar:baz' and
+    data['foo']['bar'] == 'baz'. The latter would take priority over the
+    former, as more deeply-nested matches are tried first.
+
+    Use :py:func:`compile_subdict_match` to match the same expression against
+    many dictionaries.
+    """
+    return compile_subdict_match(
+        expr, delimiter=delimiter, regex_match=regex_match, exact_match=exact_match
+    ).match(data)
 
 
 @jinja_filter("substring_in_list")
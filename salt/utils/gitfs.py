@@ -14,11 +14,14 @@ import logging
 import multiprocessing
 import os
 import pathlib
+import posixpath
+import queue
 import re
 import shlex
 import shutil
 import stat
 import subprocess
+import threading
 import time
 import weakref
 from datetime import datetime
@@ -26,6 +29,8 @@ from datetime import datetime
 import tornado.ioloop
 
 import salt.fileserver
+import salt.payload
+import salt.utils.atomicfile
 import salt.utils.cache
 import salt.utils.configparser
 import salt.utils.data
@@ -58,6 +63,9 @@ GLOBAL_ONLY = ()
 
 SYMLINK_RECURSE_DEPTH = 100
 
+# Maximum number of blob hashes remembered by a GitFS instance
+BLOB_HASH_CACHE_SIZE = 100000
+
 # Auth support (auth params can be global or per-remote, too)
 AUTH_PROVIDERS = ("pygit2",)
 AUTH_PARAMS = ("user", "password", "pubkey", "privkey", "passphrase", "insecure_auth")
@@ -510,6 +518,11 @@ class GitProvider:
         self._linkdir = salt.utils.path.join(
             cache_root, "links", self._cache_full_basename
         )
+        self._tree_index_dir = salt.utils.path.join(
+            cache_root, "tree_index", self._cache_full_basename
+        )
+        self._tree_index = {}
+        self.use_tree_index = self.opts.get(f"{self.role}_tree_index", False)
         if not os.path.isdir(self._cachedir):
             os.makedirs(self._cachedir)
 
@@ -557,6 +570,9 @@ class GitProvider:
     def get_linkdir(self):
         return self._linkdir
 
+    def get_tree_index_dir(self):
+        return self._tree_index_dir
+
     def get_salt_working_dir(self):
         return self._salt_working_dir
 
@@ -1292,6 +1308,158 @@ class GitProvider:
         # No matches found
         return None
 
+    def _tree_index_path(self, tgt_env):
+        """
+        Return the path of the persisted tree index for the specified
+        environment
+        """
+        return salt.utils.path.join(
+            self._tree_index_dir, "{}.p".format(tgt_env.replace(os.path.sep, "_|-"))
+        )
+
+    def _read_tree_index(self, tgt_env):
+        """
+        Load the persisted tree index for the specified environment. Returns a
+        tuple of the tree ID and the index, or (None, None) if there is no
+        usable persisted index.
+        """
+        index_path = self._tree_index_path(tgt_env)
+        try:
+            with salt.utils.files.fopen(index_path, "rb") as fp_:
+                data = salt.payload.load(fp_)
+            return data["tree"], data["index"]
+        except OSError as exc:
+            if exc.errno != errno.ENOENT:
+                log.error(
+                    "Unable to read %s tree index %s: %s", self.role, index_path, exc
+                )
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error(
+                "Corrupt %s tree index %s, it will be rebuilt: %s",
+                self.role,
+                index_path,
+                exc,
+            )
+        return None, None
+
+    def _write_tree_index(self, tgt_env, tree_id, index):
+        """
+        Persist the tree index for the specified environment, so that it
+        survives restarts and can be shared by all processes on the master
+        """
+        index_path = self._tree_index_path(tgt_env)
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with salt.utils.atomicfile.atomic_open(index_path, "wb") as fp_:
+                salt.payload.dump({"tree": tree_id, "index": index}, fp_)
+        except OSError as exc:
+            log.error(
+                "Unable to write %s tree index %s: %s", self.role, index_path, exc
+            )
+
+    def get_tree_index(self, tgt_env):
+        """
+        Return a dict mapping every blob path in the tree for the specified
+        environment to a ``(blob_hexsha, filemode, size)`` tuple, or None if
+        the environment does not resolve to a tree.
+
+        Indexes are built once per tree. When the environment moves to a new
+        tree (i.e. after a fetch), the index for the old tree is updated by
+        applying the diff between the two trees rather than walking the new
+        tree from scratch.
+        """
+        tree = self.get_tree(tgt_env)
+        if not tree:
+            return None
+        tree_id = self.get_tree_hexsha(tree)
+        try:
+            old_tree_id, index = self._tree_index[tgt_env]
+        except KeyError:
+            old_tree_id, index = self._read_tree_index(tgt_env)
+        if old_tree_id == tree_id:
+            self._tree_index[tgt_env] = (tree_id, index)
+            return index
+
+        start = time.time()
+        new_index = None
+        if old_tree_id is not None:
+            new_index = self._diff_tree_index(old_tree_id, tree, index)
+        if new_index is None:
+            new_index = self._walk_tree_index(tree)
+        log.profile(
+            "%s tree index for remote '%s' (saltenv %s, tree %s) built in %s "
+            "seconds (%s)",
+            self.role,
+            self.id,
+            tgt_env,
+            tree_id,
+            time.time() - start,
+            "full walk" if old_tree_id is None else f"incremental from {old_tree_id}",
+        )
+        self._tree_index[tgt_env] = (tree_id, new_index)
+        self._write_tree_index(tgt_env, tree_id, new_index)
+        return new_index
+
+    def _walk_tree_index(self, tree):
+        """
+        Build a tree index by walking the whole tree. This function must be
+        overridden in a sub-class which supports tree indexes.
+        """
+        raise NotImplementedError()
+
+    def _diff_tree_index(self, old_tree_id, new_tree, index):
+        """
+        Return a new tree index made by applying the diff between the old and
+        new trees to the index of the old tree, or None if the diff cannot be
+        computed. This function must be overridden in a sub-class which
+        supports tree indexes.
+        """
+        raise NotImplementedError()
+
+    def get_checkout_tree(self):
+        """
+        Return the tree object for the branch/tag/SHA that checkout() would
+        check out, or None if it cannot be resolved. The working copy is not
+        touched.
+        """
+        self.fetch_request_check()
+        for tgt_ref in (self.get_checkout_target(), getattr(self, "fallback", "")):
+            if not tgt_ref:
+                continue
+            for func in (
+                self.get_tree_from_branch,
+                self.get_tree_from_tag,
+                self.get_tree_from_sha,
+            ):
+                tree = func(tgt_ref)
+                if tree is not None:
+                    return tree
+        return None
+
+    def get_tree_files(self, tree):
+        """
+        Return a sorted list of the paths of all files in a tree object
+        """
+        return sorted(self._walk_tree_index(tree))
+
+    def find_file_in_tree(self, path, tree):
+        """
+        This function must be overridden in a sub-class
+        """
+        raise NotImplementedError()
+
+    def get_subtree(self, tree, path):
+        """
+        This function must be overridden in a sub-class
+        """
+        raise NotImplementedError()
+
+    def get_tree_hexsha(self, tree):
+        """
+        This function must be overridden in a sub-class
+        """
+        raise NotImplementedError()
+
     def get_url(self):
         """
         Examine self.id and assign self.url (and self.branch, for git_pillar)
@@ -1652,6 +1820,12 @@ class GitPython(GitProvider):
         if not tree:
             # Branch/tag/SHA not found in repo
             return None, None, None
+        return self.find_file_in_tree(path, tree)
+
+    def find_file_in_tree(self, path, tree):
+        """
+        Find the specified file in a git.Tree object
+        """
         blob = None
         depth = 0
         while True:
@@ -1688,6 +1862,52 @@ class GitPython(GitProvider):
             return blob, blob.hexsha, blob.mode
         return None, None, None
 
+    def _walk_tree_index(self, tree):
+        """
+        Build a tree index by traversing a git.Tree object
+        """
+        # The paths of the blobs are relative to the root of the repo, not to
+        # the tree, which is not the root tree when it is a subtree
+        if tree.path:
+
+            def relpath(path):
+                return posixpath.relpath(path, tree.path)
+
+        else:
+
+            def relpath(path):
+                return path
+
+        return {
+            relpath(file_blob.path): (file_blob.hexsha, file_blob.mode, file_blob.size)
+            for file_blob in tree.traverse()
+            if isinstance(file_blob, git.Blob)
+        }
+
+    def _diff_tree_index(self, old_tree_id, new_tree, index):
+        """
+        Incremental index updates are not implemented for GitPython, the new
+        tree will be walked instead.
+        """
+        return None
+
+    def get_subtree(self, tree, path):
+        """
+        Return the git.Tree object at the specified path within a tree, or
+        None if there is no such directory
+        """
+        try:
+            subtree = tree / path
+        except KeyError:
+            return None
+        return subtree if isinstance(subtree, git.Tree) else None
+
+    def get_tree_hexsha(self, tree):
+        """
+        Return the SHA of a git.Tree object
+        """
+        return tree.hexsha
+
     def get_tree_from_branch(self, ref):
         """
         Return a git.Tree object matching a head ref fetched into
@@ -2040,6 +2260,8 @@ class Pygit2(GitProvider):
         """
         Get a list of directories for the target environment using pygit2
         """
+        if self.use_tree_index:
+            return self._indexed_lists(tgt_env)[2]
 
         def _traverse(tree, blobs, prefix):
             """
@@ -2187,6 +2409,8 @@ class Pygit2(GitProvider):
         """
         Get file list for the target environment using pygit2
         """
+        if self.use_tree_index:
+            return self._indexed_lists(tgt_env)[:2]
 
         def _traverse(tree, blobs, prefix):
             """
@@ -2257,10 +2481,18 @@ class Pygit2(GitProvider):
         """
         Find the specified file in the specified environment
         """
+        if self.use_tree_index:
+            return self._indexed_find_file(path, tgt_env)
         tree = self.get_tree(tgt_env)
         if not tree:
             # Branch/tag/SHA not found in repo
             return None, None, None
+        return self.find_file_in_tree(path, tree)
+
+    def find_file_in_tree(self, path, tree):
+        """
+        Find the specified file in a pygit2.Tree object
+        """
         blob = None
         mode = None
         depth = 0
@@ -2294,6 +2526,133 @@ class Pygit2(GitProvider):
             return blob, str(blob.id), mode
         return None, None, None
 
+    def _walk_tree_index(self, tree):
+        """
+        Build a tree index by recursively walking a pygit2 Tree object
+        """
+        index = {}
+
+        def _traverse(tree, prefix):
+            for entry in iter(tree):
+                if entry.id not in self.repo:
+                    # Entry is a submodule, skip it
+                    continue
+                obj = self.repo[entry.id]
+                repo_path = salt.utils.path.join(prefix, entry.name, use_posixpath=True)
+                if isinstance(obj, pygit2.Blob):
+                    index[repo_path] = (str(obj.id), entry.filemode, obj.size)
+                elif isinstance(obj, pygit2.Tree):
+                    _traverse(obj, repo_path)
+
+        _traverse(tree, "")
+        return index
+
+    def _diff_tree_index(self, old_tree_id, new_tree, index):
+        """
+        Apply the diff between two pygit2 Tree objects to the index of the old
+        tree
+        """
+        try:
+            old_tree = self.repo[old_tree_id]
+        except (KeyError, ValueError):
+            # Old tree was garbage collected, or the repo was re-cloned
+            return None
+        if not isinstance(old_tree, pygit2.Tree):
+            return None
+        deltas = list(self.repo.diff(old_tree, new_tree).deltas)
+        new_index = dict(index)
+        # Remove all old paths before adding new ones, typechanges can be
+        # reported as a deletion and an addition of the same path.
+        for delta in deltas:
+            new_index.pop(delta.old_file.path, None)
+        for delta in deltas:
+            if delta.status_char() == "D":
+                continue
+            new_file = delta.new_file
+            if new_file.id not in self.repo:
+                # Entry is a submodule, skip it
+                continue
+            blob = self.repo[new_file.id]
+            if isinstance(blob, pygit2.Blob):
+                new_index[new_file.path] = (str(blob.id), new_file.mode, blob.size)
+        return new_index
+
+    def get_subtree(self, tree, path):
+        """
+        Return the pygit2.Tree object at the specified path within a tree, or
+        None if there is no such directory
+        """
+        try:
+            subtree = self.repo[tree[path].id]
+        except KeyError:
+            return None
+        return subtree if isinstance(subtree, pygit2.Tree) else None
+
+    def get_tree_hexsha(self, tree):
+        """
+        Return the SHA of a pygit2.Tree object
+        """
+        return str(tree.id)
+
+    def _indexed_lists(self, tgt_env):
+        """
+        Return the files, symlinks and dirs for the target environment using
+        the tree index
+        """
+        files = set()
+        symlinks = {}
+        dirs = set()
+        index = self.get_tree_index(tgt_env)
+        if index is None:
+            return files, symlinks, dirs
+        root = self.root(tgt_env)
+        mountpoint = self.mountpoint(tgt_env)
+        prefix = root.rstrip("/") + "/" if root else ""
+        for repo_path, (hexsha, mode, _) in index.items():
+            if not repo_path.startswith(prefix):
+                continue
+            rel_path = repo_path[len(prefix) :]
+            path = salt.utils.path.join(mountpoint, rel_path, use_posixpath=True)
+            files.add(path)
+            if stat.S_ISLNK(mode):
+                symlinks[path] = self.repo[hexsha].data
+            parent = posixpath.dirname(rel_path)
+            while parent:
+                dirs.add(salt.utils.path.join(mountpoint, parent, use_posixpath=True))
+                parent = posixpath.dirname(parent)
+        if files and mountpoint:
+            dirs.add(mountpoint)
+        return files, symlinks, dirs
+
+    def _indexed_find_file(self, path, tgt_env):
+        """
+        Find the specified file in the specified environment using the tree
+        index
+        """
+        index = self.get_tree_index(tgt_env)
+        if index is None:
+            # Branch/tag/SHA not found in repo
+            return None, None, None
+        depth = 0
+        while depth < SYMLINK_RECURSE_DEPTH:
+            depth += 1
+            try:
+                hexsha, mode, _ = index[path]
+            except KeyError:
+                break
+            if stat.S_ISLNK(mode):
+                # Path is a symlink. The blob data corresponding to this
+                # path's object ID will be the target of the symlink. Follow
+                # the symlink and set path to the location indicated
+                # in the blob data.
+                link_tgt = salt.utils.stringutils.to_unicode(self.repo[hexsha].data)
+                path = posixpath.normpath(
+                    posixpath.join(posixpath.dirname(path), link_tgt)
+                )
+                continue
+            return self.repo[hexsha], hexsha, mode
+        return None, None, None
+
     def get_tree_from_branch(self, ref):
         """
         Return a pygit2.Tree object matching a head ref fetched into
@@ -2555,6 +2914,10 @@ class GitBase:
         self.git_providers = (
             git_providers if git_providers is not None else GIT_PROVIDERS
         )
+        self.fetch_durations = {}
+        # The IDs of the remotes whose fetch timed out and is still running
+        self._fetches_in_flight = set()
+        self._fetches_in_flight_lock = threading.Lock()
         self.verify_provider()
         if cache_root is not None:
             self.cache_root = self.remote_root = cache_root
@@ -2563,6 +2926,10 @@ class GitBase:
             self.remote_root = salt.utils.path.join(self.cache_root, "remotes")
         self.env_cache = salt.utils.path.join(self.cache_root, "envs.p")
         self.hash_cachedir = salt.utils.path.join(self.cache_root, "hash")
+        # Content hashes keyed by (blob_hexsha, hash_type). Blobs are immutable,
+        # so a hash never needs to be computed twice for the same blob, no
+        # matter which saltenv or path it is served from.
+        self._blob_hashes = {}
         self.file_list_cachedir = salt.utils.path.join(
             self.opts["cachedir"], "file_lists", self.role
         )
@@ -2786,7 +3153,7 @@ class GitBase:
 
     def _iter_remote_hashes(self):
         for item in os.listdir(self.cache_root):
-            if item in ("hash", "refs", "links", "work"):
+            if item in ("hash", "refs", "links", "work", "tree_index", "trees"):
                 continue
             if os.path.isdir(salt.utils.path.join(self.cache_root, item)):
                 yield item
@@ -2860,79 +3227,183 @@ class GitBase:
             )
             remotes = []
 
-        changed = False
+        to_fetch = []
         for repo in self.remotes:
             name = getattr(repo, "name", None)
             if not remotes or (repo.id, name) in remotes or name in remotes:
-                try:
-                    # Find and place fetch_request file for all the other branches for this repo
-                    repo_work_hash = os.path.split(repo.get_salt_working_dir())[0]
-                    branches = [
-                        os.path.relpath(path, repo_work_hash)
-                        for (path, subdirs, files) in os.walk(repo_work_hash)
-                        if not subdirs
-                    ]
-
-                    for branch in branches:
-                        # Don't place fetch request in current branch being updated
-                        if branch == repo.get_cache_basename():
-                            continue
-                        branch_salt_dir = salt.utils.path.join(repo_work_hash, branch)
-                        fetch_path = salt.utils.path.join(
-                            branch_salt_dir, "fetch_request"
-                        )
-                        if os.path.isdir(branch_salt_dir):
-                            try:
-                                with salt.utils.files.fopen(fetch_path, "w"):
-                                    pass
-                            except OSError as exc:  # pylint: disable=broad-except
-                                log.error(
-                                    "Failed to make fetch request: %s %s",
-                                    fetch_path,
-                                    exc,
-                                    exc_info=True,
-                                )
-                        else:
-                            log.error("Failed to make fetch request: %s", fetch_path)
-                    for branch in os.listdir(repo_work_hash):
-                        # Don't place fetch request in current branch being updated
-                        if branch == repo.get_cache_basename():
-                            continue
-                        branch_salt_dir = salt.utils.path.join(repo_work_hash, branch)
-                        fetch_path = salt.utils.path.join(
-                            branch_salt_dir, "fetch_request"
-                        )
-                        if os.path.isdir(branch_salt_dir):
-                            try:
-                                with salt.utils.files.fopen(fetch_path, "w"):
-                                    pass
-                            except OSError as exc:  # pylint: disable=broad-except
-                                log.error(
-                                    "Failed to make fetch request: %s %s",
-                                    fetch_path,
-                                    exc,
-                                    exc_info=True,
-                                )
-                        else:
-                            log.error("Failed to make fetch request: %s", fetch_path)
-                    if repo.fetch():
-                        # We can't just use the return value from repo.fetch()
-                        # because the data could still have changed if old
-                        # remotes were cleared above. Additionally, we're
-                        # running this in a loop and later remotes without
-                        # changes would override this value and make it
-                        # incorrect.
-                        changed = True
-                except Exception as exc:  # pylint: disable=broad-except
-                    log.error(
-                        "Exception caught while fetching %s remote '%s': %s",
+                with self._fetches_in_flight_lock:
+                    in_flight = repo.id in self._fetches_in_flight
+                if in_flight:
+                    log.warning(
+                        "Skipping %s remote '%s', its previous fetch timed out "
+                        "and has not completed yet",
                         self.role,
                         repo.id,
-                        exc,
-                        exc_info=True,
                     )
+                    continue
+                to_fetch.append(repo)
+
+        self.fetch_durations = {}
+        workers = self.opts.get(f"{self.role}_fetch_workers", 1)
+        if workers <= 1 or len(to_fetch) <= 1:
+            changed = False
+            for repo in to_fetch:
+                # Don't short-circuit, all remotes must be fetched
+                changed = self._fetch_remote(repo) or changed
+            return changed
+        return self._fetch_remotes_concurrently(to_fetch, workers)
+
+    def _fetch_remotes_concurrently(self, to_fetch, workers):
+        """
+        Fetch the passed remotes from up to ``workers`` threads at a time, and
+        return True if any of them were updated.
+
+        Each remote is still fetched under its own update lock, so this is
+        safe when several masters share the cachedir. A fetch which runs for
+        longer than ``<role>_fetch_timeout`` seconds is abandoned: its thread
+        cannot be interrupted and keeps running until the fetch completes, but
+        its result is discarded, and the remote is skipped by the following
+        calls until then. The threads are daemon threads, so that a hung fetch
+        does not keep the process from exiting.
+        """
+        timeout = self.opts.get(f"{self.role}_fetch_timeout", 0)
+        results = queue.Queue()
+        fetch_durations = self.fetch_durations
+        completed = set()
+
+        def _fetch(repo):
+            changed = False
+            try:
+                changed = self._fetch_remote(repo, fetch_durations)
+            finally:
+                with self._fetches_in_flight_lock:
+                    completed.add(repo.id)
+                    self._fetches_in_flight.discard(repo.id)
+                results.put((repo.id, changed))
+
+        changed = False
+        pending = list(to_fetch)
+        # The remotes being fetched, and when their fetch started
+        running = {}
+        while pending or running:
+            while pending and len(running) < workers:
+                repo = pending.pop(0)
+                running[repo.id] = (repo, time.time())
+                thread = threading.Thread(
+                    target=_fetch,
+                    args=(repo,),
+                    name=f"{self.role}-fetch-{repo.id}",
+                    daemon=True,
+                )
+                thread.start()
+            try:
+                repo_id, repo_changed = results.get(timeout=1 if timeout else None)
+            except queue.Empty:
+                pass
+            else:
+                if running.pop(repo_id, None) is not None and repo_changed:
+                    changed = True
+            if not timeout:
+                continue
+            now = time.time()
+            for repo_id, (repo, start) in list(running.items()):
+                if now - start <= timeout:
+                    continue
+                with self._fetches_in_flight_lock:
+                    if repo_id in completed:
+                        # It has just completed, its result is picked up on
+                        # the next loop
+                        continue
+                    # The thread removes it once the fetch completes
+                    self._fetches_in_flight.add(repo_id)
+                running.pop(repo_id)
+                log.error(
+                    "Timed out after %s seconds fetching %s remote '%s'. "
+                    "The fetch will continue in the background, and the "
+                    "remote will be skipped until it completes.",
+                    timeout,
+                    self.role,
+                    repo.id,
+                )
         return changed
 
+    def _fetch_remote(self, repo, fetch_durations=None):
+        """
+        Fetch a single remote, and return True if it was updated. Exceptions
+        are logged and never propagated, so that a broken remote does not keep
+        the others from being updated. The duration of the fetch is recorded
+        in ``fetch_durations``, which defaults to ``self.fetch_durations``.
+        """
+        if fetch_durations is None:
+            fetch_durations = self.fetch_durations
+        start = time.time()
+        try:
+            # Find and place fetch_request file for all the other branches for this repo
+            repo_work_hash = os.path.split(repo.get_salt_working_dir())[0]
+            branches = [
+                os.path.relpath(path, repo_work_hash)
+                for (path, subdirs, files) in os.walk(repo_work_hash)
+                if not subdirs
+            ]
+
+            for branch in branches:
+                # Don't place fetch request in current branch being updated
+                if branch == repo.get_cache_basename():
+                    continue
+                branch_salt_dir = salt.utils.path.join(repo_work_hash, branch)
+                fetch_path = salt.utils.path.join(branch_salt_dir, "fetch_request")
+                if os.path.isdir(branch_salt_dir):
+                    try:
+                        with salt.utils.files.fopen(fetch_path, "w"):
+                            pass
+                    except OSError as exc:  # pylint: disable=broad-except
+                        log.error(
+                            "Failed to make fetch request: %s %s",
+                            fetch_path,
+                            exc,
+                            exc_info=True,
+                        )
+                else:
+                    log.error("Failed to make fetch request: %s", fetch_path)
+            for branch in os.listdir(repo_work_hash):
+                # Don't place fetch request in current branch being updated
+                if branch == repo.get_cache_basename():
+                    continue
+                branch_salt_dir = salt.utils.path.join(repo_work_hash, branch)
+                fetch_path = salt.utils.path.join(branch_salt_dir, "fetch_request")
+                if os.path.isdir(branch_salt_dir):
+                    try:
+                        with salt.utils.files.fopen(fetch_path, "w"):
+                            pass
+                    except OSError as exc:  # pylint: disable=broad-except
+                        log.error(
+                            "Failed to make fetch request: %s %s",
+                            fetch_path,
+                            exc,
+                            exc_info=True,
+                        )
+                else:
+                    log.error("Failed to make fetch request: %s", fetch_path)
+            return bool(repo.fetch())
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error(
+                "Exception caught while fetching %s remote '%s': %s",
+                self.role,
+                repo.id,
+                exc,
+                exc_info=True,
+            )
+            return False
+        finally:
+            duration = time.time() - start
+            fetch_durations[repo.id] = duration
+            log.profile(
+                "%s remote '%s' fetch duration=%s seconds",
+                self.role,
+                repo.id,
+                duration,
+            )
+
     def lock(self, remote=None):
         """
         Place an update.lk
@@ -2971,6 +3442,7 @@ class GitBase:
         data["changed"] = self.clear_old_remotes()
         if self.fetch_remotes(remotes=remotes):
             data["changed"] = True
+        data["fetch_durations"] = dict(self.fetch_durations)
 
         # A masterless minion will need a new env cache file even if no changes
         # were fetched.
@@ -3004,6 +3476,7 @@ class GitBase:
         except OSError:
             # Hash file won't exist if no files have yet been served up
             pass
+        return data["changed"]
 
     def update_intervals(self):
         """
@@ -3372,6 +3845,8 @@ class GitFS(GitBase):
                 """
                 if mode is not None:
                     fnd["stat"] = [mode]
+                if repo.use_tree_index:
+                    fnd["blob"] = blob_hexsha
                 return fnd
 
             salt.fileserver.wait_lock(lk_fn, dest)
@@ -3456,6 +3931,10 @@ class GitFS(GitBase):
         relpath = fnd["rel"]
         path = fnd["path"]
         lc_hash_type = self.opts["hash_type"]
+        blob_key = (fnd["blob"], lc_hash_type) if fnd.get("blob") else None
+        if blob_key in self._blob_hashes:
+            ret["hsum"] = self._blob_hashes[blob_key]
+            return ret
         hashdest = salt.utils.path.join(
             self.hash_cachedir,
             load["saltenv"],
@@ -3464,6 +3943,7 @@ class GitFS(GitBase):
         try:
             with salt.utils.files.fopen(hashdest, "rb") as fp_:
                 ret["hsum"] = fp_.read()
+            self._cache_blob_hash(blob_key, ret["hsum"])
             return ret
         except OSError as exc:
             if exc.errno != errno.ENOENT:
@@ -3478,8 +3958,19 @@ class GitFS(GitBase):
         ret["hsum"] = salt.utils.hashutils.get_hash(path, self.opts["hash_type"])
         with salt.utils.files.fopen(hashdest, "w+") as fp_:
             fp_.write(ret["hsum"])
+        self._cache_blob_hash(blob_key, ret["hsum"])
         return ret
 
+    def _cache_blob_hash(self, blob_key, hsum):
+        """
+        Remember the hash computed for a blob, keeping the cache bounded
+        """
+        if blob_key is None:
+            return
+        if len(self._blob_hashes) >= BLOB_HASH_CACHE_SIZE:
+            self._blob_hashes.clear()
+        self._blob_hashes[blob_key] = hsum
+
     def _file_lists(self, load, form):
         """
         Return a dict containing the file lists for files and dirs
@@ -3597,19 +4088,7 @@ class GitPillar(GitBase):
         for repo in self.remotes:
             cachedir = self.do_checkout(repo, fetch_on_fail=fetch_on_fail)
             if cachedir is not None:
-                # Figure out which environment this remote should be assigned
-                if repo.branch == "__env__" and hasattr(repo, "all_saltenvs"):
-                    env = (
-                        self.opts.get("pillarenv") or self.opts.get("saltenv") or "base"
-                    )
-                elif repo.env:
-                    env = repo.env
-                else:
-                    if repo.branch == repo.base:
-                        env = "base"
-                    else:
-                        tgt = repo.get_checkout_target()
-                        env = "base" if tgt == repo.base else tgt
+                env = self.get_pillar_env(repo)
                 if repo._mountpoint:
                     if self.link_mountpoint(repo):
                         self.pillar_dirs[repo.get_linkdir()] = env
@@ -3617,6 +4096,110 @@ class GitPillar(GitBase):
                 else:
                     self.pillar_dirs[cachedir] = env
 
+    def get_pillar_env(self, repo):
+        """
+        Figure out which environment a remote should be assigned
+        """
+        if repo.branch == "__env__" and hasattr(repo, "all_saltenvs"):
+            return self.opts.get("pillarenv") or self.opts.get("saltenv") or "base"
+        elif repo.env:
+            return repo.env
+        elif repo.branch == repo.base:
+            return "base"
+        tgt = repo.get_checkout_target()
+        return "base" if tgt == repo.base else tgt
+
+    def load_trees(self):
+        """
+        Resolve the targeted branches/tags from the git_pillar remotes to git
+        tree objects, without checking them out. This is used instead of
+        checkout() when git_pillar_checkout is set to False.
+
+        Sets ``pillar_trees``, an ordered mapping of each pillar root to a
+        ``(repo, tree, mountpoint, env)`` tuple. The pillar roots are not
+        checkouts, but per-tree directories in which files are written from
+        the tree objects the first time they are requested (see
+        :py:class:`salt.fileclient.GitPillarClient`). Since a tree is
+        immutable, so are the contents of its directory, and no locking is
+        needed to render from it.
+
+        When every remote was resolved, the directories written for the older
+        trees of the remotes are removed.
+        """
+        self.pillar_trees = OrderedDict()
+        resolved = True
+        for repo in self.remotes:
+            tree = repo.get_checkout_tree()
+            if tree is None:
+                log.error(
+                    "Failed to resolve '%s' for %s remote '%s'",
+                    repo.get_checkout_target(),
+                    self.role,
+                    repo.id,
+                )
+                resolved = False
+                continue
+            root = repo.root()
+            if root:
+                tree = repo.get_subtree(tree, root)
+                if tree is None:
+                    log.error(
+                        "Root directory '%s' not found in %s remote '%s'",
+                        root,
+                        self.role,
+                        repo.id,
+                    )
+                    resolved = False
+                    continue
+            mountpoint = repo._mountpoint
+            env = self.get_pillar_env(repo)
+            # The same remote can be configured with more than one root,
+            # mountpoint and env, so keep them in the directory name to make it
+            # unique. Only the tree ID then changes between commits.
+            suffix = hashlib.sha256(f"{root}\0{mountpoint}\0{env}".encode()).hexdigest()
+            pillar_root = salt.utils.path.join(
+                self.cache_root,
+                "trees",
+                repo.get_cache_basehash(),
+                f"{repo.get_tree_hexsha(tree)}-{suffix[:12]}",
+            )
+            self.pillar_trees[pillar_root] = (repo, tree, mountpoint, env)
+        if resolved:
+            self.prune_trees()
+
+    def prune_trees(self):
+        """
+        Remove the directories written for trees which the remotes in
+        ``pillar_trees`` no longer serve. Only the directories of the same
+        remote, root, mountpoint and env are removed, as other git_pillar
+        configurations can share the remote.
+        """
+        for pillar_root in self.pillar_trees:
+            tree_dir, name = os.path.split(pillar_root)
+            suffix = "-" + name.rsplit("-", 1)[-1]
+            try:
+                items = os.listdir(tree_dir)
+            except OSError:
+                continue
+            for item in items:
+                if item == name or not item.endswith(suffix):
+                    continue
+                path = salt.utils.path.join(tree_dir, item)
+                try:
+                    shutil.rmtree(path)
+                except FileNotFoundError:
+                    # Removed by another process
+                    pass
+                except OSError as exc:
+                    log.error(
+                        "Unable to remove old %s tree directory %s: %s",
+                        self.role,
+                        path,
+                        exc,
+                    )
+                else:
+                    log.debug("%s removed old tree directory %s", self.role, path)
+
     def link_mountpoint(self, repo):
         """
         Ensure that the mountpoint is present in the correct location and
@@ -0,0 +1,331 @@
+"""
+A columnar store of selected grains of all minions, kept by the master
+
+The grains listed in the :conf_master:`grains_store_paths` master option are
+kept in an sqlite database in the master cachedir. This is updated whenever a
+minion's grains are stored in the minion data cache. Fleet-wide questions,
+such as how many minions run each OS release, can then be answered from the
+store, without loading every minion's grains from the minion data cache.
+
+Each grain is a column of ``(path, minion, value_id)`` rows, and the values
+are dictionary-encoded: every distinct value is stored once, in the
+``grain_values`` table. Filters are evaluated against the distinct values of a
+grain, rather than against every minion.
+
+.. versionadded:: 3008.0
+"""
+
+import fnmatch
+import logging
+import os
+import sqlite3
+import time
+
+import salt.utils.data
+import salt.utils.json
+from salt.defaults import DEFAULT_TARGET_DELIM
+from salt.exceptions import SaltInvocationError
+
+log = logging.getLogger(__name__)
+
+DB_NAME = "grains_store.db"
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS grain_values (
+        id INTEGER PRIMARY KEY,
+        value TEXT NOT NULL UNIQUE
+    )""",
+    """CREATE TABLE IF NOT EXISTS grains (
+        path TEXT NOT NULL,
+        minion TEXT NOT NULL,
+        value_id INTEGER NOT NULL,
+        PRIMARY KEY (path, minion)
+    )""",
+    "CREATE INDEX IF NOT EXISTS grains_value ON grains (path, value_id)",
+    "CREATE INDEX IF NOT EXISTS grains_minion ON grains (minion)",
+    "CREATE INDEX IF NOT EXISTS grains_value_id ON grains (value_id)",
+    """CREATE TABLE IF NOT EXISTS minions (
+        minion TEXT PRIMARY KEY,
+        updated REAL NOT NULL
+    )""",
+)
+
+# Marks a grain which the minion does not have
+_MISSING = object()
+
+
+def enabled(opts):
+    """
+    Return whether the grains store is enabled
+    """
+    return bool(opts.get("minion_data_cache", False)) and bool(
+        opts.get("grains_store_paths")
+    )
+
+
+def _match_value(value, pattern):
+    """
+    Return whether the JSON-encoded value of a grain matches the glob, which is
+    done case-insensitively, as when targeting minions by grains. A list
+    matches if any of its items match.
+    """
+    value = salt.utils.json.loads(value)
+    if not isinstance(value, list):
+        value = [value]
+    pattern = pattern.lower()
+    return any(fnmatch.fnmatch(str(item).lower(), pattern) for item in value)
+
+
+def _decode(value):
+    """
+    Return the value to report for a JSON-encoded grain value. Lists and dicts
+    are reported as their JSON, so that they can be used as dict keys.
+    """
+    decoded = salt.utils.json.loads(value)
+    if isinstance(decoded, (list, dict)):
+        return value
+    return decoded
+
+
+def _parse_where(where):
+    """
+    Return a list of ``(path, pattern)`` tuples for the filters, which are
+    passed as ``path:pattern`` strings, in a list or comma-separated
+    """
+    if not where:
+        return []
+    if isinstance(where, str):
+        where = where.split(",")
+    ret = []
+    for item in where:
+        path, sep, pattern = str(item).strip().rpartition(DEFAULT_TARGET_DELIM)
+        if not sep or not path:
+            raise SaltInvocationError(
+                f"Invalid filter '{item}', filters must be in the form path:pattern"
+            )
+        ret.append((path, pattern))
+    return ret
+
+
+class GrainStore:
+    """
+    The grains store of a master
+    """
+
+    def __init__(self, opts):
+        self.opts = opts
+        self.paths = list(opts.get("grains_store_paths") or [])
+        self.path = os.path.join(opts["cachedir"], DB_NAME)
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # Allow the master's workers to read the store while another one
+            # updates it
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.create_function("grain_match", 2, _match_value)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _value_id(self, conn, value):
+        conn.execute("INSERT OR IGNORE INTO grain_values (value) VALUES (?)", (value,))
+        return conn.execute(
+            "SELECT id FROM grain_values WHERE value = ?", (value,)
+        ).fetchone()[0]
+
+    def _replace(self, conn, minion_id, grains, updated):
+        rows = []
+        for path in self.paths:
+            value = salt.utils.data.traverse_dict_and_list(grains or {}, path, _MISSING)
+            if value is _MISSING:
+                continue
+            value = salt.utils.json.dumps(value, sort_keys=True, default=repr)
+            rows.append((path, minion_id, self._value_id(conn, value)))
+        old_ids = {
+            row[0]
+            for row in conn.execute(
+                "SELECT value_id FROM grains WHERE minion = ?", (minion_id,)
+            )
+        }
+        conn.execute("DELETE FROM grains WHERE minion = ?", (minion_id,))
+        conn.executemany(
+            "INSERT INTO grains (path, minion, value_id) VALUES (?, ?, ?)", rows
+        )
+        # Remove the values the minion no longer has, unless another minion
+        # has them
+        old_ids.difference_update(row[2] for row in rows)
+        conn.executemany(
+            "DELETE FROM grain_values WHERE id = ? AND NOT EXISTS "
+            "(SELECT 1 FROM grains WHERE value_id = ?)",
+            [(value_id, value_id) for value_id in old_ids],
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO minions (minion, updated) VALUES (?, ?)",
+            (minion_id, updated),
+        )
+
+    def update(self, minion_id, grains):
+        """
+        Replace the stored grains of a minion, removing the values which are
+        no longer used by any minion
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._replace(conn, minion_id, grains, time.time())
+
+    def rebuild(self, minion_grains):
+        """
+        Replace the contents of the store with the grains of the minions, from
+        an iterable of ``(minion_id, grains)`` tuples
+        """
+        conn = self._connect()
+        updated = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for table in ("grains", "grain_values", "minions"):
+                conn.execute(f"DELETE FROM {table}")  # nosec
+            for minion_id, grains in minion_grains:
+                self._replace(conn, minion_id, grains, updated)
+
+    def remove(self, *minion_ids):
+        """
+        Remove minions from the store, along with the values which are no longer
+        used by any minion
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for minion_id in minion_ids:
+                conn.execute("DELETE FROM grains WHERE minion = ?", (minion_id,))
+                conn.execute("DELETE FROM minions WHERE minion = ?", (minion_id,))
+            conn.execute(
+                "DELETE FROM grain_values WHERE id NOT IN "
+                "(SELECT DISTINCT value_id FROM grains)"
+            )
+
+    def minions(self):
+        """
+        Return the IDs of the minions in the store
+        """
+        return [
+            row[0]
+            for row in self._connect().execute(
+                "SELECT minion FROM minions ORDER BY minion"
+            )
+        ]
+
+    def _check_paths(self, paths):
+        for path in paths:
+            if path not in self.paths:
+                raise SaltInvocationError(
+                    f"Grain '{path}' is not in grains_store_paths, the stored grains"
+                    f" are: {', '.join(self.paths)}"
+                )
+
+    def query(self, group_by=None, where=None, count=False):
+        """
+        Query the store
+
+        group_by
+            A grain path, or a list of them, to count the minions by. The
+            counts are returned in a dict keyed by the values of the grain,
+            nested for each additional path. Minions which do not have all of
+            the grains are not counted.
+
+        where
+            Filters, as ``path:pattern`` strings, which the minions must match.
+            The patterns are globs, which are matched case-insensitively.
+
+        count
+            When not grouping, return the number of matching minions instead of
+            their IDs.
+        """
+        if isinstance(group_by, str):
+            group_by = [path.strip() for path in group_by.split(",")]
+        group_by = list(group_by or [])
+        filters = _parse_where(where)
+        self._check_paths(group_by + [path for path, _ in filters])
+
+        if group_by:
+            columns = ", ".join(f"v{idx}.value" for idx in range(len(group_by)))
+            sql = [f"SELECT {columns}, COUNT(*) FROM minions m"]
+            params = []
+            for idx, path in enumerate(group_by):
+                sql.append(
+                    f"JOIN grains g{idx} ON g{idx}.minion = m.minion"
+                    f" AND g{idx}.path = ?"
+                    f" JOIN grain_values v{idx} ON v{idx}.id = g{idx}.value_id"
+                )
+                params.append(path)
+        else:
+            sql = ["SELECT m.minion FROM minions m"]
+            params = []
+        clauses = []
+        for path, pattern in filters:
+            # The pattern is only matched against each distinct value
+            clauses.append(
+                "m.minion IN (SELECT minion FROM grains WHERE path = ? AND value_id"
+                " IN (SELECT id FROM grain_values WHERE grain_match(value, ?)))"
+            )
+            params.extend((path, pattern))
+        if clauses:
+            sql.append("WHERE " + " AND ".join(clauses))
+        if group_by:
+            sql.append("GROUP BY " + columns)
+        else:
+            sql.append("ORDER BY m.minion")
+
+        rows = self._connect().execute(" ".join(sql), params).fetchall()
+        if not group_by:
+            minions = [row[0] for row in rows]
+            return len(minions) if count else minions
+        ret = {}
+        for row in rows:
+            ptr = ret
+            values = [_decode(value) for value in row[:-1]]
+            for value in values[:-1]:
+                ptr = ptr.setdefault(value, {})
+            ptr[values[-1]] = row[-1]
+        return ret
+
+
+def update(opts, minion_id, grains):
+    """
+    Update the grains store with the grains of a minion, if it is enabled
+    """
+    if not enabled(opts):
+        return
+    try:
+        with GrainStore(opts) as store:
+            store.update(minion_id, grains)
+    except sqlite3.Error as exc:
+        log.error("Failed to update the grains store for %s: %s", minion_id, exc)
+
+
+def remove(opts, *minion_ids):
+    """
+    Remove minions from the grains store, if it is enabled
+    """
+    if not minion_ids or not enabled(opts):
+        return
+    try:
+        with GrainStore(opts) as store:
+            store.remove(*minion_ids)
+    except sqlite3.Error as exc:
+        log.error("Failed to remove minions from the grains store: %s", exc)
@@ -5,14 +5,24 @@ A collection of hashing and encoding utils.
 import base64
 import hashlib
 import hmac
+import logging
 import os
 import random
+import tempfile
+import time
 
 import salt.utils.files
+import salt.utils.json
 import salt.utils.platform
 import salt.utils.stringutils
 from salt.utils.decorators.jinja import jinja_filter
 
+log = logging.getLogger(__name__)
+
+# Files modified this recently are not cached, as a later change within the
+# resolution of the filesystem timestamps would leave their stat unchanged
+HASH_CACHE_MIN_AGE = 2
+
 
 @jinja_filter("base64_encode")
 def base64_b64encode(instr):
@@ -170,6 +180,64 @@ def get_hash(path, form="sha256", chunk_size=65536):
         return hash_obj.hexdigest()
 
 
+def _hash_cache_key(stat):
+    return [stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns]
+
+
+def get_hash_cached(path, cachedir, form="sha256", chunk_size=65536):
+    """
+    Get the hash sum of a file like ``get_hash``, but remember it in
+    ``cachedir``. The hash is reused as long as the device, inode, size,
+    modification time and change time of the file are unchanged, so that
+    large files which have not changed are not read again.
+    """
+    path = os.path.abspath(path)
+    entry_path = os.path.join(cachedir, sha256_digest(path))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return get_hash(path, form, chunk_size)
+    key = _hash_cache_key(stat)
+
+    entry = {}
+    try:
+        with salt.utils.files.fopen(entry_path, "r") as fp_:
+            entry = salt.utils.json.load(fp_)
+    except (OSError, ValueError):
+        pass
+    if entry.get("path") == path and entry.get("stat") == key:
+        if form in entry.get("hashes", {}):
+            return entry["hashes"][form]
+    else:
+        entry = {"path": path, "stat": key, "hashes": {}}
+
+    ret = get_hash(path, form, chunk_size)
+
+    try:
+        stat_after = os.stat(path)
+    except OSError:
+        return ret
+    if (
+        _hash_cache_key(stat_after) != key
+        or time.time() - stat.st_mtime_ns / 1e9 < HASH_CACHE_MIN_AGE
+        or time.time() - stat.st_ctime_ns / 1e9 < HASH_CACHE_MIN_AGE
+    ):
+        # The file was modified while it was hashed, or too recently to tell
+        # later changes apart by their stat
+        return ret
+    entry["hashes"][form] = ret
+    try:
+        os.makedirs(cachedir, mode=0o700, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=cachedir, prefix=".", delete=False
+        ) as fp_:
+            salt.utils.json.dump(entry, fp_)
+        os.replace(fp_.name, entry_path)
+    except OSError as exc:
+        log.debug("Unable to cache the hash of %s: %s", path, exc)
+    return ret
+
+
 class DigestCollector:
     """
     Class to collect digest of the file tree.
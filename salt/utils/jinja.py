@@ -2,12 +2,17 @@
 Jinja loading utils to enable a more powerful backend for jinja templates
 """
 
+import hashlib
+import hmac
+import io
 import itertools
 import logging
 import os.path
 import pprint
 import re
 import shlex
+import tempfile
+import threading
 import time
 import uuid
 import warnings
@@ -18,16 +23,21 @@ from xml.etree.ElementTree import Element, SubElement, tostring
 
 import jinja2
 from jinja2 import BaseLoader, TemplateNotFound, nodes
+from jinja2.bccache import Bucket, BytecodeCache
 from jinja2.environment import TemplateModule
 from jinja2.exceptions import TemplateRuntimeError
 from jinja2.ext import Extension
 
+import salt.utils.atomicfile
 import salt.utils.data
 import salt.utils.files
+import salt.utils.hashutils
 import salt.utils.json
+import salt.utils.platform
 import salt.utils.stringutils
 import salt.utils.url
 import salt.utils.yaml
+import salt.version
 from salt.exceptions import TemplateError
 from salt.utils.decorators.jinja import jinja_filter, jinja_global, jinja_test
 from salt.utils.odict import OrderedDict
@@ -41,11 +51,18 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
-__all__ = ["SaltCacheLoader", "SerializerExtension"]
+__all__ = ["SaltCacheLoader", "SaltBytecodeCache", "SerializerExtension"]
 
 GLOBAL_UUID = uuid.UUID("91633EBF-1C86-5E33-935A-28061F4B480E")
 JINJA_VERSION = Version(jinja2.__version__)
 
+# One bytecode cache per set of environment options, per process
+_BYTECODE_CACHES = {}
+_BYTECODE_CACHES_LOCK = threading.Lock()
+# How often, in seconds, each bytecode cache removes the expired files from
+# the cache directory
+_BYTECODE_CACHE_PRUNE_INTERVAL = 3600
+
 
 class SaltCacheLoader(BaseLoader):
     """
@@ -220,6 +237,289 @@ class SaltCacheLoader(BaseLoader):
         self.destroy()
 
 
+class SaltBytecodeCache(BytecodeCache):
+    """
+    A jinja bytecode cache which keeps the most recently used compiled
+    templates in memory, and all of them on disk.
+
+    The compiled code depends on the options the environment was created
+    with, so a separate cache (and cache directory) must be used for each set
+    of environment options. See :py:func:`get_bytecode_cache`.
+
+    Files on disk are authenticated with an HMAC keyed with ``secret``, as
+    loading them runs the code they hold, and the disk cache is only used
+    when a secret is given. Files which were not used for ``max_age`` seconds
+    are removed from the parent of ``directory``, which holds the caches for
+    the other sets of environment options.
+    """
+
+    def __init__(self, directory=None, size=1000, secret=None, max_age=None):
+        self.directory = directory
+        self.size = size
+        self.secret = secret
+        self.max_age = max_age
+        self._code = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_prune = 0
+
+    def _get_cache_path(self, bucket):
+        return os.path.join(self.directory, f"{bucket.key}.cache")
+
+    def _use_disk(self, bucket):
+        return (
+            self.directory is not None
+            and self.secret is not None
+            and bucket.key is not None
+        )
+
+    def _digest(self, bucket, data):
+        return hmac.new(
+            self.secret,
+            salt.utils.stringutils.to_bytes(bucket.key) + b"\0" + data,
+            hashlib.sha256,
+        ).digest()
+
+    def load_bytecode(self, bucket):
+        """
+        Load the compiled code for the bucket from memory, falling back to
+        the cache directory
+        """
+        mem_key = (bucket.key, bucket.checksum)
+        with self._lock:
+            code = self._code.get(mem_key)
+            if code is not None:
+                self._code.move_to_end(mem_key)
+                bucket.code = code
+                return
+        if not self._use_disk(bucket):
+            return
+        path = self._get_cache_path(bucket)
+        try:
+            with salt.utils.files.fopen(path, "rb") as fp_:
+                data = fp_.read()
+        except OSError:
+            return
+        size = hashlib.sha256().digest_size
+        digest, data = data[:size], data[size:]
+        if not hmac.compare_digest(digest, self._digest(bucket, data)):
+            log.warning(
+                "Ignoring jinja bytecode cache file %s, which failed authentication",
+                path,
+            )
+            return
+        try:
+            # This resets the bucket if the checksum does not match
+            bucket.load_bytecode(io.BytesIO(data))
+        except Exception as exc:  # pylint: disable=broad-except
+            log.debug("Failed to load jinja bytecode cache for %s: %s", bucket.key, exc)
+            bucket.reset()
+            return
+        if bucket.code is not None:
+            self._remember(mem_key, bucket.code)
+            try:
+                # Files are pruned by the time they were last used
+                os.utime(path)
+            except OSError:
+                pass
+
+    def dump_bytecode(self, bucket):
+        """
+        Save the compiled code for the bucket in memory and in the cache
+        directory
+        """
+        self._remember((bucket.key, bucket.checksum), bucket.code)
+        if not self._use_disk(bucket):
+            return
+        buf = io.BytesIO()
+        bucket.write_bytecode(buf)
+        data = buf.getvalue()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with salt.utils.atomicfile.atomic_open(
+                self._get_cache_path(bucket), "wb"
+            ) as fp_:
+                fp_.write(self._digest(bucket, data) + data)
+        except OSError as exc:
+            log.debug(
+                "Failed to write jinja bytecode cache for %s: %s", bucket.key, exc
+            )
+        now = time.time()
+        if now >= self._next_prune:
+            self._next_prune = now + _BYTECODE_CACHE_PRUNE_INTERVAL
+            self.prune()
+
+    def prune(self):
+        """
+        Remove the files in the cache directory, and in the cache directories
+        for other environment options, which were not used for ``max_age``
+        seconds, and the cache directories left empty
+        """
+        if self.directory is None or not self.max_age:
+            return
+        root = os.path.dirname(self.directory)
+        cutoff = time.time() - self.max_age
+        for dirpath, _, filenames in os.walk(root, topdown=False):
+            for name in filenames:
+                if not name.endswith(".cache"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                except OSError:
+                    # Removed by another process
+                    pass
+            if dirpath != root:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    # Not empty
+                    pass
+
+    def _remember(self, mem_key, code):
+        with self._lock:
+            self._code[mem_key] = code
+            self._code.move_to_end(mem_key)
+            while len(self._code) > self.size:
+                self._code.popitem(last=False)
+
+    def clear(self):
+        """
+        Clear the in-memory cache. Files in the cache directory are left in
+        place, they are validated against the template source when loaded.
+        """
+        with self._lock:
+            self._code.clear()
+
+    def get_template_bucket(self, environment, source, tmplpath=None):
+        """
+        Return a bucket for a template which is compiled from a string rather
+        than loaded through the environment's loader. Only templates with a
+        path are cached on disk, to keep the cache directory from growing with
+        every distinct string rendered.
+        """
+        key = self.get_cache_key(tmplpath) if tmplpath else None
+        bucket = Bucket(environment, key, self.get_source_checksum(source))
+        self.load_bytecode(bucket)
+        return bucket
+
+    def compile_template(self, environment, source, tmplpath=None):
+        """
+        Return a template compiled from the source string, reusing the
+        compiled code if it is cached. This is the cached equivalent of
+        ``environment.from_string(source)``.
+        """
+        bucket = self.get_template_bucket(environment, source, tmplpath)
+        if bucket.code is None:
+            bucket.code = environment.compile(source)
+            self.dump_bytecode(bucket)
+        return environment.template_class.from_code(
+            environment, bucket.code, environment.make_globals(None), None
+        )
+
+
+def get_bytecode_cache(opts, env_class, env_args):
+    """
+    Return the bytecode cache to use for a jinja environment of class
+    ``env_class`` created with the options in ``env_args``, or ``None`` if
+    :conf_master:`jinja_bytecode_cache` is disabled.
+
+    Caches are kept for the life of the process, so that the compiled
+    templates are shared by all renders in the process.
+    """
+    if not opts.get("jinja_bytecode_cache", False):
+        return None
+    options = sorted(
+        (key, repr(val))
+        for key, val in env_args.items()
+        if key not in ("loader", "bytecode_cache", "undefined")
+    )
+    options_hash = salt.utils.hashutils.sha256_digest(
+        repr(
+            (
+                env_class.__module__,
+                env_class.__name__,
+                str(JINJA_VERSION),
+                salt.version.__version__,
+                options,
+            )
+        )
+    )
+    root = os.path.join(opts["cachedir"], "jinja")
+    directory = os.path.join(root, options_hash[:16])
+    with _BYTECODE_CACHES_LOCK:
+        bcc = _BYTECODE_CACHES.get(directory)
+        if bcc is None:
+            bcc = _BYTECODE_CACHES[directory] = SaltBytecodeCache(
+                directory,
+                size=opts.get("jinja_bytecode_cache_size", 1000),
+                secret=_get_bytecode_cache_secret(root),
+                max_age=opts.get("jinja_bytecode_cache_max_age", 604800),
+            )
+    return bcc
+
+
+def _is_private(path, mode_mask):
+    """
+    Check that ``path`` is owned by the user salt runs as, and that none of
+    the permissions in ``mode_mask`` are set on it
+    """
+    if salt.utils.platform.is_windows():
+        # The cachedir is protected by its ACL
+        return True
+    st = os.lstat(path)
+    return st.st_uid == os.geteuid() and not st.st_mode & mode_mask
+
+
+def _get_bytecode_cache_secret(root):
+    """
+    Return the secret which authenticates the files in the bytecode cache
+    directory ``root``, creating it if needed. Returns ``None``, so that only
+    the in-memory cache is used, if other users could change the directory or
+    read the secret.
+    """
+    path = os.path.join(root, ".secret")
+    try:
+        with salt.utils.files.set_umask(0o077):
+            os.makedirs(root, exist_ok=True)
+        if not _is_private(root, 0o022):
+            log.warning(
+                "Not caching compiled jinja templates on disk, as %s can be "
+                "written to by other users",
+                root,
+            )
+            return None
+        if not os.path.exists(path):
+            # Link the secret into place, so that concurrent processes all
+            # use the secret of the first one
+            fd_, tmp = tempfile.mkstemp(dir=root)
+            try:
+                with os.fdopen(fd_, "wb") as fp_:
+                    fp_.write(os.urandom(32))
+                try:
+                    os.link(tmp, path)
+                except FileExistsError:
+                    pass
+            finally:
+                os.remove(tmp)
+        if not os.path.isfile(path) or not _is_private(path, 0o077):
+            log.warning(
+                "Not caching compiled jinja templates on disk, as %s is not "
+                "private to the user salt runs as",
+                path,
+            )
+            return None
+        with salt.utils.files.fopen(path, "rb") as fp_:
+            secret = fp_.read()
+    except OSError as exc:
+        log.warning("Failed to read the jinja bytecode cache secret: %s", exc)
+        return None
+    if len(secret) < 32:
+        log.warning("Ignoring the jinja bytecode cache secret %s, too short", path)
+        return None
+    return secret
+
+
 class PrintableDict(OrderedDict):
     """
     Ensures that dict str() and repr() are YAML friendly.
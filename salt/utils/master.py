@@ -18,6 +18,7 @@ import salt.payload
 import salt.pillar
 import salt.utils.atomicfile
 import salt.utils.files
+import salt.utils.grainstore
 import salt.utils.minions
 import salt.utils.platform
 import salt.utils.stringutils
@@ -547,6 +548,7 @@ class MasterPillarUtil:
             # to read in the pillar/grains data since they are both stored
             # in the same file, 'data.p'
             grains, pillars = self._get_cached_minion_data(*minion_ids)
+        cleared_grains = []
         try:
             c_minions = self.cache.list("minions")
             for minion_id in minion_ids:
@@ -570,6 +572,8 @@ class MasterPillarUtil:
                     self.cache.store(bank, "data", {"grains": minion_grains})
                 elif clear_grains and minion_pillar:
                     self.cache.store(bank, "data", {"pillar": minion_pillar})
+                if clear_grains:
+                    cleared_grains.append(minion_id)
                 if clear_mine:
                     # Delete the whole mine file
                     self.cache.flush(bank, "mine")
@@ -581,6 +585,8 @@ class MasterPillarUtil:
                             self.cache.store(bank, "mine", mine_data)
         except OSError:
             return True
+        finally:
+            salt.utils.grainstore.remove(self.opts, *cleared_grains)
         return True
 
 
@@ -15,6 +15,7 @@ import salt.transport
 import salt.utils.data
 import salt.utils.files
 import salt.utils.network
+import salt.utils.presence
 import salt.utils.stringutils
 import salt.utils.versions
 from salt._compat import ipaddress
@@ -338,6 +339,12 @@ class CkMinions:
             if not cminions:
                 return {"minions": minions, "missing": []}
             minions = set(minions)
+            matcher = salt.utils.data.compile_subdict_match(
+                expr,
+                delimiter=delimiter,
+                regex_match=regex_match,
+                exact_match=exact_match,
+            )
             for id_ in cminions:
                 if greedy and id_ not in minions:
                     continue
@@ -346,14 +353,7 @@ class CkMinions:
                     if not greedy:
                         minions.remove(id_)
                     continue
-                search_results = mdata.get(search_type)
-                if not salt.utils.data.subdict_match(
-                    search_results,
-                    expr,
-                    delimiter=delimiter,
-                    regex_match=regex_match,
-                    exact_match=exact_match,
-                ):
+                if not matcher.match(mdata.get(search_type)):
                     minions.remove(id_)
             minions = list(minions)
         return {"minions": minions, "missing": []}
@@ -668,6 +668,10 @@ class CkMinions:
         """
         Return a set of all connected minion ids, optionally within a subset
         """
+        if salt.utils.presence.enabled(self.opts):
+            return salt.utils.presence.connected_ids(
+                self.opts, subset=subset, show_ip=show_ip
+            )
         minions = set()
         if self.opts.get("minion_data_cache", False):
             search = self.cache.list("minions")
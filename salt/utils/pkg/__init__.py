@@ -2,6 +2,7 @@
 Common functions for managing package refreshes during states
 """
 
+import copy
 import errno
 import fnmatch
 import logging
@@ -11,10 +12,35 @@ import sys
 
 import salt.utils.data
 import salt.utils.files
+import salt.utils.hashutils
 import salt.utils.versions
 
 log = logging.getLogger(__name__)
 
+# The files and directories which change whenever packages are installed or
+# removed, for the package managers which keep them
+PKG_DB_PATHS = (
+    "/var/lib/dpkg/status",
+    "/var/lib/rpm/rpmdb.sqlite",
+    "/var/lib/rpm/Packages",
+    "/usr/lib/sysimage/rpm/rpmdb.sqlite",
+    "/usr/lib/sysimage/rpm/Packages",
+    "/var/lib/pacman/local",
+    "/var/lib/apk/db/installed",
+    "/var/db/pkg/local.sqlite",
+)
+
+# The directories holding the repository metadata the package managers query,
+# which change when the metadata is refreshed
+REPO_METADATA_PATHS = (
+    "/var/lib/apt/lists",
+    "/var/cache/dnf",
+    "/var/cache/yum",
+    "/var/cache/zypp/raw",
+    "/var/lib/pacman/sync",
+    "/var/cache/apk",
+)
+
 
 def rtag(opts):
     """
@@ -66,6 +92,78 @@ def check_refresh(opts, refresh=None):
     )
 
 
+def _stat_fingerprint(paths):
+    """
+    Return a hash of the size and modification time of the paths which exist,
+    or None if none of them exist
+    """
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stats.append((path, stat.st_size, stat.st_mtime_ns))
+    if not stats:
+        return None
+    return salt.utils.hashutils.sha256_digest(repr(stats))
+
+
+def db_fingerprint():
+    """
+    Return a hash which changes whenever the package database changes, made
+    from the size and modification time of the package manager's database.
+    Returns None if no known package database is present.
+    """
+    return _stat_fingerprint(PKG_DB_PATHS)
+
+
+def cached_query(context, name, func, *args, **kwargs):
+    """
+    Return the result of ``func(*args, **kwargs)``, a query of the package
+    manager such as a lookup of the versions available from the repositories,
+    caching it in ``context`` (the ``__context__`` of the calling module) so
+    that the states of a run which make the same query share the result.
+    ``name`` and the arguments make up the cache key.
+
+    The cache is dropped when the package database or the repository metadata
+    changes on disk, and by :py:func:`clear_query_cache`, which the package
+    modules call when refreshing the package database and when installing or
+    removing packages.
+
+    A result with a non-zero ``retcode``, such as that of a command which gave
+    up waiting for the package manager's lock, is not cached, so that later
+    queries run the command again.
+    """
+    fingerprint = (
+        _stat_fingerprint(PKG_DB_PATHS),
+        _stat_fingerprint(REPO_METADATA_PATHS),
+    )
+    cache = context.get("pkg.query_cache")
+    if cache is None or cache["fingerprint"] != fingerprint:
+        cache = context["pkg.query_cache"] = {
+            "fingerprint": fingerprint,
+            "queries": {},
+        }
+    key = (name, repr(args), repr(sorted(kwargs.items())))
+    if key in cache["queries"]:
+        log.trace("Using cached result of package query %s", name)
+        return copy.deepcopy(cache["queries"][key])
+    ret = func(*args, **kwargs)
+    if isinstance(ret, dict) and ret.get("retcode", 0) != 0:
+        log.trace("Not caching failed package query %s", name)
+        return ret
+    cache["queries"][key] = ret
+    return copy.deepcopy(ret)
+
+
+def clear_query_cache(context):
+    """
+    Drop the package query results cached by :py:func:`cached_query`
+    """
+    context.pop("pkg.query_cache", None)
+
+
 def split_comparison(version):
     match = re.match(r"^(<=>|!=|>=|<=|>>|<<|<>|>|<|=)?\s?([^<>=]+)$", version)
     if match:
@@ -0,0 +1,191 @@
+"""
+A table of the minions connected to the publishers of the master
+
+When the :conf_master:`presence_table` master option is set, the publish
+servers of the TCP and websocket transports record the minions which connect
+to them, and which disconnect from them, in an sqlite database in the master
+cachedir. The master's processes, such as the workers, and the runners can
+then tell which minions are connected by reading the table, rather than by
+matching the connections to the publish port against the addresses in the
+minion data cache, or by publishing ``test.ping`` to the minions.
+
+Each publisher also updates its heartbeat in the table. The connections of a
+publisher whose heartbeat is older than ``PUBLISHER_TIMEOUT`` seconds, which
+happens when its process died, are ignored.
+
+.. versionadded:: 3008.0
+"""
+
+import logging
+import os
+import sqlite3
+import time
+
+log = logging.getLogger(__name__)
+
+DB_NAME = "presence.db"
+
+# The transports whose publish servers report the connections of the minions
+TRANSPORTS = ("tcp", "ws")
+
+# The interval, in seconds, at which the publishers write the changes to the
+# connections of the minions
+FLUSH_INTERVAL = 1
+
+# The interval, in seconds, at which the publishers update their heartbeat
+HEARTBEAT_INTERVAL = 5
+
+# The number of seconds after which the connections of a publisher which
+# stopped updating its heartbeat are ignored
+PUBLISHER_TIMEOUT = 30
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS publishers (
+        publisher TEXT PRIMARY KEY,
+        heartbeat REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS connections (
+        minion TEXT NOT NULL,
+        publisher TEXT NOT NULL,
+        addr TEXT,
+        connected REAL NOT NULL,
+        seen REAL NOT NULL,
+        PRIMARY KEY (minion, publisher)
+    )""",
+)
+
+
+def enabled(opts):
+    """
+    Return whether the presence table is enabled, which requires all of the
+    transports of the master to report the connections of the minions
+    """
+    if not opts.get("presence_table", False):
+        return False
+    transports = set(opts.get("transport_opts") or {})
+    transports.add(opts.get("transport"))
+    return transports.issubset(TRANSPORTS)
+
+
+class PresenceTable:
+    """
+    The presence table of a master
+    """
+
+    def __init__(self, opts):
+        self.opts = opts
+        self.path = os.path.join(opts["cachedir"], DB_NAME)
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # Allow the master's processes to read the table while a publisher
+            # updates it
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def reset(self, publisher, now=None):
+        """
+        Remove the connections recorded by a publisher, when it starts
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM connections WHERE publisher = ?", (publisher,))
+            conn.execute(
+                "INSERT OR REPLACE INTO publishers (publisher, heartbeat) VALUES (?, ?)",
+                (publisher, time.time() if now is None else now),
+            )
+
+    def update(self, publisher, connected=(), seen=(), disconnected=(), now=None):
+        """
+        Record the changes to the connections of a publisher, and update its
+        heartbeat
+
+        connected
+            ``(minion_id, address)`` tuples of the minions which connected
+
+        seen
+            The IDs of connected minions which sent their ID again
+
+        disconnected
+            The IDs of the minions which disconnected
+        """
+        now = time.time() if now is None else now
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO connections"
+                " (minion, publisher, addr, connected, seen) VALUES (?, ?, ?, ?, ?)",
+                [(minion, publisher, addr, now, now) for minion, addr in connected],
+            )
+            conn.executemany(
+                "UPDATE connections SET seen = ? WHERE minion = ? AND publisher = ?",
+                [(now, minion, publisher) for minion in seen],
+            )
+            conn.executemany(
+                "DELETE FROM connections WHERE minion = ? AND publisher = ?",
+                [(minion, publisher) for minion in disconnected],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO publishers (publisher, heartbeat) VALUES (?, ?)",
+                (publisher, now),
+            )
+
+    def present(self, subset=None, now=None):
+        """
+        Return a dict of the connected minions, with the address each one is
+        connecting from, the time it connected, and the time it last sent its
+        ID to the master
+        """
+        now = time.time() if now is None else now
+        rows = self._connect().execute(
+            "SELECT c.minion, c.addr, c.connected, c.seen FROM connections c"
+            " JOIN publishers p ON p.publisher = c.publisher"
+            " WHERE p.heartbeat >= ? ORDER BY c.minion, c.seen",
+            (now - PUBLISHER_TIMEOUT,),
+        )
+        if subset is not None:
+            subset = set(subset)
+        ret = {}
+        for minion, addr, connected, seen in rows:
+            if subset is not None and minion not in subset:
+                continue
+            if minion in ret:
+                # Connected to more than one publisher
+                connected = min(connected, ret[minion]["connected"])
+            ret[minion] = {"addr": addr, "connected": connected, "seen": seen}
+        return ret
+
+
+def connected_ids(opts, subset=None, show_ip=False):
+    """
+    Return a set of the IDs of the connected minions, or of ``(id, address)``
+    tuples if ``show_ip`` is True
+    """
+    try:
+        with PresenceTable(opts) as table:
+            present = table.present(subset=subset)
+    except sqlite3.Error as exc:
+        log.error("Failed to read the presence table: %s", exc)
+        return set()
+    if show_ip:
+        return {(minion, data["addr"]) for minion, data in present.items()}
+    return set(present)
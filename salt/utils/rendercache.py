@@ -0,0 +1,291 @@
+"""
+Memoization of template renders, keyed by the inputs the render actually read
+
+A render is memoized against the grains, pillar and opts keys which were read
+while rendering it, by passing :py:class:`TrackedDict` copies of those to the
+renderers. A later render of the same template, with the same values for those
+keys, can then reuse the result, even if other keys differ. This lets a fleet
+of similar minions share the results of templates which only depend on a few
+grains.
+
+Any use of the ``salt`` execution module functions makes a render uncacheable,
+as their results cannot be tracked.
+"""
+
+import copy
+import logging
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class _Sentinel:
+    """
+    A marker which keeps its identity when the reads are copied
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+# Marks a key which was looked up, but was not present
+_MISSING = _Sentinel("<missing>")
+# Marks a dependency on the entire contents of a mapping
+_ALL = _Sentinel("<all>")
+
+# Renderers whose output depends only on the template and the tracked inputs
+CACHEABLE_RENDERERS = ("jinja", "yaml", "yamlex", "json", "gpg")
+
+_RENDER_CACHES = {}
+_RENDER_CACHES_LOCK = threading.Lock()
+
+
+class RenderInputs:
+    """
+    Records the inputs read during a render
+    """
+
+    def __init__(self):
+        self.reads = {}
+        self.cacheable = True
+
+    def track(self, name, data):
+        """
+        Return a copy of ``data`` which records the keys read from it
+        """
+        return TrackedDict(data or {}, self, name)
+
+    def untracked(self, name, wrapped):
+        """
+        Return a proxy for ``wrapped`` which makes the render uncacheable when
+        used
+        """
+        return UntrackedProxy(wrapped, self, name)
+
+    def read(self, name, key, value):
+        self.reads.setdefault((name, key), value)
+
+    def read_all(self, name, data):
+        self.reads.setdefault((name, _ALL), dict(data))
+
+    def invalidate(self, reason):
+        if self.cacheable:
+            log.trace("Render is not cacheable: %s", reason)
+        self.cacheable = False
+
+
+class TrackedDict(dict):
+    """
+    A dict which records reads to a :py:class:`RenderInputs` instance. Only
+    the top-level keys are tracked, reading a nested value makes the render
+    depend on the whole top-level value containing it.
+    """
+
+    def __init__(self, data, inputs, name):
+        super().__init__(data)
+        self._inputs = inputs
+        self._name = name
+
+    def __getitem__(self, key):
+        try:
+            value = super().__getitem__(key)
+        except KeyError:
+            self._inputs.read(self._name, key, _MISSING)
+            raise
+        self._inputs.read(self._name, key, value)
+        return value
+
+    def get(self, key, default=None):
+        value = super().get(key, _MISSING)
+        self._inputs.read(self._name, key, value)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key):
+        self._inputs.read(self._name, key, super().get(key, _MISSING))
+        return super().__contains__(key)
+
+    def _read_all(self):
+        self._inputs.read_all(self._name, super().items())
+
+    def __iter__(self):
+        self._read_all()
+        return super().__iter__()
+
+    def __len__(self):
+        self._read_all()
+        return super().__len__()
+
+    def __eq__(self, other):
+        self._read_all()
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._read_all()
+        return super().__repr__()
+
+    def keys(self):
+        self._read_all()
+        return super().keys()
+
+    def values(self):
+        self._read_all()
+        return super().values()
+
+    def items(self):
+        self._read_all()
+        return super().items()
+
+    def copy(self):
+        self._read_all()
+        return dict(super().items())
+
+    def __deepcopy__(self, memo):
+        self._read_all()
+        return copy.deepcopy(dict(super().items()), memo)
+
+    def _write(self, method, *args, **kwargs):
+        self._inputs.invalidate(f"{self._name} modified during render")
+        return getattr(super(), method)(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        self._write("__setitem__", key, value)
+
+    def __delitem__(self, key):
+        self._write("__delitem__", key)
+
+    def setdefault(self, key, default=None):
+        return self._write("setdefault", key, default)
+
+    def pop(self, *args):
+        return self._write("pop", *args)
+
+    def popitem(self):
+        return self._write("popitem")
+
+    def update(self, *args, **kwargs):
+        self._write("update", *args, **kwargs)
+
+    def clear(self):
+        self._write("clear")
+
+
+class UntrackedProxy:
+    """
+    Wraps an object whose use cannot be tracked, such as the execution module
+    loader, and makes the render uncacheable once it is used
+    """
+
+    def __init__(self, wrapped, inputs, name):
+        self._wrapped = wrapped
+        self._inputs = inputs
+        self._name = name
+
+    def __getitem__(self, key):
+        self._inputs.invalidate(f"{self._name}[{key!r}] used during render")
+        return self._wrapped[key]
+
+    def __getattr__(self, key):
+        self._inputs.invalidate(f"{self._name}.{key} used during render")
+        return getattr(self._wrapped, key)
+
+    def __contains__(self, key):
+        self._inputs.invalidate(f"{self._name} used during render")
+        return key in self._wrapped
+
+
+class RenderCache:
+    """
+    An LRU cache of render results. Each key (the template and everything
+    else which is fixed for it) holds the results of renders with different
+    values for the inputs they read.
+    """
+
+    def __init__(self, size=1000):
+        self.size = size
+        self._entries = OrderedDict()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _matches(reads, sources):
+        for (name, key), value in reads.items():
+            data = sources.get(name) or {}
+            if key is _ALL:
+                if dict(data) != value:
+                    return False
+            elif data.get(key, _MISSING) != value:
+                return False
+        return True
+
+    def get(self, key, sources):
+        """
+        Return a copy of the result of a previous render of ``key``, for which
+        the inputs read have the same values in ``sources`` (a dict mapping
+        each tracked name to its current data), or ``None``
+        """
+        with self._lock:
+            variants = self._entries.get(key)
+            if variants is None:
+                return None
+            self._entries.move_to_end(key)
+            variants = list(variants)
+        for reads, result in variants:
+            if self._matches(reads, sources):
+                return copy.deepcopy(result)
+        return None
+
+    def set(self, key, inputs, result):
+        """
+        Store the result of a render of ``key``, if it was cacheable
+        """
+        if not inputs.cacheable:
+            return False
+        try:
+            entry = (copy.deepcopy(inputs.reads), copy.deepcopy(result))
+        except Exception as exc:  # pylint: disable=broad-except
+            log.debug("Unable to cache render result for %s: %s", key, exc)
+            return False
+        with self._lock:
+            self._entries.setdefault(key, []).insert(0, entry)
+            self._entries.move_to_end(key)
+            self._count += 1
+            while self._count > self.size:
+                oldest = next(iter(self._entries))
+                variants = self._entries[oldest]
+                variants.pop()
+                self._count -= 1
+                if not variants:
+                    del self._entries[oldest]
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._count = 0
+
+
+def get_render_cache(name, size=1000):
+    """
+    Return the named render cache. Caches are kept for the life of the
+    process, so that all renders in the process share them.
+    """
+    with _RENDER_CACHES_LOCK:
+        cache = _RENDER_CACHES.get(name)
+        if cache is None:
+            cache = _RENDER_CACHES[name] = RenderCache(size)
+        return cache
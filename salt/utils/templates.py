@@ -422,6 +422,12 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
         else:
             opt_jinja_env_helper(opt_jinja_env, "jinja_env")
 
+        bytecode_cache = salt.utils.jinja.get_bytecode_cache(
+            opts, jinja2.sandbox.SandboxedEnvironment, env_args
+        )
+        if bytecode_cache is not None:
+            env_args["bytecode_cache"] = bytecode_cache
+
         if opts.get("allow_undefined", False):
             jinja_env = jinja2.sandbox.SandboxedEnvironment(**env_args)
         else:
@@ -465,7 +471,10 @@ def render_jinja_tmpl(tmplstr, context, tmplpath=None):
 
         jinja_env.globals.update(decoded_context)
         try:
-            template = jinja_env.from_string(tmplstr)
+            if bytecode_cache is not None:
+                template = bytecode_cache.compile_template(jinja_env, tmplstr, tmplpath)
+            else:
+                template = jinja_env.from_string(tmplstr)
             output = template.render(**decoded_context)
         except jinja2.exceptions.UndefinedError as exc:
             trace = traceback.extract_tb(sys.exc_info()[2])
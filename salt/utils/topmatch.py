@@ -0,0 +1,149 @@
+"""
+Memoization of top file target matches
+
+The result of matching a top file target against a minion only depends on the
+parts of the minion's data which the matcher for that target looks at, such as
+the grains for a grain target. The results are cached by a digest of just those
+parts, so that minions which share them, or a minion whose data has not
+changed, can skip evaluating the target again.
+
+Only the matchers which ship with Salt, and which do not depend on anything
+outside of the minion's ID, grains and pillar and the nodegroups, are cached.
+"""
+
+import hashlib
+import logging
+
+import salt.utils.json
+import salt.utils.minions
+import salt.utils.rendercache
+
+log = logging.getLogger(__name__)
+
+_ALL_INPUTS = ("id", "grains", "pillar", "nodegroups")
+
+# The inputs each matcher reads
+MATCHER_INPUTS = {
+    "glob": ("id",),
+    "pcre": ("id",),
+    "list": ("id",),
+    "grain": ("grains",),
+    "grain_pcre": ("grains",),
+    "ipcidr": ("grains",),
+    "pillar": ("pillar",),
+    "pillar_pcre": ("pillar",),
+    "pillar_exact": ("pillar",),
+    "nodegroup": _ALL_INPUTS,
+}
+
+# The inputs read by each engine of a compound target
+COMPOUND_INPUTS = {
+    None: ("id",),
+    "G": ("grains",),
+    "P": ("grains",),
+    "S": ("grains",),
+    "I": ("pillar",),
+    "J": ("pillar",),
+    "L": ("id",),
+    "E": ("id",),
+    "N": _ALL_INPUTS,
+}
+
+_COMPOUND_OPERATORS = ("and", "or", "not", "(", ")")
+
+
+def _matcher_name(data):
+    """
+    Return the name of the matcher confirm_top uses for the target data
+    """
+    matcher = "compound"
+    for item in data:
+        if isinstance(item, dict) and "match" in item:
+            matcher = item["match"]
+    return matcher
+
+
+def _compound_inputs(match):
+    """
+    Return the inputs read when matching a compound target, or None if it uses
+    an engine which cannot be cached
+    """
+    words = match.split() if isinstance(match, str) else list(match)
+    inputs = set()
+    for word in words:
+        if word in _COMPOUND_OPERATORS:
+            continue
+        engine = salt.utils.minions.parse_target(word)["engine"]
+        if engine not in COMPOUND_INPUTS:
+            return None
+        inputs.update(COMPOUND_INPUTS[engine])
+    return inputs
+
+
+class TopMatcher:
+    """
+    Wraps the ``confirm_top`` matcher of a minion, caching its results
+    """
+
+    def __init__(self, opts, confirm_top, size=10000):
+        self.opts = opts
+        self.confirm_top = confirm_top
+        self.cache = salt.utils.rendercache.get_render_cache("top_match", size)
+        self._digests = {}
+
+    def _input_value(self, name, nodegroups):
+        if name == "id":
+            return self.opts.get("minion_id", self.opts.get("id"))
+        if name == "nodegroups":
+            return nodegroups
+        return self.opts.get(name)
+
+    def _digest(self, name, nodegroups):
+        """
+        Return the digest of one of the inputs, or None if it cannot be
+        serialized
+        """
+        if name not in self._digests:
+            try:
+                serialized = salt.utils.json.dumps(
+                    self._input_value(name, nodegroups), sort_keys=True, default=repr
+                )
+            except (TypeError, ValueError):
+                self._digests[name] = None
+            else:
+                self._digests[name] = hashlib.sha256(serialized.encode()).hexdigest()
+        return self._digests[name]
+
+    def _cache_key(self, match, data, nodegroups):
+        """
+        Return the key the result of matching the target is cached under, or
+        None if it cannot be cached
+        """
+        matcher = _matcher_name(data)
+        if matcher == "compound":
+            if not isinstance(match, (str, list, tuple)):
+                return None
+            inputs = _compound_inputs(match)
+        else:
+            inputs = MATCHER_INPUTS.get(matcher)
+        if inputs is None:
+            return None
+        digests = []
+        for name in sorted(inputs):
+            digest = self._digest(name, nodegroups)
+            if digest is None:
+                return None
+            digests.append((name, digest))
+        return (matcher, repr(match), tuple(digests))
+
+    def __call__(self, match, data, nodegroups=None):
+        key = self._cache_key(match, data, nodegroups)
+        if key is None:
+            return self.confirm_top(match, data, nodegroups)
+        ret = self.cache.get(key, {})
+        if ret is None:
+            ret = bool(self.confirm_top(match, data, nodegroups))
+            self.cache.set(key, salt.utils.rendercache.RenderInputs(), ret)
+        else:
+            log.trace("Using cached result of matching top file target %s", match)
+        return ret
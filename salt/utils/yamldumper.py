@@ -13,6 +13,7 @@ import collections
 import yaml  # pylint: disable=blacklisted-import
 
 import salt.utils.context
+import salt.utils.rendercache
 from salt.utils.odict import HashableOrderedDict, OrderedDict
 
 try:
@@ -90,6 +91,14 @@ SafeOrderedDumper.add_representer(
     salt.utils.context.NamespacedDictWrapper,
     yaml.representer.SafeRepresenter.represent_dict,
 )
+OrderedDumper.add_representer(
+    salt.utils.rendercache.TrackedDict,
+    yaml.representer.SafeRepresenter.represent_dict,
+)
+SafeOrderedDumper.add_representer(
+    salt.utils.rendercache.TrackedDict,
+    yaml.representer.SafeRepresenter.represent_dict,
+)
 
 OrderedDumper.add_representer(
     "tag:yaml.org,2002:timestamp", OrderedDumper.represent_scalar
@@ -87,6 +87,28 @@ def test_recurse(file, tmp_path, grail, test):
         assert name.exists() is False
 
 
+def test_recurse_bulk(file, tmp_path, grail):
+    """
+    file.recurse with bulk=True
+    """
+    name = tmp_path / "grail-dest-dir"
+    ret = file.recurse(name=str(name), source="salt://grail", bulk=True)
+    assert ret.result is True
+    scene_36_src = grail / "36" / "scene"
+    scene_36_dst = name / "36" / "scene"
+    assert scene_36_src.read_text() == scene_36_dst.read_text()
+
+    ret = file.recurse(name=str(name), source="salt://grail", bulk=True)
+    assert ret.result is True
+    assert ret.changes == {}
+
+    scene_36_dst.write_text("changed")
+    ret = file.recurse(name=str(name), source="salt://grail", bulk=True)
+    assert ret.result is True
+    assert list(ret.changes) == [str(scene_36_dst)]
+    assert scene_36_src.read_text() == scene_36_dst.read_text()
+
+
 @pytest.mark.parametrize("saltenv_param", ("__env__", "saltenv"))
 def test_recurse_specific_env(file, tmp_path, holy, saltenv_param):
     """
@@ -1,6 +1,9 @@
 import pytest
 
 import salt.channel.server as server
+import salt.transport.tcp
+import salt.utils.presence
+from tests.support.mock import MagicMock, patch
 
 
 @pytest.fixture
@@ -107,3 +110,35 @@ def test_req_server_validate_token_removes_token_id_traversal(root_dir):
     }
     assert reqsrv.validate_token(payload) is False
     assert "tok" not in payload["load"]
+
+
+def test_pub_server_presence_table(tmp_path):
+    opts = {
+        "cachedir": str(tmp_path),
+        "transport": "tcp",
+        "publish_port": 4505,
+        "presence_table": True,
+    }
+    with patch("salt.master.AESFuncs", MagicMock()), patch(
+        "salt.utils.minions.CkMinions", MagicMock()
+    ), patch("salt.utils.event.get_event", MagicMock()), patch(
+        "tornado.ioloop.PeriodicCallback", MagicMock()
+    ):
+        channel = server.PubServerChannel(opts, MagicMock())
+        web1 = salt.transport.tcp.Subscriber(MagicMock(), ("10.0.0.1", 50000))
+        web1.id_ = "web1"
+        web2 = salt.transport.tcp.Subscriber(MagicMock(), ("10.0.0.2", 50000))
+        web2.id_ = "web2"
+        channel._add_client_present(web1)
+        channel._add_client_present(web2)
+        channel._flush_presence()
+        assert salt.utils.presence.connected_ids(opts, show_ip=True) == {
+            ("web1", "10.0.0.1"),
+            ("web2", "10.0.0.2"),
+        }
+
+        # Changes are only written by the next flush
+        channel._remove_client_present(web2)
+        assert salt.utils.presence.connected_ids(opts) == {"web1", "web2"}
+        channel._flush_presence()
+        assert salt.utils.presence.connected_ids(opts) == {"web1"}
@@ -2,9 +2,11 @@
 Unit Tests for the salt.cli.batch module
 """
 
+import collections
+
 import pytest
 
-from salt.cli.batch import Batch
+from salt.cli.batch import Batch, EventBatch, get_batch
 from tests.support.mock import MagicMock, patch
 
 
@@ -135,3 +137,135 @@ def test_return_value_in_run_for_return(batch):
         verbose=False,
         gather_job_timeout=5,
     )
+
+
+@pytest.fixture
+def event_batch():
+    opts = {
+        "batch": "2",
+        "conf_file": {},
+        "tgt": "*",
+        "tgt_type": "glob",
+        "transport": "",
+        "timeout": 5,
+        "gather_job_timeout": 5,
+        "minion_data_cache": True,
+        "fun": "test.ping",
+        "arg": [],
+    }
+
+    mock_client = MagicMock()
+    with patch("salt.client.get_local_client", MagicMock(return_value=mock_client)):
+        yield EventBatch(opts, quiet=True)
+
+
+def _fake_bus(event_batch, returns):
+    """
+    Make the jobs published by the batch return ``returns[minion]`` from each
+    of their minions, through the event bus, with a retcode of 1 for False.
+    The returns are sent as soon as the job is published, and are lost unless
+    the event subscription was connected first.
+    """
+    events = collections.deque()
+    published = []
+    connected = []
+
+    def run_job(tgt, fun, arg, listen=False, **kwargs):
+        if listen:
+            connected.append(True)
+        jid = f"2024010100000000000{len(published)}"
+        published.append((fun, list(tgt)))
+        if not connected:
+            return {"jid": jid, "minions": list(tgt)}
+        for minion in tgt:
+            if fun == "saltutil.find_job" or minion not in returns:
+                continue
+            events.append(
+                {
+                    "tag": f"salt/job/{jid}/ret/{minion}",
+                    "data": {
+                        "id": minion,
+                        "return": returns[minion],
+                        "retcode": 0 if returns[minion] else 1,
+                    },
+                }
+            )
+        return {"jid": jid, "minions": list(tgt)}
+
+    event_batch.local.run_job = run_job
+    event_batch.local.event.connect_pub = lambda **kwargs: connected.append(True)
+    event_batch.local.event.get_event = lambda **kwargs: (
+        events.popleft() if events else None
+    )
+    return published
+
+
+def test_get_batch():
+    with patch("salt.client.get_local_client", MagicMock()):
+        assert type(get_batch({"conf_file": {}})) is Batch
+        assert isinstance(
+            get_batch({"conf_file": {}, "batch_event_driven": True}), EventBatch
+        )
+        assert (
+            type(
+                get_batch(
+                    {"conf_file": {}, "batch_event_driven": True, "order_masters": True}
+                )
+            )
+            is Batch
+        )
+
+
+def test_event_batch_gather_minions(event_batch):
+    ckminions = MagicMock()
+    ckminions.check_minions.return_value = {"minions": ["foo", "bar", "baz"]}
+    ckminions.connected_ids.return_value = {"foo", "baz"}
+    with patch("salt.utils.minions.CkMinions", MagicMock(return_value=ckminions)):
+        assert event_batch.gather_minions() == (["foo", "baz"], None, {"bar"})
+    ckminions.connected_ids.assert_called_once_with(subset=["foo", "bar", "baz"])
+
+
+def test_event_batch_run(event_batch):
+    minions = ["m1", "m2", "m3", "m4", "m5"]
+    event_batch.gather_minions = MagicMock(return_value=(minions, None, set()))
+    published = _fake_bus(event_batch, {minion: True for minion in minions})
+    ret = dict(item for result, _ in event_batch.run() for item in result.items())
+    assert ret == {minion: True for minion in minions}
+    # Each job is published to the free slots of the batch as a list target
+    assert published == [
+        ("test.ping", ["m1", "m2"]),
+        ("test.ping", ["m3", "m4"]),
+        ("test.ping", ["m5"]),
+    ]
+    assert event_batch.metrics["returns"] == 5
+    assert event_batch.metrics["publishes"] == 3
+    assert event_batch.metrics["lost"] == 0
+
+
+def test_event_batch_run_immediate_returns(event_batch):
+    event_batch.opts.update(timeout=0, gather_job_timeout=0)
+    event_batch.gather_minions = MagicMock(return_value=(["m1", "m2"], None, set()))
+    published = _fake_bus(event_batch, {"m1": True, "m2": True})
+    # Returns sent right after the first publish are received, so no minion is
+    # checked for still running the job or reported as lost
+    assert list(event_batch.run()) == [({"m1": True}, 0), ({"m2": True}, 0)]
+    assert published == [("test.ping", ["m1", "m2"])]
+    assert event_batch.metrics["lost"] == 0
+
+
+def test_event_batch_run_no_return(event_batch):
+    event_batch.opts.update(timeout=0, gather_job_timeout=0)
+    event_batch.gather_minions = MagicMock(return_value=(["m1", "m2"], None, set()))
+    published = _fake_bus(event_batch, {"m1": True})
+    assert list(event_batch.run()) == [({"m1": True}, 0), ({"m2": {}}, 0)]
+    # The minion which did not return was checked for still running the job
+    assert ("saltutil.find_job", ["m2"]) in published
+    assert event_batch.metrics["lost"] == 1
+
+
+def test_event_batch_run_failhard(event_batch):
+    event_batch.opts.update(batch="1", failhard=True)
+    event_batch.gather_minions = MagicMock(return_value=(["m1", "m2"], None, set()))
+    published = _fake_bus(event_batch, {"m1": False, "m2": True})
+    assert list(event_batch.run()) == [({"m1": False}, 1)]
+    assert published == [("test.ping", ["m1"])]
@@ -0,0 +1,232 @@
+"""
+Unit Tests for the salt.cli.batch_async module
+"""
+
+import pytest
+
+import salt.cli.batch_async
+import salt.utils.event
+from tests.support.mock import AsyncMock, MagicMock, patch
+
+
+@pytest.fixture
+def load():
+    return {
+        "jid": "20260101000000000000",
+        "tgt": "*",
+        "tgt_type": "glob",
+        "user": "root",
+        "fun": "test.ping",
+        "arg": [],
+        "ret": "",
+        "minions": ["a", "b", "c"],
+        "missing": [],
+        "batch": {
+            "batch": "2",
+            "batch_wait": 0,
+            "timeout": 5,
+            "gather_job_timeout": 5,
+            "failhard": False,
+        },
+    }
+
+
+@pytest.fixture
+def returners(load):
+    return {
+        "local_cache.get_load": MagicMock(return_value=load),
+        "local_cache.save_load": MagicMock(),
+        "local_cache.returner": MagicMock(),
+    }
+
+
+@pytest.fixture
+def scheduler(returners):
+    opts = {
+        "master_job_cache": "local_cache",
+        "minion_data_cache": False,
+        "sock_dir": "",
+    }
+    local = MagicMock()
+    local.run_job_async = AsyncMock(side_effect=lambda *args, **kwargs: kwargs)
+    mminion = MagicMock(returners=returners)
+    with patch("salt.client.get_local_client", MagicMock(return_value=local)), patch(
+        "salt.minion.MasterMinion", MagicMock(return_value=mminion)
+    ), patch("salt.utils.event.get_master_event", MagicMock()), patch(
+        "salt.utils.minions.CkMinions", MagicMock()
+    ):
+        yield salt.cli.batch_async.BatchScheduler(opts)
+
+
+def _published(scheduler):
+    return [
+        (call.args[0], call.args[1], call.kwargs["jid"])
+        for call in scheduler.local.run_job_async.call_args_list
+    ]
+
+
+def _event(tag, data):
+    return salt.utils.event.SaltEvent.pack(tag, data)
+
+
+async def test_run_batch(scheduler, load, returners):
+    await scheduler.handle_event(_event("salt/batch/20260101000000000000/new", {}))
+    assert list(scheduler.batches) == ["20260101000000000000"]
+    ((minions, fun, jid),) = _published(scheduler)
+    assert (minions, fun) == (["a", "b"], "test.ping")
+    assert scheduler.local.run_job_async.call_args.kwargs["metadata"] == {
+        "batch_jid": "20260101000000000000"
+    }
+
+    await scheduler.handle_event(_event(f"salt/job/{jid}/ret/a", {"return": True}))
+    returners["local_cache.returner"].assert_called_once()
+    assert returners["local_cache.returner"].call_args[0][0]["jid"] == (
+        "20260101000000000000"
+    )
+    # The slot of the minion which returned is filled
+    assert [call[0] for call in _published(scheduler)] == [["a", "b"], ["c"]]
+    third = _published(scheduler)[1][2]
+
+    await scheduler.handle_event(_event(f"salt/job/{jid}/ret/b", {"return": True}))
+    returners["local_cache.save_load"].assert_not_called()
+    await scheduler.handle_event(_event(f"salt/job/{third}/ret/c", {"return": True}))
+
+    assert not scheduler.batches
+    assert not scheduler.jobs
+    saved = returners["local_cache.save_load"].call_args[0][1]["progress"]
+    assert saved["done"] == ["a", "b", "c"]
+    assert saved["finished"] is True
+    scheduler.event.fire_event.assert_called_once()
+    assert scheduler.event.fire_event.call_args[0][1] == (
+        "salt/batch/20260101000000000000/done"
+    )
+
+
+async def test_start_batch_not_a_batch(scheduler, load, returners):
+    load.pop("batch")
+    await scheduler.start_batch("20260101000000000000")
+    load["batch"] = {"batch": "1", "timeout": 5, "gather_job_timeout": 5}
+    load["progress"] = {}
+    await scheduler.start_batch("20260101000000000000")
+    assert not scheduler.batches
+    scheduler.local.run_job_async.assert_not_called()
+
+
+async def test_check_batches_lost(scheduler, load, returners):
+    await scheduler.start_batch("20260101000000000000")
+    ((_, _, jid),) = _published(scheduler)
+    batch = scheduler.batches["20260101000000000000"]
+
+    await scheduler.check_batches(batch.start + 6)
+    minions, fun, find_jid = _published(scheduler)[1]
+    assert (minions, fun) == (["a", "b"], "saltutil.find_job")
+    # b is still running the job
+    await scheduler.handle_event(
+        _event(f"salt/job/{find_jid}/ret/b", {"return": {"jid": jid}})
+    )
+
+    await scheduler.check_batches(batch.start + 12)
+    assert batch.lost == ["a"]
+    assert [call[0] for call in _published(scheduler)[2:]] == [["c"]]
+    assert returners["local_cache.save_load"].call_args[0][1]["progress"][
+        "running"
+    ] == ["b", "c"]
+
+
+async def test_failhard(scheduler, load, returners):
+    load["batch"]["batch"] = "1"
+    load["batch"]["failhard"] = True
+    await scheduler.start_batch("20260101000000000000")
+    ((_, _, jid),) = _published(scheduler)
+    await scheduler.handle_event(
+        _event(f"salt/job/{jid}/ret/a", {"return": False, "retcode": 1})
+    )
+    assert len(_published(scheduler)) == 1
+    assert not scheduler.batches
+    progress = returners["local_cache.save_load"].call_args[0][1]["progress"]
+    assert progress["failhard"] is True
+    assert progress["pending"] == 2
+
+
+async def test_resume_batches(scheduler, load, returners):
+    """
+    The batches which did not finish are resumed when the scheduler starts,
+    and the batches which were never started are started
+    """
+    load["minions"] = ["a", "b", "c", "d", "e"]
+    load["progress"] = {
+        "pending": 2,
+        "running": ["c"],
+        "done": ["a"],
+        "lost": ["b"],
+        "down": [],
+        "failhard": False,
+        "finished": False,
+        "elapsed": 10,
+    }
+    new_load = dict(load, jid="20260101000000000001")
+    new_load.pop("progress")
+    loads = {
+        "20260101000000000000": load,
+        "20260101000000000001": new_load,
+        "20260101000000000002": dict(
+            load, jid="20260101000000000002", progress={"finished": True}
+        ),
+        "20260101000000000003": {"jid": "20260101000000000003", "fun": "test.ping"},
+    }
+    returners["local_cache.get_load"].side_effect = loads.get
+    returners["local_cache.get_jids"] = MagicMock(
+        return_value={jid: {"Function": loads[jid]["fun"]} for jid in loads}
+    )
+    await scheduler.resume_batches()
+    assert sorted(scheduler.batches) == [
+        "20260101000000000000",
+        "20260101000000000001",
+    ]
+    resumed = scheduler.batches["20260101000000000000"]
+    assert resumed.done == ["a"]
+    assert resumed.lost == ["b", "c"]
+    published = _published(scheduler)
+    assert [minions for minions, _, _ in published] == [["d", "e"], ["a", "b"]]
+
+    # A resumed batch finishes as usual
+    jid = published[0][2]
+    for minion in ("d", "e"):
+        await scheduler.handle_event(
+            _event(f"salt/job/{jid}/ret/{minion}", {"return": True})
+        )
+    assert "20260101000000000000" not in scheduler.batches
+    progress = returners["local_cache.save_load"].call_args[0][1]["progress"]
+    assert progress["done"] == ["a", "d", "e"]
+    assert progress["lost"] == ["b", "c"]
+    assert progress["finished"] is True
+    assert scheduler.event.fire_event.call_args[0][1] == (
+        "salt/batch/20260101000000000000/done"
+    )
+
+
+async def test_resume_batches_failhard(scheduler, load, returners):
+    """
+    A failhard batch whose minions were running when the scheduler stopped
+    finishes when it is resumed
+    """
+    load["batch"]["failhard"] = True
+    load["progress"] = {
+        "running": ["a", "b"],
+        "done": [],
+        "lost": [],
+        "down": [],
+        "failhard": False,
+        "finished": False,
+        "elapsed": 1,
+    }
+    returners["local_cache.get_jids"] = MagicMock(
+        return_value={"20260101000000000000": {"Function": "test.ping"}}
+    )
+    await scheduler.resume_batches()
+    assert not scheduler.batches
+    scheduler.local.run_job_async.assert_not_called()
+    progress = returners["local_cache.save_load"].call_args[0][1]["progress"]
+    assert progress["failhard"] is True
+    assert progress["finished"] is True
+    scheduler.event.fire_event.assert_called_once()
@@ -2,6 +2,7 @@ import pytest
 
 import salt.client
 from salt.exceptions import SaltInvocationError
+from tests.support.mock import MagicMock, patch
 
 
 @pytest.fixture
@@ -273,3 +274,17 @@ def test_prep_pub_ext_job_cache_existing(master_opts):
         "user": local_client.salt_user,
     }
     assert result == expected
+
+
+def test_run_batch_async(master_opts):
+    local_client = salt.client.get_local_client(mopts=master_opts)
+    send = MagicMock(return_value={"jid": "123", "minions": ["spongebob"]})
+    with patch.object(local_client, "_send_pub_load", send):
+        result = local_client.run_batch_async(
+            "*", "test.ping", batch="2", batch_wait=1, timeout=30
+        )
+    assert result == {"jid": "123", "minions": ["spongebob"]}
+    payload = send.call_args[0][0]
+    assert payload["cmd"] == "publish_batch"
+    assert payload["fun"] == "test.ping"
+    assert payload["kwargs"] == {"batch": "2", "batch_wait": 1, "timeout": 30}
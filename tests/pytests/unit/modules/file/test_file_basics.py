@@ -11,6 +11,7 @@ import salt.modules.config as configmod
 import salt.modules.file as filemod
 import salt.utils.data
 import salt.utils.files
+import salt.utils.hashutils
 import salt.utils.platform
 import salt.utils.stringutils
 from tests.support.mock import MagicMock, call, patch
@@ -309,3 +310,23 @@ def test_symlink_lexists_called_follow_symlinks_true():
         filemod.symlink(tfile, a_link, follow_symlinks=True)
         lexists.assert_not_called()
         exists.assert_called()
+
+
+def test_get_hash_file_hash_cache(tmp_path):
+    path = tmp_path / "file"
+    path.write_bytes(b"foo")
+    expected = salt.utils.hashutils.get_hash(str(path))
+    with patch.dict(
+        filemod.__opts__, {"file_hash_cache": True, "cachedir": str(tmp_path)}
+    ), patch(
+        "salt.utils.hashutils.get_hash_cached", return_value=expected
+    ) as get_hash_cached:
+        assert filemod.get_hash(str(path)) == expected
+        assert filemod.get_sum(str(path), "sha256") == expected
+        assert filemod.check_hash(str(path), expected)
+    assert get_hash_cached.call_count == 3
+    assert get_hash_cached.call_args[0][:3] == (
+        str(path),
+        str(tmp_path / "file_hashes"),
+        "sha256",
+    )
@@ -549,6 +549,92 @@ def test_unfinished_block_exception(multiline_file):
         )
 
 
+def test_replace_diff_max_lines(subdir):
+    path = subdir / "replace.txt"
+    path.write_text("".join(f"line {idx}\n" for idx in range(1000)))
+    with patch.dict(filemod.__opts__, {"file_diff_max_lines": 50}):
+        ret = filemod.replace(str(path), "^line", "LINE")
+    diff_lines = ret.splitlines()
+    assert diff_lines[:4] == ["--- ", "+++ ", "@@ -1,1000 +1,1000 @@", "-line 0"]
+    assert len(diff_lines) == 51
+    assert diff_lines[-1] == "[Diff truncated after 50 lines]"
+    assert path.read_text() == "".join(f"LINE {idx}\n" for idx in range(1000))
+
+
+def test_blockreplace_diff_max_lines(subdir):
+    path = subdir / "blockreplace.txt"
+    old_lines = "".join(f"old {idx}\n" for idx in range(1000))
+    path.write_text(f"head\n#-- START\n{old_lines}#-- END\ntail\n")
+    new_lines = "".join(f"new {idx}\n" for idx in range(1000))
+    with patch.dict(filemod.__opts__, {"file_diff_max_lines": 50}):
+        ret = filemod.blockreplace(
+            str(path), "#-- START", "#-- END", new_lines, backup=False
+        )
+    diff_lines = ret.splitlines()
+    assert diff_lines[:6] == [
+        "--- ",
+        "+++ ",
+        "@@ -1,1004 +1,1004 @@",
+        " head",
+        " #-- START",
+        "-old 0",
+    ]
+    assert len(diff_lines) == 51
+    assert diff_lines[-1] == "[Diff truncated after 50 lines]"
+    assert path.read_text() == f"head\n#-- START\n{new_lines}#-- END\ntail\n"
+
+
+def test_blockreplace_reads_twice(subdir):
+    """
+    The file is read once to find the block, and once to compare and write
+    the edited lines. No temporary file is left behind when nothing changed.
+    """
+    path = subdir / "blockreplace.txt"
+    path.write_text("head\n#-- START\nold\n#-- END\ntail\n")
+    fopen = salt.utils.files.fopen
+    reads = []
+
+    def _fopen(name, mode="r", **kwargs):
+        if str(name) == str(path) and "r" in mode:
+            reads.append(mode)
+        return fopen(name, mode, **kwargs)
+
+    with patch("salt.utils.files.fopen", _fopen):
+        filemod.blockreplace(str(path), "#-- START", "#-- END", "new\n", backup=False)
+        assert len(reads) == 2
+        assert path.read_text() == "head\n#-- START\nnew\n#-- END\ntail\n"
+        reads.clear()
+        filemod.blockreplace(str(path), "#-- START", "#-- END", "new\n", backup=False)
+        assert len(reads) == 2
+    assert os.listdir(str(subdir)) == ["blockreplace.txt"]
+
+
+def test_blockreplace_file_changed(subdir):
+    """
+    The edits are not applied to a file which changed after they were found
+    """
+    path = subdir / "blockreplace.txt"
+    path.write_text("head\n#-- START\nold\n#-- END\ntail\n")
+    fopen = salt.utils.files.fopen
+    reads = []
+
+    def _fopen(name, mode="r", **kwargs):
+        if str(name) == str(path) and "r" in mode:
+            reads.append(mode)
+            if len(reads) == 2:
+                with fopen(name, "a") as fp_:
+                    fp_.write("added\n")
+        return fopen(name, mode, **kwargs)
+
+    with patch("salt.utils.files.fopen", _fopen):
+        with pytest.raises(CommandExecutionError, match="was changed"):
+            filemod.blockreplace(
+                str(path), "#-- START", "#-- END", "new\n", backup=False
+            )
+    assert path.read_text() == "head\n#-- START\nold\n#-- END\ntail\nadded\n"
+    assert os.listdir(str(subdir)) == ["blockreplace.txt"]
+
+
 def test_search_proc_file():
     """
     Test that searching content in a /proc file does not raise a TypeError
@@ -1,3 +1,4 @@
+import difflib
 import logging
 import os
 import re
@@ -580,6 +581,39 @@ def test_get_diff():
             assert ret == "Replace binary file with text file"
 
 
+@pytest.mark.parametrize(
+    "old,new",
+    [
+        (["a\n", "b\n", "c\n"], ["a\n", "b\n", "c\n"]),
+        (["a\n", "b\n", "c\n"], ["a\n", "B\n", "c\n"]),
+        ([], ["a\n", "b\n"]),
+        (["a\n", "b\n"], []),
+        (["a\n", "b\n", "c\n", "d\n"], ["x\n", "y\n", "c\n", "d\n", "e\n"]),
+        (
+            [f"{idx}\n" for idx in range(30)],
+            [f"{idx}\n" for idx in range(30) if idx not in (2, 9, 10, 25)],
+        ),
+        (
+            [f"{idx}\n" for idx in range(30)],
+            [f"{idx * 2}\n" if idx % 7 == 0 else f"{idx}\n" for idx in range(30)],
+        ),
+    ],
+)
+def test__streaming_diff(old, new):
+    diff = filemod._StreamingDiff()
+    diff.compare(old, new)
+    assert diff.result() == "".join(difflib.unified_diff(old, new, "", ""))
+
+
+def test__streaming_diff_truncated():
+    old = [f"{idx}\n" for idx in range(100)]
+    new = [f"new {idx}\n" for idx in range(100)]
+    diff = filemod._StreamingDiff(max_lines=10)
+    diff.compare(old, new)
+    expected = "".join(list(difflib.unified_diff(old, new, "", ""))[:10])
+    assert diff.result() == expected + "[Diff truncated after 10 lines]\n"
+
+
 def test_stats():
     with patch("os.path.expanduser", MagicMock(side_effect=lambda path: path)), patch(
         "os.path.exists", MagicMock(return_value=True)
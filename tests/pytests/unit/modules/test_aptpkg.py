@@ -1674,6 +1674,7 @@ def test_latest_version_fromrepo():
                 f"APT::Default-Release={fromrepo}",
             ],
             scope=False,
+            cache=True,
         )
 
 
@@ -1743,6 +1744,7 @@ def test_latest_version_fromrepo_multiple_names():
                 "APT::Default-Release=jammy-updates",
             ],
             scope=False,
+            cache=True,
         )
 
 
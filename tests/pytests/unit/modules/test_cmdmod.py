@@ -11,6 +11,8 @@ import os
 import re
 import sys
 import tempfile
+import threading
+import time
 
 import pytest
 
@@ -553,6 +555,128 @@ def test_run_cwd_in_combination_with_runas():
     assert stdout == cwd
 
 
+@pytest.mark.skip_on_windows
+def test_retcode_many():
+    """
+    cmd.retcode_many returns the return code and run time of each command,
+    in the order they were given
+    """
+    ret = cmdmod.retcode_many(
+        ["sleep 0.5; exit 1", "exit 0", "exit 3"], concurrency=3, python_shell=True
+    )
+    assert [result["cmd"] for result in ret] == [
+        "sleep 0.5; exit 1",
+        "exit 0",
+        "exit 3",
+    ]
+    assert [result["retcode"] for result in ret] == [1, 0, 3]
+    assert ret[0]["duration"] >= 500
+    assert ret[1]["duration"] < 500
+
+
+def test_retcode_many_error():
+    with patch(
+        "salt.modules.cmdmod._run",
+        MagicMock(side_effect=[{"retcode": 0}, CommandExecutionError("No shell")]),
+    ):
+        ret = cmdmod.retcode_many(["true", "false"], concurrency=1)
+    assert ret[0]["retcode"] == 0
+    assert "error" not in ret[0]
+    assert ret[1]["retcode"] is None
+    assert ret[1]["error"] == "No shell"
+
+
+@pytest.mark.skip_on_windows
+@pytest.mark.skip_on_darwin
+def test_retcode_many_runas_env_retrieved_once():
+    """
+    The login environment of the runas user is only retrieved once for all
+    of the commands
+    """
+    runas_env = {"HOME": "/home/foobar", "USER": "foobar"}
+    mock_get_env = MagicMock(return_value=runas_env)
+    mock_run = MagicMock(return_value={"retcode": 0})
+    with patch("pwd.getpwnam", MagicMock()), patch(
+        "salt.modules.cmdmod._get_runas_env", mock_get_env
+    ), patch("salt.modules.cmdmod._run", mock_run):
+        ret = cmdmod.retcode_many(["true"] * 5, runas="foobar")
+    assert [result["retcode"] for result in ret] == [0] * 5
+    mock_get_env.assert_called_once()
+    assert mock_run.call_count == 5
+    for call in mock_run.call_args_list:
+        assert call.kwargs["runas_env"] is runas_env
+
+
+@pytest.mark.skip_on_windows
+@pytest.mark.parametrize(
+    "kwargs", ({"runas": "foobar"}, {"group": "foobar"}, {"umask": "022"})
+)
+def test_retcode_many_preexec_fn_serial(kwargs):
+    """
+    Commands which switch the user, group or umask between the fork and the
+    exec are run one at a time, from the calling thread
+    """
+    threads = []
+
+    def _run(cmd, **kwargs):
+        threads.append(threading.current_thread())
+        return {"retcode": 0}
+
+    with patch("pwd.getpwnam", MagicMock()), patch("grp.getgrnam", MagicMock()), patch(
+        "salt.modules.cmdmod._get_runas_env", MagicMock(return_value={})
+    ), patch("salt.modules.cmdmod._run", _run), patch(
+        "concurrent.futures.ThreadPoolExecutor",
+        MagicMock(side_effect=AssertionError("thread pool used")),
+    ):
+        ret = cmdmod.retcode_many(["true"] * 3, concurrency=3, **kwargs)
+    assert [result["retcode"] for result in ret] == [0] * 3
+    assert threads == [threading.current_thread()] * 3
+
+
+@pytest.mark.skip_on_windows
+def test_get_runas_env_cached(tmp_path):
+    """
+    The login environment of a runas user is cached in __context__ and on
+    disk, until the files it depends on change or the TTL expires
+    """
+    runas_env = {"HOME": "/home/foobar", "USER": "foobar"}
+    mock_discover = MagicMock(return_value=runas_env)
+    fingerprint = [[1000, 1000, "/home/foobar", "/bin/bash"]]
+    mock_fingerprint = MagicMock(return_value=fingerprint)
+    context = {}
+    opts = {"cachedir": str(tmp_path), "cmd_runas_env_cache_ttl": 300}
+    with patch.dict(cmdmod.__opts__, opts), patch.object(
+        cmdmod, "__context__", context, create=True
+    ), patch("salt.modules.cmdmod._discover_runas_env", mock_discover), patch(
+        "salt.modules.cmdmod._runas_env_fingerprint", mock_fingerprint
+    ):
+        args = ("foobar", None, "/bin/bash", False, None)
+        assert cmdmod._get_runas_env(*args) == runas_env
+        assert cmdmod._get_runas_env(*args) == runas_env
+        assert mock_discover.call_count == 1
+
+        # Another process uses the copy on disk
+        context.clear()
+        assert cmdmod._get_runas_env(*args) == runas_env
+        assert mock_discover.call_count == 1
+
+        # A login shell file changed
+        mock_fingerprint.return_value = fingerprint + [["/home/foobar/.profile", 1]]
+        assert cmdmod._get_runas_env(*args) == runas_env
+        assert mock_discover.call_count == 2
+
+        # The cached environment expired
+        with patch("time.time", MagicMock(return_value=time.time() + 301)):
+            assert cmdmod._get_runas_env(*args) == runas_env
+        assert mock_discover.call_count == 3
+
+    # Caching is disabled by default
+    with patch("salt.modules.cmdmod._discover_runas_env", mock_discover):
+        cmdmod._get_runas_env(*args)
+        cmdmod._get_runas_env(*args)
+    assert mock_discover.call_count == 5
+
+
 def test_run_all_binary_replace():
     """
     Test for failed decoding of binary data, for instance when doing
@@ -8,6 +8,7 @@ import salt.modules.cmdmod as cmdmod
 import salt.modules.pkg_resource as pkg_resource
 import salt.modules.rpm_lowpkg as rpm
 import salt.modules.yumpkg as yumpkg
+import salt.utils.pkg
 import salt.utils.platform
 from salt.exceptions import CommandExecutionError, MinionError, SaltInvocationError
 from tests.support.mock import MagicMock, Mock, call, patch
@@ -818,7 +819,9 @@ def test_list_repo_pkgs_with_options(list_repos_var):
             # iteration order will vary, different Python versions will be
             # do them in different orders, which is OK, but it will just
             # mean that we will have to check both the first and second
-            # mock call both times.
+            # mock call both times. The query for the base repo is cached
+            # from the previous call, so drop the cache first.
+            salt.utils.pkg.clear_query_cache(yumpkg.__context__)
             cmd = MagicMock(return_value={"retcode": 0, "stdout": ""})
             with patch.dict(
                 yumpkg.__salt__,
@@ -1,3 +1,4 @@
+import copy
 import logging
 from pathlib import Path
 
@@ -208,3 +209,65 @@ def test_remote_pillar_timeout(temp_salt_minion, tmp_path):
     msg = r"^Pillar timed out after \d{1,4} seconds$"
     with pytest.raises(salt.exceptions.SaltClientError):
         pillar.compile_pillar()
+
+
+def test_remote_pillar_delta(minion_opts):
+    minion_opts["pillar_delta"] = True
+    current = {"certs": {"web": "old", "db": "same"}, "users": ["root"]}
+    compiled = {"certs": {"web": "new", "db": "same"}, "users": ["root"], "new": 1}
+    minion_opts["pillar"] = current
+    pillar = salt.pillar.RemotePillar(minion_opts, {}, "minion", "base")
+    requests = []
+
+    def _master(load, dictkey=None):
+        requests.append(dict(load))
+        if "pillar_hash" not in load:
+            return compiled
+        return salt.pillar.pillar_delta_reply(compiled, load["pillar_hash"], base)
+
+    pillar.channel.crypted_transfer_decode_dictentry = MagicMock(side_effect=_master)
+
+    # The master has the pillar the minion has, so only the changes are sent
+    base = copy.deepcopy(current)
+    assert pillar.compile_pillar() == compiled
+    assert requests[0]["pillar_hash"] == salt.pillar.pillar_hash(current)
+    reply = salt.pillar.pillar_delta_reply(compiled, requests[0]["pillar_hash"], base)
+    diff = reply[salt.pillar.PILLAR_DELTA_KEY]["diff"]
+    assert diff["set"] == {"new": 1}
+    assert diff["update"] == {
+        "certs": {"set": {"web": "new"}, "unset": [], "update": {}}
+    }
+    assert len(requests) == 1
+
+    # The pillar has not changed
+    requests.clear()
+    minion_opts["pillar"] = copy.deepcopy(compiled)
+    assert pillar.compile_pillar() == compiled
+    assert len(requests) == 1
+
+    # The master does not have the pillar the minion has
+    requests.clear()
+    minion_opts["pillar"] = current
+    base = None
+    assert pillar.compile_pillar() == compiled
+    assert len(requests) == 1
+
+    # Changes which do not apply make the minion request the full pillar
+    requests.clear()
+    base = {"something": "else"}
+    assert pillar.compile_pillar() == compiled
+    assert len(requests) == 2
+    assert "pillar_hash" not in requests[1]
+
+
+@pytest.mark.parametrize("reply", (None, "", ["not", "a", "dict"]))
+def test_remote_pillar_bad_return_no_pillar_delta(minion_opts, reply):
+    """
+    Without pillar_delta, a bad reply from the master is not retried
+    """
+    pillar = salt.pillar.RemotePillar(minion_opts, {}, "minion", "base")
+    mock = MagicMock(return_value=reply)
+    pillar.channel.crypted_transfer_decode_dictentry = mock
+    with pytest.raises(salt.exceptions.SaltClientError):
+        pillar.compile_pillar()
+    mock.assert_called_once()
@@ -5,9 +5,10 @@ unit tests for the cache runner
 import pytest
 
 import salt.config
+import salt.exceptions
 import salt.runners.cache as cache
 import salt.utils.master
-from tests.support.mock import patch
+from tests.support.mock import MagicMock, patch
 
 
 @pytest.fixture
@@ -44,3 +45,31 @@ def test_grains():
 
     with patch.object(salt.utils.master, "MasterPillarUtil", MockMaster):
         assert cache.grains(tgt="*") == mock_data
+
+
+def test_query(tmp_path):
+    """
+    test cache.query runner
+    """
+    opts = {
+        "cachedir": str(tmp_path),
+        "minion_data_cache": True,
+        "grains_store_paths": ["os"],
+    }
+    with patch.dict(cache.__opts__, {"grains_store_paths": []}):
+        with pytest.raises(salt.exceptions.SaltInvocationError):
+            cache.query(group_by="os")
+
+    with patch.dict(cache.__opts__, opts):
+        mock_cache = MagicMock()
+        mock_cache.list.return_value = ["minion1", "minion2", "minion3"]
+        mock_cache.fetch.side_effect = [
+            {"grains": {"os": "Ubuntu"}},
+            {"grains": {"os": "CentOS"}},
+            None,
+        ]
+        with patch("salt.cache.factory", return_value=mock_cache):
+            assert cache.rebuild_grains_store() == 2
+        assert cache.query(group_by="os") == {"Ubuntu": 1, "CentOS": 1}
+        assert cache.query(where="os:ubuntu") == ["minion1"]
+        assert cache.query(where="os:*", count=True) == 2
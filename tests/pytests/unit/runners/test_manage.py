@@ -1,6 +1,12 @@
 import pytest
 
 from salt.runners import manage
+from tests.support.mock import MagicMock, patch
+
+
+@pytest.fixture
+def configure_loader_modules():
+    return {manage: {"__opts__": {"presence_table": True, "transport": "tcp"}}}
 
 
 def test_deprecation_58638():
@@ -15,3 +21,16 @@ def test_deprecation_58638():
             str(no_show_ipv4)
             == "list_state() got an unexpected keyword argument 'show_ipv4'"
         )
+
+
+def test_status_presence_table():
+    ckminions = MagicMock()
+    ckminions.check_minions.return_value = {"minions": ["web2", "web1", "db1"]}
+    ckminions.connected_ids.return_value = {"web1", "web2"}
+    run_job = MagicMock()
+    with patch(
+        "salt.utils.minions.CkMinions", MagicMock(return_value=ckminions)
+    ), patch("salt.client.LocalClient.run_job", run_job):
+        assert manage.status(tgt="*") == {"up": ["web1", "web2"], "down": ["db1"]}
+        assert manage.up() == ["web1", "web2"]
+    run_job.assert_not_called()
@@ -8,6 +8,7 @@ import shutil
 
 import pytest
 
+import salt.pillar
 import salt.runners.pillar as pillar_runner
 import salt.utils.files
 import salt.utils.gitfs
@@ -193,3 +194,42 @@ def test_show_pillar_cache(cachedir_tree, pillar_cache_dir, pillar_cache_files):
         ), patch("salt.utils.atomicfile.atomic_open", mock_open()) as atomic_open_mock:
             ret = pillar_runner.show_pillar_cache("fake-host")
             assert ret == {}
+
+
+def test_clear_pillar_cache_salt_cache(master_opts, tmp_path):
+    """
+    test pillar.clear_pillar_cache with the salt_cache backend
+    """
+    master_opts.update(
+        {
+            "cachedir": str(tmp_path),
+            "pillar_cache": True,
+            "pillar_cache_backend": "salt_cache",
+            "pillar_cache_ttl": 3600,
+        }
+    )
+    for minion_id, pillar in (("test-host", "one"), ("another-host", "two")):
+        with patch(
+            "salt.pillar.PillarCache.fetch_pillar", return_value={"this": pillar}
+        ):
+            salt.pillar.PillarCache(master_opts, {}, minion_id, "base").compile_pillar()
+
+    with patch.dict(pillar_runner.__opts__, master_opts), patch(
+        "salt.utils.minions.CkMinions.check_minions",
+        MagicMock(
+            side_effect=[
+                {"minions": ["test-host", "another-host"], "missing": []},
+                {"minions": ["test-host"], "missing": []},
+                {"minions": ["test-host", "another-host"], "missing": []},
+            ]
+        ),
+    ), patch(
+        "salt.utils.minions.get_minion_data",
+        MagicMock(side_effect=lambda tgt, opts: (tgt, {}, {})),
+    ):
+        assert pillar_runner.show_pillar_cache() == {
+            "test-host": {"this": "one"},
+            "another-host": {"this": "two"},
+        }
+        assert pillar_runner.clear_pillar_cache("test-host") == {}
+        assert pillar_runner.show_pillar_cache() == {"another-host": {"this": "two"}}
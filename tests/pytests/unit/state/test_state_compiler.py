@@ -2,7 +2,10 @@
     :codeauthor: Nicole Thomas <nicole@saltstack.com>
 """
 
+import copy
 import logging
+import multiprocessing
+import time
 from typing import Any
 
 import pytest
@@ -344,6 +347,39 @@ def test_verify_onlyif_list_cmd_valid(minion_opts):
         assert expected_result == return_result
 
 
+def test_verify_onlyif_list_cmd_concurrent(minion_opts):
+    """
+    With state_check_concurrency, the onlyif commands are run together, and
+    their results are checked in order
+    """
+    minion_opts["state_check_concurrency"] = 4
+    low_data = {
+        "state": "cmd",
+        "name": 'echo "something"',
+        "__sls__": "tests.cmd",
+        "__env__": "base",
+        "__id__": "check onlyif",
+        "onlyif": ["exit 0", "exit 1", "exit 0"],
+        "order": 10001,
+        "fun": "run",
+    }
+    expected_result = {
+        "comment": "onlyif condition is false",
+        "result": True,
+        "skip_watch": True,
+    }
+    for key in ("__sls__", "__id__", "name"):
+        expected_result[key] = low_data.get(key)
+    with patch("salt.state.State._gather_pillar"):
+        state_obj = salt.state.State(minion_opts)
+        with patch.dict(
+            state_obj.functions,
+            {"cmd.retcode": MagicMock(side_effect=Exception("Not run together"))},
+        ):
+            return_result = state_obj._run_check_onlyif(low_data, {})
+        assert expected_result == return_result
+
+
 def test_verify_unless_list_cmd_invalid(minion_opts):
     """
     If any of the unless commands return False (non 0) then the state should
@@ -1249,3 +1285,225 @@ def test_module_refresh_typeerror(minion_opts, caplog):
             "Error encountered during module reload. Modules were not reloaded."
             in caplog.text
         )
+
+
+def test_incremental_state_fingerprints(minion_opts):
+    """
+    Test that a chunk whose low data and fingerprint have not changed since
+    its last successful run is skipped
+    """
+    minion_opts["state_incremental_full_run_interval"] = 3600
+    low = {
+        "state": "pkg",
+        "name": "vim",
+        "__id__": "vim",
+        "fun": "installed",
+        "__env__": "base",
+        "__sls__": "test",
+        "order": 10000,
+    }
+    fingerprint = MagicMock(return_value="fp1")
+    installed = MagicMock(
+        return_value={"name": "vim", "result": True, "changes": {}, "comment": ""}
+    )
+    states = {"pkg.installed": installed, "pkg.mod_fingerprint": fingerprint}
+    cdata = {"full": "pkg.installed", "args": ["vim"], "kwargs": {}}
+
+    def run():
+        state_obj = salt.state.State(minion_opts)
+        state_obj.states = states
+        state_obj.load_fingerprints()
+        ret = state_obj._call_state_function(low, cdata)
+        state_obj.save_fingerprints()
+        return ret
+
+    with patch("salt.state.State._gather_pillar", return_value={}):
+        # The first run is a full run, which records the fingerprint
+        run()
+        assert installed.call_count == 1
+        assert fingerprint.call_args.kwargs["sfun"] == "installed"
+
+        # Unchanged, so it is skipped
+        ret = run()
+        assert installed.call_count == 1
+        assert ret["result"] is True
+        assert ret["changes"] == {}
+        assert "unchanged" in ret["comment"]
+
+        # The fingerprint changed, so it runs
+        fingerprint.return_value = "fp2"
+        run()
+        assert installed.call_count == 2
+
+        # Chunks with check commands always run
+        low["unless"] = "true"
+        run()
+        assert installed.call_count == 3
+        low.pop("unless")
+
+        # A change to the low data runs the state
+        low["version"] = "1.0"
+        run()
+        assert installed.call_count == 4
+        run()
+        assert installed.call_count == 4
+
+        # Full runs run everything
+        minion_opts["state_incremental_full_run_interval"] = 0
+        run()
+        assert installed.call_count == 5
+
+
+@pytest.mark.skip_on_spawning_platform(
+    reason="state_concurrency is not supported on spawning platforms"
+)
+def test_call_chunks_concurrent(minion_opts):
+    """
+    Test that independent chunks run concurrently, that requisites are
+    respected, and that the results are numbered as in a serial run
+    """
+    minion_opts["state_events"] = False
+    high = {
+        "sleep": {
+            "cmd": [
+                {"names": ["sleep 2", "sleep 2 ", "sleep 2  "]},
+                {"shell": "/bin/sh"},
+                "run",
+            ],
+            "__sls__": "test",
+            "__env__": "base",
+        },
+        "one": {
+            "test": [{"require": [{"cmd": "sleep"}]}, "succeed_without_changes"],
+            "__sls__": "test",
+            "__env__": "base",
+        },
+        "two": {
+            "test": ["succeed_with_changes"],
+            "__sls__": "test",
+            "__env__": "base",
+        },
+        "three": {
+            "test": [{"onchanges": [{"test": "two"}]}, "succeed_without_changes"],
+            "__sls__": "test",
+            "__env__": "base",
+        },
+        "four": {
+            "test": [{"onchanges": [{"test": "one"}]}, "succeed_without_changes"],
+            "__sls__": "test",
+            "__env__": "base",
+        },
+    }
+
+    def run(concurrency):
+        minion_opts["state_concurrency"] = concurrency
+        with patch("salt.state.State._gather_pillar", return_value={}):
+            state_obj = salt.state.State(minion_opts)
+            start = time.time()
+            ret = state_obj.call_high(copy.deepcopy(high))
+            duration = time.time() - start
+        return {
+            tag: (val["__run_num__"], val["result"], val["comment"])
+            for tag, val in ret.items()
+        }, duration
+
+    serial, serial_duration = run(1)
+    concurrent, concurrent_duration = run(4)
+    assert concurrent == serial
+    assert sorted(num for num, _, _ in concurrent.values()) == list(range(7))
+    assert serial_duration >= 6
+    assert concurrent_duration < 5
+
+
+@pytest.mark.skip_on_spawning_platform(
+    reason="state_concurrency is not supported on spawning platforms"
+)
+def test_call_chunks_concurrent_incremental(minion_opts):
+    """
+    Test that the fingerprints and __context__ changes of the chunks run in
+    separate processes are returned to the main process
+    """
+    minion_opts["state_events"] = False
+    minion_opts["state_concurrency"] = 2
+    minion_opts["state_incremental_full_run_interval"] = 3600
+    high = {
+        name: {
+            "test": ["succeed_without_changes"],
+            "__sls__": "test",
+            "__env__": "base",
+        }
+        for name in ("one", "two", "three")
+    }
+
+    def _fingerprint(self, low):
+        self.state_con[f"fingerprinted_{low['name']}"] = True
+        return "fp"
+
+    def run():
+        state_obj = salt.state.State(minion_opts)
+        state_obj.load_fingerprints()
+        ret = state_obj.call_high(copy.deepcopy(high))
+        context = {
+            key for key in state_obj.state_con if key.startswith("fingerprinted_")
+        }
+        state_obj.save_fingerprints()
+        return ret, context
+
+    with patch("salt.state.State._gather_pillar", return_value={}), patch(
+        "salt.state.State._fingerprint_applies",
+        lambda self, low: self.fingerprints is not None,
+    ), patch("salt.state.State._fingerprint", _fingerprint):
+        ret, context = run()
+        assert context == {
+            "fingerprinted_one",
+            "fingerprinted_two",
+            "fingerprinted_three",
+        }
+        assert all("unchanged" not in val["comment"] for val in ret.values())
+        ret, _ = run()
+        assert len(ret) == 3
+        assert all("unchanged" in val["comment"] for val in ret.values())
+
+
+@pytest.mark.skip_on_spawning_platform(
+    reason="Skipped until parallel states can be fixed on spawning platforms."
+)
+def test_reconcile_procs(minion_opts):
+    """
+    Test that the results of parallel states are received from their
+    processes, and that a process which exits without returning fails
+    """
+    minion_opts["state_events"] = False
+    high = {
+        "one": {
+            "test": [{"parallel": True}, "succeed_with_changes"],
+            "__sls__": "test",
+            "__env__": "base",
+        },
+        "two": {
+            "test": [
+                {"onchanges": [{"test": "one"}]},
+                "succeed_without_changes",
+            ],
+            "__sls__": "test",
+            "__env__": "base",
+        },
+    }
+    with patch("salt.state.State._gather_pillar", return_value={}):
+        state_obj = salt.state.State(minion_opts)
+        ret = state_obj.call_high(high)
+        assert ret["test_|-one_|-one_|-succeed_with_changes"]["__parallel__"] is True
+        assert ret["test_|-one_|-one_|-succeed_with_changes"]["changes"]
+        assert ret["test_|-two_|-two_|-succeed_without_changes"]["result"] is True
+        assert not state_obj.parallel_conns
+
+        recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+        proc = multiprocessing.Process(target=send_conn.close)
+        proc.start()
+        send_conn.close()
+        running = {"tag": {"name": "dead", "result": None, "proc": proc}}
+        state_obj.parallel_conns["tag"] = recv_conn
+        assert state_obj.reconcile_procs(running, block=True) is True
+        assert running["tag"]["result"] is False
+        assert running["tag"]["comment"] == "Parallel process failed to return"
+        assert "proc" not in running["tag"]
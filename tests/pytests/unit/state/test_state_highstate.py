@@ -7,8 +7,11 @@ import textwrap
 
 import pytest  # pylint: disable=unused-import
 
+import salt.payload
 import salt.state
+import salt.utils.files
 from salt.utils.odict import DefaultOrderedDict, OrderedDict
+from tests.support.mock import patch
 
 log = logging.getLogger(__name__)
 
@@ -418,3 +421,111 @@ def test_verify_tops_match_none(highstate):
     tops["base"] = OrderedDict([("*", [OrderedDict([("match", "")]), "test", "test2"])])
     matches = highstate.verify_tops(tops)
     assert "Improperly formatted top file matcher in saltenv" in matches[0]
+
+
+def test_call_highstate_compile_cache(minion_opts, state_tree_dir, cache_dir):
+    """
+    Test that the compiled highstate is reused until one of the files it was
+    rendered from changes
+    """
+    state_tree_dir.mkdir(parents=True)
+    minion_opts["file_client"] = "local"
+    minion_opts["file_roots"] = {"base": [str(state_tree_dir)]}
+    minion_opts["cachedir"] = str(cache_dir)
+    minion_opts["state_events"] = False
+    minion_opts["state_compile_cache"] = True
+    top = pytest.helpers.temp_file("top.sls", "base: {'*': [foo]}", str(state_tree_dir))
+    foo = pytest.helpers.temp_file(
+        "foo.sls",
+        textwrap.dedent(
+            """\
+            include:
+              - bar
+            foo:
+              test.succeed_without_changes:
+                - require:
+                  - test: bar
+            """
+        ),
+        str(state_tree_dir),
+    )
+    bar = pytest.helpers.temp_file(
+        "bar.sls", "bar: test.succeed_without_changes", str(state_tree_dir)
+    )
+
+    def run():
+        with salt.state.HighState(minion_opts) as highstate:
+            with patch.object(
+                highstate, "render_highstate", wraps=highstate.render_highstate
+            ) as render:
+                ret = highstate.call_highstate()
+            return ret, render.call_count
+
+    with top, foo, bar:
+        ret, renders = run()
+        assert renders == 1
+        assert [val["name"] for val in ret.values()] == ["bar", "foo"]
+        assert all(val["result"] for val in ret.values())
+
+        ret, renders = run()
+        assert renders == 0
+        assert [val["name"] for val in ret.values()] == ["bar", "foo"]
+        assert all(val["result"] for val in ret.values())
+
+        (state_tree_dir / "bar.sls").write_text("bar: test.succeed_with_changes")
+        ret, renders = run()
+        assert renders == 1
+        assert [bool(val["changes"]) for val in ret.values()] == [True, False]
+
+        # Any of the options can change the compilation
+        minion_opts["jinja_trim_blocks"] = not minion_opts.get("jinja_trim_blocks")
+        ret, renders = run()
+        assert renders == 1
+        ret, renders = run()
+        assert renders == 0
+
+
+def test_call_highstate_compile_cache_execution_modules(
+    minion_opts, state_tree_dir, cache_dir
+):
+    """
+    Test that the highstate is not cached when its SLS files call execution
+    modules, and that the cache is stored with salt.payload
+    """
+    state_tree_dir.mkdir(parents=True)
+    minion_opts["file_client"] = "local"
+    minion_opts["file_roots"] = {"base": [str(state_tree_dir)]}
+    minion_opts["cachedir"] = str(cache_dir)
+    minion_opts["state_events"] = False
+    minion_opts["state_compile_cache"] = True
+    top = pytest.helpers.temp_file("top.sls", "base: {'*': [foo]}", str(state_tree_dir))
+    foo = pytest.helpers.temp_file(
+        "foo.sls",
+        "foo: test.succeed_without_changes",
+        str(state_tree_dir),
+    )
+
+    def run():
+        with salt.state.HighState(minion_opts) as highstate:
+            with patch.object(
+                highstate, "render_highstate", wraps=highstate.render_highstate
+            ) as render:
+                ret = highstate.call_highstate()
+            return ret, render.call_count
+
+    with top, foo:
+        ret, renders = run()
+        assert renders == 1
+        with salt.utils.files.fopen(
+            str(cache_dir / "highstate.compiled.p"), "rb"
+        ) as fp_:
+            cached = salt.payload.load(fp_)
+        assert [chunk["name"] for chunk in cached["chunks"]] == ["foo"]
+
+        (state_tree_dir / "foo.sls").write_text(
+            "{{ salt['test.echo']('foo') }}: test.succeed_without_changes"
+        )
+        for _ in range(2):
+            ret, renders = run()
+            assert renders == 1
+            assert [val["name"] for val in ret.values()] == ["foo"]
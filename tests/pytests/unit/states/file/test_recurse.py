@@ -1,10 +1,12 @@
 import logging
 import os
 import pathlib
+import stat
 
 import pytest
 
 import salt.states.file as filestate
+import salt.utils.hashutils
 from tests.support.mock import MagicMock, patch
 
 log = logging.getLogger(__name__)
@@ -63,3 +65,80 @@ def test__gen_recurse_managed_files():
     )
     assert expected_dest in links
     assert links[expected_dest] == expected
+
+
+@pytest.mark.skip_on_windows(reason="mode management is not supported on Windows")
+def test__gen_recurse_unchanged(tmp_path):
+    """
+    Test that _gen_recurse_unchanged only reports the files and directories
+    whose contents and modes already match the fileserver
+    """
+    target = tmp_path / "target"
+    (target / "sub").mkdir(parents=True)
+    (target / "sub").chmod(0o755)
+    same = target / "same"
+    same.write_text("same")
+    same.chmod(0o644)
+    changed = target / "changed"
+    changed.write_text("old")
+    changed.chmod(0o644)
+    wrong_mode = target / "sub" / "wrong_mode"
+    wrong_mode.write_text("wrong_mode")
+    wrong_mode.chmod(0o600)
+
+    def _info(data):
+        return {
+            "hsum": salt.utils.hashutils.sha256_digest(data),
+            "hash_type": "sha256",
+            "mode": 0o100644,
+        }
+
+    list_master_hashes = MagicMock(
+        return_value={
+            "target/same": _info("same"),
+            "target/changed": _info("new"),
+            "target/sub/wrong_mode": _info("wrong_mode"),
+            "target/missing": _info("missing"),
+        }
+    )
+    patch_salt = {
+        "cp.list_master_hashes": list_master_hashes,
+        "file.get_hash": salt.utils.hashutils.get_hash,
+    }
+    files = {
+        (str(target / x), f"salt://target/{x}?saltenv=base")
+        for x in ("same", "changed", "sub/wrong_mode", "missing")
+    }
+    dirs = {str(target), str(target / "sub")}
+    with patch.dict(filestate.__salt__, patch_salt):
+        unchanged_files, unchanged_dirs = filestate._gen_recurse_unchanged(
+            str(target),
+            ["salt://target"],
+            files,
+            dirs,
+            file_mode="0644",
+            dir_mode="0755",
+        )
+        assert unchanged_files == {str(same)}
+        assert unchanged_dirs == {str(target / "sub")} | (
+            {str(target)} if stat.S_IMODE(target.stat().st_mode) == 0o755 else set()
+        )
+
+        unchanged_files, _ = filestate._gen_recurse_unchanged(
+            str(target), ["salt://target"], files, dirs, keep_mode=True
+        )
+        assert unchanged_files == {str(same)}
+
+        unchanged_files, _ = filestate._gen_recurse_unchanged(
+            str(target), ["salt://target"], files, dirs
+        )
+        assert unchanged_files == {str(same), str(wrong_mode)}
+    list_master_hashes.assert_called_with("base", "target/")
+
+    # Fall back to checking each file when the master cannot list the hashes
+    with patch.dict(
+        filestate.__salt__, {"cp.list_master_hashes": MagicMock(return_value=None)}
+    ):
+        assert filestate._gen_recurse_unchanged(
+            str(target), ["salt://target"], files, dirs
+        ) == (set(), set())
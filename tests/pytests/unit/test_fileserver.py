@@ -4,6 +4,7 @@ import time
 
 import salt.fileserver
 import salt.utils.files
+import salt.utils.hashutils
 
 
 def test_diff_with_diffent_keys():
@@ -117,3 +118,30 @@ def test_file_server_serve_url_escape(tmp_path):
         }
     )
     assert ret == {"data": "", "dest": ""}
+
+
+def test_file_hash_list(tmp_path, master_opts):
+    fileroot = tmp_path / "srv" / "salt"
+    (fileroot / "dir" / "sub").mkdir(parents=True)
+    (fileroot / "dir" / "foo").write_text("foo")
+    (fileroot / "dir" / "sub" / "bar").write_text("bar")
+    (fileroot / "dir" / "sub" / "bar").chmod(0o600)
+    (fileroot / "other").write_text("other")
+    master_opts["fileserver_backend"] = ["roots"]
+    master_opts["file_roots"] = {"base": [str(fileroot)]}
+    fs = salt.fileserver.Fileserver(master_opts)
+    ret = fs.file_hash_list({"saltenv": "base", "prefix": "dir/"})
+    assert ret == {
+        "dir/foo": {
+            "hsum": salt.utils.hashutils.get_hash(str(fileroot / "dir" / "foo")),
+            "hash_type": master_opts["hash_type"],
+            "mode": (fileroot / "dir" / "foo").stat().st_mode,
+        },
+        "dir/sub/bar": {
+            "hsum": salt.utils.hashutils.get_hash(
+                str(fileroot / "dir" / "sub" / "bar")
+            ),
+            "hash_type": master_opts["hash_type"],
+            "mode": (fileroot / "dir" / "sub" / "bar").stat().st_mode,
+        },
+    }
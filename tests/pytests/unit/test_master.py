@@ -9,6 +9,7 @@ import pytest
 import salt.config
 import salt.crypt
 import salt.master
+import salt.pillar
 import salt.utils.files
 import salt.utils.platform
 from tests.support.mock import MagicMock, patch
@@ -176,6 +177,23 @@ def test_fileserver_duration():
         assert 2 > duration > 1
 
 
+def test_fileserver_update_flushes_pillar_cache():
+    """
+    Validate that cached pillars are flushed when a fileserver update finds
+    changes.
+    """
+    opts = {"pillar_cache": True, "pillar_cache_backend": "salt_cache"}
+    unchanged = MagicMock(return_value=False)
+    changed = MagicMock(return_value={"changed": True, "backend": "roots"})
+    with patch("salt.pillar.flush_pillar_cache") as flush_pillar_cache:
+        salt.master.FileserverUpdate.update(1, {("gitfs", unchanged): None}, 0.5, opts)
+        flush_pillar_cache.assert_not_called()
+        salt.master.FileserverUpdate.update(
+            1, {("gitfs", unchanged): None, ("roots", changed): None}, 0.5, opts
+        )
+        flush_pillar_cache.assert_called_once_with(opts)
+
+
 @pytest.mark.parametrize(
     "expected_return, payload",
     (
@@ -336,6 +354,7 @@ def test_aes_funcs_black(master_opts):
         "get_method",
         "run_func",
         "_handle_minion_event",
+        "_pillar_delta",
     ]
     try:
         for name in dir(aes_funcs):
@@ -390,6 +409,7 @@ def test_clear_funcs_black(master_opts):
         "__sizeof__",
         "__str__",
         "__subclasshook__",
+        "_check_publish_auth",
         "_prep_auth_info",
         "_prep_jid",
         "_prep_pub",
@@ -929,6 +949,62 @@ async def test_publish_user_authorization_error(clear_funcs):
         assert await clear_funcs.publish(load) == mock_ret
 
 
+@pytest.mark.slow_test
+async def test_publish_batch_disabled(clear_funcs):
+    """
+    Asserts that batches are refused when batch_async is not enabled.
+    """
+    ret = await clear_funcs.publish_batch({"user": "foo", "fun": "test.arg"})
+    assert "batch_async" in ret["error"]
+
+
+@pytest.mark.slow_test
+async def test_publish_batch(clear_funcs):
+    """
+    Asserts that an authorized batch is saved to the job cache, and announced
+    with its jid only.
+    """
+    clear_funcs.opts["batch_async"] = True
+    load = {
+        "user": "test",
+        "fun": "test.arg",
+        "tgt": "*",
+        "arg": ["foo"],
+        "key": "fake-user-key",
+        "kwargs": {"batch": "25%", "batch_wait": "2", "timeout": 30},
+    }
+    save_load = MagicMock()
+    fire_event = MagicMock()
+    with patch.object(
+        clear_funcs,
+        "_check_publish_auth",
+        MagicMock(return_value=({"minions": ["a", "b"], "missing": []}, [], None)),
+    ), patch.object(
+        clear_funcs, "_prep_jid", MagicMock(return_value="20260101000000000000")
+    ), patch.dict(
+        clear_funcs.mminion.returners, {"local_cache.save_load": save_load}
+    ), patch.object(
+        clear_funcs.event, "fire_event", fire_event
+    ):
+        ret = await clear_funcs.publish_batch(load)
+    assert ret == {
+        "enc": "clear",
+        "load": {"jid": "20260101000000000000", "minions": ["a", "b"], "missing": []},
+    }
+    saved = save_load.call_args[0][1]
+    assert "key" not in saved
+    assert saved["batch"] == {
+        "batch": "25%",
+        "batch_wait": 2,
+        "timeout": 30,
+        "gather_job_timeout": clear_funcs.opts["gather_job_timeout"],
+        "failhard": False,
+    }
+    fire_event.assert_called_once_with(
+        {"jid": "20260101000000000000"}, "salt/batch/20260101000000000000/new"
+    )
+
+
 def test_run_func(maintenance):
     """
     Test the run function inside Maintenance class.
@@ -1041,6 +1117,37 @@ def test_key_rotate_no_master_match(maintenance):
         rotate_secrets.assert_not_called()
 
 
+def test_handle_pillar_push_runs_in_thread(maintenance):
+    """
+    The pillar push must not block the maintenance loop, and git_pillar
+    changes seen while a push is running are included in the next one
+    """
+    maintenance.opts["pillar_push"] = True
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def push_pillar_changes(opts, changed_ext_pillars=None):
+        calls.append(changed_ext_pillars)
+        started.set()
+        release.wait(10)
+
+    with patch("salt.pillar.push_pillar_changes", push_pillar_changes):
+        maintenance.handle_pillar_push()
+        assert started.wait(10)
+        first = maintenance.pillar_push_thread
+        # The previous push is still running, so no new push is started
+        maintenance.handle_pillar_push(git_pillar_changed=True)
+        assert maintenance.pillar_push_thread is first
+        assert calls == [[]]
+        release.set()
+        first.join(10)
+        assert not first.is_alive()
+        maintenance.handle_pillar_push()
+        maintenance.pillar_push_thread.join(10)
+    assert calls == [[], ["git"]]
+
+
 @pytest.mark.slow_test
 def test_key_dfn_wait(cluster_maintenance):
     now = time.monotonic()
@@ -1258,3 +1365,80 @@ def test_on_demand_not_allowed(not_allowed_funcs, tmp_path, caplog):
         "The following ext_pillar modules are not allowed for on-demand pillar data: git."
         in caplog.text
     )
+
+
+def test_pillar_delta(master_opts):
+    """
+    Verify that a minion which sends the hash of its pillar is sent only the
+    changes to it
+    """
+    old = {"certs": {"web": "old"}, "users": ["root"]}
+    new = {"certs": {"web": "new"}, "users": ["root"]}
+    load = {
+        "cmd": "_pillar",
+        "saltenv": "base",
+        "pillarenv": None,
+        "id": "minion",
+        "grains": {},
+        "ver": "2",
+    }
+    aes_funcs = salt.master.AESFuncs(master_opts)
+    try:
+        compiled = MagicMock()
+        with patch("salt.pillar.get_pillar", MagicMock(return_value=compiled)):
+            # The master has not sent this minion a pillar yet
+            compiled.compile_pillar.return_value = old
+            ret = aes_funcs._pillar(
+                dict(load, pillar_hash=salt.pillar.pillar_hash({"a": 1}))
+            )
+            assert ret[salt.pillar.PILLAR_DELTA_KEY]["type"] == "full"
+            assert ret[salt.pillar.PILLAR_DELTA_KEY]["pillar"] == old
+
+            ret = aes_funcs._pillar(
+                dict(load, pillar_hash=salt.pillar.pillar_hash(old))
+            )
+            assert ret[salt.pillar.PILLAR_DELTA_KEY]["type"] == "unchanged"
+
+            compiled.compile_pillar.return_value = new
+            ret = aes_funcs._pillar(
+                dict(load, pillar_hash=salt.pillar.pillar_hash(old))
+            )
+            reply = ret[salt.pillar.PILLAR_DELTA_KEY]
+            assert reply["type"] == "delta"
+            assert reply["diff"]["update"] == {
+                "certs": {"set": {"web": "new"}, "unset": [], "update": {}}
+            }
+            assert salt.pillar.apply_pillar_diff(old, reply["diff"]) == new
+
+            # Minions which do not send a hash get the pillar as before
+            assert aes_funcs._pillar(load) == new
+    finally:
+        aes_funcs.destroy()
+
+
+def test_pillar_delta_no_minion_data_cache(master_opts):
+    """
+    Verify that without the minion data cache the full pillar is sent, and
+    nothing is stored for the minion
+    """
+    master_opts["minion_data_cache"] = False
+    pillar = {"certs": {"web": "old"}}
+    load = {
+        "cmd": "_pillar",
+        "saltenv": "base",
+        "pillarenv": None,
+        "id": "minion",
+        "grains": {},
+        "ver": "2",
+        "pillar_hash": salt.pillar.pillar_hash(pillar),
+    }
+    aes_funcs = salt.master.AESFuncs(master_opts)
+    try:
+        compiled = MagicMock()
+        compiled.compile_pillar.return_value = pillar
+        with patch("salt.pillar.get_pillar", MagicMock(return_value=compiled)):
+            assert aes_funcs._pillar(load) == pillar
+            assert aes_funcs._pillar(load) == pillar
+        assert not aes_funcs.masterapi.cache.contains("minions/minion", "pillar_base")
+    finally:
+        aes_funcs.destroy()
@@ -11,12 +11,16 @@ import os
 import shutil
 import tempfile
 import textwrap
+import threading
 
 import pytest
 
+import salt.cache
+import salt.client
 import salt.config
 import salt.exceptions
 import salt.fileclient
+import salt.utils.json
 import salt.utils.stringutils
 from salt.utils.files import fopen
 from tests.support.mock import MagicMock, patch
@@ -552,6 +556,62 @@ def test_ext_pillar_first(tmp_path):
         assert pillar.compile_pillar()["generic"]["key1"] == "value1"
 
 
+def test_ext_pillar_workers():
+    """
+    test that the ext_pillars in ext_pillar_independent are run concurrently,
+    and that their data is merged in the configured order
+    """
+    opts = {
+        "optimization_order": [0, 1, 2],
+        "renderer": "json",
+        "renderer_blacklist": [],
+        "renderer_whitelist": [],
+        "state_top": "",
+        "pillar_roots": {"base": []},
+        "file_roots": {"base": []},
+        "extension_modules": "",
+        "fileserver_backend": "",
+        "cachedir": "",
+        "ext_pillar": [{"slow_a": "a"}, {"dependent": "d"}, {"slow_b": "b"}],
+        "ext_pillar_independent": ["slow_a", "slow_b"],
+    }
+    # Each independent ext_pillar waits for the other one to start, so they
+    # fail unless they are run at the same time.
+    barrier = threading.Barrier(2, timeout=10)
+
+    def slow(name):
+        def ext_pillar(minion_id, pillar, val):
+            barrier.wait()
+            return {name: val, "last": name, "seen_" + name: sorted(pillar)}
+
+        return ext_pillar
+
+    def dependent(minion_id, pillar, val):
+        return {"dependent": val, "last": "dependent", "seen": sorted(pillar)}
+
+    ext_pillars = {
+        "slow_a": slow("slow_a"),
+        "slow_b": slow("slow_b"),
+        "dependent": dependent,
+    }
+    with patch("salt.loader.pillars", MagicMock(return_value=ext_pillars)):
+        pillar = salt.pillar.Pillar(opts, {}, "mocked-minion", "base")
+
+    pillar.opts["ext_pillar_workers"] = 2
+    ret, errors = pillar.ext_pillar({"base": True})
+    assert errors == []
+    assert ret == {
+        "base": True,
+        "slow_a": "a",
+        "seen_slow_a": ["base"],
+        "dependent": "d",
+        "seen": ["base", "last", "seen_slow_a", "slow_a"],
+        "slow_b": "b",
+        "seen_slow_b": ["base"],
+        "last": "slow_b",
+    }
+
+
 @patch("salt.fileclient.Client.list_states")
 def test_malformed_pillar_sls(mock_list_states):
     with patch("salt.pillar.compile_template") as compile_template:
@@ -1267,6 +1327,59 @@ def test_compile_pillar_disk_cache(master_opts, grains):
             assert pillar.cache._dict == expected_cache
 
 
+def test_compile_pillar_salt_cache(master_opts, grains, tmp_path):
+    master_opts.update(
+        {
+            "cachedir": str(tmp_path),
+            "pillar_cache": True,
+            "pillar_cache_backend": "salt_cache",
+            "pillar_cache_ttl": 3600,
+        }
+    )
+
+    def _pillar(minion_id, pillarenv, clean_cache=False):
+        return salt.pillar.PillarCache(
+            master_opts,
+            grains,
+            minion_id,
+            "fake_env",
+            pillarenv=pillarenv,
+            clean_cache=clean_cache,
+        )
+
+    with patch(
+        "salt.pillar.PillarCache.fetch_pillar",
+        side_effect=[{"foo": "bar"}, {"foo": "baz"}, {"foo": "qux"}, {"foo": "new"}],
+    ) as fetch_pillar:
+        # Entries are shared between instances, and stored per pillarenv
+        assert _pillar("minion1", "base").compile_pillar() == {"foo": "bar"}
+        assert _pillar("minion1", "base").compile_pillar() == {"foo": "bar"}
+        assert _pillar("minion1", "dev").compile_pillar() == {"foo": "baz"}
+        assert _pillar("minion2", "base").compile_pillar() == {"foo": "qux"}
+        assert fetch_pillar.call_count == 3
+        assert _pillar("minion1", "dev").get_cached_pillar() == {"foo": "baz"}
+
+        # Cleaning the cache (i.e. refresh_pillar) removes the minion's entries
+        assert _pillar("minion1", "base", clean_cache=True).compile_pillar() == {
+            "foo": "new"
+        }
+        assert _pillar("minion1", "dev").get_cached_pillar() is None
+        assert _pillar("minion2", "base").get_cached_pillar() == {"foo": "qux"}
+
+    # Expired entries are not used
+    master_opts["pillar_cache_ttl"] = -1
+    assert _pillar("minion2", "base").get_cached_pillar() is None
+    master_opts["pillar_cache_ttl"] = 3600
+
+    # Fileserver and git_pillar updates remove all of the entries
+    assert salt.pillar.flush_pillar_cache(master_opts) is True
+    assert _pillar("minion1", "base").get_cached_pillar() is None
+    assert _pillar("minion2", "base").get_cached_pillar() is None
+
+    master_opts["pillar_cache_backend"] = "disk"
+    assert salt.pillar.flush_pillar_cache(master_opts) is False
+
+
 def test_remote_pillar_bad_return(grains, tmp_pki):
     opts = salt.config.minion_config(None)
     opts.update(
@@ -1311,3 +1424,296 @@ async def test_async_remote_pillar_bad_return(grains, tmp_pki):
     pillar.channel.crypted_transfer_decode_dictentry = crypted_transfer_mock
     with pytest.raises(salt.exceptions.SaltClientError):
         await pillar.compile_pillar()
+
+
+def test_pillar_render_cache(master_opts, tmp_path):
+    pillar_root = tmp_path / "pillar"
+    pillar_root.mkdir()
+    (pillar_root / "top.sls").write_text("base:\n  '*':\n    - os\n    - minion\n")
+    (pillar_root / "os.sls").write_text("os_name: {{ grains['os'] }}\n")
+    (pillar_root / "minion.sls").write_text("minion: {{ opts['id'] }}\n")
+    master_opts.update(
+        {
+            "pillar_roots": {"base": [str(pillar_root)]},
+            "file_client": "local",
+            "pillar_render_cache": True,
+        }
+    )
+
+    def _compile(minion_id, os_name):
+        opts = dict(master_opts, id=minion_id)
+        grains = {"id": minion_id, "os": os_name}
+        pillar = salt.pillar.Pillar(opts, grains, minion_id, "base")
+        return pillar.compile_pillar(ext=False)
+
+    def _rendered(compile_template):
+        # The top file is rendered without an SLS name
+        return [
+            call.args[6]
+            for call in compile_template.call_args_list
+            if len(call.args) > 6 and call.args[6]
+        ]
+
+    with patch.dict(salt.utils.rendercache._RENDER_CACHES, clear=True), patch(
+        "salt.pillar.compile_template", wraps=salt.pillar.compile_template
+    ) as compile_template:
+        assert _compile("web1", "Ubuntu") == {"os_name": "Ubuntu", "minion": "web1"}
+        assert _rendered(compile_template) == ["os", "minion"]
+
+        # os.sls only read the "os" grain, so it is reused for another minion
+        compile_template.reset_mock()
+        assert _compile("web2", "Ubuntu") == {"os_name": "Ubuntu", "minion": "web2"}
+        assert _rendered(compile_template) == ["minion"]
+
+        compile_template.reset_mock()
+        assert _compile("web3", "CentOS") == {"os_name": "CentOS", "minion": "web3"}
+        assert _rendered(compile_template) == ["os", "minion"]
+
+        # Changing a file in the pillar_roots invalidates the cached renders
+        (pillar_root / "os.sls").write_text("os_name: {{ grains['os'] }}!\n")
+        compile_template.reset_mock()
+        assert _compile("web4", "Ubuntu") == {"os_name": "Ubuntu!", "minion": "web4"}
+        assert _rendered(compile_template) == ["os", "minion"]
+
+        # Renders which use execution modules are not cached
+        (pillar_root / "os.sls").write_text(
+            "os_name: {{ salt['test.echo'](grains['os']) }}\n"
+        )
+        for minion_id in ("web5", "web6"):
+            compile_template.reset_mock()
+            assert _compile(minion_id, "Ubuntu")["os_name"] == "Ubuntu"
+            assert "os" in _rendered(compile_template)
+
+
+def test_pillar_render_cache_yaml_filter(master_opts, tmp_path):
+    pillar_root = tmp_path / "pillar"
+    pillar_root.mkdir()
+    (pillar_root / "top.sls").write_text("base:\n  '*':\n    - dump\n")
+    (pillar_root / "dump.sls").write_text(
+        "grains_yaml: '{{ grains|yaml }}'\npillar_yaml: '{{ pillar|yaml }}'\n"
+    )
+    master_opts.update(
+        {
+            "pillar_roots": {"base": [str(pillar_root)]},
+            "file_client": "local",
+            "pillar_render_cache": True,
+        }
+    )
+    grains = {"id": "web1", "os": "Ubuntu"}
+    with patch.dict(salt.utils.rendercache._RENDER_CACHES, clear=True):
+        pillar = salt.pillar.Pillar(
+            dict(master_opts, id="web1"), grains, "web1", "base"
+        )
+        assert pillar.compile_pillar(ext=False) == {
+            "grains_yaml": "{id: web1, os: Ubuntu}",
+            "pillar_yaml": "{}",
+        }
+
+
+def test_push_pillar_changes(master_opts, tmp_path):
+    pillar_root = tmp_path / "pillar"
+    pillar_root.mkdir()
+    (pillar_root / "top.sls").write_text(
+        "base:\n  '*':\n    - common\n  'web1':\n    - web1\n"
+    )
+    (pillar_root / "common.sls").write_text("common: {{ grains['os'] }}\n")
+    (pillar_root / "web1.sls").write_text("web1: one\nold: value\n")
+    master_opts.update(
+        {
+            "pillar_roots": {"base": [str(pillar_root)]},
+            "file_client": "local",
+            "minion_data_cache": True,
+            "pillar_push": True,
+        }
+    )
+    cache = salt.cache.factory(master_opts)
+    pillars = {}
+    for minion_id, os_name in (("web1", "Ubuntu"), ("web2", "CentOS")):
+        grains = {"id": minion_id, "os": os_name}
+        pillar = salt.pillar.Pillar(
+            dict(master_opts, id=minion_id), grains, minion_id, "base"
+        )
+        pillars[minion_id] = pillar.compile_pillar()
+        cache.store(
+            f"minions/{minion_id}",
+            "data",
+            {"grains": grains, "pillar": pillars[minion_id]},
+        )
+        cache.store(
+            f"minions/{minion_id}",
+            "pillar_deps",
+            dict(pillar.dependencies, saltenv="base"),
+        )
+    assert sorted(pillar.dependencies["files"]) == [
+        str(pillar_root / "common.sls"),
+        str(pillar_root / "top.sls"),
+    ]
+
+    local = MagicMock()
+    assert salt.pillar.push_pillar_changes(master_opts, local=local) == []
+    local.cmd_async.assert_not_called()
+
+    # Only the minion which uses the changed file is recompiled and notified
+    (pillar_root / "web1.sls").write_text("web1: two\n")
+    assert salt.pillar.push_pillar_changes(master_opts, local=local) == ["web1"]
+    local.cmd_async.assert_called_once_with(
+        "web1", "saltutil.refresh_pillar", kwarg={"clean_cache": False}
+    )
+    new_pillar = {"common": "Ubuntu", "web1": "two"}
+    assert cache.fetch("minions/web1", "data")["pillar"] == new_pillar
+
+    # The recorded file hashes were updated, so there is nothing left to push
+    local.reset_mock()
+    assert salt.pillar.push_pillar_changes(master_opts, local=local) == []
+    local.cmd_async.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "render_cache,ext_pillar_first", ((False, False), (True, False), (False, True))
+)
+def test_pillar_dependencies_templates(
+    master_opts, tmp_path, render_cache, ext_pillar_first
+):
+    pillar_root = tmp_path / "pillar"
+    pillar_root.mkdir()
+    (pillar_root / "top.sls").write_text("base:\n  '*':\n    - web\n")
+    (pillar_root / "web.sls").write_text(
+        '{% from "map.jinja" import port with context %}\n'
+        "{% include 'extra.jinja' %}\n"
+        "port: {{ port }}\n"
+    )
+    (pillar_root / "map.jinja").write_text("{% set port = 80 %}\n")
+    (pillar_root / "extra.jinja").write_text("extra: true\n")
+    master_opts.update(
+        {
+            "pillar_roots": {"base": [str(pillar_root)]},
+            "file_client": "local",
+            "minion_data_cache": True,
+            "pillar_push": True,
+            "pillar_render_cache": render_cache,
+            "ext_pillar": [],
+            "ext_pillar_first": ext_pillar_first,
+        }
+    )
+    expected = sorted(
+        str(pillar_root / name)
+        for name in ("top.sls", "web.sls", "map.jinja", "extra.jinja")
+    )
+    with patch.dict(salt.utils.rendercache._RENDER_CACHES, clear=True):
+        # The second compile reuses the renders when the render cache is on
+        for minion_id in ("web1", "web2"):
+            grains = {"id": minion_id}
+            pillar = salt.pillar.Pillar(
+                dict(master_opts, id=minion_id), grains, minion_id, "base"
+            )
+            assert pillar.compile_pillar() == {"extra": True, "port": 80}
+            assert sorted(pillar.dependencies["files"]) == expected
+
+
+@pytest.mark.parametrize("render_cache", (False, True))
+def test_pillar_dependencies_not_tracked(master_opts, tmp_path, render_cache):
+    """
+    Without pillar_push, compiling the pillar neither hashes the files it is
+    compiled from nor records the templates they load
+    """
+    pillar_root = tmp_path / "pillar"
+    pillar_root.mkdir()
+    (pillar_root / "top.sls").write_text("base:\n  '*':\n    - web\n")
+    (pillar_root / "web.sls").write_text(
+        '{% from "map.jinja" import port with context %}\nport: {{ port }}\n'
+    )
+    (pillar_root / "map.jinja").write_text("{% set port = 80 %}\n")
+    master_opts.update(
+        {
+            "pillar_roots": {"base": [str(pillar_root)]},
+            "file_client": "local",
+            "minion_data_cache": True,
+            "pillar_push": False,
+            "pillar_render_cache": render_cache,
+        }
+    )
+    with patch.dict(salt.utils.rendercache._RENDER_CACHES, clear=True), patch(
+        "salt.pillar._file_hash"
+    ) as file_hash, patch.object(
+        salt.fileclient.Client, "record_fetches"
+    ) as record_fetches:
+        pillar = salt.pillar.Pillar(
+            dict(master_opts, id="web1"), {"id": "web1"}, "web1", "base"
+        )
+        assert pillar.compile_pillar() == {"port": 80}
+    assert pillar.dependencies is None
+    file_hash.assert_not_called()
+    record_fetches.assert_not_called()
+
+
+def test_pillar_dependencies_render_cache_untracked_entry(master_opts, tmp_path):
+    """
+    A render cached while dependencies were not tracked is rendered again
+    when they are, so that the templates it loads are recorded
+    """
+    pillar_root = tmp_path / "pillar"
+    pillar_root.mkdir()
+    (pillar_root / "top.sls").write_text("base:\n  '*':\n    - web\n")
+    (pillar_root / "web.sls").write_text(
+        '{% from "map.jinja" import port with context %}\nport: {{ port }}\n'
+    )
+    (pillar_root / "map.jinja").write_text("{% set port = 80 %}\n")
+    master_opts.update(
+        {
+            "pillar_roots": {"base": [str(pillar_root)]},
+            "file_client": "local",
+            "minion_data_cache": True,
+            "pillar_render_cache": True,
+        }
+    )
+    with patch.dict(salt.utils.rendercache._RENDER_CACHES, clear=True):
+        for pillar_push in (False, True):
+            pillar = salt.pillar.Pillar(
+                dict(master_opts, id="web1", pillar_push=pillar_push),
+                {"id": "web1"},
+                "web1",
+                "base",
+            )
+            assert pillar.compile_pillar(ext=False) == {"port": 80}
+    assert sorted(pillar.dependencies["files"]) == sorted(
+        str(pillar_root / name) for name in ("top.sls", "web.sls", "map.jinja")
+    )
+
+
+def test_push_pillar_changes_publishes_no_pillar_data(master_opts, tmp_path):
+    pillar_root = tmp_path / "pillar"
+    pillar_root.mkdir()
+    (pillar_root / "top.sls").write_text("base:\n  '*':\n    - secrets\n")
+    (pillar_root / "secrets.sls").write_text("db_password: hunter2\n")
+    master_opts.update(
+        {
+            "pillar_roots": {"base": [str(pillar_root)]},
+            "file_client": "local",
+            "minion_data_cache": True,
+            "pillar_push": True,
+        }
+    )
+    cache = salt.cache.factory(master_opts)
+    grains = {"id": "web1", "os": "Ubuntu"}
+    pillar = salt.pillar.Pillar(dict(master_opts, id="web1"), grains, "web1", "base")
+    cache.store(
+        "minions/web1", "data", {"grains": grains, "pillar": pillar.compile_pillar()}
+    )
+    cache.store(
+        "minions/web1", "pillar_deps", dict(pillar.dependencies, saltenv="base")
+    )
+    (pillar_root / "secrets.sls").write_text("db_password: correcthorse\n")
+
+    sock_dir = tmp_path / "sock"
+    sock_dir.mkdir()
+    (sock_dir / "publish_pull.ipc").touch()
+    local = salt.client.LocalClient(mopts=dict(master_opts, sock_dir=str(sock_dir)))
+    send_pub_load = MagicMock(return_value={"jid": "1", "minions": ["web1"]})
+    with patch.object(local, "_send_pub_load", send_pub_load):
+        assert salt.pillar.push_pillar_changes(master_opts, local=local) == ["web1"]
+    load = send_pub_load.call_args[0][0]
+    assert load["fun"] == "saltutil.refresh_pillar"
+    assert load["tgt"] == "web1"
+    serialized = salt.utils.json.dumps(load, default=repr)
+    assert "hunter2" not in serialized
+    assert "correcthorse" not in serialized
@@ -2,10 +2,14 @@
 Tests for salt.utils.templates
 """
 
+import os
 import re
+import time
 
 from collections import OrderedDict
+import jinja2
 import pytest
+import salt.utils.jinja
 from salt.exceptions import SaltRenderError
 from salt.utils.templates import render_jinja_tmpl
 
@@ -101,3 +105,105 @@ def test_render_cve_2021_25283(render_context):
     render_context["var"] = "OK"
     with pytest.raises(SaltRenderError):
         res = render_jinja_tmpl(tmpl, render_context)
+
+
+def test_render_bytecode_cache(render_context, tmp_path):
+    render_context["opts"].update(
+        {"cachedir": str(tmp_path), "jinja_bytecode_cache": True}
+    )
+    tmpl = """{% for i in range(3) %}{{ i }}{% endfor %}"""
+    tmplpath = str(tmp_path / "foo.sls")
+    with patch.dict(salt.utils.jinja._BYTECODE_CACHES, clear=True):
+        assert render_jinja_tmpl(tmpl, render_context, tmplpath=tmplpath) == "012"
+        assert len(salt.utils.jinja._BYTECODE_CACHES) == 1
+        with patch.object(
+            jinja2.Environment, "compile", side_effect=AssertionError("compiled")
+        ):
+            # Served from memory
+            assert render_jinja_tmpl(tmpl, render_context, tmplpath=tmplpath) == "012"
+            # Served from disk
+            salt.utils.jinja._BYTECODE_CACHES.clear()
+            assert render_jinja_tmpl(tmpl, render_context, tmplpath=tmplpath) == "012"
+        # A changed template must be compiled again
+        assert (
+            render_jinja_tmpl(tmpl + "3", render_context, tmplpath=tmplpath) == "0123"
+        )
+
+        # The line of an error is still found in a cached template
+        tmpl = "OK\n{{ foo.bar }}"
+        for _ in range(2):
+            with pytest.raises(SaltRenderError, match="line 2"):
+                render_jinja_tmpl(tmpl, render_context)
+
+        # Different environment options use a different cache
+        render_context["opts"]["jinja_env"] = {"trim_blocks": True}
+        assert render_jinja_tmpl("OK", render_context) == "OK"
+        assert len(salt.utils.jinja._BYTECODE_CACHES) == 2
+
+
+@pytest.mark.skip_on_windows(reason="Checks POSIX file permissions")
+def test_render_bytecode_cache_authenticated(render_context, tmp_path):
+    """
+    Test that files in the bytecode cache which were not written with the
+    cache's secret are not loaded, and that the disk cache is not used when
+    other users could change it
+    """
+    render_context["opts"].update(
+        {"cachedir": str(tmp_path), "jinja_bytecode_cache": True}
+    )
+    tmpl = "{{ 1 + 1 }}"
+    tmplpath = str(tmp_path / "foo.sls")
+    root = tmp_path / "jinja"
+    with patch.dict(salt.utils.jinja._BYTECODE_CACHES, clear=True):
+        assert render_jinja_tmpl(tmpl, render_context, tmplpath=tmplpath) == "2"
+        assert (root / ".secret").stat().st_mode & 0o077 == 0
+        (path,) = root.glob("*/*.cache")
+
+        data = path.read_bytes()
+        path.write_bytes(data[:-1] + bytes([data[-1] ^ 1]))
+        salt.utils.jinja._BYTECODE_CACHES.clear()
+        with patch.object(
+            jinja2.Environment,
+            "compile",
+            autospec=True,
+            side_effect=jinja2.Environment.compile,
+        ) as compile_:
+            assert render_jinja_tmpl(tmpl, render_context, tmplpath=tmplpath) == "2"
+        compile_.assert_called_once()
+
+        path.unlink()
+        root.chmod(0o777)
+        salt.utils.jinja._BYTECODE_CACHES.clear()
+        assert render_jinja_tmpl(tmpl, render_context, tmplpath=tmplpath) == "2"
+        assert not list(root.glob("*/*.cache"))
+
+
+def test_bytecode_cache_prune(tmp_path):
+    """
+    Test that the files in the bytecode cache which were not used for
+    max_age seconds are removed, along with the directories left empty
+    """
+    directory = tmp_path / "current"
+    bcc = salt.utils.jinja.SaltBytecodeCache(
+        str(directory), secret=b"0" * 32, max_age=3600
+    )
+    env = jinja2.Environment()
+    for name in ("old", "new"):
+        bucket = bcc.get_template_bucket(env, name, name)
+        bucket.code = env.compile(name)
+        bcc.dump_bytecode(bucket)
+    old, new = (
+        bcc._get_cache_path(bcc.get_template_bucket(env, name, name))
+        for name in ("old", "new")
+    )
+    stale = tmp_path / "stale"
+    stale.mkdir()
+    (stale / "foo.cache").write_bytes(b"")
+    past = time.time() - 7200
+    for path in (old, str(stale / "foo.cache")):
+        os.utime(path, (past, past))
+
+    bcc.prune()
+    assert not os.path.exists(old)
+    assert not stale.exists()
+    assert [str(path) for path in directory.iterdir()] == [new]
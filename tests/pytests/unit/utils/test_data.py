@@ -172,6 +172,42 @@ def test_subdict_match_with_wildcards(wildcard):
     assert salt.utils.data.subdict_match(data, wildcard)
 
 
+def test_subdict_matcher_match_many():
+    """
+    Tests matching a compiled expression against many dicts at once
+    """
+    data = [
+        {"os": "Ubuntu", "roles": ["web", "db"]},
+        {"os": "CentOS", "roles": ["web"]},
+        {"os": "ubuntu", "roles": []},
+        {},
+    ]
+    matcher = salt.utils.data.SubdictMatcher("os:ubuntu")
+    assert matcher.match_many(data) == [True, False, True, False]
+    matcher = salt.utils.data.SubdictMatcher("roles:d*")
+    assert matcher.match_many(data) == [True, False, False, False]
+    matcher = salt.utils.data.SubdictMatcher("os:cent.*", regex_match=True)
+    assert matcher.match_many(data) == [False, True, False, False]
+    matcher = salt.utils.data.SubdictMatcher("os:ubunt", exact_match=True)
+    assert matcher.match_many(data) == [False, False, False, False]
+    matcher = salt.utils.data.SubdictMatcher("os|centos", delimiter="|")
+    assert matcher.match_many(data) == [False, True, False, False]
+
+
+def test_subdict_matcher_invalid_regex():
+    matcher = salt.utils.data.SubdictMatcher("foo:(", regex_match=True)
+    assert matcher.match_many([{"foo": "("}, {"foo": "bar"}]) == [False, False]
+
+
+def test_compile_subdict_match_reuses_matcher():
+    matcher = salt.utils.data.compile_subdict_match("foo:bar")
+    assert salt.utils.data.compile_subdict_match("foo:bar") is matcher
+    assert (
+        salt.utils.data.compile_subdict_match("foo:bar", regex_match=True)
+        is not matcher
+    )
+
+
 def test_traverse_dict():
     test_two_level_dict = {"foo": {"bar": "baz"}}
 
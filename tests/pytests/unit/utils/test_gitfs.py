@@ -1,11 +1,14 @@
 import os
+import threading
 import time
 
 import pytest
 
 import salt.config
 import salt.exceptions
+import salt.fileclient
 import salt.fileserver.gitfs
+import salt.pillar.git_pillar
 import salt.utils.gitfs
 from salt.exceptions import FileserverConfigError
 from tests.support.mock import MagicMock, patch
@@ -21,6 +24,13 @@ except AttributeError:
     HAS_PYGIT2 = False
 
 
+try:
+    import git
+
+    HAS_GITPYTHON = True
+except ImportError:
+    HAS_GITPYTHON = False
+
 if HAS_PYGIT2:
     import pygit2
 
@@ -412,3 +422,308 @@ def test_find_file_subdir(tmp_path):
     gitfs.cache_root = str(root)
     ret = gitfs.find_file("foo/init.sls")
     assert ret == {"path": "", "rel": ""}
+
+
+def _commit_to_remote(remote, files, message):
+    """
+    Commit the given files (a dict mapping path to content, or None to remove
+    the path) to the master branch of the remote repository
+    """
+    repository = pygit2.Repository(remote)
+    signature = pygit2.Signature(
+        "Dummy Commiter", "dummy@dummy.com", int(time.time()), 0
+    )
+    repository.index.read()
+    for path, content in files.items():
+        full_path = os.path.join(repository.workdir, path)
+        if content is None:
+            os.remove(full_path)
+            repository.index.remove(path)
+            continue
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with salt.utils.files.fopen(full_path, "w") as fp_:
+            fp_.write(content)
+        repository.index.add(path)
+    repository.index.write()
+    tree = repository.index.write_tree()
+    repository.create_commit(
+        "HEAD", signature, signature, message, tree, [repository.head.target]
+    )
+
+
+@pytest.mark.skipif(not HAS_PYGIT2, reason="This host lacks proper pygit2 support")
+@pytest.mark.skip_on_windows(
+    reason="Skip Pygit2 on windows, due to pygit2 access error on windows"
+)
+def test_tree_index_pygit2(_prepare_provider, _prepare_remote_repository_pygit2):
+    provider = _prepare_provider
+    provider.remotecallbacks = None
+    provider.credentials = None
+    provider.init_remote()
+    _commit_to_remote(
+        _prepare_remote_repository_pygit2,
+        {"foo/bar.sls": "bar", "foo/baz/qux.sls": "qux"},
+        "Add foo",
+    )
+    provider.fetch()
+
+    provider.use_tree_index = False
+    files, symlinks = provider.file_list("base")
+    dirs = provider.dir_list("base")
+    blob, blob_hexsha, _ = provider.find_file("foo/bar.sls", "base")
+
+    provider.use_tree_index = True
+    assert provider.file_list("base") == (files, symlinks)
+    assert provider.dir_list("base") == dirs
+    assert files == {"README", "foo/bar.sls", "foo/baz/qux.sls"}
+    assert dirs == {"foo", "foo/baz"}
+    indexed_blob, indexed_hexsha, _ = provider.find_file("foo/bar.sls", "base")
+    assert indexed_hexsha == blob_hexsha
+    assert indexed_blob.data == blob.data == b"bar"
+    assert provider.find_file("foo/baz", "base") == (None, None, None)
+    assert provider.find_file("does/not/exist", "base") == (None, None, None)
+
+    # After a fetch, the index must be updated from the diff and not rebuilt
+    _commit_to_remote(
+        _prepare_remote_repository_pygit2,
+        {"foo/bar.sls": "changed", "foo/baz/qux.sls": None, "new.sls": "new"},
+        "Change foo",
+    )
+    provider.fetch()
+    with patch.object(
+        provider, "_walk_tree_index", side_effect=AssertionError("full walk")
+    ):
+        files, _ = provider.file_list("base")
+        assert files == {"README", "foo/bar.sls", "new.sls"}
+        assert provider.dir_list("base") == {"foo"}
+        assert provider.find_file("foo/bar.sls", "base")[0].data == b"changed"
+        assert provider.find_file("foo/baz/qux.sls", "base") == (None, None, None)
+
+    # The index is persisted, a fresh process must not need to walk the tree
+    provider._tree_index.clear()
+    with patch.object(
+        provider, "_walk_tree_index", side_effect=AssertionError("full walk")
+    ):
+        assert provider.file_list("base")[0] == files
+
+
+def _fake_remotes(tmp_path, count, fetch):
+    remotes = []
+    for idx in range(count):
+        work_dir = tmp_path / "work" / f"remote{idx}" / "_"
+        work_dir.mkdir(parents=True)
+        repo = MagicMock(id=f"remote{idx}", spec=salt.utils.gitfs.GitProvider)
+        repo.name = f"remote{idx}"
+        repo.get_salt_working_dir.return_value = str(work_dir)
+        repo.get_cache_basename.return_value = "_"
+        repo.fetch.side_effect = lambda idx=idx: fetch(idx)
+        remotes.append(repo)
+    return remotes
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_fetch_remotes_workers(minion_opts, tmp_path, workers):
+    minion_opts["gitfs_fetch_workers"] = workers
+    with patch.object(salt.utils.gitfs.GitFS, "verify_provider"):
+        gitfs = salt.utils.gitfs.GitFS(minion_opts, [], init_remotes=False)
+    gitfs.remotes = _fake_remotes(tmp_path, 6, lambda idx: idx == 3)
+    assert gitfs.fetch_remotes() is True
+    assert sorted(gitfs.fetch_durations) == [f"remote{idx}" for idx in range(6)]
+    for repo in gitfs.remotes:
+        repo.fetch.assert_called_once_with()
+
+    # Only the selected remote is fetched
+    assert gitfs.fetch_remotes(remotes=["remote1"]) is False
+    assert list(gitfs.fetch_durations) == ["remote1"]
+
+
+def test_fetch_remotes_timeout(minion_opts, tmp_path):
+    minion_opts["gitfs_fetch_workers"] = 2
+    minion_opts["gitfs_fetch_timeout"] = 1
+    release = threading.Event()
+
+    def _fetch(idx):
+        if idx == 0:
+            release.wait(30)
+        return True
+
+    with patch.object(salt.utils.gitfs.GitFS, "verify_provider"):
+        gitfs = salt.utils.gitfs.GitFS(minion_opts, [], init_remotes=False)
+    gitfs.remotes = _fake_remotes(tmp_path, 2, _fetch)
+    try:
+        start = time.time()
+        # The hung remote is abandoned, the other one's change is reported
+        assert gitfs.fetch_remotes() is True
+        assert time.time() - start < 10
+        assert list(gitfs.fetch_durations) == ["remote1"]
+        # The hung fetch does not keep the process from exiting
+        threads = [
+            thread
+            for thread in threading.enumerate()
+            if thread.name == "gitfs-fetch-remote0"
+        ]
+        assert threads and all(thread.daemon for thread in threads)
+
+        # The remote is skipped until its fetch completes
+        assert gitfs.fetch_remotes() is True
+        assert list(gitfs.fetch_durations) == ["remote1"]
+        assert gitfs.remotes[0].fetch.call_count == 1
+        durations = gitfs.fetch_durations
+        release.set()
+        threads[0].join(10)
+        # The abandoned fetch does not record into a later cycle's durations
+        assert list(durations) == ["remote1"]
+        assert gitfs.fetch_remotes() is True
+        assert gitfs.remotes[0].fetch.call_count == 2
+    finally:
+        release.set()
+
+
+@pytest.mark.skipif(not HAS_PYGIT2, reason="This host lacks proper pygit2 support")
+@pytest.mark.skip_on_windows(
+    reason="Skip Pygit2 on windows, due to pygit2 access error on windows"
+)
+def test_git_pillar_client_pygit2(
+    _prepare_provider, _prepare_remote_repository_pygit2, tmp_path
+):
+    provider = _prepare_provider
+    provider.remotecallbacks = None
+    provider.credentials = None
+    provider.init_remote()
+    _commit_to_remote(
+        _prepare_remote_repository_pygit2,
+        {"top.sls": "base: {}", "foo/bar.sls": "bar"},
+        "Add pillar",
+    )
+    provider.fetch()
+    provider.branch = "master"
+    tree = provider.get_checkout_tree()
+    assert provider.get_tree_files(tree) == ["README", "foo/bar.sls", "top.sls"]
+    assert provider.get_subtree(tree, "foo") is not None
+    assert provider.get_subtree(tree, "README") is None
+
+    root = str(tmp_path / "trees" / "root")
+    mounted = str(tmp_path / "trees" / "mounted")
+    pillar_trees = {
+        root: (provider, tree, "", "base"),
+        mounted: (provider, provider.get_subtree(tree, "foo"), "web", "base"),
+    }
+    opts = dict(provider.opts, pillar_roots={"base": [root, mounted]})
+    client = salt.fileclient.GitPillarClient(opts, pillar_trees)
+    assert sorted(client.file_list("base")) == [
+        "README",
+        "foo/bar.sls",
+        "top.sls",
+        "web/bar.sls",
+    ]
+    assert client.file_list("base", prefix="web") == ["web/bar.sls"]
+    assert client.dir_list("base") == [".", "foo", "web"]
+
+    # Nothing is written until a file is requested
+    assert not os.path.exists(root)
+    path = client.cache_file("salt://foo/bar.sls", "base")
+    assert path == os.path.join(root, "foo", "bar.sls")
+    with salt.utils.files.fopen(path) as fp_:
+        assert fp_.read() == "bar"
+    path = client.cache_file("salt://web/bar.sls", "base")
+    assert path == os.path.join(mounted, "web", "bar.sls")
+    assert os.listdir(root) == ["foo"]
+
+    assert not client.cache_file("salt://does/not/exist.sls", "base")
+    assert not client.cache_file("salt://web/../foo/bar.sls", "base")
+
+
+@pytest.mark.skipif(not HAS_GITPYTHON, reason="Missing gitpython")
+def test_git_pillar_client_gitpython_root(minion_opts, tmp_path):
+    remote = tmp_path / "remote"
+    repository = git.Repo.init(str(remote))
+    for path, content in {
+        "README": "readme",
+        "pillar/top.sls": "base: {}",
+        "pillar/foo/bar.sls": "bar",
+    }.items():
+        os.makedirs(os.path.dirname(str(remote / path)), exist_ok=True)
+        (remote / path).write_text(content)
+    repository.index.add(["README", "pillar/top.sls", "pillar/foo/bar.sls"])
+    actor = git.Actor("Dummy Commiter", "dummy@dummy.com")
+    repository.index.commit("Add pillar", author=actor, committer=actor)
+
+    master_opts = dict(
+        minion_opts,
+        cachedir=str(tmp_path / "cache"),
+        git_pillar_provider="gitpython",
+        git_pillar_ssl_verify=True,
+        git_pillar_refspecs=salt.config._DFLT_REFSPECS,
+    )
+    git_pillar = salt.utils.gitfs.GitPillar(
+        master_opts,
+        [{f"master file://{remote}": [{"root": "pillar"}]}],
+        per_remote_overrides=salt.pillar.git_pillar.PER_REMOTE_OVERRIDES,
+        per_remote_only=salt.pillar.git_pillar.PER_REMOTE_ONLY,
+        global_only=salt.pillar.git_pillar.GLOBAL_ONLY,
+    )
+    provider = git_pillar.remotes[0]
+    assert isinstance(provider, salt.utils.gitfs.GitPython)
+    tree = repository.head.commit.tree
+    subtree = provider.get_subtree(tree, "pillar")
+    assert subtree is not None
+    # The paths are relative to the root, not to the root of the repo
+    assert provider.get_tree_files(subtree) == ["foo/bar.sls", "top.sls"]
+    blob, _, _ = provider.find_file_in_tree("foo/bar.sls", subtree)
+    assert blob.data_stream.read() == b"bar"
+
+    root = str(tmp_path / "trees" / "root")
+    pillar_trees = {root: (provider, subtree, "", "base")}
+    opts = dict(provider.opts, pillar_roots={"base": [root]})
+    client = salt.fileclient.GitPillarClient(opts, pillar_trees)
+    assert sorted(client.file_list("base")) == ["foo/bar.sls", "top.sls"]
+    path = client.cache_file("salt://foo/bar.sls", "base")
+    assert path == os.path.join(root, "foo", "bar.sls")
+    with salt.utils.files.fopen(path) as fp_:
+        assert fp_.read() == "bar"
+
+
+def test_git_pillar_load_trees_prunes_old_trees(minion_opts):
+    with patch.object(
+        salt.utils.gitfs.GitPillar, "verify_gitpython", MagicMock(return_value=True)
+    ), patch.object(
+        salt.utils.gitfs.GitPillar, "verify_pygit2", MagicMock(return_value=False)
+    ):
+        git_pillar = salt.utils.gitfs.GitPillar(minion_opts, {}, init_remotes=False)
+
+    def _repo(mountpoint):
+        repo = MagicMock(_mountpoint=mountpoint, env="base")
+        repo.root.return_value = ""
+        repo.get_cache_basehash.return_value = "remotehash"
+        return repo
+
+    # The same remote, served under two mountpoints
+    repos = [_repo(""), _repo("web")]
+    git_pillar.remotes = repos
+
+    def _load(tree):
+        for repo in repos:
+            repo.get_checkout_tree.return_value = tree
+            repo.get_tree_hexsha.return_value = tree
+        git_pillar.load_trees()
+        for pillar_root in git_pillar.pillar_trees:
+            os.makedirs(os.path.join(pillar_root, "foo"), exist_ok=True)
+        return list(git_pillar.pillar_trees)
+
+    old_roots = _load("aaaa")
+    assert len(old_roots) == 2
+    tree_dir = os.path.dirname(old_roots[0])
+    assert tree_dir == os.path.join(git_pillar.cache_root, "trees", "remotehash")
+
+    new_roots = _load("bbbb")
+    assert sorted(os.listdir(tree_dir)) == sorted(
+        os.path.basename(root) for root in new_roots
+    )
+
+    # Nothing is removed unless every remote was resolved
+    repos[1].get_checkout_tree.return_value = None
+    repos[0].get_checkout_tree.return_value = "cccc"
+    repos[0].get_tree_hexsha.return_value = "cccc"
+    git_pillar.load_trees()
+    os.makedirs(next(iter(git_pillar.pillar_trees)))
+    assert len(os.listdir(tree_dir)) == 3
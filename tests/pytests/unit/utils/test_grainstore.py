@@ -0,0 +1,109 @@
+"""
+Tests for salt.utils.grainstore
+"""
+
+import pytest
+
+import salt.utils.grainstore
+from salt.exceptions import SaltInvocationError
+
+
+@pytest.fixture
+def opts(tmp_path):
+    return {
+        "cachedir": str(tmp_path),
+        "minion_data_cache": True,
+        "grains_store_paths": ["os", "osrelease", "roles", "ip4_interfaces:eth0"],
+    }
+
+
+@pytest.fixture
+def store(opts):
+    with salt.utils.grainstore.GrainStore(opts) as store:
+        store.update(
+            "web1",
+            {
+                "os": "Ubuntu",
+                "osrelease": "22.04",
+                "roles": ["web", "db"],
+                "ip4_interfaces": {"eth0": ["10.0.0.1"]},
+            },
+        )
+        store.update("web2", {"os": "Ubuntu", "osrelease": "20.04", "roles": ["web"]})
+        store.update("db1", {"os": "CentOS", "osrelease": "7"})
+        store.update("new", {})
+        yield store
+
+
+def test_query_group_by(store):
+    assert store.query(group_by="os") == {"Ubuntu": 2, "CentOS": 1}
+    assert store.query(group_by="os,osrelease") == {
+        "Ubuntu": {"22.04": 1, "20.04": 1},
+        "CentOS": {"7": 1},
+    }
+    assert store.query(group_by=["osrelease"], where="os:ubuntu") == {
+        "22.04": 1,
+        "20.04": 1,
+    }
+    # Non-scalar values are grouped by their JSON
+    assert store.query(group_by="ip4_interfaces:eth0") == {'["10.0.0.1"]': 1}
+
+
+def test_query_where(store):
+    assert store.minions() == ["db1", "new", "web1", "web2"]
+    assert store.query(where="os:ubuntu") == ["web1", "web2"]
+    assert store.query(where=["os:*", "osrelease:2*"]) == ["web1", "web2"]
+    assert store.query(where="os:Ubuntu,osrelease:22.*") == ["web1"]
+    # A list matches when any of its items match
+    assert store.query(where="roles:db") == ["web1"]
+    assert store.query(where="ip4_interfaces:eth0:10.0.*") == ["web1"]
+    assert store.query(where="os:Ubuntu", count=True) == 2
+    assert store.query(count=True) == 4
+
+
+def test_query_invalid(store):
+    with pytest.raises(SaltInvocationError):
+        store.query(group_by="kernel")
+    with pytest.raises(SaltInvocationError):
+        store.query(where="os")
+
+
+def test_update_replaces_minion(store):
+    store.update("web2", {"os": "Debian", "osrelease": "12"})
+    assert store.query(group_by="os") == {"Ubuntu": 1, "Debian": 1, "CentOS": 1}
+    assert store.query(where="roles:web") == ["web1"]
+    # The values only web2 had are removed, the ones web1 still has are kept
+    values = store._connect().execute("SELECT value FROM grain_values").fetchall()
+    assert sorted(row[0] for row in values) == [
+        '"12"',
+        '"22.04"',
+        '"7"',
+        '"CentOS"',
+        '"Debian"',
+        '"Ubuntu"',
+        '["10.0.0.1"]',
+        '["web", "db"]',
+    ]
+
+
+def test_remove(opts, store):
+    salt.utils.grainstore.remove(opts, "web1", "db1")
+    assert store.minions() == ["new", "web2"]
+    assert store.query(group_by="os") == {"Ubuntu": 1}
+    values = store._connect().execute("SELECT value FROM grain_values").fetchall()
+    assert sorted(row[0] for row in values) == ['"20.04"', '"Ubuntu"', '["web"]']
+
+
+def test_rebuild(store):
+    store.rebuild([("a", {"os": "Fedora"}), ("b", {"os": "fedora"})])
+    assert store.minions() == ["a", "b"]
+    assert store.query(group_by="os") == {"Fedora": 1, "fedora": 1}
+    assert store.query(where="os:FEDORA", count=True) == 2
+
+
+def test_update_disabled(opts):
+    opts["minion_data_cache"] = False
+    salt.utils.grainstore.update(opts, "web1", {"os": "Ubuntu"})
+    opts["minion_data_cache"] = True
+    with salt.utils.grainstore.GrainStore(opts) as store:
+        assert store.minions() == []
@@ -0,0 +1,46 @@
+import os
+import time
+
+import salt.utils.hashutils
+from tests.support.mock import patch
+
+
+def _age(path, seconds=60):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_get_hash_cached(tmp_path):
+    cachedir = str(tmp_path / "cache")
+    path = tmp_path / "file"
+    path.write_bytes(b"foo")
+    _age(path)
+    foo_hash = salt.utils.hashutils.get_hash(str(path))
+    # Make sure the ctime is old enough for the hash to be cached
+    with patch("time.time", return_value=time.time() + 60):
+        assert salt.utils.hashutils.get_hash_cached(str(path), cachedir) == foo_hash
+        assert len(os.listdir(cachedir)) == 1
+
+        with patch.object(salt.utils.hashutils, "get_hash", side_effect=AssertionError):
+            assert salt.utils.hashutils.get_hash_cached(str(path), cachedir) == foo_hash
+
+        # Any change to the stat of the file is a cache miss
+        path.write_bytes(b"bar")
+        _age(path)
+        assert salt.utils.hashutils.get_hash_cached(
+            str(path), cachedir
+        ) == salt.utils.hashutils.get_hash(str(path))
+
+        assert salt.utils.hashutils.get_hash_cached(
+            str(path), cachedir, form="md5"
+        ) == salt.utils.hashutils.get_hash(str(path), form="md5")
+
+
+def test_get_hash_cached_recently_modified(tmp_path):
+    cachedir = str(tmp_path / "cache")
+    path = tmp_path / "file"
+    path.write_bytes(b"foo")
+    assert salt.utils.hashutils.get_hash_cached(
+        str(path), cachedir
+    ) == salt.utils.hashutils.get_hash(str(path))
+    assert not os.path.exists(cachedir)
@@ -1,6 +1,7 @@
 import pytest
 
 import salt.utils.pkg
+from tests.support.mock import MagicMock, patch
 
 CURRENT_PKGS = {
     "acl": "2.2.53-4",
@@ -28,3 +29,52 @@ CURRENT_PKGS = {
 def test_match_wildcard(current_pkgs, pkg_params, expected):
     result = salt.utils.pkg.match_wildcard(current_pkgs, pkg_params)
     assert result == expected
+
+
+def test_cached_query(tmp_path):
+    db = tmp_path / "status"
+    db.write_text("foo")
+    context = {}
+    func = MagicMock(side_effect=lambda cmd, **kwargs: {"stdout": " ".join(cmd)})
+    with patch.object(salt.utils.pkg, "PKG_DB_PATHS", (str(db),)), patch.object(
+        salt.utils.pkg, "REPO_METADATA_PATHS", ()
+    ):
+        ret = salt.utils.pkg.cached_query(context, "apt", func, ["foo"], env={})
+        assert ret == {"stdout": "foo"}
+        # Changes to the returned data do not leak into the cache
+        ret["stdout"] = "bar"
+        assert salt.utils.pkg.cached_query(context, "apt", func, ["foo"], env={}) == {
+            "stdout": "foo"
+        }
+        assert func.call_count == 1
+
+        salt.utils.pkg.cached_query(context, "apt", func, ["bar"], env={})
+        assert func.call_count == 2
+
+        # A change to the package database drops the cache
+        db.write_text("foo bar")
+        salt.utils.pkg.cached_query(context, "apt", func, ["foo"], env={})
+        assert func.call_count == 3
+
+        salt.utils.pkg.clear_query_cache(context)
+        salt.utils.pkg.cached_query(context, "apt", func, ["foo"], env={})
+        assert func.call_count == 4
+
+
+def test_cached_query_failure_not_cached():
+    context = {}
+    func = MagicMock(
+        side_effect=[
+            {"retcode": 100, "stderr": "E: Could not get lock /var/lib/dpkg/lock"},
+            {"retcode": 0, "stdout": "foo"},
+        ]
+    )
+    with patch.object(salt.utils.pkg, "PKG_DB_PATHS", ()), patch.object(
+        salt.utils.pkg, "REPO_METADATA_PATHS", ()
+    ):
+        ret = salt.utils.pkg.cached_query(context, "apt", func, ["foo"])
+        assert ret["retcode"] == 100
+        ret = salt.utils.pkg.cached_query(context, "apt", func, ["foo"])
+        assert ret == {"retcode": 0, "stdout": "foo"}
+        assert salt.utils.pkg.cached_query(context, "apt", func, ["foo"]) == ret
+    assert func.call_count == 2
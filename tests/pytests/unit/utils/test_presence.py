@@ -0,0 +1,72 @@
+"""
+Tests for salt.utils.presence
+"""
+
+import pytest
+
+import salt.utils.presence
+
+
+@pytest.fixture
+def opts(tmp_path):
+    return {"cachedir": str(tmp_path), "transport": "tcp", "presence_table": True}
+
+
+@pytest.fixture
+def table(opts):
+    with salt.utils.presence.PresenceTable(opts) as table:
+        table.reset("tcp:4505", now=100)
+        table.update(
+            "tcp:4505",
+            connected=[("web1", "10.0.0.1"), ("web2", "10.0.0.2")],
+            now=100,
+        )
+        yield table
+
+
+@pytest.mark.parametrize(
+    "presence_table,transport,transport_opts,expected",
+    (
+        (False, "tcp", None, False),
+        (True, "tcp", None, True),
+        (True, "ws", {"tcp": {}}, True),
+        (True, "zeromq", None, False),
+        (True, "tcp", {"zeromq": {}}, False),
+    ),
+)
+def test_enabled(presence_table, transport, transport_opts, expected):
+    opts = {"presence_table": presence_table, "transport": transport}
+    if transport_opts is not None:
+        opts["transport_opts"] = transport_opts
+    assert salt.utils.presence.enabled(opts) is expected
+
+
+def test_update(table):
+    table.update("tcp:4505", seen=["web1"], disconnected=["web2"], now=110)
+    assert table.present(now=110) == {
+        "web1": {"addr": "10.0.0.1", "connected": 100, "seen": 110}
+    }
+    assert table.present(subset=["web2"], now=110) == {}
+
+
+def test_present_publisher_timeout(table):
+    table.reset("ws:4505", now=100)
+    table.update("ws:4505", connected=[("web3", "10.0.0.3")], now=130)
+    timeout = salt.utils.presence.PUBLISHER_TIMEOUT
+    # The tcp publisher stopped updating its heartbeat
+    assert list(table.present(now=100 + timeout + 1)) == ["web3"]
+
+
+def test_reset(table):
+    table.reset("tcp:4505", now=120)
+    assert table.present(now=120) == {}
+
+
+def test_connected_ids(opts, table):
+    # The heartbeat of the publisher is too old
+    assert salt.utils.presence.connected_ids(opts) == set()
+    table.update("tcp:4505")
+    assert salt.utils.presence.connected_ids(opts) == {"web1", "web2"}
+    assert salt.utils.presence.connected_ids(
+        opts, subset=["web2", "web3"], show_ip=True
+    ) == {("web2", "10.0.0.2")}
@@ -0,0 +1,59 @@
+"""
+Tests for salt.utils.topmatch
+"""
+
+import pytest
+
+import salt.utils.rendercache
+import salt.utils.topmatch
+from tests.support.mock import MagicMock, patch
+
+
+@pytest.fixture(autouse=True)
+def match_cache():
+    with patch.dict(salt.utils.rendercache._RENDER_CACHES, clear=True):
+        yield
+
+
+def _matcher(minion_id, os_name, confirm_top):
+    opts = {"id": minion_id, "grains": {"os": os_name}, "pillar": {}}
+    return salt.utils.topmatch.TopMatcher(opts, confirm_top)
+
+
+def test_grain_match_shared_between_minions():
+    confirm_top = MagicMock(return_value=True)
+    data = [{"match": "grain"}, "ubuntu"]
+    assert _matcher("web1", "Ubuntu", confirm_top)("os:Ubuntu", data, {}) is True
+    assert _matcher("web2", "Ubuntu", confirm_top)("os:Ubuntu", data, {}) is True
+    assert confirm_top.call_count == 1
+    # The grains differ
+    _matcher("web3", "CentOS", confirm_top)("os:Ubuntu", data, {})
+    assert confirm_top.call_count == 2
+
+
+def test_compound_match_uses_the_inputs_it_reads():
+    confirm_top = MagicMock(return_value=False)
+    data = ["webserver"]
+    assert (
+        _matcher("web1", "Ubuntu", confirm_top)("G@os:Ubuntu and web*", data, {})
+        is False
+    )
+    # The compound target reads the ID, so other minions are matched again
+    _matcher("web2", "Ubuntu", confirm_top)("G@os:Ubuntu and web*", data, {})
+    _matcher("web1", "Ubuntu", confirm_top)("G@os:Ubuntu and web*", data, {})
+    assert confirm_top.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "match,data",
+    [
+        ("R@%cluster", ["state"]),
+        ("foo", [{"match": "data"}, "state"]),
+        ("foo", [{"match": "custom"}, "state"]),
+    ],
+)
+def test_uncacheable_matches(match, data):
+    confirm_top = MagicMock(return_value=True)
+    for _ in range(2):
+        assert _matcher("web1", "Ubuntu", confirm_top)(match, data, {}) is True
+    assert confirm_top.call_count == 2
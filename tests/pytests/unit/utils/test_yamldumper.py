@@ -4,6 +4,7 @@
 
 from collections import OrderedDict, defaultdict
 
+import salt.utils.rendercache
 import salt.utils.yamldumper
 from salt.utils.context import NamespacedDictWrapper
 from salt.utils.odict import HashableOrderedDict
@@ -102,6 +103,19 @@ def test_yaml_namespaced_dict_wrapper_dump():
     assert salt.utils.yamldumper.dump(data) == exp_yaml
 
 
+def test_yaml_tracked_dict_dump():
+    """
+    Test yaml.safe_dump with TrackedDict
+    """
+    inputs = salt.utils.rendercache.RenderInputs()
+    data = inputs.track("grains", {"foo": "bar"})
+    assert salt.utils.yamldumper.safe_dump(data) == "{foo: bar}\n"
+    assert (
+        salt.utils.yamldumper.dump(data, Dumper=salt.utils.yamldumper.OrderedDumper)
+        == "{foo: bar}\n"
+    )
+
+
 def test_yaml_undefined_dump():
     """
     Test yaml.safe_dump with None